@@ -12,6 +12,8 @@ import sqlite3
 # Add parent directory to path to allow imports from main package
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
+from .query_logger import log_search_query
+from response_cache import response_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +35,11 @@ def health_check():
         'version': '1.0.0'
     })
 
+@api_bp.route('/metrics/cache', methods=['GET'])
+def cache_metrics():
+    """API endpoint for response cache hit rates"""
+    return jsonify(response_cache.stats())
+
 @api_bp.route('/search', methods=['POST'])
 def search():
     """API endpoint for search"""
@@ -111,8 +118,8 @@ def search():
             
             conn.close()
         
-        # Log search query
-        log_search_query(query, search_type, len(search_results))
+        # Queue the query log; the id is assigned up front so no second query is needed
+        query_log_id = log_search_query(query, search_type, len(search_results))
         
         # Calculate total pages (for pagination)
         total_pages = 1  # Simple implementation
@@ -140,7 +147,7 @@ def search():
             'page': page,
             'total_pages': total_pages,
             'search_time': 0.5,  # Placeholder
-            'query_log_id': get_last_query_id()
+            'query_log_id': query_log_id
         })
         
     except Exception as e:
@@ -187,6 +194,8 @@ def answer():
             model=model
         )
         
+        query_log_id = log_search_query(query, search_type, len(response.get('sources', [])))
+        
         return jsonify({
             'query': query,
             'answer': response.get('answer', ''),
@@ -199,7 +208,7 @@ def answer():
                 'source_type': source_type,
                 'timestamp': datetime.now().isoformat()
             },
-            'query_log_id': get_last_query_id()
+            'query_log_id': query_log_id
         })
         
     except Exception as e:
@@ -281,7 +290,7 @@ def save_feedback():
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS user_feedback (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query_log_id INTEGER,
+                query_log_id TEXT,
                 content_id INTEGER,
                 feedback_score INTEGER,
                 feedback_type TEXT,
@@ -306,46 +315,3 @@ def save_feedback():
     except Exception as e:
         logger.error(f"Error saving feedback: {str(e)}")
         return jsonify({'error': str(e)}), 500
-
-def log_search_query(query, search_type, results_count):
-    """Log search query to database"""
-    try:
-        conn = sqlite3.connect(config.DB_PATH)
-        cursor = conn.cursor()
-        
-        # Create table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS query_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query TEXT,
-                search_type TEXT,
-                results_count INTEGER,
-                date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Insert query log
-        cursor.execute("""
-            INSERT INTO query_logs (query, search_type, results_count)
-            VALUES (?, ?, ?)
-        """, (query, search_type, results_count))
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Error logging query: {str(e)}")
-
-def get_last_query_id():
-    """Get the ID of the last logged query"""
-    try:
-        conn = sqlite3.connect(config.DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT last_insert_rowid()")
-        query_id = cursor.fetchone()[0]
-        
-        conn.close()
-        return query_id
-    except Exception as e:
-        logger.error(f"Error getting last query ID: {str(e)}")
-        return None 
\ No newline at end of file
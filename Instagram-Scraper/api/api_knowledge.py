@@ -11,6 +11,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
 from api.api import api_bp
+from response_cache import cached_response
+from concept_stats import read_concept_stats
 
 logger = logging.getLogger('api.knowledge')
 
@@ -83,6 +85,7 @@ def search_concepts():
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/concepts/<int:concept_id>', methods=['GET'])
+@cached_response('concept')
 def get_concept(concept_id):
     """API endpoint to get concept details"""
     try:
@@ -172,6 +175,7 @@ def get_concept(concept_id):
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/content/<int:content_id>', methods=['GET'])
+@cached_response('content')
 def get_content(content_id):
     """API endpoint to get content details"""
     try:
@@ -256,72 +260,38 @@ def get_content(content_id):
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/kg/stats', methods=['GET'])
+@cached_response('kg_stats')
 def knowledge_graph_stats():
     """API endpoint to get knowledge graph statistics"""
     try:
+        # Counts and top concepts come from the materialized concept_stats table
+        stats = read_concept_stats(config.DB_PATH, limit=10)
+        
+        conn = sqlite3.connect(config.DB_PATH)
         try:
-            from knowledge_graph import KnowledgeGraph
-            graph = KnowledgeGraph()
-            stats = graph.get_statistics()
-            return jsonify(stats)
-        except ImportError:
-            # Fallback to direct DB query
-            conn = sqlite3.connect(config.DB_PATH)
             cursor = conn.cursor()
-            
-            # Get concept count
-            cursor.execute("SELECT COUNT(*) FROM concepts")
-            concepts_count = cursor.fetchone()[0]
-            
-            # Get content count
             cursor.execute("SELECT COUNT(*) FROM ai_content")
             content_count = cursor.fetchone()[0]
-            
-            # Get relationship count
-            cursor.execute("SELECT COUNT(*) FROM content_concepts")
-            relationships_count = cursor.fetchone()[0]
-            
-            # Get concept categories
-            cursor.execute("""
-                SELECT category, COUNT(*) as count
-                FROM concepts
-                GROUP BY category
-                ORDER BY count DESC
-            """)
-            
-            categories = {}
-            for row in cursor.fetchall():
-                categories[row[0]] = row[1]
-            
-            # Get top concepts
-            cursor.execute("""
-                SELECT c.id, c.name, c.category, COUNT(*) as reference_count
-                FROM concepts c
-                JOIN content_concepts cc ON c.id = cc.concept_id
-                GROUP BY c.id
-                ORDER BY reference_count DESC
-                LIMIT 10
-            """)
-            
-            top_concepts = []
-            for row in cursor.fetchall():
-                top_concepts.append({
-                    'id': row[0],
-                    'name': row[1],
-                    'category': row[2],
-                    'reference_count': row[3]
-                })
-            
+        finally:
             conn.close()
-            
-            return jsonify({
-                'concepts_count': concepts_count,
-                'content_count': content_count,
-                'relationships_count': relationships_count,
-                'categories': categories,
-                'top_concepts': top_concepts
-            })
+        
+        return jsonify({
+            'concepts_count': stats['concept_count'],
+            'content_count': content_count,
+            'relationships_count': stats['content_concept_links'],
+            'concept_relationships_count': stats['relationship_count'],
+            'categories': {c['category']: c['count'] for c in stats['categories']},
+            'top_concepts': [
+                {
+                    'id': c['id'],
+                    'name': c['name'],
+                    'category': c['category'],
+                    'reference_count': c['count']
+                }
+                for c in stats['top_concepts']
+            ]
+        })
             
     except Exception as e:
         logger.error(f"Error in knowledge graph stats API: {str(e)}")
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
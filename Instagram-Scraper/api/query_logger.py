@@ -0,0 +1,212 @@
+"""
+Buffered, asynchronous search query logging for the API
+
+Query log rows are queued in-process and written by a background thread
+with executemany, so request latency never waits on a SQLite commit.
+Each logged query gets a UUID up front, which the API returns to the
+client as query_log_id for later feedback.
+"""
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+# Add parent directory to path to allow imports from main package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+logger = logging.getLogger('api.query_logger')
+
+# Flush the buffer every FLUSH_INTERVAL_MS or once MAX_BATCH_ROWS are queued
+FLUSH_INTERVAL_MS = 500
+MAX_BATCH_ROWS = 200
+# Upper bound on queued rows; beyond this new log entries are dropped
+MAX_QUEUE_SIZE = 10000
+
+
+class QueryLogWriter:
+    """Queue-backed writer that batches query_logs inserts on a background thread"""
+
+    def __init__(self, db_path: Optional[str] = None,
+                 flush_interval_ms: int = FLUSH_INTERVAL_MS,
+                 max_batch_rows: int = MAX_BATCH_ROWS,
+                 max_queue_size: int = MAX_QUEUE_SIZE):
+        """
+        Initialize the writer (the background thread starts on first use)
+
+        Args:
+            db_path: Path to the SQLite database (defaults to config.DB_PATH)
+            flush_interval_ms: Maximum time a queued row waits before being written
+            max_batch_rows: Number of queued rows that triggers an immediate flush
+            max_queue_size: Maximum number of rows held in memory
+        """
+        self.db_path = db_path or config.DB_PATH
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+
+    def log(self, query: str, search_type: str, results_count: int) -> str:
+        """
+        Queue a query log row and return its id immediately
+
+        Args:
+            query: The search query text
+            search_type: Search type used (hybrid, vector, keyword, rag)
+            results_count: Number of results returned
+
+        Returns:
+            UUID string identifying the query log row
+        """
+        self._ensure_started()
+
+        query_uuid = uuid.uuid4().hex
+        row = (query_uuid, query, search_type, results_count,
+               time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()))
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Query log queue full, dropping log for query: {query[:50]}")
+
+        return query_uuid
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until all rows queued so far have been committed (or timeout)"""
+        # The writer marks rows done only after their batch is committed;
+        # an empty queue can still have a batch in flight
+        deadline = time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._queue.all_tasks_done.wait(remaining)
+
+    def close(self) -> None:
+        """Stop the background thread after writing any remaining rows"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+        self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='query-log-writer', daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query_uuid TEXT,
+                query TEXT,
+                search_type TEXT,
+                results_count INTEGER,
+                date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Older databases created query_logs without the uuid column
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(query_logs)")]
+        if 'query_uuid' not in columns:
+            conn.execute("ALTER TABLE query_logs ADD COLUMN query_uuid TEXT")
+
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_query_logs_uuid ON query_logs(query_uuid)"
+        )
+        conn.commit()
+        return conn
+
+    def _drain(self, first_row: Tuple) -> List[Tuple]:
+        """Collect up to max_batch_rows rows, waiting at most flush_interval"""
+        batch = [first_row]
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.max_batch_rows:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Tuple]) -> None:
+        try:
+            conn.executemany("""
+                INSERT INTO query_logs (query_uuid, query, search_type, results_count, date_created)
+                VALUES (?, ?, ?, ?, ?)
+            """, batch)
+            conn.commit()
+            self.written += len(batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} query logs: {str(e)}")
+            conn.rollback()
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self) -> None:
+        try:
+            conn = self._connect()
+        except Exception as e:
+            logger.error(f"Query log writer could not open database: {str(e)}")
+            self._thread = None
+            return
+
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                try:
+                    first_row = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                self._write(conn, self._drain(first_row))
+        finally:
+            conn.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_query_log_writer() -> QueryLogWriter:
+    """Return the process-wide query log writer"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = QueryLogWriter()
+    return _writer
+
+
+def log_search_query(query: str, search_type: str, results_count: int) -> str:
+    """
+    Log a search query without blocking on the database
+
+    Returns:
+        UUID of the query log row, usable as query_log_id for feedback
+    """
+    return get_query_log_writer().log(query, search_type, results_count)
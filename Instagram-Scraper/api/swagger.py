@@ -52,6 +52,29 @@ def swagger_json():
                     }
                 }
             },
+            "/metrics/cache": {
+                "get": {
+                    "summary": "Response cache metrics",
+                    "description": "Hit rates of the shared response cache, overall and per endpoint",
+                    "produces": ["application/json"],
+                    "responses": {
+                        "200": {
+                            "description": "Cache statistics",
+                            "schema": {
+                                "type": "object",
+                                "properties": {
+                                    "entries": {"type": "integer"},
+                                    "generation": {"type": "integer"},
+                                    "hits": {"type": "integer"},
+                                    "misses": {"type": "integer"},
+                                    "hit_rate": {"type": "number"},
+                                    "namespaces": {"type": "object"}
+                                }
+                            }
+                        }
+                    }
+                }
+            },
             "/search": {
                 "post": {
                     "summary": "Search the knowledge base",
@@ -301,8 +324,8 @@ def swagger_json():
                                 "type": "object",
                                 "properties": {
                                     "query_log_id": {
-                                        "type": "integer",
-                                        "description": "ID of the query log"
+                                        "type": "string",
+                                        "description": "ID of the query log (returned by /search and /answer)"
                                     },
                                     "content_id": {
                                         "type": "integer",
@@ -502,6 +525,7 @@ def swagger_json():
                                     "concepts_count": {"type": "integer"},
                                     "content_count": {"type": "integer"},
                                     "relationships_count": {"type": "integer"},
+                                    "concept_relationships_count": {"type": "integer"},
                                     "categories": {"type": "object"},
                                     "top_concepts": {
                                         "type": "array",
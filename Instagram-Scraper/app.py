@@ -4,7 +4,6 @@ Web interface for the AI Knowledge Base
 import os
 import re
 import sqlite3
-from functools import lru_cache
 from flask import Flask, render_template, request, jsonify, g, send_from_directory, redirect, url_for
 
 from config import (
@@ -14,6 +13,7 @@ from config import (
     DOWNLOAD_DIR,
     DATA_DIR
 )
+from response_cache import cached_call, response_cache
 
 app = Flask(__name__)
 
@@ -143,7 +143,7 @@ def media(path):
     """Serve media files"""
     return send_from_directory(DOWNLOAD_DIR, path)
 
-@lru_cache(maxsize=100)
+@cached_call('video_by_shortcode')
 def get_video_by_shortcode(shortcode):
     """Legacy cache for videos by shortcode"""
     db = sqlite3.connect(DB_PATH)
@@ -159,7 +159,7 @@ def get_video_by_shortcode(shortcode):
         db.close()
         return None
 
-@lru_cache(maxsize=30)
+@cached_call('recent_videos')
 def get_recent_videos(limit=10, account=None):
     """Legacy cache for recent videos"""
     db = sqlite3.connect(DB_PATH)
@@ -181,8 +181,7 @@ def get_recent_videos(limit=10, account=None):
 
 def clear_caches():
     """Clear all cached data"""
-    get_video_by_shortcode.cache_clear()
-    get_recent_videos.cache_clear()
+    response_cache.invalidate()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=WEB_PORT, debug=DEBUG_MODE) 
\ No newline at end of file
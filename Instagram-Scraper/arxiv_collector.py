@@ -9,7 +9,6 @@ import sqlite3
 import hashlib
 import requests
 import PyPDF2
-import feedparser
 import Levenshtein
 from datetime import datetime
 from urllib.parse import urlparse, urljoin
@@ -24,6 +23,11 @@ except ImportError:
     ARXIV_AVAILABLE = False
 
 import config
+from response_cache import bump_data_generation
+from paper_dedup import find_duplicate, index_paper, index_paper_by_id, paper_id_for_rowid
+from pdf_extractor import DEFAULT_TIMEOUT as PDF_EXTRACTION_TIMEOUT, get_pdf_extractor, join_pages
+from paper_pipeline import PaperPipeline, parse_feed_entry
+from http_cache import install_http_cache, log_http_cache_stats
 try:
     from mistral_ocr import mistral_ocr
 except ImportError:
@@ -57,6 +61,10 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
+# Session for pages fetched again on every run (revalidated through the HTTP cache)
+http_session = install_http_cache(requests.Session())
+http_session.headers.update(HEADERS)
+
 def setup_directories():
     """Create necessary directories for storing paper data"""
     papers_dir = os.path.join(config.DATA_DIR, "papers")
@@ -106,17 +114,18 @@ def get_proxy():
         "https": proxy_url
     }
 
+def mistral_ocr_configured():
+    """Check if Mistral OCR is enabled in MISTRAL_OCR_CONFIG and available"""
+    return (hasattr(config, 'MISTRAL_OCR_CONFIG') and 
+            config.MISTRAL_OCR_CONFIG.get('enabled', False) and 
+            MISTRAL_AVAILABLE)
+
 def extract_text_from_pdf(pdf_path):
     """
     Extract text content from a PDF file using PyPDF2
     Falls back to default PyPDF2 extraction if Mistral OCR is not available
     """
-    # Check if Mistral OCR is enabled and available
-    use_mistral = (hasattr(config, 'MISTRAL_OCR_CONFIG') and 
-                  config.MISTRAL_OCR_CONFIG.get('enabled', False) and 
-                  MISTRAL_AVAILABLE)
-                  
-    if use_mistral:
+    if mistral_ocr_configured():
         # Try Mistral OCR first
         try:
             return extract_text_with_mistral_ocr(pdf_path)
@@ -151,47 +160,33 @@ def extract_text_with_pypdf(pdf_path):
         logger.error(f"Error extracting text from PDF {pdf_path} with PyPDF2: {str(e)}")
         return None
 
+def get_extractor():
+    """The shared PDF extraction pool, sized from config (PDF_EXTRACTION_WORKERS, PDF_EXTRACTION_TIMEOUT)"""
+    return get_pdf_extractor(workers=getattr(config, 'PDF_EXTRACTION_WORKERS', 0),
+                             timeout=getattr(config, 'PDF_EXTRACTION_TIMEOUT', PDF_EXTRACTION_TIMEOUT))
+
 def extract_text_with_pypdf2(pdf_path):
     """
     Extract text from a PDF file using PyPDF2
     
+    Runs on the extraction pool (see pdf_extractor), so a PDF that hangs the
+    parser is abandoned after the timeout, and text already extracted from
+    an identical file is read from the cache.
+    
     Args:
         pdf_path: Path to the PDF file
         
     Returns:
-        str: Extracted text
+        str: Extracted text (empty if the extraction failed or timed out)
     """
     try:
-        text = ""
-        title = None
-        
-        with open(pdf_path, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            num_pages = len(pdf_reader.pages)
-            
-            # Extract title from first page if possible
-            if pdf_reader.pages:
-                first_page_text = pdf_reader.pages[0].extract_text() or ""
-                lines = first_page_text.split('\n')
-                if lines:
-                    # Use first non-empty line as title
-                    for line in lines:
-                        if line.strip():
-                            title = line.strip()
-                            break
-            
-            # Extract text from all pages
-            for page in pdf_reader.pages:
-                try:
-                    page_text = page.extract_text() or ""
-                    # Handle encoding issues
-                    page_text = page_text.encode('utf-8', errors='replace').decode('utf-8')
-                    text += page_text + "\n\n"
-                except Exception as e:
-                    logger.warning(f"Error extracting text from page: {e}")
-                    continue
-                
-        logger.info(f"Extracted text using PyPDF2: {len(text)} characters from {num_pages} pages")
+        result = list(get_extractor().extract_many([pdf_path]))[0]
+        if not result['complete']:
+            logger.error(f"Text extraction from {pdf_path} failed ({result['error']}) "
+                         f"after {len(result['pages'])} pages")
+            return ""
+        text = join_pages(result['pages'])
+        logger.info(f"Extracted text using PyPDF2: {len(text)} characters from {len(result['pages'])} pages")
         return text
     except Exception as e:
         logger.error(f"Error extracting text with PyPDF2: {e}")
@@ -256,57 +251,68 @@ def extract_text_with_mistral_ocr(pdf_path):
             return ""
 
 def parse_sections(text):
-    """Attempt to parse sections from extracted PDF text"""
+    """
+    Attempt to parse sections from extracted PDF text
+    
+    Args:
+        text: Full text, or an iterable of page texts (e.g. pages streamed
+            from the extraction pool), consumed one page at a time
+    """
     sections = {
-        "abstract": "",
-        "introduction": "",
-        "methodology": "",
-        "results": "",
-        "conclusion": "",
-        "references": ""
+        "abstract": [],
+        "introduction": [],
+        "methodology": [],
+        "results": [],
+        "conclusion": [],
+        "references": []
     }
+    sizes = dict.fromkeys(sections, 0)
     
     if not text:
-        return sections
+        return {section: "" for section in sections}
+    pages = [text] if isinstance(text, str) else text
         
     # Simple heuristic section detection
-    lines = text.split('\n')
     current_section = "abstract"
     
-    for line in lines:
-        line = line.strip()
-        line_lower = line.lower()
-        
-        # Check for section headers
-        if "abstract" in line_lower and len(line) < 30:
-            current_section = "abstract"
-            continue
-        elif any(x in line_lower for x in ["introduction", "background"]) and len(line) < 30:
-            current_section = "introduction"
-            continue
-        elif any(x in line_lower for x in ["method", "approach", "model", "implementation"]) and len(line) < 30:
-            current_section = "methodology"
-            continue
-        elif any(x in line_lower for x in ["result", "evaluation", "experiment", "performance"]) and len(line) < 30:
-            current_section = "results"
-            continue
-        elif any(x in line_lower for x in ["conclusion", "discussion", "future work"]) and len(line) < 30:
-            current_section = "conclusion"
-            continue
-        elif any(x in line_lower for x in ["reference", "bibliography"]) and len(line) < 30:
-            current_section = "references"
-            continue
+    for page in pages:
+        for line in page.split('\n'):
+            line = line.strip()
+            line_lower = line.lower()
             
-        # Add text to current section
-        if line and current_section in sections:
-            sections[current_section] += line + "\n"
+            # Check for section headers
+            if "abstract" in line_lower and len(line) < 30:
+                current_section = "abstract"
+                continue
+            elif any(x in line_lower for x in ["introduction", "background"]) and len(line) < 30:
+                current_section = "introduction"
+                continue
+            elif any(x in line_lower for x in ["method", "approach", "model", "implementation"]) and len(line) < 30:
+                current_section = "methodology"
+                continue
+            elif any(x in line_lower for x in ["result", "evaluation", "experiment", "performance"]) and len(line) < 30:
+                current_section = "results"
+                continue
+            elif any(x in line_lower for x in ["conclusion", "discussion", "future work"]) and len(line) < 30:
+                current_section = "conclusion"
+                continue
+            elif any(x in line_lower for x in ["reference", "bibliography"]) and len(line) < 30:
+                current_section = "references"
+                continue
+                
+            # Add text to current section (nothing is kept past the size limit)
+            if line and current_section in sections and sizes[current_section] <= 100000:
+                sections[current_section].append(line + "\n")
+                sizes[current_section] += len(line) + 1
     
     # Clean up sections
-    for section in sections:
-        if len(sections[section]) > 100000:  # Limit section size
-            sections[section] = sections[section][:100000] + "... [truncated]"
+    result = {}
+    for section, lines in sections.items():
+        result[section] = "".join(lines)
+        if len(result[section]) > 100000:  # Limit section size
+            result[section] = result[section][:100000] + "... [truncated]"
     
-    return sections
+    return result
 
 def download_paper_from_url(url, conn, paper_dir, use_mistral_ocr=False):
     """
@@ -358,7 +364,7 @@ def download_paper_from_url(url, conn, paper_dir, use_mistral_ocr=False):
         if not is_pdf_url:
             # If not a direct PDF link, try to find PDF link on the webpage
             try:
-                response = requests.get(url, headers=HEADERS, timeout=30)
+                response = http_session.get(url, timeout=30)
                 response.raise_for_status()
                 
                 soup = BeautifulSoup(response.text, 'html.parser')
@@ -464,6 +470,7 @@ def download_paper_from_url(url, conn, paper_dir, use_mistral_ocr=False):
                     None,  # No embedding yet
                 ),
             )
+            index_paper(conn, cursor.lastrowid, title, text, abstract=abstract)
             conn.commit()
             
             logger.info(f"Added paper {paper_id} to database")
@@ -607,6 +614,7 @@ def collect_papers(max_papers=None, force_update=False):
                                     0  # Not indexed yet
                                 )
                             )
+                            bump_data_generation(cursor, 'arxiv_collector')
                             conn.commit()
                         except Exception as e:
                             logger.error(f"Error adding paper to ai_content: {str(e)}")
@@ -619,6 +627,7 @@ def collect_papers(max_papers=None, force_update=False):
                     
             logger.info(f"Added {url_papers_added} papers from custom URLs")
         
+        log_http_cache_stats()
         conn.close()
         return total_papers_added
         
@@ -672,103 +681,243 @@ def download_arxiv_paper(paper_id, papers_pdf_dir):
         logger.error(f"Error downloading paper {paper_id}: {str(e)}")
         return None
 
-def is_duplicate_paper(conn, text, title, abstract, threshold=0.8):
+def is_duplicate_paper(conn, text, title, abstract, threshold=0.8, paper_id=None):
     """
-    Check if a paper is a duplicate based on title, abstract, and content similarity
+    Check if a paper is a duplicate based on title and content similarity
+    
+    Uses the MinHash/LSH index in paper_dedup, which covers every stored
+    paper. With text=None the title is checked against the abstract, which
+    is enough to skip a download before its PDF is fetched; a matching
+    title alone is never a duplicate.
     
     Args:
         conn: Database connection
-        text: Full text of the paper
+        text: Full text of the paper (or None)
         title: Title of the paper
         abstract: Abstract of the paper
         threshold: Similarity threshold (0-1) for considering a duplicate
+        paper_id: ID of the paper itself if it is already stored (never its own duplicate)
         
     Returns:
         tuple: (is_duplicate, existing_id) if duplicate, (False, None) otherwise
     """
-    # TEMPORARILY DISABLED - ALWAYS RETURN FALSE FOR TESTING
-    return False, None
-    
-    # Original implementation commented out below
-    '''
     try:
-        # If text is too short, it's probably not extractable, so skip duplicate check
-        if not text or len(text) < 100:
+        exclude_rowid = None
+        if paper_id is not None:
+            row = conn.execute("SELECT rowid FROM research_papers WHERE id = ?", (paper_id,)).fetchone()
+            exclude_rowid = row[0] if row else None
+        
+        match = find_duplicate(conn, text, title, threshold=threshold, exclude_rowid=exclude_rowid,
+                               abstract=abstract)
+        if not match:
             return False, None
-            
-        cursor = conn.cursor()
         
-        # First try to find duplicates by title similarity
-        cursor.execute(
-            "SELECT id, title, abstract, content FROM research_papers ORDER BY last_crawled DESC LIMIT 100"
-        )
-        results = cursor.fetchall()
+        logger.info(f"Duplicate paper detected by {match['reason']} similarity: {match['score']:.2f}")
+        return True, paper_id_for_rowid(conn, match['rowid'])
+    except Exception as e:
+        logger.error(f"Error checking for duplicate papers: {str(e)}")
+        return False, None
+
+def store_arxiv_papers(conn, papers, papers_text_dir, source_type_id):
+    """
+    Store a batch of downloaded arXiv papers in one transaction
+    
+    Args:
+        conn: Database connection
+        papers: Paper dicts from paper_pipeline.parse_feed_entry with pdf_path,
+            text and existing set
+        papers_text_dir: Directory to save text files
+        source_type_id: Source type ID for research papers
         
-        for row in results:
-            existing_id, existing_title, existing_abstract, existing_content = row
+    Returns:
+        int: Number of papers added
+    """
+    papers_added = 0
+    changed = False
+    cursor = conn.cursor()
+    
+    for paper in papers:
+        paper_id = paper['paper_id']
+        title = paper['title']
+        authors = paper['authors']
+        abstract = paper['abstract']
+        published = paper['published']
+        pdf_path = paper['pdf_path']
+        text = paper.get('text') or ""
+        
+        try:
+            if paper.get('extraction_error'):
+                logger.warning(f"Text extraction for {paper_id} failed ({paper['extraction_error']}), "
+                               f"storing its metadata without content")
             
-            # Skip if existing content is empty
-            if not existing_content or len(existing_content) < 100:
+            # Save text to file
+            if text:
+                text_path = os.path.join(papers_text_dir, f"{paper_id.replace('/', '_')}.txt")
+                with open(text_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+            
+            # Check for duplicates (also against the papers earlier in this batch)
+            is_duplicate, existing_id = is_duplicate_paper(conn, text, title, abstract, paper_id=paper_id)
+            if is_duplicate:
+                logger.info(f"Paper {paper_id} is a duplicate of {existing_id}, skipping")
+                # Delete the downloaded PDF
+                try:
+                    os.remove(pdf_path)
+                except Exception as e:
+                    logger.error(f"Error deleting duplicate PDF: {str(e)}")
                 continue
-                
-            # Calculate title similarity using Levenshtein distance
-            title_similarity = 0
-            if title and existing_title:
-                # Normalize strings
-                norm_title = title.lower().strip()
-                norm_existing_title = existing_title.lower().strip()
-                
-                # Calculate Levenshtein similarity
-                import Levenshtein
-                title_similarity = 1 - (Levenshtein.distance(norm_title, norm_existing_title) / 
-                                       max(len(norm_title), len(norm_existing_title)))
-                
-                # If titles are nearly identical, consider it a duplicate
-                if title_similarity > 0.9:
-                    logger.info(f"Duplicate paper detected by title similarity: {title_similarity:.2f}")
-                    return True, existing_id
             
-            # Calculate content similarity
-            if existing_content and text:
-                # Use a simple jaccard similarity on content chunks
-                def get_chunks(text, size=5):
-                    """Split text into word chunks for comparison"""
-                    words = text.lower().split()
-                    return set(' '.join(words[i:i+size]) for i in range(max(1, len(words) - size + 1)))
-                    
-                # Get samples of text for efficiency
-                orig_sample = existing_content[:10000] + existing_content[-10000:]
-                new_sample = text[:10000] + text[-10000:]
-                
-                # Calculate Jaccard similarity
-                orig_chunks = get_chunks(orig_sample)
-                new_chunks = get_chunks(new_sample)
-                
-                if not orig_chunks or not new_chunks:
-                    continue
-                    
-                intersection = orig_chunks.intersection(new_chunks)
-                union = orig_chunks.union(new_chunks)
-                
-                if not union:
-                    continue
-                    
-                content_similarity = len(intersection) / len(union)
-                
-                if content_similarity > threshold:
-                    logger.info(f"Duplicate paper detected by content similarity: {content_similarity:.2f}")
-                    return True, existing_id
+            # Insert or update paper in database
+            if paper['existing']:
+                # Update existing paper
+                cursor.execute(
+                    """
+                    UPDATE research_papers 
+                    SET title = ?, authors = ?, abstract = ?, pdf_url = ?, pub_date = ?,
+                        content = COALESCE(NULLIF(?, ''), content), last_crawled = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        title,
+                        authors,
+                        abstract,
+                        paper['pdf_url'],
+                        published.strftime('%Y-%m-%d'),
+                        text,
+                        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        paper_id
+                    )
+                )
+                logger.info(f"Updated paper {paper_id} in database")
+            else:
+                # Insert new paper
+                cursor.execute(
+                    """
+                    INSERT INTO research_papers (id, title, authors, abstract, pdf_url, pub_date, content, last_crawled)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        paper_id,
+                        title,
+                        authors,
+                        abstract,
+                        paper['pdf_url'],
+                        published.strftime('%Y-%m-%d'),
+                        text,
+                        datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    )
+                )
+                logger.info(f"Added paper {paper_id} to database")
+                papers_added += 1
+            if text or not paper['existing']:
+                # A failed extraction keeps the stored content, and its signature
+                index_paper_by_id(conn, paper_id, title, text, abstract=abstract)
+            changed = True
+        except Exception as e:
+            logger.error(f"Error storing paper {paper_id}: {str(e)}")
+            continue
         
-        return False, None
+        # Add to AI content table
+        try:
+            metadata = json.dumps({
+                "authors": authors,
+                "published_date": published.strftime('%Y-%m-%d'),
+                "year": published.year,
+                "source": "arxiv",
+                "category": paper['category']
+            })
+            
+            # Check if already exists in ai_content
+            cursor.execute(
+                "SELECT id FROM ai_content WHERE source_type_id = ? AND source_id = ?",
+                (source_type_id, paper_id)
+            )
+            ai_content_exists = cursor.fetchone()
+            
+            if ai_content_exists:
+                # Update existing record
+                cursor.execute(
+                    """
+                    UPDATE ai_content
+                    SET title = ?, description = ?, content = COALESCE(NULLIF(?, ''), content), url = ?,
+                        date_created = ?, date_collected = ?, metadata = ?
+                    WHERE source_type_id = ? AND source_id = ?
+                    """,
+                    (
+                        title,
+                        abstract,
+                        text,
+                        paper['article_url'],
+                        published.strftime('%Y-%m-%d'),
+                        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        metadata,
+                        source_type_id,
+                        paper_id
+                    )
+                )
+            else:
+                # Insert new record
+                cursor.execute(
+                    """
+                    INSERT INTO ai_content (source_type_id, source_id, title, description, content, url, date_created, date_collected, metadata, is_indexed)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        source_type_id,
+                        paper_id,
+                        title,
+                        abstract,
+                        text,
+                        paper['article_url'],
+                        published.strftime('%Y-%m-%d'),
+                        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        metadata,
+                        0  # Not indexed yet
+                    )
+                )
+        except Exception as e:
+            logger.error(f"Error adding paper to ai_content: {str(e)}")
+    
+    # One transaction per batch
+    if changed:
+        try:
+            bump_data_generation(cursor, 'arxiv_collector')
+        except Exception as e:
+            logger.error(f"Error updating data generation: {str(e)}")
+    conn.commit()
+    return papers_added
+
+def extract_text_with_ocr_fallback(pdf_path):
+    """
+    Extract text with Mistral OCR, falling back to PyPDF2 if OCR fails
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        str: Extracted text
+    """
+    try:
+        result = mistral_ocr.extract_text_from_pdf(pdf_path)
+        logger.info(f"Successfully extracted text using Mistral OCR")
+        # Handle tuple return type (text, title)
+        if isinstance(result, tuple) and len(result) > 0:
+            return result[0]  # Extract just the text part
+        return result
     except Exception as e:
-        logger.error(f"Error checking for duplicate papers: {str(e)}")
-        return False, None
-    '''
+        logger.error(f"Error extracting text with Mistral OCR: {e}")
+        # Fall back to PyPDF2
+        logger.info(f"Extracting text using PyPDF2 as fallback")
+        return extract_text_with_pypdf2(pdf_path)
 
 def process_arxiv_papers(categories, max_results, papers_pdf_dir, papers_text_dir, conn, source_type_id, force_update=False):
     """
     Process papers from ArXiv based on categories
     
+    The category feeds are read here; the PDFs are then downloaded, parsed
+    and stored by a PaperPipeline, which overlaps those stages while keeping
+    every request to arXiv behind one global rate limit.
+    
     Args:
         categories: List of ArXiv categories to search
         max_results: Maximum number of results per category
@@ -782,258 +931,75 @@ def process_arxiv_papers(categories, max_results, papers_pdf_dir, papers_text_di
         int: Number of papers added
     """
     try:
-        papers_added = 0
+        pipeline = PaperPipeline(papers_pdf_dir, headers=HEADERS, extractor=get_extractor())
+        cursor = conn.cursor()
+        papers = []
+        seen = set()
         
         # Process each category
         for category in categories:
             logger.info(f"Collecting papers for category: {category}")
             
-            # Construct ArXiv API query
-            query = f"cat:{category}"
-            url = f"http://export.arxiv.org/api/query?search_query={query}&sortBy=submittedDate&sortOrder=descending&max_results={max_results}"
-            
             try:
                 # Get papers from ArXiv
-                response = feedparser.parse(url)
-                
-                if not response.entries:
-                    logger.warning(f"No papers found for category: {category}")
-                    continue
+                entries = pipeline.fetch_feed(f"cat:{category}", max_results)
+            except Exception as e:
+                logger.error(f"Error collecting papers for category {category}: {str(e)}")
+                continue
+            
+            if not entries:
+                logger.warning(f"No papers found for category: {category}")
+                continue
+            
+            logger.info(f"Found {len(entries)} papers for category: {category}")
+            
+            for entry in entries:
+                try:
+                    paper = parse_feed_entry(entry, category)
+                    paper_id = paper['paper_id']
                     
-                logger.info(f"Found {len(response.entries)} papers for category: {category}")
-                
-                # Process each paper
-                for entry in response.entries:
-                    try:
-                        # Extract paper ID
-                        paper_id = entry.id.split('/abs/')[-1] if hasattr(entry, 'id') else f"arxiv_{int(time.time())}"
-                        
-                        # Check if paper already exists
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT id FROM research_papers WHERE id = ?", (paper_id,))
-                        existing = cursor.fetchone()
-                        
-                        # Skip if paper exists and not forcing update
-                        if existing and not force_update:
-                            logger.debug(f"Paper {paper_id} already exists, skipping")
-                            continue
-                        
-                        # Extract publication date
-                        published = datetime.now()
-                        if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                            try:
-                                published = datetime(
-                                    year=entry.published_parsed[0],
-                                    month=entry.published_parsed[1],
-                                    day=entry.published_parsed[2]
-                                )
-                            except Exception as e:
-                                logger.warning(f"Error parsing publication date: {str(e)}")
-                        
-                        # Extract paper details
-                        title = entry.get('title', f"Unknown Paper {paper_id}")
-                        
-                        # Extract authors
-                        authors = ""
-                        if hasattr(entry, 'authors'):
-                            try:
-                                authors = ", ".join(author.get('name', '') for author in entry.authors)
-                            except Exception as e:
-                                logger.warning(f"Error extracting authors: {str(e)}")
-                        
-                        # Extract abstract
-                        abstract = entry.get('summary', "")
-                        
-                        # Get PDF link
-                        pdf_url = None
-                        if hasattr(entry, 'links'):
-                            for link in entry.links:
-                                if hasattr(link, 'title') and link.title == 'pdf':
-                                    pdf_url = link.href
-                                    break
-                        
-                        if not pdf_url:
-                            pdf_url = f"https://arxiv.org/pdf/{paper_id}.pdf"
-                        
-                        # Get article URL
-                        article_url = f"https://arxiv.org/abs/{paper_id}"
-                        
-                        # Download PDF
-                        pdf_path = os.path.join(papers_pdf_dir, f"{paper_id}.pdf")
-                        try:
-                            # Download PDF
-                            response = requests.get(pdf_url, headers=HEADERS, timeout=30)
-                            response.raise_for_status()
-                            
-                            with open(pdf_path, 'wb') as f:
-                                f.write(response.content)
-                                
-                            logger.info(f"Downloaded PDF for {paper_id}")
-                            
-                            # Extract text from PDF
-                            text = ""
-                            
-                            # Use Mistral OCR if available
-                            if mistral_ocr and hasattr(config, 'USE_MISTRAL_OCR') and config.USE_MISTRAL_OCR:
-                                try:
-                                    result = mistral_ocr.extract_text_from_pdf(pdf_path)
-                                    # Handle tuple return type (text, title)
-                                    if isinstance(result, tuple) and len(result) > 0:
-                                        text = result[0]  # Extract just the text part
-                                        logger.info(f"Successfully extracted text using Mistral OCR")
-                                    else:
-                                        text = result
-                                        logger.info(f"Successfully extracted text using Mistral OCR")
-                                except Exception as e:
-                                    logger.error(f"Error extracting text with Mistral OCR: {e}")
-                                    # Fall back to PyPDF2
-                                    text = extract_text_with_pypdf2(pdf_path)
-                                    logger.info(f"Extracted text using PyPDF2 as fallback")
-                            else:
-                                text = extract_text_with_pypdf2(pdf_path)
-                                logger.info(f"Extracted text using PyPDF2")
-                            
-                            # Save text to file
-                            if text:
-                                text_path = os.path.join(papers_text_dir, f"{paper_id}.txt")
-                                with open(text_path, 'w', encoding='utf-8') as f:
-                                    f.write(text)
-                            
-                            # Check for duplicates
-                            is_duplicate, existing_id = is_duplicate_paper(conn, text, title, abstract)
-                            if is_duplicate:
-                                logger.info(f"Paper {paper_id} is a duplicate of {existing_id}, skipping")
-                                # Delete the downloaded PDF
-                                try:
-                                    os.remove(pdf_path)
-                                except Exception as e:
-                                    logger.error(f"Error deleting duplicate PDF: {str(e)}")
-                                continue
-                            
-                            # Insert or update paper in database
-                            if existing:
-                                # Update existing paper
-                                cursor.execute(
-                                    """
-                                    UPDATE research_papers 
-                                    SET title = ?, authors = ?, abstract = ?, pdf_url = ?, pub_date = ?, content = ?, last_crawled = ?
-                                    WHERE id = ?
-                                    """,
-                                    (
-                                        title,
-                                        authors,
-                                        abstract,
-                                        pdf_url,
-                                        published.strftime('%Y-%m-%d'),
-                                        text,
-                                        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                        paper_id
-                                    )
-                                )
-                                logger.info(f"Updated paper {paper_id} in database")
-                            else:
-                                # Insert new paper
-                                cursor.execute(
-                                    """
-                                    INSERT INTO research_papers (id, title, authors, abstract, pdf_url, pub_date, content, last_crawled)
-                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                    """,
-                                    (
-                                        paper_id,
-                                        title,
-                                        authors,
-                                        abstract,
-                                        pdf_url,
-                                        published.strftime('%Y-%m-%d'),
-                                        text,
-                                        datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                    )
-                                )
-                                logger.info(f"Added paper {paper_id} to database")
-                                papers_added += 1
-                            
-                            # Add to AI content table
-                            try:
-                                # Check if already exists in ai_content
-                                cursor.execute(
-                                    "SELECT id FROM ai_content WHERE source_type_id = ? AND source_id = ?",
-                                    (source_type_id, paper_id)
-                                )
-                                ai_content_exists = cursor.fetchone()
-                                
-                                if ai_content_exists:
-                                    # Update existing record
-                                    cursor.execute(
-                                        """
-                                        UPDATE ai_content
-                                        SET title = ?, description = ?, content = ?, url = ?, date_created = ?, date_collected = ?, metadata = ?
-                                        WHERE source_type_id = ? AND source_id = ?
-                                        """,
-                                        (
-                                            title,
-                                            abstract,
-                                            text,
-                                            article_url,
-                                            published.strftime('%Y-%m-%d'),
-                                            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                            json.dumps({
-                                                "authors": authors,
-                                                "published_date": published.strftime('%Y-%m-%d'),
-                                                "year": published.year,
-                                                "source": "arxiv",
-                                                "category": category
-                                            }),
-                                            source_type_id,
-                                            paper_id
-                                        )
-                                    )
-                                else:
-                                    # Insert new record
-                                    cursor.execute(
-                                        """
-                                        INSERT INTO ai_content (source_type_id, source_id, title, description, content, url, date_created, date_collected, metadata, is_indexed)
-                                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                        """,
-                                        (
-                                            source_type_id,
-                                            paper_id,
-                                            title,
-                                            abstract,
-                                            text,
-                                            article_url,
-                                            published.strftime('%Y-%m-%d'),
-                                            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                            json.dumps({
-                                                "authors": authors,
-                                                "published_date": published.strftime('%Y-%m-%d'),
-                                                "year": published.year,
-                                                "source": "arxiv",
-                                                "category": category
-                                            }),
-                                            0  # Not indexed yet
-                                        )
-                                    )
-                            except Exception as e:
-                                logger.error(f"Error adding paper to ai_content: {str(e)}")
-                            
-                            conn.commit()
-                            
-                        except Exception as e:
-                            logger.error(f"Error downloading PDF for {paper_id}: {str(e)}")
-                            continue
-                            
-                    except Exception as e:
-                        logger.error(f"Error processing paper entry: {str(e)}")
+                    # Papers are often cross-listed in several categories
+                    if paper_id in seen:
                         continue
+                    seen.add(paper_id)
                     
-                    # Add a delay to be respectful of the API
-                    time.sleep(3)
+                    # Check if paper already exists
+                    cursor.execute("SELECT id FROM research_papers WHERE id = ?", (paper_id,))
+                    paper['existing'] = cursor.fetchone() is not None
                     
-            except Exception as e:
-                logger.error(f"Error collecting papers for category {category}: {str(e)}")
-                continue
-                
-        return papers_added
+                    # Skip if paper exists and not forcing update
+                    if paper['existing'] and not force_update:
+                        logger.debug(f"Paper {paper_id} already exists, skipping")
+                        continue
+                    
+                    # Skip papers already stored under another ID before fetching the PDF
+                    is_duplicate, existing_id = is_duplicate_paper(conn, None, paper['title'], paper['abstract'], paper_id=paper_id)
+                    if is_duplicate:
+                        logger.info(f"Paper {paper_id} is a duplicate of {existing_id}, skipping")
+                        continue
+                    
+                    papers.append(paper)
+                except Exception as e:
+                    logger.error(f"Error processing paper entry: {str(e)}")
+                    continue
+        
+        if not papers:
+            return 0
+        
+        logger.info(f"Downloading {len(papers)} papers")
+        
+        # Use Mistral OCR if available
+        if mistral_ocr and hasattr(config, 'USE_MISTRAL_OCR') and config.USE_MISTRAL_OCR:
+            extract = extract_text_with_ocr_fallback
+        else:
+            extract = True
+        
+        stats = pipeline.run(
+            papers,
+            lambda batch: store_arxiv_papers(conn, batch, papers_text_dir, source_type_id),
+            extract=extract
+        )
+        return stats['written']
         
     except Exception as e:
         logger.error(f"Error in process_arxiv_papers: {str(e)}")
@@ -1170,14 +1136,15 @@ def download_papers_only(max_papers=50, categories=None, save_dir=None, custom_s
     client = arxiv.Client()
     papers = client.results(search)
     
-    download_count = 0
+    pending_ids = {p.get('arxiv_id') for p in pending_papers}
+    to_download = []
     
     for paper in papers:
         paper_id = paper.get_short_id()
         title = paper.title
         
         # Check if we already have this paper in pending list
-        if any(p.get('arxiv_id') == paper_id for p in pending_papers):
+        if paper_id in pending_ids:
             logger.info(f"Paper {paper_id} - '{title}' already in pending list, skipping")
             continue
         
@@ -1187,51 +1154,43 @@ def download_papers_only(max_papers=50, categories=None, save_dir=None, custom_s
             logger.info(f"Paper {paper_id} - '{title}' already exists in database, skipping")
             continue
         
-        try:
-            # Create a clean filename
-            pdf_filename = f"{paper_id}.pdf"
-            pdf_path = os.path.join(pdf_dir, pdf_filename)
-            logger.info(f"Downloading paper {paper_id} - '{title}'")
-            
-            # Download PDF directly using requests
-            pdf_url = paper.pdf_url
-            response = requests.get(pdf_url, stream=True)
-            response.raise_for_status()  # Raise an error for bad responses
-            
-            with open(pdf_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            logger.info(f"Downloaded PDF to {pdf_path}")
-            
-            # Save metadata
-            paper_info = {
+        to_download.append({
+            'paper_id': paper_id,
+            'pdf_url': paper.pdf_url,
+            'info': {
                 'arxiv_id': paper_id,
                 'title': title,
                 'authors': [author.name for author in paper.authors],
                 'summary': paper.summary,
                 'date': paper.published.strftime('%Y-%m-%d'),
                 'categories': paper.categories,
-                'pdf_url': paper.pdf_url,
-                'pdf_path': pdf_path
+                'pdf_url': paper.pdf_url
             }
-            
+        })
+    
+    conn.close()
+    
+    def save_pending(batch):
+        """Add a batch of downloaded papers to the pending list"""
+        for paper in batch:
+            paper_info = dict(paper['info'], pdf_path=paper['pdf_path'])
+            logger.info(f"Downloaded PDF to {paper_info['pdf_path']}")
             pending_papers.append(paper_info)
-            download_count += 1
-            
-            # Periodically save the pending papers list
-            if download_count % 5 == 0:
-                with open(metadata_file, 'w') as f:
-                    json.dump(pending_papers, f, indent=2)
-                    
-        except Exception as e:
-            logger.error(f"Error downloading paper {paper_id}: {e}")
+        with open(metadata_file, 'w') as f:
+            json.dump(pending_papers, f, indent=2)
+        return len(batch)
+    
+    # Download the PDFs (rate limited) and save the pending list every few papers
+    download_count = 0
+    if to_download:
+        logger.info(f"Downloading {len(to_download)} papers")
+        pipeline = PaperPipeline(pdf_dir, headers=HEADERS, write_batch=5)
+        download_count = pipeline.run(to_download, save_pending, extract=False)['written']
     
     # Save the final list of pending papers
     with open(metadata_file, 'w') as f:
         json.dump(pending_papers, f, indent=2)
     
-    conn.close()
     logger.info(f"Downloaded {download_count} new papers. Total pending papers: {len(pending_papers)}")
     return download_count
 
@@ -1279,6 +1238,7 @@ def batch_process_pdfs(max_papers=None, use_mistral=True):
     
     processed_count = 0
     remaining_papers = []
+    papers_to_process = []
     
     for paper in pending_papers:
         paper_id = paper.get('arxiv_id')
@@ -1301,61 +1261,113 @@ def batch_process_pdfs(max_papers=None, use_mistral=True):
                 logger.warning(f"Failed to delete duplicate PDF: {e}")
             continue
         
-        logger.info(f"Processing paper {paper_id} - '{title}'")
+        # The same paper collected under another ID (e.g. from a URL list) is not extracted again
+        is_duplicate, existing_id = is_duplicate_paper(conn, None, title, paper.get('summary', ''))
+        if is_duplicate:
+            logger.info(f"Paper {paper_id} - '{title}' is a duplicate of {existing_id}, skipping")
+            try:
+                os.remove(pdf_path)
+                logger.info(f"Deleted duplicate PDF: {pdf_path}")
+            except Exception as e:
+                logger.warning(f"Failed to delete duplicate PDF: {e}")
+            continue
         
+        papers_to_process.append(paper)
+    
+    def insert_paper(paper, extracted_text):
+        """Insert one processed paper unless it duplicates a stored one; returns 'inserted', 'duplicate' or 'failed'"""
+        paper_id = paper.get('arxiv_id')
         try:
-            # Extract text from PDF
-            extracted_text = ""
-            
-            if use_mistral and mistral_ocr:
+            is_duplicate, existing_id = is_duplicate_paper(conn, extracted_text, paper.get('title'), paper.get('summary', ''))
+            if is_duplicate:
+                logger.info(f"Paper {paper_id} is a duplicate of existing paper {existing_id}, skipping")
                 try:
-                    result = mistral_ocr.extract_text_from_pdf(pdf_path)
-                    # Handle tuple return type (text, title)
-                    if isinstance(result, tuple) and len(result) > 0:
-                        extracted_text = result[0]  # Extract just the text part
-                        logger.info(f"Successfully extracted text using Mistral OCR")
-                    else:
-                        extracted_text = result
-                        logger.info(f"Successfully extracted text using Mistral OCR")
+                    os.remove(paper.get('pdf_path'))
                 except Exception as e:
-                    logger.error(f"Error extracting text with Mistral OCR: {e}")
-                    # Fall back to PyPDF2
-                    extracted_text = extract_text_from_pdf(pdf_path)
-                    logger.info(f"Extracted text using PyPDF2 as fallback")
-            else:
-                extracted_text = extract_text_from_pdf(pdf_path)
-                logger.info(f"Extracted text using PyPDF2")
+                    logger.warning(f"Failed to delete duplicate PDF: {e}")
+                return 'duplicate'
+            
+            # Map ArXiv metadata to database schema
+            authors = ", ".join(paper.get('authors', []))
+            abstract = paper.get('summary', '')
+            publication = "arXiv"
+            year = int(paper.get('date', '').split('-')[0]) if paper.get('date') else None
+            url = f"https://arxiv.org/abs/{paper_id}"
+            pdf_url = paper.get('pdf_url', '')
             
-            # Insert paper into database
+            # Insert into database - using ArXiv ID as the DOI since ID is INTEGER PRIMARY KEY
+            cursor.execute("""
+                INSERT INTO research_papers 
+                (title, authors, abstract, publication, year, url, doi, pdf_path, content, pdf_url) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                paper.get('title'), authors, abstract, publication, 
+                year, url, paper_id, paper.get('pdf_path'), extracted_text, pdf_url
+            ))
+            index_paper(conn, cursor.lastrowid, paper.get('title'), extracted_text, abstract=abstract)
+            conn.commit()
+            logger.info(f"Inserted paper {paper_id} into database")
+            return 'inserted'
+            
+        except Exception as e:
+            logger.error(f"Error inserting paper into database: {e}")
+            return 'failed'
+    
+    if (use_mistral and mistral_ocr) or mistral_ocr_configured():
+        # OCR requests go to the API one paper at a time
+        for paper in papers_to_process:
+            paper_id = paper.get('arxiv_id')
+            pdf_path = paper.get('pdf_path')
+            logger.info(f"Processing paper {paper_id} - '{paper.get('title')}'")
             try:
-                # Map ArXiv metadata to database schema
-                authors = ", ".join(paper.get('authors', []))
-                abstract = paper.get('summary', '')
-                publication = "arXiv"
-                year = int(paper.get('date', '').split('-')[0]) if paper.get('date') else None
-                url = f"https://arxiv.org/abs/{paper_id}"
-                pdf_url = paper.get('pdf_url', '')
-                
-                # Insert into database - using ArXiv ID as the DOI since ID is INTEGER PRIMARY KEY
-                cursor.execute("""
-                    INSERT INTO research_papers 
-                    (title, authors, abstract, publication, year, url, doi, pdf_path, content, pdf_url) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    title, authors, abstract, publication, 
-                    year, url, paper_id, pdf_path, extracted_text, pdf_url
-                ))
-                conn.commit()
-                logger.info(f"Inserted paper {paper_id} into database")
-                processed_count += 1
+                if not (use_mistral and mistral_ocr):
+                    extracted_text = extract_text_from_pdf(pdf_path)
+                else:
+                    try:
+                        result = mistral_ocr.extract_text_from_pdf(pdf_path)
+                        # Handle tuple return type (text, title)
+                        if isinstance(result, tuple) and len(result) > 0:
+                            extracted_text = result[0]  # Extract just the text part
+                        else:
+                            extracted_text = result
+                        logger.info(f"Successfully extracted text using Mistral OCR")
+                    except Exception as e:
+                        logger.error(f"Error extracting text with Mistral OCR: {e}")
+                        # Fall back to PyPDF2
+                        extracted_text = extract_text_from_pdf(pdf_path)
+                        logger.info(f"Extracted text using PyPDF2 as fallback")
                 
+                status = insert_paper(paper, extracted_text)
+                if status == 'inserted':
+                    processed_count += 1
+                elif status == 'failed':
+                    remaining_papers.append(paper)
             except Exception as e:
-                logger.error(f"Error inserting paper into database: {e}")
+                logger.error(f"Error processing paper {paper_id}: {e}")
                 remaining_papers.append(paper)
-                
-        except Exception as e:
-            logger.error(f"Error processing paper {paper_id}: {e}")
-            remaining_papers.append(paper)
+    else:
+        # Extract all PDFs in parallel and insert each paper as soon as its text is ready
+        papers_by_path = {}
+        for paper in papers_to_process:
+            papers_by_path.setdefault(paper.get('pdf_path'), []).append(paper)
+        
+        for result in get_extractor().extract_many(papers_by_path):
+            for paper in papers_by_path[result['pdf_path']]:
+                paper_id = paper.get('arxiv_id')
+                if not result['complete']:
+                    # Partial text would be stored as the paper's content; try again next run
+                    logger.warning(f"Text extraction for paper {paper_id} failed ({result['error']}) "
+                                   f"after {len(result['pages'])} pages, leaving it pending")
+                    remaining_papers.append(paper)
+                    continue
+                source = "cache" if result['cached'] else "PyPDF2"
+                logger.info(f"Extracted text of paper {paper_id} - '{paper.get('title')}' "
+                            f"({len(result['pages'])} pages) using {source}")
+                status = insert_paper(paper, join_pages(result['pages']))
+                if status == 'inserted':
+                    processed_count += 1
+                elif status == 'failed':
+                    remaining_papers.append(paper)
     
     # Update pending papers file with remaining papers
     with open(pending_papers_file, 'w') as f:
@@ -0,0 +1,133 @@
+"""
+Streaming audio decoding for transcription
+
+ffmpeg decodes a video's audio track to 16 kHz mono float PCM on stdout,
+which is read straight into a NumPy array in the format Whisper expects,
+so no intermediate WAV file is written. A bounded prefetch queue decodes
+the next files on background threads while the current one is being
+transcribed; the bound keeps memory flat however long the job list is.
+"""
+import os
+import wave
+import queue
+import logging
+import threading
+import subprocess
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('audio_stream')
+
+# Whisper's input format
+SAMPLE_RATE = 16000
+# Files decoded ahead of the consumer
+DEFAULT_PREFETCH = 2
+
+_END = object()
+
+
+def decode_audio(path: str, sample_rate: int = SAMPLE_RATE) -> Optional[np.ndarray]:
+    """
+    Decode a media file's audio track to mono float32 PCM in memory
+
+    Args:
+        path: Audio or video file
+        sample_rate: Output sample rate
+
+    Returns:
+        Samples in [-1, 1], or None if the file has no audio or ffmpeg fails
+    """
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-vn", "-map", "0:a:0?",
+           "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    try:
+        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        logger.error(f"Could not run ffmpeg for {path}: {str(e)}")
+        return None
+
+    if process.returncode != 0:
+        logger.error(f"FFmpeg failed to decode audio from {path}: {process.stderr.decode('utf-8', errors='replace')}")
+        return None
+    if not process.stdout:
+        logger.warning(f"No audio stream found in {path}, skipping")
+        return None
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> None:
+    """Save float PCM as a 16-bit mono WAV file (the format extract_audio writes)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    tmp_path = path + ".tmp"
+    with wave.open(tmp_path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+    os.replace(tmp_path, path)
+
+
+def prefetch_audio(
+    items: Iterable[str],
+    source: Callable[[str], str] = lambda item: item,
+    depth: int = DEFAULT_PREFETCH,
+    decoders: int = 1,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Iterator[Tuple[str, Optional[np.ndarray]]]:
+    """
+    Decode files ahead of the consumer
+
+    Items are yielded in input order. At most depth decoded files wait in
+    the queue; decoders threads run ffmpeg concurrently.
+
+    Args:
+        items: Job keys
+        source: Maps a key to the media file to decode
+        depth: Maximum decoded files held in memory ahead of the consumer
+        decoders: Concurrent ffmpeg processes
+        should_stop: When true, decoding stops after the current files
+
+    Yields:
+        (key, samples or None)
+    """
+    items = list(items)
+    ready = queue.Queue(maxsize=max(1, depth))
+    slots = [threading.Semaphore(0) for _ in range(max(1, decoders))]
+    stop = threading.Event()
+
+    def decode_share(index):
+        # Thread i decodes items i, i + n, ...; the semaphores hand the queue
+        # from thread to thread so results enter it in input order
+        for position in range(index, len(items), len(slots)):
+            audio = None
+            if not stop.is_set() and not (should_stop and should_stop()):
+                audio = decode_audio(source(items[position]))
+            slots[index].acquire()
+            if not stop.is_set():
+                ready.put((items[position], audio))
+            slots[(index + 1) % len(slots)].release()
+        if index == (len(items) - 1) % len(slots) or not items:
+            ready.put(_END)
+
+    threads = [threading.Thread(target=decode_share, args=(i,), daemon=True) for i in range(len(slots))]
+    slots[0].release()
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            entry = ready.get()
+            if entry is _END:
+                break
+            yield entry
+            if should_stop and should_stop():
+                break
+    finally:
+        # Unblock producers waiting on a full queue when the consumer stops early
+        stop.set()
+        while any(thread.is_alive() for thread in threads):
+            try:
+                ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,332 @@
+"""
+Pipelined Message Batches orchestration
+
+Keeps several Message Batches in flight at once: requests are pulled
+lazily from a source iterator and submitted as batches while fewer than
+max_in_flight batches are pending. All pending batches are polled from
+one scheduler (a heap ordered by next poll time) with per-batch
+exponential backoff, and each batch's results are streamed to a callback
+as soon as it ends. Batch ids are checkpointed in SQLite, so a restarted
+run resumes polling its batches instead of resubmitting them.
+
+The client only needs the messages.batches create/retrieve/results
+interface of the Anthropic SDK.
+"""
+import heapq
+import json
+import logging
+import random
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Import local modules
+import config
+
+logger = logging.getLogger('batch_orchestrator')
+
+BATCH_TABLE = 'message_batches'
+
+# Batches pending at the same time
+DEFAULT_MAX_IN_FLIGHT = 4
+# Requests per batch
+DEFAULT_BATCH_SIZE = 100
+# Poll interval bounds (seconds); the interval grows by BACKOFF_FACTOR per poll
+INITIAL_POLL_INTERVAL = 10.0
+MAX_POLL_INTERVAL = 120.0
+BACKOFF_FACTOR = 1.5
+# Random spread applied to poll times so batches do not poll in lockstep
+POLL_JITTER = 0.1
+# HTTP status codes worth retrying
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def _retryable(error: Exception) -> bool:
+    """Whether an API error is transient (rate limit, overload, network)"""
+    status = getattr(error, "status_code", None)
+    return status is None or status in RETRYABLE_STATUS
+
+
+class _PendingBatch:
+    """A submitted batch waiting to end"""
+
+    __slots__ = ("batch_id", "custom_ids", "interval", "next_poll")
+
+    def __init__(self, batch_id: str, custom_ids: List[str], interval: float, next_poll: float):
+        self.batch_id = batch_id
+        self.custom_ids = custom_ids
+        self.interval = interval
+        self.next_poll = next_poll
+
+
+class BatchOrchestrator:
+    """Submit, poll and collect Message Batches with several batches in flight"""
+
+    def __init__(self, client: Any, purpose: str, db_path: Optional[str] = None,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 initial_poll_interval: float = INITIAL_POLL_INTERVAL,
+                 max_poll_interval: float = MAX_POLL_INTERVAL,
+                 backoff_factor: float = BACKOFF_FACTOR,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the orchestrator
+
+        Args:
+            client: Anthropic client (or any object with messages.batches)
+            purpose: Name separating this workload's checkpoints from others
+            db_path: Path to the SQLite database holding checkpoints (defaults to config.DB_PATH)
+            max_in_flight: Maximum batches pending at the same time
+            batch_size: Maximum requests per batch
+            initial_poll_interval: First poll delay after submission (seconds)
+            max_poll_interval: Upper bound for the poll delay (seconds)
+            backoff_factor: Growth of the poll delay after each unfinished poll
+            clock: Time source
+            sleep: Sleep function
+        """
+        self.client = client
+        self.purpose = purpose
+        self.db_path = db_path or config.DB_PATH
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff_factor = backoff_factor
+        self.clock = clock
+        self.sleep = sleep
+
+        self._heap: List[Tuple[float, int, _PendingBatch]] = []
+        self._sequence = 0
+        self._in_flight_ids: Set[str] = set()
+        # Custom ids whose results were delivered in this run (resumed batches can end
+        # before the source reaches their requests)
+        self._collected_ids: Set[str] = set()
+        self.stats = {"batches_submitted": 0, "batches_resumed": 0, "batches_completed": 0,
+                      "requests_submitted": 0, "results": 0, "succeeded": 0,
+                      "failed_requests": 0, "duplicate_requests": 0, "polls": 0, "api_errors": 0}
+
+        conn = self._connect()
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {BATCH_TABLE} (
+                    batch_id TEXT PRIMARY KEY,
+                    purpose TEXT NOT NULL,
+                    custom_ids TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    submitted_at REAL,
+                    ended_at REAL,
+                    processed_at REAL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{BATCH_TABLE}_status ON {BATCH_TABLE}(purpose, status)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30.0)
+
+    def _checkpoint(self, sql: str, params: Tuple) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _schedule(self, batch: _PendingBatch, delay: float) -> None:
+        spread = 1 + random.uniform(-POLL_JITTER, POLL_JITTER)
+        batch.next_poll = self.clock() + delay * spread
+        self._sequence += 1
+        heapq.heappush(self._heap, (batch.next_poll, self._sequence, batch))
+
+    def in_flight_ids(self) -> Set[str]:
+        """Custom ids of requests in pending batches (including resumed ones)"""
+        return set(self._in_flight_ids)
+
+    def resume(self) -> int:
+        """
+        Load checkpointed batches that were not fully processed
+
+        Returns:
+            Number of resumed batches
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"""
+                SELECT batch_id, custom_ids FROM {BATCH_TABLE}
+                WHERE purpose = ? AND status != 'processed'
+                ORDER BY submitted_at
+            """, (self.purpose,)).fetchall()
+        finally:
+            conn.close()
+
+        pending = {batch.batch_id for _, _, batch in self._heap}
+        resumed = 0
+        for batch_id, custom_ids in rows:
+            if batch_id in pending:
+                continue
+            ids = json.loads(custom_ids)
+            self._in_flight_ids.update(ids)
+            # Poll resumed batches right away: they may have ended while we were down
+            self._schedule(_PendingBatch(batch_id, ids, self.initial_poll_interval, 0.0), 0.0)
+            resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} checkpointed batches")
+        self.stats["batches_resumed"] += resumed
+        return resumed
+
+    def _next_chunk(self, requests: Iterable[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Take the next batch of requests from the source
+
+        Requests already in flight or answered are skipped, and so are
+        repeats of a custom id within the batch (the API rejects the whole
+        batch for those).
+        """
+        chunk = []
+        custom_ids = set()
+        for custom_id, params in requests:
+            if custom_id in self._in_flight_ids or custom_id in self._collected_ids:
+                continue
+            if custom_id in custom_ids:
+                logger.warning(f"Skipping duplicate request {custom_id} in the same batch")
+                self.stats["duplicate_requests"] += 1
+                continue
+            custom_ids.add(custom_id)
+            chunk.append((custom_id, params))
+            if len(chunk) >= self.batch_size:
+                break
+        return chunk
+
+    def _submit(self, chunk: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Create a batch and checkpoint it (raises API errors)"""
+        requests = [{"custom_id": custom_id, "params": params} for custom_id, params in chunk]
+        message_batch = self.client.messages.batches.create(requests=requests)
+        custom_ids = [custom_id for custom_id, _ in chunk]
+
+        self._checkpoint(f"""
+            INSERT OR REPLACE INTO {BATCH_TABLE} (batch_id, purpose, custom_ids, status, submitted_at)
+            VALUES (?, ?, ?, 'in_progress', ?)
+        """, (message_batch.id, self.purpose, json.dumps(custom_ids), time.time()))
+
+        self._in_flight_ids.update(custom_ids)
+        self._schedule(_PendingBatch(message_batch.id, custom_ids, self.initial_poll_interval, 0.0),
+                       self.initial_poll_interval)
+        self.stats["batches_submitted"] += 1
+        self.stats["requests_submitted"] += len(chunk)
+        logger.info(f"Submitted batch {message_batch.id} with {len(chunk)} requests "
+                    f"({len(self._heap)} in flight)")
+
+    def _collect(self, batch: _PendingBatch, on_result: Callable[[str, Any], None],
+                 on_batch_done: Optional[Callable[[str], None]]) -> None:
+        """Stream an ended batch's results to the callback and mark it processed"""
+        self._checkpoint(f"UPDATE {BATCH_TABLE} SET status = 'ended', ended_at = ? WHERE batch_id = ?",
+                         (time.time(), batch.batch_id))
+        count = 0
+        for entry in self.client.messages.batches.results(batch.batch_id):
+            count += 1
+            if getattr(entry.result, "type", None) == "succeeded":
+                self.stats["succeeded"] += 1
+            on_result(entry.custom_id, entry)
+        if on_batch_done:
+            on_batch_done(batch.batch_id)
+
+        self._checkpoint(f"UPDATE {BATCH_TABLE} SET status = 'processed', processed_at = ? WHERE batch_id = ?",
+                         (time.time(), batch.batch_id))
+        self._in_flight_ids.difference_update(batch.custom_ids)
+        self._collected_ids.update(batch.custom_ids)
+        self.stats["results"] += count
+        self.stats["batches_completed"] += 1
+        logger.info(f"Batch {batch.batch_id} ended: {count} results ({len(self._heap)} still in flight)")
+
+    def run(self, source: Iterable[Tuple[str, Dict[str, Any]]],
+            on_result: Callable[[str, Any], None],
+            on_batch_done: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        """
+        Submit all requests from the source and collect every result
+
+        Checkpointed batches from an earlier run are resumed first, and
+        source requests whose custom id is already in one of them (or was
+        answered earlier in this run) are skipped, as are repeats of a custom id within one batch. The source
+        is consumed lazily, one batch at a time.
+
+        Args:
+            source: Iterable of (custom_id, message params) pairs
+            on_result: Called with (custom_id, result entry) for every result
+            on_batch_done: Called with the batch id after a batch's results were delivered
+
+        Returns:
+            Run statistics
+        """
+        start_time = self.clock()
+        self.resume()
+        requests = iter(source)
+        exhausted = False
+        chunk = None
+        submit_delay = self.initial_poll_interval
+        submit_retry_at = 0.0
+
+        while True:
+            now = self.clock()
+
+            # Fill the pipeline
+            while not exhausted and len(self._heap) < self.max_in_flight and now >= submit_retry_at:
+                if chunk is None:
+                    chunk = self._next_chunk(requests)
+                    if not chunk:
+                        exhausted = True
+                        break
+                try:
+                    self._submit(chunk)
+                    chunk = None
+                    submit_delay = self.initial_poll_interval
+                except Exception as e:
+                    self.stats["api_errors"] += 1
+                    if not _retryable(e):
+                        logger.error(f"Batch of {len(chunk)} requests rejected: {str(e)}")
+                        self.stats["failed_requests"] += len(chunk)
+                        chunk = None
+                        continue
+                    logger.warning(f"Batch submission failed, retrying in {submit_delay:.0f}s: {str(e)}")
+                    submit_retry_at = now + submit_delay
+                    submit_delay = min(submit_delay * self.backoff_factor, self.max_poll_interval)
+
+            if exhausted and not self._heap:
+                break
+
+            # Sleep until the next poll (or until a submission retry is due)
+            wake = self._heap[0][0] if self._heap else submit_retry_at
+            if not exhausted and len(self._heap) < self.max_in_flight:
+                wake = min(wake, submit_retry_at)
+            if wake > now:
+                self.sleep(wake - now)
+                continue
+            if not self._heap:
+                continue
+
+            _, _, batch = heapq.heappop(self._heap)
+            self.stats["polls"] += 1
+            try:
+                status = self.client.messages.batches.retrieve(batch.batch_id).processing_status
+            except Exception as e:
+                self.stats["api_errors"] += 1
+                if not _retryable(e):
+                    # Unknown or deleted batch: drop the checkpoint so its requests can be resubmitted
+                    logger.error(f"Batch {batch.batch_id} cannot be retrieved: {str(e)}")
+                    self._checkpoint(f"DELETE FROM {BATCH_TABLE} WHERE batch_id = ?", (batch.batch_id,))
+                    self._in_flight_ids.difference_update(batch.custom_ids)
+                    self.stats["failed_requests"] += len(batch.custom_ids)
+                    continue
+                logger.warning(f"Polling batch {batch.batch_id} failed: {str(e)}")
+                status = None
+
+            if status == "ended":
+                self._collect(batch, on_result, on_batch_done)
+            else:
+                batch.interval = min(batch.interval * self.backoff_factor, self.max_poll_interval)
+                self._schedule(batch, batch.interval)
+
+        self.stats["elapsed_seconds"] = round(self.clock() - start_time, 2)
+        return dict(self.stats)
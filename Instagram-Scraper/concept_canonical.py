@@ -0,0 +1,551 @@
+"""
+Concept name canonicalization and duplicate merging
+
+Concept names are normalized (case, punctuation, plurals) into alias
+keys stored in the concept_aliases table, so store_concepts() resolves
+"Transformer", "transformers" and "Transformer's" to one concept with a
+single primary-key lookup. Near-duplicates that normalization does not
+catch are found with a MinHash/LSH index over character n-grams and a
+generic-suffix rule ("attention mechanism" -> "attention"), and merged
+in bulk: content links and relationships are rewritten to the canonical
+concept, aliases are repointed, stats are rebuilt and the data
+generation is bumped.
+"""
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Import local modules
+import config
+from concept_stats import rebuild_concept_stats
+from graph_communities import invalidate_communities
+from minhash import MinHasher, LSHIndex, char_ngrams, jaccard
+from response_cache import bump_data_generation
+
+logger = logging.getLogger('concept_canonical')
+
+ALIAS_TABLE = 'concept_aliases'
+MERGE_TABLE = 'concept_merges'
+
+# Trailing words that do not change which concept a name refers to
+GENERIC_SUFFIXES = {
+    "architecture", "model", "algorithm", "method", "technique",
+    "approach", "framework", "mechanism"
+}
+# Words whose trailing "s" is not a plural
+SINGULAR_EXCEPTIONS = {"bias", "gaussian", "loss", "lens", "news", "physics", "analysis", "basis"}
+
+# Minimum n-gram Jaccard similarity for MinHash candidates
+SIMILARITY_THRESHOLD = 0.8
+# LSH bands over 64-hash signatures; 8 bands of 8 rows put the collision threshold near 0.77
+LSH_BANDS = 8
+# Score assigned to generic-suffix candidates
+SUFFIX_SCORE = 0.9
+# Candidates at or above this score are merged by default
+DEFAULT_MERGE_SCORE = 0.9
+
+_NON_WORD = re.compile(r"[^\w]+")
+_NUMBER = re.compile(r"\d+")
+
+
+def _singular(word: str) -> str:
+    """Strip a plural ending from one lowercase word"""
+    if len(word) <= 3 or word in SINGULAR_EXCEPTIONS or word.isdigit():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name: str) -> str:
+    """
+    Alias key for a concept name
+
+    Applies Unicode normalization, lowercasing, possessive and punctuation
+    removal ("Q-Learning" and "q learning" match) and singularization.
+
+    Args:
+        name: Concept name as extracted
+
+    Returns:
+        Normalized key (empty string for names without word characters)
+    """
+    text = unicodedata.normalize("NFKC", name or "").lower()
+    text = text.replace("'s ", " ").replace("’s ", " ")
+    if text.endswith(("'s", "’s")):
+        text = text[:-2]
+    words = [word for word in _NON_WORD.split(text.replace("_", " ")) if word]
+    return " ".join(_singular(word) for word in words)
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> Set[str]:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+# ----------------------------------------------------------------------
+# Alias table
+# ----------------------------------------------------------------------
+
+def ensure_alias_table(cursor: sqlite3.Cursor) -> None:
+    """
+    Create the alias and merge log tables, seeding aliases from concepts on first use
+
+    Where several existing concepts share an alias key, the key points
+    to the most referenced one until they are merged.
+
+    Args:
+        cursor: Cursor of an open connection (caller commits)
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (ALIAS_TABLE,))
+    if cursor.fetchone():
+        return
+
+    cursor.execute(f"""
+        CREATE TABLE {ALIAS_TABLE} (
+            alias_key TEXT PRIMARY KEY,
+            concept_id INTEGER NOT NULL,
+            alias TEXT,
+            created_at REAL
+        )
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{ALIAS_TABLE}_concept ON {ALIAS_TABLE}(concept_id)")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MERGE_TABLE} (
+            merged_id INTEGER PRIMARY KEY,
+            merged_name TEXT,
+            canonical_id INTEGER NOT NULL,
+            score REAL,
+            reason TEXT,
+            merged_at REAL
+        )
+    """)
+    logger.info("Created concept alias tables")
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='concepts'")
+    if not cursor.fetchone():
+        return
+
+    now = time.time()
+    references = _reference_counts(cursor)
+    cursor.execute("SELECT id, name FROM concepts")
+    concepts = sorted(cursor.fetchall(), key=lambda row: (-references.get(row[0], 0), row[0]))
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO {ALIAS_TABLE} (alias_key, concept_id, alias, created_at) VALUES (?, ?, ?, ?)",
+        [(normalize_name(name), concept_id, name, now) for concept_id, name in concepts if normalize_name(name)]
+    )
+
+
+def resolve_concept(cursor: sqlite3.Cursor, name: str) -> Optional[int]:
+    """
+    Canonical concept ID for a name through its alias key
+
+    Args:
+        cursor: Cursor of an open connection with the alias table
+        name: Concept name as extracted
+
+    Returns:
+        Concept ID, or None if no concept has this alias key
+    """
+    cursor.execute(f"SELECT concept_id FROM {ALIAS_TABLE} WHERE alias_key = ?", (normalize_name(name),))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def register_alias(cursor: sqlite3.Cursor, name: str, concept_id: int) -> None:
+    """Point the alias key of a name at a concept unless the key is already taken"""
+    key = normalize_name(name)
+    if key:
+        cursor.execute(
+            f"INSERT OR IGNORE INTO {ALIAS_TABLE} (alias_key, concept_id, alias, created_at) VALUES (?, ?, ?, ?)",
+            (key, concept_id, name, time.time())
+        )
+
+
+# ----------------------------------------------------------------------
+# Duplicate candidates
+# ----------------------------------------------------------------------
+
+def _reference_counts(cursor: sqlite3.Cursor) -> Dict[int, int]:
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='content_concepts'")
+    if not cursor.fetchone():
+        return {}
+    cursor.execute("SELECT concept_id, COUNT(*) FROM content_concepts GROUP BY concept_id")
+    return dict(cursor.fetchall())
+
+
+def find_duplicate_candidates(db_path: Optional[str] = None,
+                              threshold: float = SIMILARITY_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Find pairs of concepts that probably name the same thing
+
+    Three kinds of candidates are reported:
+    - 'normalized': identical alias keys (score 1.0)
+    - 'generic_suffix': same category and equal keys after dropping
+      trailing generic words such as "architecture" or "model"
+    - 'similar': character 3-gram Jaccard similarity of the keys at or
+      above the threshold, found through MinHash/LSH buckets (names
+      with different numbers are never candidates)
+
+    Args:
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        threshold: Minimum Jaccard similarity for 'similar' candidates
+
+    Returns:
+        List of candidates (concept_id, duplicate_id, names, score, reason), best first
+    """
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name, category FROM concepts")
+        concepts = cursor.fetchall()
+        references = _reference_counts(cursor)
+    finally:
+        conn.close()
+
+    names = {concept_id: name for concept_id, name, _ in concepts}
+    categories = {concept_id: category or "" for concept_id, _, category in concepts}
+    keys = {concept_id: normalize_name(name) for concept_id, name, _ in concepts}
+
+    pairs: Dict[Tuple[int, int], Tuple[float, str]] = {}
+
+    def add_pair(a: int, b: int, score: float, reason: str) -> None:
+        pair = (min(a, b), max(a, b))
+        if pair not in pairs or pairs[pair][0] < score:
+            pairs[pair] = (score, reason)
+
+    by_key = defaultdict(list)
+    for concept_id, key in keys.items():
+        if key:
+            by_key[key].append(concept_id)
+    for members in by_key.values():
+        for other in members[1:]:
+            add_pair(members[0], other, 1.0, "normalized")
+
+    for concept_id, key in keys.items():
+        words = key.split()
+        while len(words) > 1 and words[-1] in GENERIC_SUFFIXES:
+            words = words[:-1]
+            for other in by_key.get(" ".join(words), ()):
+                if categories[other] == categories[concept_id]:
+                    add_pair(concept_id, other, SUFFIX_SCORE, "generic_suffix")
+
+    hasher = MinHasher()
+    index = LSHIndex(bands=LSH_BANDS)
+    ngrams = {}
+    numbers = {}
+    for key in by_key:
+        ngrams[key] = char_ngrams(key)
+        numbers[key] = _NUMBER.findall(key)
+        index.add(key, hasher.signature(ngrams[key]))
+    for key_a, key_b in index.candidate_pairs():
+        # Names that differ in a number ("GPT-3", "GPT-4") are different concepts
+        if numbers[key_a] != numbers[key_b]:
+            continue
+        score = jaccard(ngrams[key_a], ngrams[key_b])
+        if score >= threshold:
+            add_pair(by_key[key_a][0], by_key[key_b][0], score, "similar")
+
+    candidates = []
+    for (a, b), (score, reason) in pairs.items():
+        # The more referenced concept (then the shorter name) is the canonical one
+        canonical, duplicate = sorted((a, b), key=lambda c: (-references.get(c, 0), len(names[c]), c))
+        candidates.append({
+            "concept_id": canonical,
+            "concept_name": names[canonical],
+            "duplicate_id": duplicate,
+            "duplicate_name": names[duplicate],
+            "score": round(score, 4),
+            "reason": reason
+        })
+    return sorted(candidates, key=lambda x: (-x["score"], x["concept_id"], x["duplicate_id"]))
+
+
+# ----------------------------------------------------------------------
+# Merging
+# ----------------------------------------------------------------------
+
+def _merge_groups(candidates: List[Dict[str, Any]], references: Dict[int, int],
+                  names: Dict[int, str]) -> Dict[int, int]:
+    """Union candidate pairs and map every duplicate to its group's canonical concept"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for candidate in candidates:
+        a, b = find(candidate["concept_id"]), find(candidate["duplicate_id"])
+        if a != b:
+            parent[b] = a
+
+    groups = defaultdict(list)
+    for concept_id in list(parent):
+        groups[find(concept_id)].append(concept_id)
+
+    merge_map = {}
+    for members in groups.values():
+        canonical = min(members, key=lambda c: (-references.get(c, 0), len(names.get(c, "")), c))
+        for member in members:
+            if member != canonical:
+                merge_map[member] = canonical
+    return merge_map
+
+
+def _merge_relationships(cursor: sqlite3.Cursor, merge_map: Dict[int, int]) -> int:
+    """
+    Rewrite relationships of merged concepts, folding rows that become duplicates
+
+    Returns:
+        Number of relationship rows removed
+    """
+    columns = _columns(cursor, "concept_relationships")
+    has_refs = "reference_count" in columns
+    has_confidence = "confidence_score" in columns
+
+    cursor.execute("""
+        SELECT r.id, r.source_concept_id, r.target_concept_id, r.relationship_type, {refs}, {conf}
+        FROM concept_relationships r
+        WHERE r.source_concept_id IN (SELECT old_id FROM temp.merge_map)
+           OR r.target_concept_id IN (SELECT old_id FROM temp.merge_map)
+    """.format(refs="r.reference_count" if has_refs else "NULL",
+               conf="r.confidence_score" if has_confidence else "NULL"))
+    affected = cursor.fetchall()
+
+    # Group rewritten rows by their new (source, target, type) key
+    groups = defaultdict(list)
+    removed = []
+    for row_id, source, target, rel_type, refs, confidence in affected:
+        new_source = merge_map.get(source, source)
+        new_target = merge_map.get(target, target)
+        if new_source == new_target and source != target:
+            # Relationship between two names of the same concept
+            removed.append(row_id)
+            continue
+        groups[(new_source, new_target, rel_type)].append((row_id, refs, confidence))
+
+    updates = []
+    for (source, target, rel_type), rows in groups.items():
+        cursor.execute("""
+            SELECT id, {refs}, {conf} FROM concept_relationships
+            WHERE source_concept_id = ? AND target_concept_id = ? AND relationship_type = ?
+        """.format(refs="reference_count" if has_refs else "NULL",
+                   conf="confidence_score" if has_confidence else "NULL"),
+            (source, target, rel_type))
+        existing = cursor.fetchone()
+        members = ([existing] if existing else []) + rows
+        survivor = members[0][0]
+        refs = sum(member[1] or 0 for member in members) if has_refs else None
+        confidence = max((member[2] or 0.0 for member in members), default=0.0) if has_confidence else None
+        removed.extend(member[0] for member in members[1:])
+        updates.append((source, target, refs, confidence, survivor))
+
+    assignments = ["source_concept_id = ?", "target_concept_id = ?"]
+    if has_refs:
+        assignments.append("reference_count = ?")
+    if has_confidence:
+        assignments.append("confidence_score = ?")
+    cursor.executemany("DELETE FROM concept_relationships WHERE id = ?", [(row_id,) for row_id in removed])
+    cursor.executemany(
+        f"UPDATE concept_relationships SET {', '.join(assignments)} WHERE id = ?",
+        [(source, target) + ((refs,) if has_refs else ()) + ((confidence,) if has_confidence else ()) + (survivor,)
+         for source, target, refs, confidence, survivor in updates]
+    )
+    return len(removed)
+
+
+def merge_concepts(cursor: sqlite3.Cursor, merge_map: Dict[int, int],
+                   reasons: Optional[Dict[int, Tuple[float, str]]] = None) -> Dict[str, int]:
+    """
+    Merge concepts into their canonical concepts with set-based rewrites
+
+    Content links and relationships are moved to the canonical concept
+    (links and relationships that become duplicates are folded),
+    aliases are repointed and the merged concepts are deleted. Does not
+    rebuild stats or commit.
+
+    Args:
+        cursor: Cursor of an open connection
+        merge_map: Mapping of merged concept ID to canonical concept ID
+        reasons: Optional (score, reason) per merged concept ID for the merge log
+
+    Returns:
+        Counts of merged concepts, moved links and removed relationships
+    """
+    if not merge_map:
+        return {"merged": 0, "links_moved": 0, "relationships_removed": 0}
+
+    ensure_alias_table(cursor)
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS merge_map (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+    cursor.execute("DELETE FROM temp.merge_map")
+    cursor.executemany("INSERT INTO temp.merge_map VALUES (?, ?)", list(merge_map.items()))
+    mapped = "(SELECT new_id FROM temp.merge_map WHERE old_id = {column})"
+
+    # Content links: move, then drop the ones the canonical concept already has
+    cursor.execute(f"""
+        UPDATE OR IGNORE content_concepts SET concept_id = {mapped.format(column='concept_id')}
+        WHERE concept_id IN (SELECT old_id FROM temp.merge_map)
+    """)
+    links_moved = cursor.rowcount
+    cursor.execute("DELETE FROM content_concepts WHERE concept_id IN (SELECT old_id FROM temp.merge_map)")
+
+    relationships_removed = _merge_relationships(cursor, merge_map)
+
+    # Keep what the merged concepts contributed to the canonical rows
+    concept_columns = _columns(cursor, "concepts")
+    if "reference_count" in concept_columns:
+        cursor.execute("""
+            UPDATE concepts SET reference_count = COALESCE(reference_count, 0) + (
+                SELECT COALESCE(SUM(c.reference_count), 0) FROM concepts c
+                JOIN temp.merge_map m ON m.old_id = c.id WHERE m.new_id = concepts.id
+            )
+            WHERE id IN (SELECT new_id FROM temp.merge_map)
+        """)
+    cursor.execute("""
+        UPDATE concepts SET description = (
+            SELECT c.description FROM concepts c JOIN temp.merge_map m ON m.old_id = c.id
+            WHERE m.new_id = concepts.id AND COALESCE(c.description, '') != ''
+            ORDER BY length(c.description) DESC LIMIT 1
+        )
+        WHERE id IN (SELECT new_id FROM temp.merge_map) AND COALESCE(description, '') = ''
+          AND EXISTS (
+            SELECT 1 FROM concepts c JOIN temp.merge_map m ON m.old_id = c.id
+            WHERE m.new_id = concepts.id AND COALESCE(c.description, '') != ''
+          )
+    """)
+
+    # Aliases follow their concept; the merged names become aliases too
+    cursor.execute(f"""
+        UPDATE {ALIAS_TABLE} SET concept_id = {mapped.format(column='concept_id')}
+        WHERE concept_id IN (SELECT old_id FROM temp.merge_map)
+    """)
+    now = time.time()
+    cursor.execute("SELECT c.id, c.name, m.new_id FROM concepts c JOIN temp.merge_map m ON m.old_id = c.id")
+    merged_rows = cursor.fetchall()
+    for _, name, canonical_id in merged_rows:
+        register_alias(cursor, name, canonical_id)
+    reasons = reasons or {}
+    cursor.executemany(
+        f"""INSERT OR REPLACE INTO {MERGE_TABLE} (merged_id, merged_name, canonical_id, score, reason, merged_at)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+        [(concept_id, name, canonical_id, *reasons.get(concept_id, (None, "manual")), now)
+         for concept_id, name, canonical_id in merged_rows]
+    )
+
+    cursor.execute("DELETE FROM concepts WHERE id IN (SELECT old_id FROM temp.merge_map)")
+    merged = cursor.rowcount
+    cursor.execute("DELETE FROM temp.merge_map")
+
+    return {"merged": merged, "links_moved": links_moved, "relationships_removed": relationships_removed}
+
+
+def merge_duplicates(db_path: Optional[str] = None, min_score: float = DEFAULT_MERGE_SCORE,
+                     candidates: Optional[List[Dict[str, Any]]] = None,
+                     dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Merge duplicate concepts in one transaction
+
+    Candidate pairs are grouped transitively; each group keeps its most
+    referenced concept. Concept stats are rebuilt, stored community runs
+    are invalidated and the data generation is bumped, so caches and the
+    graph pick up the merged concepts.
+
+    Args:
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        min_score: Minimum candidate score to merge
+        candidates: Candidates to merge (defaults to find_duplicate_candidates())
+        dry_run: Only report what would be merged
+
+    Returns:
+        Dictionary with the merge map and merge counts
+    """
+    db_path = db_path or config.DB_PATH
+    if candidates is None:
+        candidates = find_duplicate_candidates(db_path)
+    selected = [c for c in candidates if c["score"] >= min_score]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name FROM concepts")
+        names = dict(cursor.fetchall())
+        references = _reference_counts(cursor)
+        merge_map = _merge_groups(selected, references, names)
+        reasons = {}
+        for c in selected:
+            for concept_id in (c["duplicate_id"], c["concept_id"]):
+                reasons.setdefault(concept_id, (c["score"], c["reason"]))
+
+        result = {"candidates": len(selected), "merge_map": merge_map}
+        if dry_run or not merge_map:
+            result.update({"merged": 0, "links_moved": 0, "relationships_removed": 0})
+            return result
+
+        start_time = time.time()
+        result.update(merge_concepts(cursor, merge_map, reasons))
+        rebuild_concept_stats(cursor)
+        invalidate_communities(cursor)
+        bump_data_generation(cursor, 'concept_canonical')
+        conn.commit()
+        logger.info(f"Merged {result['merged']} concepts in {time.time() - start_time:.2f}s")
+        return result
+    except Exception as e:
+        logger.error(f"Error merging concepts: {str(e)}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main():
+    """Main function for direct script execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concept canonicalization")
+    parser.add_argument("--candidates", action="store_true", help="List duplicate candidates")
+    parser.add_argument("--merge", action="store_true", help="Merge duplicate candidates")
+    parser.add_argument("--min-score", type=float, default=DEFAULT_MERGE_SCORE,
+                        help="Minimum candidate score to merge")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD,
+                        help="Minimum n-gram similarity for fuzzy candidates")
+    parser.add_argument("--dry-run", action="store_true", help="Show merges without applying them")
+    parser.add_argument("--limit", type=int, default=50, help="Candidates to print")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(config.DB_PATH)
+    try:
+        ensure_alias_table(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+    start_time = time.time()
+    candidates = find_duplicate_candidates(threshold=args.threshold)
+    print(f"Found {len(candidates)} duplicate candidates in {time.time() - start_time:.2f}s")
+
+    if args.candidates or args.dry_run or not args.merge:
+        for c in candidates[:args.limit]:
+            print(f"- {c['duplicate_name']!r} -> {c['concept_name']!r} ({c['reason']}, {c['score']:.2f})")
+
+    if args.merge:
+        result = merge_duplicates(min_score=args.min_score, candidates=candidates, dry_run=args.dry_run)
+        action = "Would merge" if args.dry_run else "Merged"
+        count = len(result["merge_map"]) if args.dry_run else result["merged"]
+        print(f"{action} {count} concepts "
+              f"({result['links_moved']} content links moved, "
+              f"{result['relationships_removed']} relationships folded)")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,16 @@ import json
 import time
 import logging
 import sqlite3
+from collections import Counter
 from datetime import datetime
 import anthropic
 import config
+from response_cache import bump_data_generation
+from concept_canonical import ensure_alias_table, resolve_concept, register_alias
+from concept_stats import (
+    ensure_concept_stats, apply_stat_deltas,
+    TOTAL, CATEGORY, RELATIONSHIP_TYPE, CONCEPT_REFERENCES, CONCEPT_CONNECTIONS
+)
 
 # Configure logging
 log_dir = os.path.join(config.DATA_DIR, 'logs')
@@ -207,6 +214,13 @@ def store_concepts(content_id, source_type_id, concepts_data):
             
             logger.info("Created concepts tables")
         
+        # Incremental changes to the materialized knowledge graph stats
+        ensure_concept_stats(cursor)
+        ensure_alias_table(cursor)
+        stat_deltas = Counter()
+        cursor.execute("SELECT 1 FROM content_concepts WHERE content_id = ? LIMIT 1", (content_id,))
+        content_had_concepts = cursor.fetchone() is not None
+        
         # Store each concept
         concept_ids = {}
         for concept in concepts_data.get("concepts", []):
@@ -214,13 +228,14 @@ def store_concepts(content_id, source_type_id, concepts_data):
             if not name:
                 continue
                 
-            # Check if concept already exists
-            cursor.execute("SELECT id FROM concepts WHERE name = ?", (name,))
-            result = cursor.fetchone()
+            # Resolve the name to its canonical concept through the alias table
+            concept_id = resolve_concept(cursor, name)
+            if concept_id is None:
+                cursor.execute("SELECT id FROM concepts WHERE name = ?", (name,))
+                result = cursor.fetchone()
+                concept_id = result[0] if result else None
             
-            if result:
-                concept_id = result[0]
-            else:
+            if concept_id is None:
                 # Insert new concept
                 cursor.execute("""
                 INSERT INTO concepts (name, description, category) 
@@ -231,6 +246,9 @@ def store_concepts(content_id, source_type_id, concepts_data):
                     concept.get("category", "")
                 ))
                 concept_id = cursor.lastrowid
+                register_alias(cursor, name, concept_id)
+                stat_deltas[(TOTAL, 'concepts')] += 1
+                stat_deltas[(CATEGORY, concept.get("category", "") or "")] += 1
             
             concept_ids[name] = concept_id
             
@@ -247,6 +265,8 @@ def store_concepts(content_id, source_type_id, concepts_data):
                         "related_concepts": concept.get("related_concepts", [])
                     })
                 ))
+                stat_deltas[(TOTAL, 'content_concept_links')] += 1
+                stat_deltas[(CONCEPT_REFERENCES, str(concept_id))] += 1
             except sqlite3.IntegrityError:
                 # Update existing link
                 cursor.execute("""
@@ -262,6 +282,9 @@ def store_concepts(content_id, source_type_id, concepts_data):
                     concept_id
                 ))
         
+        if not content_had_concepts and stat_deltas[(TOTAL, 'content_concept_links')]:
+            stat_deltas[(TOTAL, 'content_with_concepts')] += 1
+        
         # Store relationships
         for relationship in concepts_data.get("relationships", []):
             source = relationship.get("source", "").strip()
@@ -273,12 +296,20 @@ def store_concepts(content_id, source_type_id, concepts_data):
                 
             source_id = concept_ids[source]
             target_id = concept_ids[target]
+            if source_id == target_id:
+                # Both names resolved to the same canonical concept
+                continue
             
             try:
                 cursor.execute("""
                 INSERT INTO concept_relationships (source_concept_id, target_concept_id, relationship_type)
                 VALUES (?, ?, ?)
                 """, (source_id, target_id, rel_type))
+                stat_deltas[(TOTAL, 'relationships')] += 1
+                stat_deltas[(RELATIONSHIP_TYPE, rel_type)] += 1
+                stat_deltas[(CONCEPT_CONNECTIONS, str(source_id))] += 1
+                if target_id != source_id:
+                    stat_deltas[(CONCEPT_CONNECTIONS, str(target_id))] += 1
             except sqlite3.IntegrityError:
                 # Relationship already exists
                 pass
@@ -291,6 +322,8 @@ def store_concepts(content_id, source_type_id, concepts_data):
         WHERE id = ?
         """, (datetime.now().isoformat(), content_id))
         
+        apply_stat_deltas(cursor, stat_deltas)
+        bump_data_generation(cursor, 'concept_extractor')
         conn.commit()
         return True
         
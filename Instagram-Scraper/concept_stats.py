@@ -0,0 +1,268 @@
+"""
+Materialized knowledge graph statistics
+
+Counts, category and relationship-type distributions and per-concept
+reference/connection counts are kept in the concept_stats table.
+store_concepts() applies incremental deltas in the same transaction as
+its writes, so stats reads never touch the raw concept tables.
+check_concept_stats() recomputes everything from scratch and reports drift.
+"""
+import logging
+import sqlite3
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger('concept_stats')
+
+STATS_TABLE = 'concept_stats'
+
+# Stat groups
+TOTAL = 'total'
+CATEGORY = 'category'
+RELATIONSHIP_TYPE = 'relationship_type'
+CONCEPT_REFERENCES = 'concept_references'
+CONCEPT_CONNECTIONS = 'concept_connections'
+
+StatKey = Tuple[str, str]
+
+
+def ensure_concept_stats(cursor: sqlite3.Cursor) -> None:
+    """
+    Create the stats table if needed, seeding it from the raw tables on first use
+
+    Args:
+        cursor: Cursor of an open connection (caller commits)
+    """
+    # The table is only created here (not in concept_schema.sql), so an existing
+    # table has always been seeded
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (STATS_TABLE,))
+    if cursor.fetchone():
+        return
+
+    cursor.execute(f"""
+        CREATE TABLE {STATS_TABLE} (
+            stat_group TEXT NOT NULL,
+            stat_key TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stat_group, stat_key)
+        )
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_concept_stats_group_value
+        ON {STATS_TABLE}(stat_group, value DESC)
+    """)
+    logger.info("Created concept_stats table")
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='concepts'")
+    if cursor.fetchone():
+        _write_stats(cursor, compute_concept_stats(cursor))
+
+
+def apply_stat_deltas(cursor: sqlite3.Cursor, deltas: Dict[StatKey, int]) -> None:
+    """
+    Add incremental changes to the materialized stats
+
+    Args:
+        cursor: Cursor of the connection performing the write (caller commits)
+        deltas: Mapping of (stat_group, stat_key) to the change in value
+    """
+    rows = [(group, key, delta) for (group, key), delta in deltas.items() if delta]
+    if not rows:
+        return
+
+    cursor.executemany(f"""
+        INSERT INTO {STATS_TABLE} (stat_group, stat_key, value)
+        VALUES (?, ?, ?)
+        ON CONFLICT(stat_group, stat_key) DO UPDATE SET value = value + excluded.value
+    """, rows)
+
+
+def compute_concept_stats(cursor: sqlite3.Cursor) -> Dict[StatKey, int]:
+    """
+    Recompute all stats from the raw concept tables
+
+    Returns:
+        Mapping of (stat_group, stat_key) to value
+    """
+    stats = Counter()
+
+    cursor.execute("SELECT COUNT(*) FROM concepts")
+    stats[(TOTAL, 'concepts')] = cursor.fetchone()[0]
+
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT content_id) FROM content_concepts")
+    links, contents = cursor.fetchone()
+    stats[(TOTAL, 'content_concept_links')] = links
+    stats[(TOTAL, 'content_with_concepts')] = contents
+
+    cursor.execute("SELECT COUNT(*) FROM concept_relationships")
+    stats[(TOTAL, 'relationships')] = cursor.fetchone()[0]
+
+    cursor.execute("SELECT COALESCE(category, ''), COUNT(*) FROM concepts GROUP BY COALESCE(category, '')")
+    for category, count in cursor.fetchall():
+        stats[(CATEGORY, category)] = count
+
+    cursor.execute("SELECT relationship_type, COUNT(*) FROM concept_relationships GROUP BY relationship_type")
+    for rel_type, count in cursor.fetchall():
+        stats[(RELATIONSHIP_TYPE, rel_type or '')] = count
+
+    cursor.execute("SELECT concept_id, COUNT(*) FROM content_concepts GROUP BY concept_id")
+    for concept_id, count in cursor.fetchall():
+        stats[(CONCEPT_REFERENCES, str(concept_id))] = count
+
+    # A self-loop counts once, matching "source = c OR target = c"
+    cursor.execute("""
+        SELECT concept_id, SUM(cnt) FROM (
+            SELECT source_concept_id AS concept_id, COUNT(*) AS cnt
+            FROM concept_relationships
+            GROUP BY source_concept_id
+            UNION ALL
+            SELECT target_concept_id AS concept_id, COUNT(*) AS cnt
+            FROM concept_relationships
+            WHERE target_concept_id != source_concept_id
+            GROUP BY target_concept_id
+        )
+        GROUP BY concept_id
+    """)
+    for concept_id, count in cursor.fetchall():
+        stats[(CONCEPT_CONNECTIONS, str(concept_id))] = count
+
+    return stats
+
+
+def _write_stats(cursor: sqlite3.Cursor, stats: Dict[StatKey, int]) -> None:
+    cursor.execute(f"DELETE FROM {STATS_TABLE}")
+    cursor.executemany(
+        f"INSERT INTO {STATS_TABLE} (stat_group, stat_key, value) VALUES (?, ?, ?)",
+        [(group, key, value) for (group, key), value in stats.items() if value]
+    )
+
+
+def rebuild_concept_stats(cursor: sqlite3.Cursor) -> None:
+    """Replace the materialized stats with a full recomputation (caller commits)"""
+    ensure_concept_stats(cursor)
+    _write_stats(cursor, compute_concept_stats(cursor))
+
+
+def check_concept_stats(db_path: Optional[str] = None, repair: bool = False) -> Dict[str, Any]:
+    """
+    Compare the materialized stats against a full recomputation
+
+    Args:
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        repair: Rewrite the stats table from the recomputed values if drift is found
+
+    Returns:
+        Dictionary with the number of stats checked and a list of drifted entries
+    """
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        ensure_concept_stats(cursor)
+
+        cursor.execute(f"SELECT stat_group, stat_key, value FROM {STATS_TABLE}")
+        stored = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+        actual = compute_concept_stats(cursor)
+
+        drift = []
+        for key in sorted(set(stored) | set(actual)):
+            stored_value = stored.get(key, 0)
+            actual_value = actual.get(key, 0)
+            if stored_value != actual_value:
+                drift.append({
+                    "group": key[0],
+                    "key": key[1],
+                    "stored": stored_value,
+                    "actual": actual_value
+                })
+
+        if drift:
+            logger.warning(f"Found {len(drift)} drifted concept stats")
+            if repair:
+                _write_stats(cursor, actual)
+                logger.info("Rebuilt concept_stats from raw tables")
+
+        conn.commit()
+        return {
+            "checked": len(set(stored) | set(actual)),
+            "drift": drift,
+            "repaired": bool(drift) and repair
+        }
+    except Exception as e:
+        logger.error(f"Error checking concept stats: {str(e)}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _top_group(cursor: sqlite3.Cursor, group: str, limit: Optional[int]) -> List[Tuple[str, int]]:
+    # SQLite reads a negative LIMIT as no limit
+    cursor.execute(f"""
+        SELECT stat_key, value FROM {STATS_TABLE}
+        WHERE stat_group = ? AND value > 0
+        ORDER BY value DESC
+        LIMIT ?
+    """, (group, -1 if limit is None else limit))
+    return cursor.fetchall()
+
+
+def _top_concepts(cursor: sqlite3.Cursor, group: str, limit: int) -> List[Dict[str, Any]]:
+    cursor.execute(f"""
+        SELECT c.id, c.name, c.category, s.value
+        FROM (
+            SELECT stat_key, value FROM {STATS_TABLE}
+            WHERE stat_group = ? AND value > 0
+            ORDER BY value DESC
+            LIMIT ?
+        ) s
+        JOIN concepts c ON c.id = CAST(s.stat_key AS INTEGER)
+        ORDER BY s.value DESC
+    """, (group, limit))
+    return [
+        {"id": row[0], "name": row[1], "category": row[2], "count": row[3]}
+        for row in cursor.fetchall()
+    ]
+
+
+def read_concept_stats(db_path: Optional[str] = None, limit: int = 10) -> Dict[str, Any]:
+    """
+    Read knowledge graph statistics from the materialized table
+
+    Args:
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        limit: Number of entries in each top-N list (the category
+            distribution is always complete)
+
+    Returns:
+        Dictionary of totals, distributions and top concepts; concepts
+        without a category are counted under category None
+    """
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        ensure_concept_stats(cursor)
+        conn.commit()
+
+        cursor.execute(f"SELECT stat_key, value FROM {STATS_TABLE} WHERE stat_group = ?", (TOTAL,))
+        totals = dict(cursor.fetchall())
+
+        return {
+            "concept_count": totals.get('concepts', 0),
+            "relationship_count": totals.get('relationships', 0),
+            "content_with_concepts": totals.get('content_with_concepts', 0),
+            "content_concept_links": totals.get('content_concept_links', 0),
+            "categories": [
+                {"category": key or None, "count": value}
+                for key, value in _top_group(cursor, CATEGORY, None)
+            ],
+            "relationship_types": [
+                {"type": key, "count": value}
+                for key, value in _top_group(cursor, RELATIONSHIP_TYPE, limit)
+            ],
+            "top_concepts": _top_concepts(cursor, CONCEPT_REFERENCES, limit),
+            "most_connected_concepts": _top_concepts(cursor, CONCEPT_CONNECTIONS, limit)
+        }
+    finally:
+        conn.close()
@@ -0,0 +1,485 @@
+"""
+Crawl scheduling state for the Instagram downloader
+
+Account refresh schedules, cooldowns, proxy cooldowns and the round-robin
+positions of the login and proxy rotations live in one SQLite database
+(WAL mode) instead of several JSON files. Every update is a single
+transaction, read-modify-write steps take the write lock up front
+(BEGIN IMMEDIATE), and several downloader processes can share the file.
+Each account row keeps a precomputed due_at time, so "which accounts are
+due" is one indexed query. A per-account high-water mark (newest post
+seen) lets a refresh stop paginating at the first post it already knows.
+
+The old JSON state files are imported once and renamed to *.imported.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from config import DATA_DIR
+
+logger = logging.getLogger('crawl_state')
+
+STATE_DB = os.path.join(DATA_DIR, "state", "crawl_state.db")
+# Refresh interval after a successful crawl (hours)
+DEFAULT_REFRESH_HOURS = 24
+# Longest refresh interval after repeated failures (hours)
+MAX_REFRESH_HOURS = 168
+# Seconds to wait for another process holding the write lock
+BUSY_TIMEOUT = 30.0
+
+# Rotation cursors
+LOGIN_ROTATION = "login"
+PROXY_ROTATION = "proxy"
+
+# Keeps due_at in step with the columns it depends on
+_DUE_AT = ("MAX(COALESCE(last_processed + refresh_interval_hours * 3600, 0), "
+           "COALESCE(cooldown_until, 0))")
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from an ISO timestamp written by the JSON state files"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _isoformat(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value else None
+
+
+class CrawlStateStore:
+    """SQLite-backed crawl state shared between downloader processes"""
+
+    def __init__(self, path: str = STATE_DB, legacy_dir: Optional[str] = DATA_DIR):
+        """
+        Open (and create) the state database
+
+        Args:
+            path: Path of the SQLite file
+            legacy_dir: Data directory whose JSON state files are imported once (None to skip)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS accounts (
+                    username TEXT PRIMARY KEY,
+                    last_processed REAL,
+                    refresh_interval_hours REAL NOT NULL DEFAULT {DEFAULT_REFRESH_HOURS},
+                    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+                    cooldown_until REAL,
+                    last_failure REAL,
+                    last_attempt REAL,
+                    next_attempt REAL,
+                    backoff_minutes REAL,
+                    due_at REAL NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_accounts_due_at ON accounts(due_at)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS proxies (
+                    proxy TEXT PRIMARY KEY,
+                    next_available REAL,
+                    last_failure REAL,
+                    failures INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS post_cursors (
+                    username TEXT PRIMARY KEY,
+                    newest_shortcode TEXT,
+                    newest_timestamp REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS rotation_cursors (
+                    name TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL
+                )
+            """)
+
+        if legacy_dir:
+            self.import_json_state(legacy_dir)
+
+    class _Transaction:
+        def __init__(self, store, immediate):
+            self.store = store
+            self.immediate = immediate
+
+        def __enter__(self):
+            self.store._lock.acquire()
+            self.cursor = self.store._conn.cursor()
+            self.cursor.execute("BEGIN IMMEDIATE" if self.immediate else "BEGIN")
+            return self.cursor
+
+        def __exit__(self, exc_type, exc, tb):
+            try:
+                self.cursor.execute("COMMIT" if exc_type is None else "ROLLBACK")
+            finally:
+                self.store._lock.release()
+            return False
+
+    def _transaction(self, immediate: bool = True) -> "_Transaction":
+        """Transaction context; immediate transactions take the write lock at BEGIN"""
+        return self._Transaction(self, immediate)
+
+    def _ensure_account(self, cursor: sqlite3.Cursor, username: str) -> None:
+        cursor.execute("INSERT OR IGNORE INTO accounts (username) VALUES (?)", (username,))
+
+    # Target account refresh schedule
+
+    def due_accounts(self, usernames: Optional[Iterable[str]] = None, now: Optional[float] = None) -> List[str]:
+        """
+        Accounts due for a refresh
+
+        Args:
+            usernames: Candidate accounts (accounts without state are due);
+                None returns every known account that is due
+            now: Reference time (epoch seconds)
+
+        Returns:
+            Due usernames, in candidate order when candidates are given
+        """
+        now = time.time() if now is None else now
+        with self._transaction(immediate=False) as cursor:
+            if usernames is None:
+                cursor.execute("SELECT username FROM accounts WHERE due_at <= ? ORDER BY due_at", (now,))
+            else:
+                cursor.execute("""
+                    SELECT candidates.value FROM json_each(?) AS candidates
+                    LEFT JOIN accounts ON accounts.username = candidates.value
+                    WHERE accounts.due_at IS NULL OR accounts.due_at <= ?
+                    ORDER BY candidates.key
+                """, (json.dumps(list(usernames)), now))
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_account(self, username: str) -> Optional[Dict]:
+        """State of one account as a dictionary (None if unknown)"""
+        with self._transaction(immediate=False) as cursor:
+            row = cursor.execute("SELECT * FROM accounts WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row else None
+
+    def is_account_due(self, username: str, now: Optional[float] = None) -> bool:
+        """Whether one account is due for a refresh"""
+        return bool(self.due_accounts([username], now))
+
+    def mark_account_processed(self, username: str, success: bool = True,
+                               base_cooldown_minutes: float = 60) -> Dict:
+        """
+        Record a crawl of an account and schedule the next one
+
+        Success resets the refresh interval; each consecutive failure
+        doubles it (up to a week), and from the third failure on the
+        account also gets an exponentially growing cooldown.
+
+        Args:
+            username: Account name
+            success: Whether the crawl succeeded
+            base_cooldown_minutes: Cooldown after the third consecutive failure
+
+        Returns:
+            Updated account state
+        """
+        now = time.time()
+        with self._transaction() as cursor:
+            self._ensure_account(cursor, username)
+            if success:
+                cursor.execute("""
+                    UPDATE accounts SET last_processed = ?, consecutive_failures = 0,
+                        refresh_interval_hours = ? WHERE username = ?
+                """, (now, DEFAULT_REFRESH_HOURS, username))
+            else:
+                failures = cursor.execute("SELECT consecutive_failures FROM accounts WHERE username = ?",
+                                          (username,)).fetchone()[0] + 1
+                interval = min(DEFAULT_REFRESH_HOURS * (2 ** (failures - 1)), MAX_REFRESH_HOURS)
+                cooldown_until = None
+                if failures > 2:
+                    cooldown_until = now + base_cooldown_minutes * 60 * (2 ** (failures - 3))
+                    logger.warning(f"Account {username} in cooldown until {_isoformat(cooldown_until)} "
+                                   f"after {failures} failures")
+                cursor.execute("""
+                    UPDATE accounts SET last_processed = ?, consecutive_failures = ?,
+                        refresh_interval_hours = ?, last_failure = ?,
+                        cooldown_until = COALESCE(?, cooldown_until)
+                    WHERE username = ?
+                """, (now, failures, interval, now, cooldown_until, username))
+            cursor.execute(f"UPDATE accounts SET due_at = {_DUE_AT} WHERE username = ?", (username,))
+            row = cursor.execute("SELECT * FROM accounts WHERE username = ?", (username,)).fetchone()
+        return dict(row)
+
+    def mark_account_cooldown(self, username: str, cooldown_minutes: float) -> float:
+        """
+        Put an account (target or login) in cooldown and count the failure
+
+        Returns:
+            End of the cooldown (epoch seconds)
+        """
+        now = time.time()
+        cooldown_until = now + cooldown_minutes * 60
+        with self._transaction() as cursor:
+            self._ensure_account(cursor, username)
+            cursor.execute("""
+                UPDATE accounts SET cooldown_until = ?, last_failure = ?,
+                    consecutive_failures = consecutive_failures + 1
+                WHERE username = ?
+            """, (cooldown_until, now, username))
+            cursor.execute(f"UPDATE accounts SET due_at = {_DUE_AT} WHERE username = ?", (username,))
+        return cooldown_until
+
+    def schedule_refresh(self, username: str, backoff_minutes: float = 60) -> float:
+        """
+        Schedule the next refresh attempt, doubling the backoff after failures
+
+        Returns:
+            Time of the next attempt (epoch seconds)
+        """
+        now = time.time()
+        with self._transaction() as cursor:
+            self._ensure_account(cursor, username)
+            row = cursor.execute("SELECT backoff_minutes, consecutive_failures FROM accounts WHERE username = ?",
+                                 (username,)).fetchone()
+            backoff = row["backoff_minutes"] or backoff_minutes
+            if row["backoff_minutes"] and row["consecutive_failures"] > 0:
+                # Exponential backoff
+                backoff *= 2
+            next_attempt = now + backoff * 60
+            cursor.execute("""
+                UPDATE accounts SET last_attempt = ?, next_attempt = ?, backoff_minutes = ?
+                WHERE username = ?
+            """, (now, next_attempt, backoff, username))
+        return next_attempt
+
+    def should_refresh(self, username: str, now: Optional[float] = None) -> bool:
+        """Whether the scheduled refresh attempt of an account has come"""
+        now = time.time() if now is None else now
+        with self._transaction(immediate=False) as cursor:
+            row = cursor.execute("SELECT next_attempt FROM accounts WHERE username = ?", (username,)).fetchone()
+        return row is None or row[0] is None or now >= row[0]
+
+    # Post discovery high-water marks
+
+    def get_post_cursor(self, username: str) -> Optional[Dict]:
+        """
+        Newest post already seen for an account
+
+        Returns:
+            Dictionary with newest_shortcode and newest_timestamp (epoch seconds), or None
+        """
+        with self._transaction(immediate=False) as cursor:
+            row = cursor.execute("SELECT * FROM post_cursors WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row else None
+
+    def advance_post_cursor(self, username: str, shortcode: Optional[str], timestamp: float) -> bool:
+        """
+        Move an account's high-water mark forward (never backward)
+
+        Args:
+            username: Account name
+            shortcode: Shortcode of the newest post (None when seeded from files on disk)
+            timestamp: Post time in epoch seconds
+
+        Returns:
+            True if the mark moved
+        """
+        with self._transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO post_cursors (username, newest_shortcode, newest_timestamp, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (username) DO UPDATE SET
+                    newest_shortcode = excluded.newest_shortcode,
+                    newest_timestamp = excluded.newest_timestamp,
+                    updated_at = excluded.updated_at
+                WHERE excluded.newest_timestamp > post_cursors.newest_timestamp
+            """, (username, shortcode, timestamp, time.time()))
+            return cursor.rowcount > 0
+
+    # Rotations
+
+    def _next_in_rotation(self, name: str, candidates: List[str], available_sql: str) -> Optional[str]:
+        """Advance a round-robin cursor to the next candidate the query reports available"""
+        if not candidates:
+            return None
+        now = time.time()
+        with self._transaction() as cursor:
+            row = cursor.execute("SELECT position FROM rotation_cursors WHERE name = ?", (name,)).fetchone()
+            last = row[0] if row else -1
+            cursor.execute(available_sql, (json.dumps(candidates), now))
+            available = {value for (value,) in cursor.fetchall()}
+            for step in range(1, len(candidates) + 1):
+                index = (last + step) % len(candidates)
+                if candidates[index] in available:
+                    cursor.execute("INSERT OR REPLACE INTO rotation_cursors (name, position) VALUES (?, ?)",
+                                   (name, index))
+                    return candidates[index]
+        return None
+
+    def next_login_account(self, usernames: List[str]) -> Optional[str]:
+        """
+        Next login account in rotation that is not in cooldown
+
+        Returns:
+            Username, or None if all are in cooldown
+        """
+        return self._next_in_rotation(LOGIN_ROTATION, usernames, """
+            SELECT candidates.value FROM json_each(?) AS candidates
+            LEFT JOIN accounts ON accounts.username = candidates.value
+            WHERE accounts.cooldown_until IS NULL OR accounts.cooldown_until <= ?
+        """)
+
+    def next_proxy(self, proxies: List[str]) -> Optional[str]:
+        """
+        Next proxy in rotation that is not in cooldown
+
+        Returns:
+            Proxy URL, or None if all are in cooldown
+        """
+        return self._next_in_rotation(PROXY_ROTATION, proxies, """
+            SELECT candidates.value FROM json_each(?) AS candidates
+            LEFT JOIN proxies ON proxies.proxy = candidates.value
+            WHERE proxies.next_available IS NULL OR proxies.next_available <= ?
+        """)
+
+    def get_proxy(self, proxy: str) -> Optional[Dict]:
+        """State of one proxy as a dictionary (None if unknown)"""
+        with self._transaction(immediate=False) as cursor:
+            row = cursor.execute("SELECT * FROM proxies WHERE proxy = ?", (proxy,)).fetchone()
+        return dict(row) if row else None
+
+    def mark_proxy_cooldown(self, proxy: str, cooldown_minutes: float) -> float:
+        """
+        Put a proxy in cooldown after a failure
+
+        Returns:
+            End of the cooldown (epoch seconds)
+        """
+        now = time.time()
+        next_available = now + cooldown_minutes * 60
+        with self._transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO proxies (proxy, next_available, last_failure, failures) VALUES (?, ?, ?, 1)
+                ON CONFLICT(proxy) DO UPDATE SET next_available = excluded.next_available,
+                    last_failure = excluded.last_failure, failures = failures + 1
+            """, (proxy, next_available, now))
+        return next_available
+
+    # Migration
+
+    def import_json_state(self, data_dir: str) -> int:
+        """
+        Import the downloader's old JSON state files once
+
+        Reads refresh_state.json, logs/account_states.json,
+        state/account_state.json and state/proxy_state.json, then renames
+        each to *.imported.
+
+        Args:
+            data_dir: Data directory holding the files
+
+        Returns:
+            Number of imported records
+        """
+        files = {
+            "refresh": os.path.join(data_dir, "refresh_state.json"),
+            "accounts": os.path.join(data_dir, "logs", "account_states.json"),
+            "logins": os.path.join(data_dir, "state", "account_state.json"),
+            "proxies": os.path.join(data_dir, "state", "proxy_state.json"),
+        }
+        loaded = {}
+        for kind, path in files.items():
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r') as f:
+                    loaded[kind] = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Could not read legacy crawl state {path}: {str(e)}")
+        if not loaded:
+            return 0
+
+        count = 0
+        with self._transaction() as cursor:
+            for username, state in loaded.get("accounts", {}).items():
+                self._ensure_account(cursor, username)
+                cursor.execute("""
+                    UPDATE accounts SET last_processed = ?, refresh_interval_hours = ?,
+                        consecutive_failures = ?, cooldown_until = ?
+                    WHERE username = ?
+                """, (_timestamp(state.get("last_processed")),
+                      state.get("refresh_interval", DEFAULT_REFRESH_HOURS),
+                      state.get("consecutive_failures", 0),
+                      _timestamp(state.get("cooldown_until")), username))
+                count += 1
+            for username, state in loaded.get("refresh", {}).get("accounts", {}).items():
+                self._ensure_account(cursor, username)
+                cursor.execute("""
+                    UPDATE accounts SET last_attempt = ?, next_attempt = ?, backoff_minutes = ?
+                    WHERE username = ?
+                """, (_timestamp(state.get("last_attempt")), _timestamp(state.get("next_attempt")),
+                      state.get("backoff_minutes"), username))
+                count += 1
+            logins = loaded.get("logins", {})
+            for username, state in logins.get("account_states", {}).items():
+                self._ensure_account(cursor, username)
+                cursor.execute("""
+                    UPDATE accounts SET cooldown_until = MAX(COALESCE(cooldown_until, 0), COALESCE(?, 0)),
+                        last_failure = COALESCE(?, last_failure)
+                    WHERE username = ?
+                """, (_timestamp(state.get("next_available")), _timestamp(state.get("last_failure")), username))
+                count += 1
+            proxies = loaded.get("proxies", {})
+            for proxy, state in proxies.get("proxy_states", {}).items():
+                cursor.execute("""
+                    INSERT OR REPLACE INTO proxies (proxy, next_available, last_failure, failures)
+                    VALUES (?, ?, ?, 1)
+                """, (proxy, _timestamp(state.get("next_available")), _timestamp(state.get("last_failure"))))
+                count += 1
+            for name, state in ((LOGIN_ROTATION, logins), (PROXY_ROTATION, proxies)):
+                if state.get("last_index", -1) >= 0:
+                    cursor.execute("INSERT OR REPLACE INTO rotation_cursors (name, position) VALUES (?, ?)",
+                                   (name, state["last_index"]))
+            cursor.execute(f"UPDATE accounts SET due_at = {_DUE_AT}")
+
+        for kind in loaded:
+            try:
+                os.replace(files[kind], files[kind] + ".imported")
+            except OSError:
+                # Another downloader process imported it first
+                pass
+        logger.info(f"Imported {count} records from legacy crawl state files")
+        return count
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_crawl_state() -> CrawlStateStore:
+    """Process-wide crawl state store (opened on first use)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CrawlStateStore()
+        return _store
@@ -0,0 +1,305 @@
+"""
+Concurrent download scheduling across (proxy, login) identities
+
+Each identity is a proxy paired with a login account. An identity crawls
+one target account at a time and owns a token bucket that paces every
+request made on its behalf, plus a cooldown that takes it out of
+rotation after failures (persisted in the crawl state store). Several
+identities work in parallel, so politeness limits hold per identity
+while total throughput grows with the number of identities.
+"""
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from crawl_state import get_crawl_state
+
+logger = logging.getLogger('download_scheduler')
+
+# Requests an identity may make back to back before pacing kicks in
+DEFAULT_BURST = 3
+# Attempts per target account (each on a different identity if possible)
+DEFAULT_MAX_ATTEMPTS = 2
+# Identity cooldown after a failed account (minutes)
+DEFAULT_COOLDOWN_MINUTES = 30
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, up to burst banked"""
+
+    def __init__(self, rate: float, burst: int = DEFAULT_BURST,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+            clock: Time source
+            sleep: Sleep function
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens if available
+
+        Returns:
+            0 on success, else the seconds until enough tokens are available
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Block until tokens are available and take them
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            self.sleep(wait)
+            waited += wait
+
+
+class Identity:
+    """A (proxy, login) pair with its own request budget and cooldown"""
+
+    def __init__(self, proxy: Optional[str], login: Optional[Dict[str, str]], rate: float,
+                 burst: int = DEFAULT_BURST):
+        """
+        Args:
+            proxy: Proxy URL (None for a direct connection)
+            login: Login account dict with username and password (None for anonymous)
+            rate: Requests per second allowed for this identity
+            burst: Requests allowed back to back
+        """
+        self.proxy = proxy
+        self.login = login
+        self.bucket = TokenBucket(rate, burst)
+        self.cooldown_until = 0.0  # Epoch seconds
+        self.failures = 0
+        self.requests = 0
+        self.waited = 0.0
+
+    @property
+    def username(self) -> Optional[str]:
+        return self.login.get("username") if self.login else None
+
+    @property
+    def key(self) -> str:
+        """Readable identity name (proxy host and login)"""
+        host = self.proxy.split("@")[-1] if self.proxy else "direct"
+        return f"{host}/{self.username or 'anonymous'}"
+
+    def throttle(self, delay: Optional[float] = None) -> None:
+        """
+        Pace a request made with this identity
+
+        Replaces the fixed sleeps of the sequential downloader; the delay
+        argument is accepted for call compatibility and ignored.
+        """
+        self.waited += self.bucket.acquire()
+        self.requests += 1
+
+    def available(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) >= self.cooldown_until
+
+    def cool_down(self, minutes: float) -> None:
+        """Take the identity out of rotation and persist the cooldown"""
+        self.failures += 1
+        self.cooldown_until = time.time() + minutes * 60
+        state = get_crawl_state()
+        if self.proxy:
+            state.mark_proxy_cooldown(self.proxy, minutes)
+        if self.username:
+            state.mark_account_cooldown(self.username, minutes)
+        logger.warning(f"Identity {self.key} in cooldown for {minutes} minutes")
+
+
+def build_identities(proxies: List[Optional[str]], logins: List[Optional[Dict[str, str]]],
+                     rate: float, burst: int = DEFAULT_BURST) -> List[Identity]:
+    """
+    Pair proxies with logins, never sharing a proxy or a login between identities
+
+    Identities whose proxy or login is in cooldown in the crawl state
+    start in cooldown.
+
+    Args:
+        proxies: Proxy URLs (an empty list means one direct connection)
+        logins: Login account dicts (an empty list means anonymous access)
+        rate: Requests per second per identity
+        burst: Requests allowed back to back per identity
+
+    Returns:
+        Identities, one per (proxy, login) pair
+    """
+    proxies = list(proxies) or [None]
+    logins = list(logins) or [None]
+    count = min(len(proxies), len(logins))
+
+    state = get_crawl_state()
+    identities = []
+    for index in range(count):
+        identity = Identity(proxies[index], logins[index], rate, burst)
+        if identity.proxy:
+            proxy_state = state.get_proxy(identity.proxy)
+            if proxy_state and proxy_state["next_available"]:
+                identity.cooldown_until = max(identity.cooldown_until, proxy_state["next_available"])
+        if identity.username:
+            account_state = state.get_account(identity.username)
+            if account_state and account_state["cooldown_until"]:
+                identity.cooldown_until = max(identity.cooldown_until, account_state["cooldown_until"])
+        identities.append(identity)
+    return identities
+
+
+class DownloadBudget:
+    """Run-wide download limit shared by all workers"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> int:
+        with self._lock:
+            return self.limit - self.used
+
+    def consume(self, count: int = 1) -> None:
+        with self._lock:
+            self.used += count
+
+
+class DownloadScheduler:
+    """Crawl target accounts on several identities in parallel"""
+
+    def __init__(self, identities: List[Identity], max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 cooldown_minutes: float = DEFAULT_COOLDOWN_MINUTES,
+                 budget: Optional[DownloadBudget] = None):
+        """
+        Args:
+            identities: Identities to crawl with (one worker thread each)
+            max_attempts: Attempts per account before giving up on it
+            cooldown_minutes: Identity cooldown after a failed attempt
+            budget: Shared download limit; no new accounts start once it is used up
+        """
+        if not identities:
+            raise ValueError("At least one identity is required")
+        self.identities = identities
+        self.max_attempts = max_attempts
+        self.cooldown_minutes = cooldown_minutes
+        self.budget = budget
+        self._free = deque(identities)
+        self._condition = threading.Condition()
+
+    def _acquire_identity(self, exclude: Iterable[Identity] = ()) -> Optional[Identity]:
+        """
+        Wait for an idle identity that is not in cooldown
+
+        Returns:
+            An identity, or None when every identity is cooling down longer than the others can help
+        """
+        exclude = set(exclude)
+        with self._condition:
+            while True:
+                now = time.time()
+                candidates = [identity for identity in self._free if identity.available(now)]
+                preferred = [identity for identity in candidates if identity not in exclude]
+                chosen = (preferred or candidates or [None])[0]
+                if chosen is not None:
+                    self._free.remove(chosen)
+                    return chosen
+                if all(not identity.available(now) for identity in self.identities):
+                    # Nobody can make progress; don't wait out long cooldowns
+                    return None
+                # Wait for a busy identity to be released (or a cooldown to pass)
+                soonest = min(identity.cooldown_until for identity in self.identities)
+                self._condition.wait(timeout=max(0.05, min(5.0, soonest - now)))
+
+    def _release_identity(self, identity: Identity) -> None:
+        with self._condition:
+            self._free.append(identity)
+            self._condition.notify_all()
+
+    def _run_account(self, account: str, process_account: Callable[[str, Identity], Any]) -> Tuple[str, Any, Optional[str]]:
+        """Crawl one account, retrying on another identity after a failure"""
+        tried = []
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            if self.budget and self.budget.remaining() <= 0:
+                return account, None, "download limit reached"
+            identity = self._acquire_identity(exclude=tried)
+            if identity is None:
+                return account, None, error or "all identities in cooldown"
+            tried.append(identity)
+            try:
+                logger.info(f"Crawling {account} with identity {identity.key} (attempt {attempt}/{self.max_attempts})")
+                return account, process_account(account, identity), None
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Error processing account {account} with identity {identity.key}: {error}")
+                identity.cool_down(self.cooldown_minutes)
+            finally:
+                self._release_identity(identity)
+        return account, None, error
+
+    def run(self, accounts: Iterable[str], process_account: Callable[[str, Identity], Any]) -> Dict:
+        """
+        Crawl accounts, one per identity at a time
+
+        Args:
+            accounts: Target account names
+            process_account: Called with (account, identity) in a worker
+                thread; it should pace each request with identity.throttle()
+                and raise on failures that warrant a cooldown
+
+        Returns:
+            Dictionary with per-account results, failures and per-identity statistics
+        """
+        accounts = list(accounts)
+        start_time = time.time()
+        results = {}
+        failures = {}
+
+        with ThreadPoolExecutor(max_workers=len(self.identities), thread_name_prefix="crawl") as executor:
+            futures = [executor.submit(self._run_account, account, process_account) for account in accounts]
+            for future in futures:
+                account, result, error = future.result()
+                if error is None:
+                    results[account] = result
+                else:
+                    failures[account] = error
+
+        elapsed = time.time() - start_time
+        identity_stats = {
+            identity.key: {"requests": identity.requests, "waited_seconds": round(identity.waited, 2),
+                           "failures": identity.failures}
+            for identity in self.identities
+        }
+        total_requests = sum(stats["requests"] for stats in identity_stats.values())
+        logger.info(f"Crawled {len(results)}/{len(accounts)} accounts on {len(self.identities)} identities "
+                    f"in {elapsed:.1f}s ({total_requests / elapsed if elapsed else 0:.2f} requests/s)")
+        return {"results": results, "failures": failures, "identities": identity_stats,
+                "elapsed_seconds": round(elapsed, 2)}
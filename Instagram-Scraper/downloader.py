@@ -6,7 +6,10 @@ import time
 import json
 import logging
 import random
-from datetime import datetime, timedelta
+import calendar
+from itertools import islice
+from concurrent.futures import Future
+from datetime import datetime, timezone
 import instaloader
 import sqlite3
 
@@ -40,6 +43,11 @@ from config import (
     RATE_LIMIT_WAIT,
     CONTENT_SOURCES
 )
+from crawl_state import get_crawl_state
+from download_scheduler import DownloadBudget, DownloadScheduler, build_identities
+from media_downloader import get_media_downloader, read_manifest, verify_download
+from media_store import get_media_store
+from http_cache import install_http_cache, log_http_cache_stats
 
 # Configure logging
 logging.basicConfig(
@@ -52,6 +60,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger('downloader')
 
+# Posts a new-content peek looks at: pinned posts (up to 3) plus the newest
+# regular post, all on the first page of results
+PEEK_POSTS = 4
+
 # Account state tracking
 def setup_directories():
     """Create necessary directories if they don't exist"""
@@ -74,69 +86,45 @@ def get_next_account():
     if not INSTAGRAM_ACCOUNT_ROTATION:
         return INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD
     
-    state_file = os.path.join(DATA_DIR, "state", "account_state.json")
-    if os.path.exists(state_file):
-        try:
-            with open(state_file) as f:
-                state = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            state = {"last_index": -1, "account_states": {}}
-    else:
-        state = {"last_index": -1, "account_states": {}}
-    
-    # Find the next available account
-    for i in range(len(INSTAGRAM_ACCOUNT_ROTATION)):
-        idx = (state["last_index"] + i + 1) % len(INSTAGRAM_ACCOUNT_ROTATION)
-        account = INSTAGRAM_ACCOUNT_ROTATION[idx]
-        username = account["username"]
-        
-        # Skip accounts that are in cooldown
-        account_state = state["account_states"].get(username, {})
-        next_available_str = account_state.get("next_available")
-        
-        if not next_available_str or datetime.now().isoformat() >= next_available_str:
-            # Update state
-            state["last_index"] = idx
-            with open(state_file, "w") as f:
-                json.dump(state, f)
-            
-            logger.info(f"Using account {username} from rotation")
-            return account["username"], account["password"]
+    # Find the next available account (skipping accounts in cooldown)
+    usernames = [account["username"] for account in INSTAGRAM_ACCOUNT_ROTATION]
+    username = get_crawl_state().next_login_account(usernames)
+    if username:
+        logger.info(f"Using account {username} from rotation")
+        account = INSTAGRAM_ACCOUNT_ROTATION[usernames.index(username)]
+        return account["username"], account["password"]
     
     # If all accounts are in cooldown, fallback to default account
     logger.warning("All accounts in rotation are in cooldown, using default account")
     return INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD
 
-def mark_account_cooldown(username, cooldown_minutes=ACCOUNT_COOLDOWN_MINUTES):
-    """Mark an account as in cooldown after a failure"""
-    if not username:
-        return
-        
-    state_file = os.path.join(DATA_DIR, "state", "account_state.json")
-    if os.path.exists(state_file):
-        try:
-            with open(state_file) as f:
-                state = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            state = {"last_index": -1, "account_states": {}}
-    else:
-        state = {"last_index": -1, "account_states": {}}
-    
-    # Set cooldown period
-    next_available = (datetime.now() + timedelta(minutes=cooldown_minutes)).isoformat()
-    
-    # Update account state
-    if username not in state["account_states"]:
-        state["account_states"][username] = {}
-        
-    state["account_states"][username]["next_available"] = next_available
-    state["account_states"][username]["last_failure"] = datetime.now().isoformat()
-    
-    # Save state
-    with open(state_file, "w") as f:
-        json.dump(state, f)
-        
-    logger.info(f"Account {username} marked for cooldown until {next_available}")
+def apply_proxy_country(base_proxy, country):
+    """Rewrite a residential proxy URL to exit in the given country"""
+    proxy = base_proxy
+    if country and "zone-residential" in base_proxy:
+        # Extract components from the proxy URL
+        parts = base_proxy.split('@')
+        if len(parts) == 2:
+            auth_part = parts[0]
+            host_part = parts[1]
+            
+            # Check if country parameter is already in the auth part
+            if "country-" in auth_part:
+                # Replace existing country
+                auth_parts = auth_part.split('-country-')
+                if len(auth_parts) == 2:
+                    country_and_after = auth_parts[1].split(':', 1)
+                    if len(country_and_after) == 2:
+                        new_auth = f"{auth_parts[0]}-country-{country}:{country_and_after[1]}"
+                        proxy = f"{new_auth}@{host_part}"
+            else:
+                # Add country before the password
+                auth_parts = auth_part.split(':')
+                if len(auth_parts) >= 2:
+                    password_idx = len(auth_parts) - 1
+                    auth_parts[password_idx] = f"country-{country}:{auth_parts[password_idx].split(':')[-1]}"
+                    proxy = f"{':'.join(auth_parts)}@{host_part}"
+    return proxy
 
 def get_proxy(country=None):
     """
@@ -152,72 +140,24 @@ def get_proxy(country=None):
     # Use country from config if not specified in function call
     if country is None and PROXY_COUNTRY:
         country = PROXY_COUNTRY
-        
-    state_file = os.path.join(DATA_DIR, "state", "proxy_state.json")
-    
-    # Make sure the directory exists
-    os.makedirs(os.path.dirname(state_file), exist_ok=True)
     
-    # Load proxy state
-    if os.path.exists(state_file):
-        try:
-            with open(state_file) as f:
-                state = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            state = {"last_index": -1, "proxy_states": {}}
-    else:
-        state = {"last_index": -1, "proxy_states": {}}
+    proxies = [apply_proxy_country(base_proxy, country) for base_proxy in PROXY_SERVERS]
+    state = get_crawl_state()
     
-    # Find the next available proxy
-    for i in range(len(PROXY_SERVERS)):
-        idx = (state["last_index"] + i + 1) % len(PROXY_SERVERS)
-        base_proxy = PROXY_SERVERS[idx]
-        
-        # If country is specified, modify the proxy URL
-        proxy = base_proxy
-        if country and "zone-residential" in base_proxy:
-            # Extract components from the proxy URL
-            parts = base_proxy.split('@')
-            if len(parts) == 2:
-                auth_part = parts[0]
-                host_part = parts[1]
-                
-                # Check if country parameter is already in the auth part
-                if "country-" in auth_part:
-                    # Replace existing country
-                    auth_parts = auth_part.split('-country-')
-                    if len(auth_parts) == 2:
-                        country_and_after = auth_parts[1].split(':', 1)
-                        if len(country_and_after) == 2:
-                            new_auth = f"{auth_parts[0]}-country-{country}:{country_and_after[1]}"
-                            proxy = f"{new_auth}@{host_part}"
-                else:
-                    # Add country before the password
-                    auth_parts = auth_part.split(':')
-                    if len(auth_parts) >= 2:
-                        password_idx = len(auth_parts) - 1
-                        auth_parts[password_idx] = f"country-{country}:{auth_parts[password_idx].split(':')[-1]}"
-                        proxy = f"{':'.join(auth_parts)}@{host_part}"
-        
-        # Skip proxies that are in cooldown
-        proxy_state = state["proxy_states"].get(proxy, {})
-        next_available_str = proxy_state.get("next_available")
+    # Find the next available proxy; failed tests put a proxy in cooldown
+    for _ in range(len(proxies)):
+        proxy = state.next_proxy(proxies)
+        if proxy is None:
+            break
         
-        if not next_available_str or datetime.now().isoformat() >= next_available_str:
-            # Update state
-            state["last_index"] = idx
-            with open(state_file, "w") as f:
-                json.dump(state, f)
-            
-            # Test the proxy before returning
-            if test_proxy(proxy):
-                logger.info(f"Using proxy: {proxy}")
-                return proxy
-            else:
-                # Mark as in cooldown if test fails
-                mark_proxy_cooldown(proxy, cooldown_minutes=30)
-                logger.warning(f"Proxy test failed, marking for cooldown: {proxy}")
-                continue
+        # Test the proxy before returning
+        if test_proxy(proxy):
+            logger.info(f"Using proxy: {proxy}")
+            return proxy
+        else:
+            # Mark as in cooldown if test fails
+            mark_proxy_cooldown(proxy, cooldown_minutes=30)
+            logger.warning(f"Proxy test failed, marking for cooldown: {proxy}")
     
     # If all proxies are in cooldown, log warning and return None
     logger.warning("All proxies are in cooldown or not working, proceeding without proxy")
@@ -260,32 +200,9 @@ def mark_proxy_cooldown(proxy, cooldown_minutes=PROXY_COOLDOWN_MINUTES):
     """Mark a proxy as in cooldown after a failure"""
     if not proxy:
         return
-        
-    state_file = os.path.join(DATA_DIR, "state", "proxy_state.json")
-    if os.path.exists(state_file):
-        try:
-            with open(state_file) as f:
-                state = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            state = {"last_index": -1, "proxy_states": {}}
-    else:
-        state = {"last_index": -1, "proxy_states": {}}
-    
-    # Set cooldown period
-    next_available = (datetime.now() + timedelta(minutes=cooldown_minutes)).isoformat()
-    
-    # Update proxy state
-    if proxy not in state["proxy_states"]:
-        state["proxy_states"][proxy] = {}
-        
-    state["proxy_states"][proxy]["next_available"] = next_available
-    state["proxy_states"][proxy]["last_failure"] = datetime.now().isoformat()
     
-    # Save state
-    with open(state_file, "w") as f:
-        json.dump(state, f)
-        
-    logger.info(f"Proxy {proxy} marked for cooldown until {next_available}")
+    next_available = get_crawl_state().mark_proxy_cooldown(proxy, cooldown_minutes)
+    logger.info(f"Proxy {proxy} marked for cooldown until {datetime.fromtimestamp(next_available).isoformat()}")
 
 def login_with_session(L, username, password):
     """Login with proper session management and error handling"""
@@ -406,6 +323,9 @@ def create_instaloader_instance(use_login=True, account=None, proxy=None, force_
             except Exception as e:
                 logger.error(f"Login failed for {username}: {str(e)}")
     
+    # Installed last: logging in replaces the session
+    install_http_cache(loader.context._session)
+    
     return loader
 
 def retry_with_backoff(func, max_retries=3, initial_delay=5):
@@ -423,17 +343,152 @@ def retry_with_backoff(func, max_retries=3, initial_delay=5):
             time.sleep(wait_time)
     return None
 
-def download_from_instagram(accounts=None, force_refresh=False, use_auth=True):
+def get_download_identities(use_auth=True):
+    """
+    Build the (proxy, login) identities available for concurrent crawling
+    
+    Each identity gets its own request budget of one request per
+    DOWNLOAD_DELAY seconds.
+    
+    Args:
+        use_auth: Whether identities log in
+        
+    Returns:
+        List of download_scheduler.Identity
+    """
+    proxies = [apply_proxy_country(proxy, PROXY_COUNTRY) for proxy in PROXY_SERVERS]
+    logins = []
+    if use_auth:
+        logins = list(INSTAGRAM_ACCOUNT_ROTATION) or (
+            [{"username": INSTAGRAM_USERNAME, "password": INSTAGRAM_PASSWORD}] if INSTAGRAM_USERNAME else []
+        )
+    return build_identities(proxies, logins, rate=1.0 / max(DOWNLOAD_DELAY, 1))
+
+def crawl_account(account_name, identity, force_refresh=False, budget=None):
+    """
+    Download new videos of one account using a scheduled identity
+    
+    Args:
+        account_name: Target account name
+        identity: download_scheduler.Identity whose proxy and login are used
+        force_refresh: If True, re-download videos even if they already exist
+        budget: Download limit shared with the other workers
+        
+    Returns:
+        Number of new videos downloaded
+        
+    Raises:
+        Exception: When the profile cannot be loaded (the identity is cooled down)
+    """
+    L = create_instaloader_instance(use_login=identity.login is not None, account=identity.login,
+                                    proxy=identity.proxy, force_refresh=force_refresh)
+    
+    identity.throttle()
+    profile = instaloader.Profile.from_username(L.context, account_name)
+    
+    # Mark this account as processed now (whether it succeeds or fails)
+    mark_account_processed(account_name)
+    
+    if profile.is_private and identity.login is None:
+        logger.warning(f"Account {account_name} is private and this identity is anonymous, skipping")
+        return 0
+    
+    # Check if this account has any new posts since last download
+    if not force_refresh:
+        identity.throttle()
+        if not has_new_posts(profile, account_name):
+            logger.info(f"Skipping {account_name} - no new posts since last download")
+            return 0
+    
+    success, processed = process_posts(L, profile, account_name, [], budget.used, budget.used,
+                                       force_refresh=force_refresh, throttle=identity.throttle, budget=budget)
+    if not success:
+        logger.warning(f"Issue processing posts from {account_name}")
+    elif processed > 0:
+        logger.info(f"Successfully downloaded {processed} new videos from {account_name}")
+    return processed
+
+def log_media_download_stats():
+    """Log bandwidth and retries of the direct video downloads of this run"""
+    stats = get_media_downloader().stats.snapshot()
+    if stats['files'] or stats['failures']:
+        logger.info(f"Direct video downloads: {stats['files']} files, {stats['failures']} failed, "
+                    f"{stats['bytes'] / 1e6:.1f} MB at {stats['bandwidth_mbps']} Mbit/s "
+                    f"({stats['per_stream_mbps']} Mbit/s per stream), {stats['resumes']} resumed, "
+                    f"{stats['retries']} retries")
+    return stats
+
+def download_from_instagram_parallel(account_names, identities, force_refresh=False):
+    """
+    Download from several accounts at once, one account per identity at a time
+    
+    Args:
+        account_names: Accounts to crawl (already filtered for due refreshes)
+        identities: Identities from get_download_identities
+        force_refresh: If True, re-download videos even if they already exist
+        
+    Returns:
+        Tuple (success_count, downloaded_count, failed_accounts): videos from
+        the accounts crawled to the end, and all videos downloaded against
+        MAX_DOWNLOADS_PER_RUN (including those of accounts that failed later)
+    """
+    budget = DownloadBudget(MAX_DOWNLOADS_PER_RUN)
+    scheduler = DownloadScheduler(identities, budget=budget)
+    logger.info(f"Crawling {len(account_names)} accounts on {len(identities)} identities in parallel")
+    
+    run = scheduler.run(
+        account_names,
+        lambda account_name, identity: crawl_account(account_name, identity, force_refresh, budget)
+    )
+    
+    downloaded = sum(run["results"].values())
+    failed_accounts = list(run["failures"])
+    for identity_key, stats in run["identities"].items():
+        logger.info(f"Identity {identity_key}: {stats['requests']} requests, "
+                    f"{stats['waited_seconds']}s paced, {stats['failures']} failures")
+    logger.info(f"Download session completed. Downloaded {downloaded} videos from "
+                f"{len(run['results'])}/{len(account_names)} accounts in {run['elapsed_seconds']}s")
+    log_media_download_stats()
+    log_http_cache_stats()
+    if failed_accounts:
+        logger.warning(f"Failed to process {len(failed_accounts)} accounts: {', '.join(failed_accounts)}")
+    return downloaded, budget.used, failed_accounts
+
+def download_from_instagram(accounts=None, force_refresh=False, use_auth=True, parallel=True):
     """
     Download content from Instagram accounts with proper rate limiting
     and proxy rotation
     
+    With several (proxy, login) identities available and parallel enabled,
+    accounts are crawled concurrently, each identity paced by its own
+    token bucket; otherwise accounts are processed one after another.
+    
     Args:
         accounts: List of accounts to download from. Uses config.INSTAGRAM_ACCOUNTS if None.
         force_refresh: If True, ignore refresh schedule and download from all accounts.
         use_auth: If True, use authenticated session which helps with API limits.
+        parallel: If True, crawl accounts concurrently when more than one identity exists.
     """
     os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    get_media_downloader().stats.reset()
+    
+    if parallel:
+        identities = get_download_identities(use_auth)
+        if len(identities) > 1:
+            account_names = [
+                account_info.get("username") if isinstance(account_info, dict) else account_info
+                for account_info in (INSTAGRAM_ACCOUNTS if accounts is None else accounts)
+            ]
+            account_names = [name for name in account_names if name]
+            if not force_refresh:
+                due_accounts = get_due_accounts(account_names)
+                skipped = [name for name in account_names if name not in due_accounts]
+                if skipped:
+                    logger.info(f"Skipping {len(skipped)} accounts not due for refresh")
+                account_names = [name for name in account_names if name in due_accounts]
+            random.shuffle(account_names)
+            return download_from_instagram_parallel(account_names, identities, force_refresh)
+
     # Make these variables mutable by wrapping in a list
     download_stats = {
         'downloaded_count': 0,
@@ -451,6 +506,14 @@ def download_from_instagram(accounts=None, force_refresh=False, use_auth=True):
     accounts_to_process = list(accounts)
     random.shuffle(accounts_to_process)
     
+    # One query answers which accounts are due for refresh
+    due_accounts = set()
+    if not force_refresh:
+        due_accounts = get_due_accounts([
+            account_info.get("username") if isinstance(account_info, dict) else account_info
+            for account_info in accounts_to_process
+        ])
+    
     # Process each target account
     for account_idx, account_info in enumerate(accounts_to_process):
         # Extract the account name depending on the type
@@ -469,7 +532,7 @@ def download_from_instagram(accounts=None, force_refresh=False, use_auth=True):
             break
             
         # Skip accounts that are not due for refresh, unless force_refresh is True
-        if not force_refresh and not is_account_due_for_refresh(account_name):
+        if not force_refresh and account_name not in due_accounts:
             logger.info(f"Skipping account {account_name} - not due for refresh")
             continue
             
@@ -583,29 +646,45 @@ def download_from_instagram(accounts=None, force_refresh=False, use_auth=True):
     
     # Log summary
     logger.info(f"Download session completed. Downloaded {download_stats['success_count']} videos from {len(accounts_to_process) - len(failed_accounts)}/{len(accounts_to_process)} accounts")
+    log_media_download_stats()
+    log_http_cache_stats()
     
     if failed_accounts:
         logger.warning(f"Failed to process {len(failed_accounts)} accounts: {', '.join(str(a) for a in failed_accounts)}")
     
     return download_stats['success_count'], download_stats['downloaded_count'], failed_accounts
 
-def get_paginated_posts(profile, account_name, L, fetch_limit=500):
+def get_paginated_posts(profile, account_name, L, fetch_limit=500, throttle=None, cursor=None):
     """
     Get posts from a profile with proper pagination to work around Instagram API limitations.
     
+    With a high-water mark, pagination stops at the first (non-pinned) post
+    that is not newer than it, so a refresh costs requests in proportion to
+    the new posts rather than to the account's history.
+    
     Args:
         profile: Instagram profile object
         account_name: Name of the account
         L: Instaloader instance
         fetch_limit: Maximum number of posts to fetch (default 500)
+        throttle: Paces requests of a scheduled identity (replaces the fixed delays)
+        cursor: High-water mark from get_post_cursor (None walks up to fetch_limit posts)
         
     Returns:
-        List of post objects
+        Tuple (posts, complete): list of post objects, and whether pagination
+        reached the high-water mark or the end of the feed. complete is False
+        when it stopped early (an Instagram error or fetch_limit), so posts
+        between the mark and the oldest post returned may be missing
     """
     posts_list = []
     count = 0
+    complete = False
     
-    logger.info(f"Starting paginated retrieval of posts for {account_name}")
+    if cursor is not None:
+        logger.info(f"Starting incremental retrieval of posts for {account_name} "
+                    f"(newer than {datetime.fromtimestamp(cursor['newest_timestamp'], timezone.utc).isoformat()})")
+    else:
+        logger.info(f"Starting paginated retrieval of posts for {account_name}")
     
     try:
         # Get the initial posts generator
@@ -625,14 +704,24 @@ def get_paginated_posts(profile, account_name, L, fetch_limit=500):
                 logger.info(f"Retrieving page {page_number} of posts for {account_name}")
                 
                 # Try to get a single page of posts
+                reached_known = False
                 for _ in range(posts_per_page):
                     try:
                         post = next(posts_iterator)
-                        current_page_posts.append(post)
-                        batch_count += 1
                     except StopIteration:
                         logger.info(f"Reached the end of posts at count {count}")
+                        complete = True
                         break
+                    if not is_new_post(post, cursor):
+                        # Pinned posts sit above newer ones; anything else is where we stopped last time
+                        if getattr(post, 'is_pinned', False):
+                            continue
+                        logger.info(f"Reached already seen post {post.shortcode}, stopping pagination")
+                        reached_known = True
+                        complete = True
+                        break
+                    current_page_posts.append(post)
+                    batch_count += 1
                 
                 # If we got any posts in this batch
                 if batch_count > 0:
@@ -640,14 +729,23 @@ def get_paginated_posts(profile, account_name, L, fetch_limit=500):
                     posts_list.extend(current_page_posts)
                     count += batch_count
                     
+                    if reached_known:
+                        break
+                    
                     # Add a significant delay between pages to avoid rate limits
                     if count < fetch_limit:
-                        delay = random.uniform(3, 5)
-                        logger.info(f"Pausing for {delay:.1f} seconds before next page to avoid rate limits")
-                        time.sleep(delay)
+                        if throttle:
+                            throttle()
+                        else:
+                            delay = random.uniform(3, 5)
+                            logger.info(f"Pausing for {delay:.1f} seconds before next page to avoid rate limits")
+                            time.sleep(delay)
                         page_number += 1
                 else:
-                    logger.info(f"No more posts found after retrieving {count} posts")
+                    if reached_known:
+                        logger.info(f"No new posts for {account_name}")
+                    else:
+                        logger.info(f"No more posts found after retrieving {count} posts")
                     break
                 
             except Exception as e:
@@ -683,7 +781,10 @@ def get_paginated_posts(profile, account_name, L, fetch_limit=500):
                                                     count += 1
                                                     
                                                 # Add a small delay between requests
-                                                time.sleep(random.uniform(1, 2))
+                                                if throttle:
+                                                    throttle()
+                                                else:
+                                                    time.sleep(random.uniform(1, 2))
                                             except Exception as post_error:
                                                 logger.warning(f"Could not load post from shortcode {shortcode}: {str(post_error)}")
                                     except Exception:
@@ -700,10 +801,30 @@ def get_paginated_posts(profile, account_name, L, fetch_limit=500):
     except Exception as e:
         logger.error(f"Error initializing post retrieval: {str(e)}")
     
-    logger.info(f"Completed post retrieval with {len(posts_list)} posts")
-    return posts_list
+    if complete:
+        logger.info(f"Completed post retrieval with {len(posts_list)} posts")
+    else:
+        logger.warning(f"Post retrieval for {account_name} stopped early with {len(posts_list)} posts")
+    return posts_list, complete
+
+def save_post_metadata(post, account_name, metadata_dir):
+    """Save post metadata to a separate JSON file"""
+    metadata = {
+        'shortcode': post.shortcode,
+        'date_utc': post.date_utc.strftime('%Y-%m-%d %H:%M:%S'),
+        'caption': post.caption if post.caption else '',
+        'likes': post.likes,
+        'comments': post.comments,
+        'url': f"https://www.instagram.com/p/{post.shortcode}/",
+        'account': account_name
+    }
+    
+    metadata_path = os.path.join(metadata_dir, f"{post.shortcode}.json")
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=4)
 
-def process_posts(L, profile, account_name, posts, downloaded_count, success_count, custom_delay=DOWNLOAD_DELAY, force_refresh=False):
+def process_posts(L, profile, account_name, posts, downloaded_count, success_count, custom_delay=DOWNLOAD_DELAY, force_refresh=False,
+                  throttle=None, budget=None):
     """Process posts for an account
     
     Args:
@@ -715,6 +836,8 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
         success_count: Current count of successfully downloaded videos (not modified by this function)
         custom_delay: Custom delay between downloads (defaults to DOWNLOAD_DELAY)
         force_refresh: If True, re-download videos even if they already exist (defaults to False)
+        throttle: Paces requests of a scheduled identity (replaces the fixed delays)
+        budget: Download limit shared with other concurrently crawled accounts
         
     Returns:
         Tuple (success, new_posts_processed)
@@ -725,6 +848,8 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
     # Process posts
     new_posts_processed = 0
     already_exists_count = 0
+    # (post, future) of direct downloads running on the download pool
+    pending_downloads = []
     
     # Create account directory
     account_dir = os.path.join(DOWNLOAD_DIR, account_name)
@@ -735,8 +860,14 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
     os.makedirs(metadata_dir, exist_ok=True)
     
     try:
-        # Use our new paginated function instead of converting directly
-        posts_list = get_paginated_posts(profile, account_name, L, fetch_limit=MAX_DOWNLOADS_PER_RUN * 10)
+        # Use our new paginated function instead of converting directly; a refresh
+        # only walks back to the newest post seen by the last complete crawl
+        cursor = None if force_refresh else get_post_cursor(account_name)
+        posts_list, complete = get_paginated_posts(profile, account_name, L, fetch_limit=MAX_DOWNLOADS_PER_RUN * 10,
+                                                   throttle=throttle, cursor=cursor)
+        # Cleared when a post is left behind, so the next crawl sees it again; a
+        # retrieval that stopped before the mark leaves it where it is, since moving
+        # it would skip the posts that were not fetched
         
         # Log how many posts we found
         logger.info(f"Total posts retrieved for processing: {len(posts_list)}")
@@ -744,9 +875,12 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
         # Now process the posts list
         for post in posts_list:
             try:
-                # Check if we've reached the maximum downloads limit (using downloaded_count as reference)
-                if downloaded_count + new_posts_processed >= MAX_DOWNLOADS_PER_RUN:
+                # Check if we've reached the maximum downloads limit (using downloaded_count as reference;
+                # queued direct downloads count toward it)
+                queued = len(pending_downloads)
+                if (budget.remaining() <= queued if budget else downloaded_count + new_posts_processed + queued >= MAX_DOWNLOADS_PER_RUN):
                     logger.info(f"Reached maximum download limit of {MAX_DOWNLOADS_PER_RUN}")
+                    complete = False
                     break
                 
                 # Skip if it's not a video
@@ -795,8 +929,7 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
                         # Also check for and remove JSON files
                         for json_path in [
                             os.path.join(account_dir, f"{date_utc_str}_{post.shortcode}.json"),
-                            os.path.join(account_dir, f"{date_utc_str}_UTC.json"),
-                            f"/home/adi235/MistralOCR/Instagram-Scraper/∕home∕adi235∕MistralOCR∕Instagram-Scraper∕data∕downloads∕{account_name}/{date_utc_str}_UTC.json"
+                            os.path.join(account_dir, f"{date_utc_str}_UTC.json")
                         ]:
                             if os.path.exists(json_path):
                                 os.remove(json_path)
@@ -814,27 +947,12 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
                     
                     # When force_refresh is True and the file exists, use our custom download function
                     if force_refresh and os.path.exists(video_path):
-                        # Use our custom direct download function
-                        success = download_video_directly(post, account_dir, post.shortcode, account_name)
-                        if success:
-                            new_posts_processed += 1
-                            
-                            # Save post metadata to a separate JSON file
-                            metadata = {
-                                'shortcode': post.shortcode,
-                                'date_utc': post.date_utc.strftime('%Y-%m-%d %H:%M:%S'),
-                                'caption': post.caption if post.caption else '',
-                                'likes': post.likes,
-                                'comments': post.comments,
-                                'url': f"https://www.instagram.com/p/{post.shortcode}/",
-                                'account': account_name
-                            }
-                            
-                            metadata_path = os.path.join(metadata_dir, f"{post.shortcode}.json")
-                            with open(metadata_path, 'w', encoding='utf-8') as f:
-                                json.dump(metadata, f, ensure_ascii=False, indent=4)
-                                
-                            logger.info(f"Successfully re-downloaded video for {post.shortcode}")
+                        # Queue it on the resumable download pool; results are collected below
+                        if throttle:
+                            throttle()
+                        future = submit_video_download(post, account_dir, post.shortcode, account_name)
+                        if future is not None:
+                            pending_downloads.append((post, future))
                         else:
                             logger.warning(f"Failed to re-download video for {post.shortcode}")
                             
@@ -851,16 +969,22 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
                             os.remove(os.path.join(account_dir, f"{post.date_utc.strftime('%Y-%m-%d_%H-%M-%S')}_UTC.mp4"))
                             
                         # Now perform the download
+                        if throttle:
+                            throttle()
                         L.download_post(post, target=account_dir)
                     except Exception as download_error:
                         logger.error(f"Error in download operation: {str(download_error)}")
                         # If the download failed, mark it as not creating a new file
                         new_file_count = prev_file_count
+                        complete = False
                     else:
                         # Check if the file was created using our helper function
                         was_created, new_path = check_file_existence(account_dir, post.date_utc.strftime('%Y-%m-%d_%H-%M-%S'), post.shortcode, account_name)
                         if was_created:
                             new_posts_processed += 1
+                            if budget:
+                                budget.consume()
+                            store_downloaded_video(new_path, account_name, post.shortcode)
                             logger.info(f"Successfully downloaded NEW video: {post.shortcode} at {new_path}")
                         else:
                             logger.warning(f"Download operation didn't create a new file for {post.shortcode}")
@@ -869,33 +993,45 @@ def process_posts(L, profile, account_name, posts, downloaded_count, success_cou
                             continue
                     
                     # Save post metadata to a separate JSON file
-                    metadata = {
-                        'shortcode': post.shortcode,
-                        'date_utc': post.date_utc.strftime('%Y-%m-%d %H:%M:%S'),
-                        'caption': post.caption if post.caption else '',
-                        'likes': post.likes,
-                        'comments': post.comments,
-                        'url': f"https://www.instagram.com/p/{post.shortcode}/",
-                        'account': account_name
-                    }
-                    
-                    metadata_path = os.path.join(metadata_dir, f"{post.shortcode}.json")
-                    with open(metadata_path, 'w', encoding='utf-8') as f:
-                        json.dump(metadata, f, ensure_ascii=False, indent=4)
+                    save_post_metadata(post, account_name, metadata_dir)
                     
                     # Respect Instagram's rate limits by adding a delay between downloads
-                    time.sleep(custom_delay)
+                    # (scheduled identities are paced by their token bucket instead)
+                    if not throttle:
+                        time.sleep(custom_delay)
                     
                 except Exception as e:
                     logger.error(f"Error downloading post {post.shortcode} from {account_name}: {str(e)}")
+                    complete = False
                     # Continue with the next post despite this error
                     continue
             
             except Exception as post_error:
                 logger.error(f"Error processing post from {account_name}: {str(post_error)}")
+                complete = False
                 # Continue with the next post
                 continue
         
+        # Collect the direct downloads of this account
+        for post, future in pending_downloads:
+            try:
+                downloaded = future.result()
+            except Exception as e:
+                logger.error(f"Error re-downloading video for {post.shortcode}: {str(e)}")
+                downloaded = False
+            if downloaded:
+                new_posts_processed += 1
+                if budget:
+                    budget.consume()
+                save_post_metadata(post, account_name, metadata_dir)
+                logger.info(f"Successfully re-downloaded video for {post.shortcode}")
+            else:
+                logger.warning(f"Failed to re-download video for {post.shortcode}")
+                complete = False
+        
+        if complete:
+            advance_post_cursor(account_name, posts_list)
+        
         # Add total counts to the logging for this account
         if new_posts_processed > 0:
             logger.info(f"Actually processed {len(posts_list)} posts from {account_name}, downloaded {new_posts_processed} NEW videos")
@@ -952,216 +1088,72 @@ def get_random_user_agent():
 
 def schedule_refresh(username, backoff_minutes=60):
     """Schedule a refresh attempt with exponential backoff"""
-    state_file = os.path.join(DATA_DIR, "refresh_state.json")
-    
-    # Load or initialize state
-    if os.path.exists(state_file):
-        try:
-            with open(state_file, 'r') as f:
-                state = json.load(f)
-        except json.JSONDecodeError:
-            state = {"accounts": {}}
-    else:
-        state = {"accounts": {}}
-    
-    # Get account state or initialize
-    account_state = state["accounts"].get(username, {
-        "last_attempt": None,
-        "backoff_minutes": backoff_minutes,
-        "consecutive_failures": 0
-    })
-    
-    # Update for next attempt
-    now = datetime.now().isoformat()
-    account_state["last_attempt"] = now
-    
-    if account_state["consecutive_failures"] > 0:
-        # Exponential backoff
-        account_state["backoff_minutes"] *= 2
-    
-    # Schedule next attempt
-    next_attempt = (datetime.now() + 
-                   timedelta(minutes=account_state["backoff_minutes"]))
-    account_state["next_attempt"] = next_attempt.isoformat()
-    
-    # Save state
-    state["accounts"][username] = account_state
-    with open(state_file, 'w') as f:
-        json.dump(state, f)
-    
+    next_attempt = datetime.fromtimestamp(get_crawl_state().schedule_refresh(username, backoff_minutes))
     logger.info(f"Scheduled next refresh for {username} at {next_attempt.isoformat()}")
     return next_attempt.isoformat()
 
 def should_refresh_account(username):
     """Check if an account is due for refresh based on backoff schedule"""
-    state_file = os.path.join(DATA_DIR, "refresh_state.json")
-    
-    # If no state file, always refresh
-    if not os.path.exists(state_file):
-        return True
-        
     try:
-        with open(state_file, 'r') as f:
-            state = json.load(f)
-            
-        # If account not in state, always refresh
-        if username not in state.get("accounts", {}):
-            return True
-            
-        account_state = state["accounts"][username]
-        next_attempt_str = account_state.get("next_attempt")
-        
-        # If no next attempt scheduled, always refresh
-        if not next_attempt_str:
-            return True
-            
-        # Parse next attempt time
-        next_attempt = datetime.fromisoformat(next_attempt_str)
-        
-        # Check if we're past the scheduled time
-        return datetime.now() >= next_attempt
-        
-    except Exception as e:
+        return get_crawl_state().should_refresh(username)
+    except sqlite3.Error as e:
         logger.error(f"Error checking refresh schedule: {str(e)}")
         return True  # Default to allowing refresh on error
 
+def get_due_accounts(account_names):
+    """
+    Accounts due for refresh, answered by one indexed query
+    
+    Args:
+        account_names: Candidate account names
+        
+    Returns:
+        Set of the due account names
+    """
+    try:
+        return set(get_crawl_state().due_accounts(account_names))
+    except sqlite3.Error as e:
+        logger.error(f"Error checking refresh status: {str(e)}")
+        # Default to allowing refresh on error
+        return set(account_names)
+
 def is_account_due_for_refresh(account_name):
     """Check if an account is due for refresh based on its last processing time"""
-    # Path to the account state file
-    account_state_file = os.path.join(DATA_DIR, "logs", "account_states.json")
-    
-    # Default: account is due for refresh
-    if not os.path.exists(account_state_file):
-        os.makedirs(os.path.dirname(account_state_file), exist_ok=True)
-        return True
-    
     try:
-        # Load account states
-        with open(account_state_file, 'r') as f:
-            account_states = json.load(f)
-        
-        # Check if account exists in states
-        if account_name not in account_states:
-            return True
-        
-        account_state = account_states[account_name]
-        last_processed = account_state.get('last_processed')
-        
-        # If no last processed time, account is due for refresh
-        if not last_processed:
+        state = get_crawl_state()
+        if state.is_account_due(account_name):
             return True
         
-        # Check if account is in cooldown
-        cooldown_until = account_state.get('cooldown_until')
-        if cooldown_until:
-            cooldown_time = datetime.fromisoformat(cooldown_until)
-            if datetime.now() < cooldown_time:
-                logger.info(f"Account {account_name} is in cooldown until {cooldown_until}")
-                return False
-        
-        # Check if enough time has passed since last processing
-        last_processed_time = datetime.fromisoformat(last_processed)
-        refresh_interval = account_state.get('refresh_interval', 24)  # Default: 24 hours
-        
-        next_refresh_time = last_processed_time + timedelta(hours=refresh_interval)
-        
-        if datetime.now() < next_refresh_time:
-            logger.info(f"Account {account_name} not due for refresh until {next_refresh_time.isoformat()}")
-            return False
-            
-        return True
+        account_state = state.get_account(account_name)
+        due_at = datetime.fromtimestamp(account_state['due_at']).isoformat()
+        if account_state['cooldown_until'] and account_state['cooldown_until'] >= account_state['due_at']:
+            logger.info(f"Account {account_name} is in cooldown until {due_at}")
+        else:
+            logger.info(f"Account {account_name} not due for refresh until {due_at}")
+        return False
         
-    except Exception as e:
+    except sqlite3.Error as e:
         logger.error(f"Error checking refresh status for {account_name}: {str(e)}")
         # Default to allowing refresh on error
         return True
 
 def mark_account_processed(account_name, success=True):
     """Mark an account as processed and update its refresh schedule"""
-    # Path to the account state file
-    account_state_file = os.path.join(DATA_DIR, "logs", "account_states.json")
-    
     try:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(account_state_file), exist_ok=True)
-        
-        # Load existing account states or create new dict
-        if os.path.exists(account_state_file):
-            with open(account_state_file, 'r') as f:
-                account_states = json.load(f)
-        else:
-            account_states = {}
-        
-        # Get or create account state
-        if account_name not in account_states:
-            account_states[account_name] = {}
-        
-        # Update account state
-        account_states[account_name]['last_processed'] = datetime.now().isoformat()
-        
-        # Update success/failure count
-        if success:
-            account_states[account_name]['consecutive_failures'] = 0
-            # Reset refresh interval to default on success
-            account_states[account_name]['refresh_interval'] = 24  # Default: 24 hours
-        else:
-            # Increment failure count
-            failures = account_states[account_name].get('consecutive_failures', 0) + 1
-            account_states[account_name]['consecutive_failures'] = failures
-            
-            # Implement exponential backoff for failures
-            backoff_hours = min(24 * (2 ** (failures - 1)), 168)  # Max 1 week
-            account_states[account_name]['refresh_interval'] = backoff_hours
-            
-            # Set cooldown period for repeated failures
-            if failures > 2:
-                cooldown_minutes = ACCOUNT_COOLDOWN_MINUTES * (2 ** (failures - 3))  # Exponential cooldown
-                cooldown_until = (datetime.now() + timedelta(minutes=cooldown_minutes)).isoformat()
-                account_states[account_name]['cooldown_until'] = cooldown_until
-                logger.warning(f"Account {account_name} in cooldown until {cooldown_until} after {failures} failures")
-        
-        # Save updated account states
-        with open(account_state_file, 'w') as f:
-            json.dump(account_states, f, indent=4)
-            
-    except Exception as e:
+        get_crawl_state().mark_account_processed(account_name, success,
+                                                 base_cooldown_minutes=ACCOUNT_COOLDOWN_MINUTES)
+    except sqlite3.Error as e:
         logger.error(f"Error marking account {account_name} as processed: {str(e)}")
 
 def mark_account_cooldown(username, cooldown_minutes=ACCOUNT_COOLDOWN_MINUTES):
     """Mark an account for cooldown after a failure"""
-    # Path to the account state file
-    account_state_file = os.path.join(DATA_DIR, "logs", "account_states.json")
+    if not username:
+        return
     
     try:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(account_state_file), exist_ok=True)
-        
-        # Load existing account states or create new dict
-        if os.path.exists(account_state_file):
-            with open(account_state_file, 'r') as f:
-                account_states = json.load(f)
-        else:
-            account_states = {}
-        
-        # Get or create account state
-        if username not in account_states:
-            account_states[username] = {}
-        
-        # Set cooldown period
-        cooldown_until = (datetime.now() + timedelta(minutes=cooldown_minutes)).isoformat()
-        account_states[username]['cooldown_until'] = cooldown_until
-        
-        # Increment failure count
-        failures = account_states[username].get('consecutive_failures', 0) + 1
-        account_states[username]['consecutive_failures'] = failures
-        
-        logger.warning(f"Account {username} in cooldown until {cooldown_until}")
-        
-        # Save updated account states
-        with open(account_state_file, 'w') as f:
-            json.dump(account_states, f, indent=4)
-            
-    except Exception as e:
+        cooldown_until = get_crawl_state().mark_account_cooldown(username, cooldown_minutes)
+        logger.warning(f"Account {username} in cooldown until {datetime.fromtimestamp(cooldown_until).isoformat()}")
+    except sqlite3.Error as e:
         logger.error(f"Error marking account {username} for cooldown: {str(e)}")
 
 def get_latest_downloaded_post_date(account_name):
@@ -1172,7 +1164,7 @@ def get_latest_downloaded_post_date(account_name):
         account_name: Name of the Instagram account
         
     Returns:
-        datetime object of the latest post, or None if no posts
+        datetime object (UTC) of the latest post, or None if no posts
     """
     account_dir = os.path.join(DOWNLOAD_DIR, account_name)
     
@@ -1189,13 +1181,15 @@ def get_latest_downloaded_post_date(account_name):
     dates = []
     for video_file in video_files:
         try:
-            # Extract the date part
-            date_str = video_file.split('_')[0]
-            if len(date_str) == 10:  # YYYY-MM-DD
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                dates.append(date_obj)
-        except Exception:
-            continue
+            # Extract the date and time part (the date alone for other names)
+            dates.append(datetime.strptime(video_file[:19], '%Y-%m-%d_%H-%M-%S'))
+        except ValueError:
+            try:
+                date_str = video_file.split('_')[0]
+                if len(date_str) == 10:  # YYYY-MM-DD
+                    dates.append(datetime.strptime(date_str, '%Y-%m-%d'))
+            except ValueError:
+                continue
             
     if not dates:
         return None
@@ -1203,10 +1197,63 @@ def get_latest_downloaded_post_date(account_name):
     # Return the most recent date
     return max(dates)
     
+def post_timestamp(post):
+    """Epoch seconds of a post's UTC date"""
+    return calendar.timegm(post.date_utc.utctimetuple())
+
+def get_post_cursor(account_name):
+    """
+    High-water mark of an account (newest post seen)
+    
+    Accounts crawled before the mark existed get one seeded from the
+    newest downloaded video file.
+    
+    Args:
+        account_name: Name of the Instagram account
+        
+    Returns:
+        Dictionary with newest_shortcode and newest_timestamp, or None for a new account
+    """
+    try:
+        state = get_crawl_state()
+        cursor = state.get_post_cursor(account_name)
+        if cursor is None:
+            latest = get_latest_downloaded_post_date(account_name)
+            if latest is not None:
+                state.advance_post_cursor(account_name, None, calendar.timegm(latest.timetuple()))
+                cursor = state.get_post_cursor(account_name)
+        return cursor
+    except sqlite3.Error as e:
+        logger.error(f"Error reading the post cursor of {account_name}: {str(e)}")
+        return None
+
+def advance_post_cursor(account_name, posts):
+    """Move an account's high-water mark to the newest of the given posts"""
+    if not posts:
+        return
+    newest = max(posts, key=post_timestamp)
+    try:
+        if get_crawl_state().advance_post_cursor(account_name, newest.shortcode, post_timestamp(newest)):
+            logger.info(f"High-water mark of {account_name} is now {newest.shortcode} ({newest.date_utc.isoformat()})")
+    except sqlite3.Error as e:
+        logger.error(f"Error updating the post cursor of {account_name}: {str(e)}")
+
+def is_new_post(post, cursor):
+    """Whether a post is newer than an account's high-water mark"""
+    if cursor is None:
+        return True
+    if post.shortcode == cursor['newest_shortcode']:
+        return False
+    return post_timestamp(post) > cursor['newest_timestamp']
+
 def has_new_posts(profile, account_name):
     """
     Check if an account has new posts since the last download
     
+    Peeks at the first page only: the first post that is not pinned
+    decides (pinned posts are out of date order, so they only count when
+    they are new themselves).
+    
     Args:
         profile: Profile object
         account_name: Name of the Instagram account
@@ -1214,166 +1261,176 @@ def has_new_posts(profile, account_name):
     Returns:
         Boolean indicating if new posts are available
     """
-    # Get the latest downloaded post date
-    latest_download_date = get_latest_downloaded_post_date(account_name)
+    cursor = get_post_cursor(account_name)
     
-    if latest_download_date is None:
-        # No posts downloaded yet, so definitely has new posts
+    if cursor is None:
+        # Nothing downloaded yet, so definitely has new posts
         return True
         
     try:
-        # Get the most recent post date from the profile
-        recent_posts = profile.get_posts()
-        
-        # Try to get the first post (most recent)
-        try:
-            most_recent_post = next(recent_posts)
-            most_recent_date = most_recent_post.date_utc.replace(tzinfo=None).date()
-            
-            # Compare dates
-            if most_recent_date > latest_download_date.date():
-                logger.info(f"New posts available for {account_name} since {latest_download_date.date()} (latest: {most_recent_date})")
+        for post in islice(profile.get_posts(), PEEK_POSTS):
+            if is_new_post(post, cursor):
+                logger.info(f"New posts available for {account_name} (latest: {post.date_utc.isoformat()})")
                 return True
-            else:
-                logger.info(f"No new posts for {account_name} since {latest_download_date.date()} (latest: {most_recent_date})")
-                return False
-                
-        except StopIteration:
-            # No posts on profile
-            logger.warning(f"No posts found for {account_name}")
-            return False
+            if not getattr(post, 'is_pinned', False):
+                break
+        
+        logger.info(f"No new posts for {account_name} since "
+                    f"{datetime.fromtimestamp(cursor['newest_timestamp'], timezone.utc).isoformat()}")
+        return False
             
     except Exception as e:
         logger.error(f"Error checking for new posts for {account_name}: {str(e)}")
         # Default to True to trigger a check
         return True
 
-def download_video_directly(post, account_dir, shortcode, account_name=None):
+def submit_video_download(post, account_dir, shortcode, account_name=None):
     """
-    Download a video directly from a post, bypassing Instaloader's file existence checks.
+    Queue a direct video download on the shared resumable download pool,
+    bypassing Instaloader's file existence checks.
+    
+    The video is streamed into a .part file (resumed by the next attempt
+    after an interruption) and only renamed into place once complete.
     
     Args:
         post: Instagram post object
         account_dir: Directory to save the video
         shortcode: Post shortcode
-        account_name: Optional account name for special path
+        account_name: Optional account name (defaults to the directory name)
         
     Returns:
-        bool: True if download was successful, False otherwise
+        Future resolving to True if the download was successful, or None if the post has no video URL
     """
-    try:
-        # Get the video URL from the post
-        if not hasattr(post, 'video_url'):
-            logger.error(f"Post {shortcode} does not have a video URL")
-            return False
-            
-        video_url = post.video_url
-        if not video_url:
-            logger.error(f"No video URL found for post {shortcode}")
-            return False
-            
-        # Get the date string in the format Instaloader uses
-        date_utc_str = post.date_utc.strftime('%Y-%m-%d_%H-%M-%S')
-        
-        # Get the account name from the account_dir if not provided
-        if account_name is None:
-            account_name = os.path.basename(account_dir)
-        
-        # Create the output filenames - let's try both formats
-        standard_video_path = os.path.join(account_dir, f"{date_utc_str}_{shortcode}.mp4")
-        utc_video_path = os.path.join(account_dir, f"{date_utc_str}_UTC.mp4")
-        
-        # Also handle the special path with Unicode slashes
-        special_path = f"/home/adi235/MistralOCR/Instagram-Scraper/∕home∕adi235∕MistralOCR∕Instagram-Scraper∕data∕downloads∕{account_name}/{date_utc_str}_UTC.mp4"
-        
-        # Let's use the UTC path as Instaloader does
-        video_path = utc_video_path
+    # Get the video URL from the post
+    if not hasattr(post, 'video_url'):
+        logger.error(f"Post {shortcode} does not have a video URL")
+        return None
         
-        # Download the video using requests
-        import requests
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
+    video_url = post.video_url
+    if not video_url:
+        logger.error(f"No video URL found for post {shortcode}")
+        return None
         
-        # Create a session with retry strategy
-        session = requests.Session()
-        retry = Retry(
-            total=5,
-            backoff_factor=0.5,
-            status_forcelist=[500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount('http://', adapter)
-        session.mount('https://', adapter)
+    # Get the date string in the format Instaloader uses
+    date_utc_str = post.date_utc.strftime('%Y-%m-%d_%H-%M-%S')
+    
+    # Get the account name from the account_dir if not provided
+    if account_name is None:
+        account_name = os.path.basename(account_dir)
+    
+    # Let's use the UTC path as Instaloader does
+    video_path = os.path.join(account_dir, f"{date_utc_str}_UTC.mp4")
+    
+    def finish(manifest, error):
+        if error is not None:
+            logger.error(f"Error downloading video directly for {shortcode}: {str(error)}")
+            return False
         
-        # Download the video
-        logger.info(f"Directly downloading video from URL for {shortcode} to {video_path}")
-        response = session.get(video_url, stream=True, timeout=30)
-        response.raise_for_status()
+        store_downloaded_video(video_path, account_name, shortcode)
         
-        # Save the video
-        with open(video_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-                
-        # Also try saving to the special path
-        try:
-            # Ensure the directory exists
-            os.makedirs(os.path.dirname(special_path), exist_ok=True)
-            # Copy the file to the special path
-            import shutil
-            shutil.copy2(video_path, special_path)
-            logger.info(f"Copied video to special path: {special_path}")
-        except Exception as e:
-            logger.warning(f"Couldn't copy to special path: {str(e)}")
-                
         # Verify the file was created using our helper function
         was_created, actual_path = check_file_existence(account_dir, date_utc_str, shortcode, account_name)
-        
         if was_created:
-            logger.info(f"Successfully downloaded video directly to: {actual_path}")
-            return True
+            logger.info(f"Successfully downloaded video directly to: {actual_path} "
+                        f"({manifest['size']} bytes, sha256 {manifest['sha256'][:12]})")
         else:
             logger.error(f"Failed to download video for {shortcode} - file not found after download")
-            return False
-            
+        return was_created
+    
+    logger.info(f"Directly downloading video from URL for {shortcode} to {video_path}")
+    download = get_media_downloader().submit(video_url, video_path)
+    result = Future()
+    
+    def resolve(done):
+        # Any failure (including a cancelled download) must reach the caller's .result()
+        try:
+            error = done.exception()
+            result.set_result(finish(None if error else done.result(), error))
+        except BaseException as e:
+            logger.error(f"Error finishing video download for {shortcode}: {str(e)}")
+            result.set_exception(e)
+    
+    download.add_done_callback(resolve)
+    return result
+
+def download_video_directly(post, account_dir, shortcode, account_name=None):
+    """
+    Download a video directly from a post, bypassing Instaloader's file existence checks.
+    
+    Args:
+        post: Instagram post object
+        account_dir: Directory to save the video
+        shortcode: Post shortcode
+        account_name: Optional account name (defaults to the directory name)
+        
+    Returns:
+        bool: True if download was successful, False otherwise
+    """
+    try:
+        future = submit_video_download(post, account_dir, shortcode, account_name)
+        return future.result() if future is not None else False
     except Exception as e:
         logger.error(f"Error downloading video directly for {shortcode}: {str(e)}")
         return False
 
 def check_file_existence(account_dir, date_utc_str, shortcode, account_name=None):
     """
-    Check if a file exists in any of the possible formats and locations.
-    This handles the case where files might be in a different path with Unicode slashes.
+    Check if a video exists in the media store index or under one of the
+    file names Instaloader and the direct downloader use.
     
     Args:
         account_dir: The account directory path
         date_utc_str: The date string in YYYY-MM-DD_HH-MM-SS format
         shortcode: The Instagram post shortcode
-        account_name: Optional account name for special path
+        account_name: Optional account name (defaults to the directory name)
         
     Returns:
-        Tuple: (exists, filepath) where filepath is the actual path if found
+        Tuple: (exists, filepath) where filepath is the account's path to the video if found
     """
     # Get the account name from the account_dir if not provided
     if account_name is None:
         account_name = os.path.basename(account_dir)
     
-    # Check all possible filename patterns
+    try:
+        entry = get_media_store().lookup(account_name, shortcode=shortcode)
+    except sqlite3.Error as e:
+        logger.error(f"Error looking up {shortcode} in the media store: {str(e)}")
+        entry = None
+    if entry:
+        path = os.path.join(account_dir, entry['name'])
+        if os.path.exists(path):
+            return True, path
+    
+    # Check the file name patterns of videos not in the store yet
     possible_paths = [
-        # Standard paths 
         os.path.join(account_dir, f"{date_utc_str}_{shortcode}.mp4"),
         os.path.join(account_dir, f"{date_utc_str}_UTC.mp4"),
     ]
     
-    # Add the special path with Unicode slash characters
-    special_path = f"/home/adi235/MistralOCR/Instagram-Scraper/∕home∕adi235∕MistralOCR∕Instagram-Scraper∕data∕downloads∕{account_name}/{date_utc_str}_UTC.mp4"
-    possible_paths.append(special_path)
-    
     for path in possible_paths:
         if os.path.exists(path):
             return True, path
             
     return False, None
 
+def store_downloaded_video(video_path, account_name, shortcode=None):
+    """
+    Move a downloaded video into the content-addressed media store
+    
+    The account directory keeps a link to the stored file, and a video
+    whose bytes are already stored (a repost) takes no extra space.
+    
+    Args:
+        video_path: Downloaded video
+        account_name: Account the video belongs to
+        shortcode: Post shortcode
+    """
+    try:
+        manifest = read_manifest(video_path)
+        sha256 = manifest['sha256'] if manifest and verify_download(video_path) else None
+        get_media_store().ingest(video_path, account_name, shortcode=shortcode, sha256=sha256)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Could not add {video_path} to the media store: {str(e)}")
+
 if __name__ == "__main__":
     download_from_instagram() 
\ No newline at end of file
@@ -252,9 +252,72 @@ class RAGTestRunner:
         
         # Save test results
         self._save_test_results(test_results, 'retrieval')
-        
+
         return test_results
-    
+
+    def compare_graph_expansion(self, dataset, top_k=10, graph_weight=None):
+        """
+        Compare hybrid search with and without concept graph expansion
+
+        Args:
+            dataset: Test dataset
+            top_k: Number of results to retrieve
+            graph_weight: Graph weight to test (defaults to hybrid_search.DEFAULT_GRAPH_WEIGHT)
+
+        Returns:
+            Dict with metrics and latency for both configurations and the recall gain
+        """
+        if not dataset or 'queries' not in dataset:
+            logger.error("Invalid test dataset")
+            return None
+
+        import hybrid_search
+        if graph_weight is None:
+            graph_weight = hybrid_search.DEFAULT_GRAPH_WEIGHT
+
+        ground_truth = {q['query_id']: q['relevant_content'] for q in dataset['queries']}
+        configurations = {'hybrid_no_graph': 0.0, f'hybrid_graph_{graph_weight}': graph_weight}
+
+        test_results = {
+            'dataset_name': dataset.get('name', 'unknown'),
+            'timestamp': datetime.now().isoformat(),
+            'top_k': top_k,
+            'metrics': {},
+            'latency': {}
+        }
+
+        for config_name, weight in configurations.items():
+            logger.info(f"Running {config_name} retrieval tests")
+
+            search_results = {}
+            search_times = []
+            for query in dataset['queries']:
+                start_time = time.time()
+                results = hybrid_search.hybrid_search(
+                    query=query['query_text'],
+                    top_k=top_k,
+                    graph_weight=weight
+                )
+                search_times.append(time.time() - start_time)
+                search_results[query['query_id']] = [r.get('content_id') for r in results]
+
+            test_results['metrics'][config_name] = self.retrieval_evaluator.evaluate_search_results(
+                search_results, ground_truth
+            )['aggregate']
+            search_times.sort()
+            test_results['latency'][config_name] = {
+                'avg_ms': 1000 * sum(search_times) / len(search_times) if search_times else 0,
+                'p95_ms': 1000 * search_times[int(0.95 * (len(search_times) - 1))] if search_times else 0
+            }
+
+        baseline, expanded = (test_results['metrics'][name] for name in configurations)
+        test_results['recall_gain'] = expanded.get('avg_recall', 0) - baseline.get('avg_recall', 0)
+        logger.info(f"Graph expansion recall gain at k={top_k}: {test_results['recall_gain']:+.4f}")
+
+        self._save_test_results(test_results, 'graph_expansion')
+
+        return test_results
+
     def run_answer_tests(self, dataset, search_type='hybrid', top_k=5,
                        vector_weight=None, keyword_weight=None, max_queries=10):
         """
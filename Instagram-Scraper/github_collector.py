@@ -11,6 +11,8 @@ import sqlite3
 import requests
 from datetime import datetime, timedelta
 import config
+from response_cache import bump_data_generation
+from http_cache import install_http_cache, log_http_cache_stats
 
 # Configure logging
 log_dir = os.path.join(config.DATA_DIR, 'logs')
@@ -59,7 +61,7 @@ GITHUB_REPOS = [
 ]
 
 def get_github_session():
-    """Create a requests session with GitHub API token if available"""
+    """Create a requests session with GitHub API token if available (revalidated through the HTTP cache)"""
     session = requests.Session()
     
     # Add GitHub API token if available
@@ -79,7 +81,8 @@ def get_github_session():
         'User-Agent': 'AI-Knowledge-Base-Collector/1.0'
     })
     
-    return session
+    # Unchanged responses come back as 304s, which GitHub does not count against the rate limit
+    return install_http_cache(session)
 
 def get_rate_limit_info(session):
     """Get the current GitHub API rate limit information"""
@@ -348,6 +351,7 @@ def store_repo_in_db(conn, repo_data, readme):
             query = f"INSERT INTO ai_content ({columns}) VALUES ({placeholders})"
             cursor.execute(query, list(content_values.values()))
         
+        bump_data_generation(cursor, 'github_collector')
         conn.commit()
         return True
         
@@ -454,6 +458,7 @@ def collect_github_repos(max_repos=None):
     finally:
         # Close database connection
         conn.close()
+        log_http_cache_stats()
     
     return success_count
 
@@ -0,0 +1,657 @@
+"""
+Persisted, incrementally updated concept communities
+
+Communities are detected on the undirected, confidence-weighted compact
+graph (Louvain or label propagation run directly on the CSR arrays,
+k-clique percolation through NetworkX) and stored per algorithm and
+graph parameters together with the graph version and the highest
+concept_relationships id they cover. When new relationships arrive,
+only the nodes they touch are re-evaluated with local moves (moves
+spread to neighbors of nodes that change community); a full run is
+done once too much of the graph has been updated incrementally.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+# Import local modules
+import config
+from graph_engine import CompactGraph, symmetric_adjacency
+from response_cache import read_data_generation
+
+logger = logging.getLogger('graph_communities')
+
+COMMUNITY_TABLE = 'concept_communities'
+COMMUNITY_RUNS_TABLE = 'community_runs'
+
+ALGORITHMS = ("louvain", "label_propagation", "clique")
+# Algorithms whose assignments can be updated with local moves
+INCREMENTAL_ALGORITHMS = ("louvain", "label_propagation")
+
+# Modularity resolution (higher values give smaller communities)
+RESOLUTION = 1.0
+# Aggregation levels for Louvain
+MAX_LEVELS = 20
+# Full recompute once this fraction of nodes was touched since the last full run
+REFRESH_FRACTION = 0.2
+# Node visits per node before local moves stop (guards label propagation oscillation)
+MAX_VISITS_PER_NODE = 20
+# Clique size for clique percolation
+CLIQUE_SIZE = 3
+# Assignments kept in memory
+CACHE_SIZE = 8
+
+
+class CommunityAssignment:
+    """Community label per node of a graph version"""
+
+    def __init__(self, node_ids: np.ndarray, labels: np.ndarray, algorithm: str,
+                 version: str = "", modularity: float = 0.0, mode: str = "full",
+                 compute_seconds: float = 0.0):
+        """
+        Args:
+            node_ids: Concept IDs
+            labels: Community ID for each concept
+            algorithm: Algorithm that produced the labels
+            version: Graph version the labels belong to
+            modularity: Modularity of the partition on the undirected graph
+            mode: How the labels were obtained ('full', 'incremental' or 'stored')
+            compute_seconds: Time spent detecting or updating communities
+        """
+        self.node_ids = node_ids
+        self.labels = labels
+        self.algorithm = algorithm
+        self.version = version
+        self.modularity = modularity
+        self.mode = mode
+        self.compute_seconds = compute_seconds
+        # Whether these labels are the ones stored under partition_key
+        self.persisted = mode == "stored"
+        self._dict = None
+
+    @property
+    def partition_key(self) -> str:
+        """Storage key: algorithm plus the graph parameters part of the version"""
+        return partition_key(self.algorithm, self.version)
+
+    def as_dict(self) -> Dict[int, int]:
+        """Mapping of concept ID to community ID (built once)"""
+        if self._dict is None:
+            self._dict = dict(zip(self.node_ids.tolist(), self.labels.tolist()))
+        return self._dict
+
+    def number_of_communities(self) -> int:
+        """Number of distinct communities"""
+        return int(len(np.unique(self.labels)))
+
+
+def partition_key(algorithm: str, version: str) -> str:
+    """Storage key for an algorithm and graph version (independent of the data generation)"""
+    return f"{algorithm}-{version.split('-', 1)[-1]}"
+
+
+# ----------------------------------------------------------------------
+# Detection
+# ----------------------------------------------------------------------
+
+def _node_weights(adj: sp.csr_matrix) -> np.ndarray:
+    """Weighted degree of each node, self-loops included"""
+    return np.asarray(adj.sum(axis=1)).ravel()
+
+
+def _local_moves(adj: sp.csr_matrix, node_weights: np.ndarray, labels: np.ndarray,
+                 queue: np.ndarray, algorithm: str = "louvain",
+                 resolution: float = RESOLUTION) -> int:
+    """
+    Move queued nodes to the neighboring community that improves the objective most
+
+    Louvain moves maximize the modularity gain, label propagation moves
+    take the label with the largest incident weight. When a node moves,
+    its neighbors in other communities are queued again.
+
+    Args:
+        adj: Symmetric weighted adjacency (diagonal holds aggregated self-loops)
+        node_weights: Weighted degree of each node
+        labels: Community label of each node (updated in place)
+        queue: Nodes to evaluate, in order
+        algorithm: 'louvain' or 'label_propagation'
+        resolution: Modularity resolution
+
+    Returns:
+        Number of moves made
+    """
+    n = adj.shape[0]
+    m2 = float(node_weights.sum())
+    if n == 0 or m2 == 0:
+        return 0
+
+    indptr = adj.indptr.tolist()
+    indices = adj.indices.tolist()
+    weights = adj.data.tolist()
+    k = node_weights.tolist()
+    lab = labels.tolist()
+    tot = np.bincount(labels, weights=node_weights, minlength=int(labels.max()) + 1).tolist()
+    louvain = algorithm == "louvain"
+
+    pending = deque(int(i) for i in queue)
+    queued = bytearray(n)
+    for i in pending:
+        queued[i] = 1
+
+    moves = 0
+    visits = 0
+    max_visits = MAX_VISITS_PER_NODE * n
+    while pending and visits < max_visits:
+        i = pending.popleft()
+        queued[i] = 0
+        visits += 1
+        start, end = indptr[i], indptr[i + 1]
+
+        links = {}
+        for p in range(start, end):
+            j = indices[p]
+            if j != i:
+                c = lab[j]
+                links[c] = links.get(c, 0.0) + weights[p]
+        if not links:
+            continue
+
+        current = lab[i]
+        best = current
+        if louvain:
+            ki = k[i]
+            tot[current] -= ki
+            scale = resolution * ki / m2
+            best_gain = links.get(current, 0.0) - tot[current] * scale
+            for c, w in links.items():
+                gain = w - tot[c] * scale
+                if gain > best_gain + 1e-12:
+                    best, best_gain = c, gain
+            tot[best] += ki
+        else:
+            best_weight = links.get(current, 0.0)
+            for c, w in links.items():
+                if w > best_weight + 1e-12:
+                    best, best_weight = c, w
+
+        if best != current:
+            lab[i] = best
+            moves += 1
+            for p in range(start, end):
+                j = indices[p]
+                if not queued[j] and lab[j] != best:
+                    queued[j] = 1
+                    pending.append(j)
+
+    labels[:] = lab
+    return moves
+
+
+def louvain(adj: sp.csr_matrix, seed: int = 42, resolution: float = RESOLUTION) -> np.ndarray:
+    """
+    Louvain community detection on a symmetric weighted adjacency
+
+    Args:
+        adj: Symmetric weighted adjacency
+        seed: Random seed for the node visiting order
+        resolution: Modularity resolution
+
+    Returns:
+        Community label per node
+    """
+    rng = np.random.default_rng(seed)
+    n = adj.shape[0]
+    membership = np.arange(n)
+    level_adj = adj
+    node_weights = _node_weights(adj)
+
+    for _ in range(MAX_LEVELS):
+        size = level_adj.shape[0]
+        labels = np.arange(size)
+        if not _local_moves(level_adj, node_weights, labels, rng.permutation(size),
+                            "louvain", resolution):
+            break
+        labels = np.unique(labels, return_inverse=True)[1]
+        membership = labels[membership]
+        if labels.max() + 1 == size:
+            break
+
+        # Aggregate each community into one node (internal weight becomes a self-loop)
+        P = sp.csr_matrix((np.ones(size), (np.arange(size), labels)), shape=(size, labels.max() + 1))
+        level_adj = (P.T @ level_adj @ P).tocsr()
+        node_weights = np.bincount(labels, weights=node_weights)
+
+    return membership
+
+
+def label_propagation(adj: sp.csr_matrix, seed: int = 42) -> np.ndarray:
+    """Asynchronous weighted label propagation starting from singleton labels"""
+    rng = np.random.default_rng(seed)
+    n = adj.shape[0]
+    labels = np.arange(n)
+    _local_moves(adj, _node_weights(adj), labels, rng.permutation(n), "label_propagation")
+    return labels
+
+
+def clique_percolation(graph: CompactGraph, k: int = CLIQUE_SIZE) -> np.ndarray:
+    """k-clique communities via NetworkX; nodes outside every clique get their own label"""
+    import networkx as nx
+
+    undirected = graph.to_networkx().to_undirected()
+    labels = np.full(graph.number_of_nodes(), -1, dtype=np.int64)
+    for c, members in enumerate(nx.algorithms.community.k_clique_communities(undirected, k)):
+        for node in members:
+            labels[graph.index_of(node)] = c
+    outside = labels < 0
+    labels[outside] = labels.max() + 1 + np.arange(int(outside.sum()))
+    return labels
+
+
+def modularity(adj: sp.csr_matrix, labels: np.ndarray, resolution: float = RESOLUTION) -> float:
+    """Modularity of a partition of a symmetric weighted adjacency"""
+    m2 = float(adj.sum())
+    if m2 == 0:
+        return 0.0
+    coo = adj.tocoo()
+    same = labels[coo.row] == labels[coo.col]
+    internal = float(coo.data[same].sum())
+    tot = np.bincount(labels, weights=_node_weights(adj))
+    return internal / m2 - resolution * float((tot / m2) @ (tot / m2))
+
+
+def _canonical_labels(labels: np.ndarray) -> np.ndarray:
+    """Renumber communities 0..c-1 by decreasing size"""
+    unique, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(len(unique), dtype=np.int64)
+    rank[np.argsort(-counts, kind="stable")] = np.arange(len(unique))
+    return rank[inverse]
+
+
+def detect_communities(graph: CompactGraph, algorithm: str = "louvain",
+                       seed: int = 42) -> CommunityAssignment:
+    """
+    Detect communities from scratch
+
+    Args:
+        graph: Compact concept graph
+        algorithm: 'louvain', 'label_propagation' or 'clique'
+        seed: Random seed
+
+    Returns:
+        CommunityAssignment with labels numbered by decreasing community size
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown community detection algorithm: {algorithm}")
+
+    start_time = time.time()
+    adj = symmetric_adjacency(graph)
+    if algorithm == "louvain":
+        labels = louvain(adj, seed)
+    elif algorithm == "label_propagation":
+        labels = label_propagation(adj, seed)
+    else:
+        labels = clique_percolation(graph)
+    labels = _canonical_labels(labels)
+
+    return CommunityAssignment(graph.node_ids, labels, algorithm, graph.version,
+                               modularity(adj, labels), "full", time.time() - start_time)
+
+
+def update_communities(graph: CompactGraph, previous: Dict[int, int], touched: List[int],
+                       algorithm: str = "louvain") -> CommunityAssignment:
+    """
+    Update stored assignments after the graph changed
+
+    Nodes keep their previous community; new nodes start in their own
+    community. Local moves are run from the touched nodes and new nodes,
+    spreading only to neighbors of nodes that change community.
+
+    Args:
+        graph: Current compact concept graph
+        previous: Stored mapping of concept ID to community ID
+        touched: Concept IDs at either end of relationships added since
+        algorithm: 'louvain' or 'label_propagation'
+
+    Returns:
+        CommunityAssignment (community IDs of unchanged communities are stable)
+    """
+    if algorithm not in INCREMENTAL_ALGORITHMS:
+        raise ValueError(f"Communities from '{algorithm}' cannot be updated incrementally")
+
+    start_time = time.time()
+    n = graph.number_of_nodes()
+    labels = np.fromiter((previous.get(int(node_id), -1) for node_id in graph.node_ids),
+                         dtype=np.int64, count=n)
+    new_nodes = np.flatnonzero(labels < 0)
+    next_label = int(labels.max()) + 1 if n else 0
+    labels[new_nodes] = next_label + np.arange(len(new_nodes))
+
+    touched_ids = np.unique(np.asarray(touched, dtype=np.int64))
+    positions = np.searchsorted(graph.node_ids, touched_ids)
+    positions = positions[positions < n]
+    positions = positions[np.isin(graph.node_ids[positions], touched_ids)]
+    queue = np.unique(np.concatenate([positions, new_nodes]))
+
+    adj = symmetric_adjacency(graph)
+    moves = _local_moves(adj, _node_weights(adj), labels, queue, algorithm)
+    logger.info(f"Incremental community update: {len(queue)} touched nodes, {moves} moves")
+
+    return CommunityAssignment(graph.node_ids, labels, algorithm, graph.version,
+                               modularity(adj, labels), "incremental", time.time() - start_time)
+
+
+# ----------------------------------------------------------------------
+# Persistence
+# ----------------------------------------------------------------------
+
+def ensure_community_tables(cursor: sqlite3.Cursor) -> None:
+    """Create the community tables if they do not exist"""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {COMMUNITY_TABLE} (
+            partition_key TEXT NOT NULL,
+            concept_id INTEGER NOT NULL,
+            community_id INTEGER NOT NULL,
+            PRIMARY KEY (partition_key, concept_id)
+        )
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{COMMUNITY_TABLE}_community
+        ON {COMMUNITY_TABLE}(partition_key, community_id)
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {COMMUNITY_RUNS_TABLE} (
+            partition_key TEXT PRIMARY KEY,
+            algorithm TEXT NOT NULL,
+            graph_version TEXT NOT NULL,
+            relationship_mark INTEGER NOT NULL,
+            touched_since_full INTEGER NOT NULL DEFAULT 0,
+            modularity REAL,
+            community_count INTEGER,
+            mode TEXT,
+            compute_seconds REAL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+
+def _load_run(cursor: sqlite3.Cursor, key: str) -> Optional[Dict[str, Any]]:
+    cursor.execute(f"""
+        SELECT graph_version, relationship_mark, touched_since_full, modularity, compute_seconds
+        FROM {COMMUNITY_RUNS_TABLE} WHERE partition_key = ?
+    """, (key,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return {"graph_version": row[0], "relationship_mark": row[1], "touched_since_full": row[2],
+            "modularity": row[3] or 0.0, "compute_seconds": row[4] or 0.0}
+
+
+def _load_assignments(cursor: sqlite3.Cursor, key: str) -> Dict[int, int]:
+    cursor.execute(f"SELECT concept_id, community_id FROM {COMMUNITY_TABLE} WHERE partition_key = ?",
+                   (key,))
+    return dict(cursor.fetchall())
+
+
+def _save(cursor: sqlite3.Cursor, assignment: CommunityAssignment, previous: Dict[int, int],
+          relationship_mark: int, touched_since_full: int) -> None:
+    """Write the assignment (only changed rows after an incremental update) and its run record"""
+    key = assignment.partition_key
+    current = assignment.as_dict()
+    if assignment.mode == "full":
+        cursor.execute(f"DELETE FROM {COMMUNITY_TABLE} WHERE partition_key = ?", (key,))
+        changed = current.items()
+    else:
+        removed = [(key, concept_id) for concept_id in previous if concept_id not in current]
+        cursor.executemany(f"DELETE FROM {COMMUNITY_TABLE} WHERE partition_key = ? AND concept_id = ?",
+                           removed)
+        changed = [(concept_id, community_id) for concept_id, community_id in current.items()
+                   if previous.get(concept_id) != community_id]
+
+    cursor.executemany(f"""
+        INSERT OR REPLACE INTO {COMMUNITY_TABLE} (partition_key, concept_id, community_id)
+        VALUES (?, ?, ?)
+    """, ((key, concept_id, community_id) for concept_id, community_id in changed))
+
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {COMMUNITY_RUNS_TABLE}
+            (partition_key, algorithm, graph_version, relationship_mark, touched_since_full,
+             modularity, community_count, mode, compute_seconds, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (key, assignment.algorithm, assignment.version, relationship_mark, touched_since_full,
+          assignment.modularity, assignment.number_of_communities(), assignment.mode,
+          assignment.compute_seconds, time.time()))
+
+
+def invalidate_communities(cursor: sqlite3.Cursor) -> None:
+    """
+    Force the next get_communities() call to run a full detection
+
+    Used after changes that rewrite existing relationships (such as
+    concept merges), which the relationship id mark does not see.
+
+    Args:
+        cursor: Cursor of the connection performing the change (caller commits)
+    """
+    ensure_community_tables(cursor)
+    cursor.execute(f"DELETE FROM {COMMUNITY_RUNS_TABLE}")
+    with _assignments_lock:
+        _assignments.clear()
+
+
+_assignments = OrderedDict()
+_assignments_lock = threading.Lock()
+
+
+def get_communities(graph: CompactGraph, algorithm: str = "louvain",
+                    db_path: Optional[str] = None, full: bool = False) -> CommunityAssignment:
+    """
+    Communities for a graph: from memory, from the database, updated or detected
+
+    Stored assignments for the same graph version are returned as they
+    are. For a newer version, louvain and label propagation assignments
+    are updated around the nodes of relationships added since they were
+    stored; other cases run a full detection. Graphs without a version
+    (built from NetworkX) are not persisted.
+
+    Args:
+        graph: Compact concept graph
+        algorithm: 'louvain', 'label_propagation' or 'clique'
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        full: Always run a full detection
+
+    Returns:
+        CommunityAssignment
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown community detection algorithm: {algorithm}")
+    if not graph.version:
+        return detect_communities(graph, algorithm)
+
+    db_path = db_path or config.DB_PATH
+    key = partition_key(algorithm, graph.version)
+    with _assignments_lock:
+        cached = _assignments.get(key)
+        if cached is not None and cached.version == graph.version and not full:
+            _assignments.move_to_end(key)
+            return cached
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        ensure_community_tables(cursor)
+        run = None if full else _load_run(cursor, key)
+        previous = _load_assignments(cursor, key) if run else {}
+
+        if run and run["graph_version"] == graph.version:
+            labels = np.fromiter((previous.get(int(node_id), -1) for node_id in graph.node_ids),
+                                 dtype=np.int64, count=graph.number_of_nodes())
+            assignment = CommunityAssignment(graph.node_ids, labels, algorithm, graph.version,
+                                             run["modularity"], "stored", run["compute_seconds"])
+        else:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM concept_relationships")
+            relationship_mark = cursor.fetchone()[0]
+
+            assignment = None
+            touched_since_full = 0
+            if run and algorithm in INCREMENTAL_ALGORITHMS:
+                cursor.execute("""
+                    SELECT source_concept_id, target_concept_id FROM concept_relationships
+                    WHERE id > ? AND id <= ?
+                """, (run["relationship_mark"], relationship_mark))
+                touched = [concept_id for row in cursor.fetchall() for concept_id in row]
+                new_nodes = sum(1 for node_id in graph.node_ids.tolist() if node_id not in previous)
+                touched_since_full = run["touched_since_full"] + len(set(touched)) + new_nodes
+                if touched_since_full <= REFRESH_FRACTION * graph.number_of_nodes():
+                    assignment = update_communities(graph, previous, touched, algorithm)
+
+            if assignment is None:
+                assignment = detect_communities(graph, algorithm)
+                touched_since_full = 0
+            logger.info(f"Communities ({algorithm}, {assignment.mode}): "
+                        f"{assignment.number_of_communities()} communities, "
+                        f"modularity {assignment.modularity:.3f}, {assignment.compute_seconds:.2f}s")
+
+            # Only persist when no new data arrived after the graph was built,
+            # so the relationship mark matches the graph contents
+            generation = read_data_generation(db_path)[0]
+            if str(generation) == graph.version.split("-", 1)[0]:
+                _save(cursor, assignment, previous, relationship_mark, touched_since_full)
+                conn.commit()
+                assignment.persisted = True
+    finally:
+        conn.close()
+
+    with _assignments_lock:
+        _assignments[key] = assignment
+        _assignments.move_to_end(key)
+        while len(_assignments) > CACHE_SIZE:
+            _assignments.popitem(last=False)
+    return assignment
+
+
+# ----------------------------------------------------------------------
+# Summaries
+# ----------------------------------------------------------------------
+
+def community_summaries(communities: Optional[Dict[int, int]] = None,
+                        key: Optional[str] = None, min_community_size: int = 3,
+                        db_path: Optional[str] = None,
+                        graph_version: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Summarize communities with one grouped query
+
+    Reads persisted assignments by partition key, or an arbitrary
+    concept-to-community mapping through a temporary table.
+
+    Args:
+        communities: Mapping of concept ID to community ID (used when key is
+            not given, or when the stored run is not graph_version)
+        key: Partition key of persisted assignments
+        min_community_size: Minimum community size to include
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        graph_version: Graph version the stored assignments must belong to
+
+    Returns:
+        List of community summaries, largest first
+    """
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        if key is not None and graph_version is not None and communities is not None:
+            # Another build may have replaced the stored partition since
+            ensure_community_tables(cursor)
+            run = _load_run(cursor, key)
+            if run is None or run["graph_version"] != graph_version:
+                key = None
+        if key is not None:
+            source = f"(SELECT concept_id, community_id FROM {COMMUNITY_TABLE} WHERE partition_key = ?)"
+            params = [key]
+        else:
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS summary_communities (
+                    concept_id INTEGER PRIMARY KEY, community_id INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("DELETE FROM summary_communities")
+            cursor.executemany("INSERT INTO summary_communities VALUES (?, ?)",
+                               ((int(concept_id), int(community_id))
+                                for concept_id, community_id in (communities or {}).items()))
+            source = "summary_communities"
+            params = []
+
+        cursor.execute(f"""
+            SELECT m.community_id, COUNT(*) AS size,
+                   json_group_array(json_object(
+                       'id', c.id, 'name', c.name, 'description', c.description,
+                       'category', c.category, 'first_seen_date', c.first_seen_date,
+                       'last_updated', c.last_updated, 'reference_count', c.reference_count
+                   ))
+            FROM {source} m
+            JOIN concepts c ON c.id = m.concept_id
+            GROUP BY m.community_id
+            HAVING COUNT(*) >= ?
+            ORDER BY size DESC, m.community_id
+        """, params + [min_community_size])
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    summaries = []
+    for community_id, size, members in rows:
+        concepts = sorted(json.loads(members), key=lambda x: x.get("reference_count") or 0, reverse=True)
+
+        category_counts = {}
+        for concept in concepts:
+            category = concept.get("category", "unknown")
+            category_counts[category] = category_counts.get(category, 0) + 1
+
+        top_concept = concepts[0] if concepts else None
+        summaries.append({
+            "community_id": community_id,
+            "size": size,
+            "top_concept": top_concept["name"] if top_concept else None,
+            "top_concept_id": top_concept["id"] if top_concept else None,
+            "category_distribution": category_counts,
+            "concepts": concepts
+        })
+
+    return summaries
+
+
+def main():
+    """Main function for direct script execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concept graph communities")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="louvain", help="Detection algorithm")
+    parser.add_argument("--min-confidence", type=float, default=0.5, help="Minimum relationship confidence")
+    parser.add_argument("--full", action="store_true", help="Ignore stored assignments")
+    parser.add_argument("--min-size", type=int, default=3, help="Minimum community size to summarize")
+    args = parser.parse_args()
+
+    graph = CompactGraph.from_database(min_confidence=args.min_confidence)
+    start_time = time.time()
+    assignment = get_communities(graph, args.algorithm, full=args.full)
+    print(f"{assignment.number_of_communities()} communities ({assignment.mode}) for "
+          f"{graph.number_of_nodes()} nodes in {time.time() - start_time:.2f}s, "
+          f"modularity {assignment.modularity:.3f}")
+
+    start_time = time.time()
+    if assignment.persisted:
+        summaries = community_summaries(key=assignment.partition_key, min_community_size=args.min_size)
+    else:
+        summaries = community_summaries(assignment.as_dict(), min_community_size=args.min_size)
+    print(f"Summarized {len(summaries)} communities in {time.time() - start_time:.2f}s")
+    for summary in summaries[:10]:
+        print(f"- {summary['community_id']}: {summary['size']} concepts, top: {summary['top_concept']}")
+
+
+if __name__ == "__main__":
+    main()
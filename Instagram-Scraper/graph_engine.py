@@ -0,0 +1,580 @@
+"""
+Compact graph engine for the concept knowledge graph
+
+Holds the concept graph as NumPy CSR adjacency arrays (with parallel
+arrays for confidence, relationship type and reference count) built
+from two bulk SQL reads. This avoids the per-edge dict-of-dicts cost of
+a NetworkX DiGraph; conversion to NetworkX is available for algorithms
+that need it.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# Import local modules
+import config
+from response_cache import read_data_generation
+
+logger = logging.getLogger('graph_engine')
+
+
+def gather_ranges(indptr: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of all entries of the given CSR rows, without a Python loop
+
+    Args:
+        indptr: CSR row pointer array
+        rows: Row indices to gather
+
+    Returns:
+        Tuple of (row index per position, positions into the CSR data arrays)
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    return np.repeat(rows, counts), offsets + np.arange(total)
+
+
+
+def symmetric_adjacency(graph: 'CompactGraph') -> sp.csr_matrix:
+    """Undirected, confidence-weighted adjacency without self-loops"""
+    n = graph.number_of_nodes()
+    sources = graph.edge_sources().astype(np.int64)
+    targets = graph.indices.astype(np.int64)
+    keep = sources != targets
+    A = sp.csr_matrix((graph.confidence[keep].astype(np.float64), (sources[keep], targets[keep])),
+                      shape=(n, n))
+    return (A + A.T).tocsr()
+
+class CompactGraph:
+    """Directed concept graph stored as CSR arrays indexed by node position"""
+
+    def __init__(self, node_ids: np.ndarray, names: List[str], descriptions: List[str],
+                 categories: List[str], node_reference_counts: np.ndarray,
+                 sources: np.ndarray, targets: np.ndarray, confidence: np.ndarray,
+                 rel_codes: np.ndarray, rel_types: List[str],
+                 edge_reference_counts: np.ndarray, version: str = ""):
+        """
+        Build CSR arrays from node arrays and an edge list in node-index space
+
+        Args:
+            node_ids: Sorted concept IDs (position in this array is the node index)
+            names: Concept names by node index
+            descriptions: Concept descriptions by node index
+            categories: Concept categories by node index
+            node_reference_counts: Concept reference counts by node index
+            sources: Source node index for each edge
+            targets: Target node index for each edge
+            confidence: Confidence score for each edge
+            rel_codes: Index into rel_types for each edge
+            rel_types: Relationship type vocabulary
+            edge_reference_counts: Reference count for each edge
+            version: Identifier of the data and parameters the graph was built from
+        """
+        self.node_ids = node_ids.astype(np.int64, copy=False)
+        self.names = names
+        self.descriptions = descriptions
+        self.categories = categories
+        self.node_reference_counts = node_reference_counts.astype(np.int32, copy=False)
+        self.rel_types = rel_types
+        self.version = version
+
+        n = len(self.node_ids)
+
+        # Keep one edge per (source, target): the highest-confidence relationship
+        order = np.lexsort((-confidence, targets, sources))
+        sources, targets = sources[order], targets[order]
+        keep = np.ones(len(order), dtype=bool)
+        if len(order) > 1:
+            keep[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        order = order[keep]
+
+        self.indices = targets[keep].astype(np.int32, copy=False)
+        self.confidence = confidence[order].astype(np.float32, copy=False)
+        self.rel_codes = rel_codes[order].astype(np.int16, copy=False)
+        self.edge_reference_counts = edge_reference_counts[order].astype(np.int32, copy=False)
+
+        counts = np.bincount(sources[keep], minlength=n)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+
+        self._index_of = {int(node_id): i for i, node_id in enumerate(self.node_ids)}
+        self._reverse = None
+        self._networkx = None
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_database(cls, db_path: Optional[str] = None,
+                      min_confidence: float = 0.5,
+                      min_references: int = 1,
+                      include_categories: List[str] = None,
+                      exclude_categories: List[str] = None,
+                      relationship_types: List[str] = None) -> 'CompactGraph':
+        """
+        Build the graph with one bulk read of concepts and one of relationships
+
+        Args:
+            db_path: Path to SQLite database (defaults to config.DB_PATH)
+            min_confidence: Minimum confidence score for relationships
+            min_references: Minimum reference count for concepts
+            include_categories: Only include these categories (if provided)
+            exclude_categories: Exclude these categories (if provided)
+            relationship_types: Only include these relationship types (if provided)
+
+        Returns:
+            CompactGraph instance
+        """
+        db_path = db_path or config.DB_PATH
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        try:
+            query = """
+                SELECT id, name, description, category, reference_count
+                FROM concepts
+                WHERE reference_count >= ?
+            """
+            params = [min_references]
+
+            if include_categories:
+                placeholders = ", ".join(["?"] * len(include_categories))
+                query += f" AND category IN ({placeholders})"
+                params.extend(include_categories)
+
+            if exclude_categories:
+                placeholders = ", ".join(["?"] * len(exclude_categories))
+                query += f" AND category NOT IN ({placeholders})"
+                params.extend(exclude_categories)
+
+            query += " ORDER BY id"
+            cursor.execute(query, params)
+            concept_rows = cursor.fetchall()
+
+            rel_query = """
+                SELECT source_concept_id, target_concept_id, relationship_type,
+                       confidence_score, reference_count
+                FROM concept_relationships
+                WHERE confidence_score >= ?
+            """
+            rel_params = [min_confidence]
+
+            if relationship_types:
+                placeholders = ", ".join(["?"] * len(relationship_types))
+                rel_query += f" AND relationship_type IN ({placeholders})"
+                rel_params.extend(relationship_types)
+
+            cursor.execute(rel_query, rel_params)
+            rel_rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        params_key = json.dumps([min_confidence, min_references, include_categories,
+                                 exclude_categories, relationship_types], sort_keys=True)
+        generation = read_data_generation(db_path)[0]
+        version = f"{generation}-{hashlib.sha1(params_key.encode()).hexdigest()[:12]}"
+
+        return cls.from_rows(concept_rows, rel_rows, version=version)
+
+    @classmethod
+    def from_rows(cls, concept_rows: List[Tuple], rel_rows: List[Tuple],
+                  version: str = "") -> 'CompactGraph':
+        """
+        Build the graph from raw rows
+
+        Args:
+            concept_rows: (id, name, description, category, reference_count) tuples
+            rel_rows: (source_id, target_id, relationship_type, confidence, reference_count) tuples
+            version: Identifier of the data the rows came from
+
+        Returns:
+            CompactGraph instance
+        """
+        concept_rows = sorted(concept_rows, key=lambda row: row[0])
+        node_ids = np.fromiter((row[0] for row in concept_rows), dtype=np.int64, count=len(concept_rows))
+        names = [row[1] for row in concept_rows]
+        descriptions = [row[2] for row in concept_rows]
+        categories = [row[3] for row in concept_rows]
+        node_refs = np.fromiter((row[4] or 0 for row in concept_rows), dtype=np.int32, count=len(concept_rows))
+
+        m = len(rel_rows)
+        src_ids = np.fromiter((row[0] for row in rel_rows), dtype=np.int64, count=m)
+        dst_ids = np.fromiter((row[1] for row in rel_rows), dtype=np.int64, count=m)
+        confidence = np.fromiter((row[3] if row[3] is not None else 0.0 for row in rel_rows),
+                                 dtype=np.float32, count=m)
+        edge_refs = np.fromiter((row[4] or 0 for row in rel_rows), dtype=np.int32, count=m)
+        rel_types, rel_codes = np.unique(np.array([row[2] or "" for row in rel_rows], dtype=object),
+                                         return_inverse=True) if m else (np.array([], dtype=object),
+                                                                         np.array([], dtype=np.int64))
+
+        # Map concept IDs to node indices, dropping edges to filtered-out concepts
+        sources = np.searchsorted(node_ids, src_ids)
+        targets = np.searchsorted(node_ids, dst_ids)
+        n = len(node_ids)
+        valid = (sources < n) & (targets < n)
+        valid[valid] &= (node_ids[sources[valid]] == src_ids[valid]) & (node_ids[targets[valid]] == dst_ids[valid])
+
+        return cls(
+            node_ids, names, descriptions, categories, node_refs,
+            sources[valid], targets[valid], confidence[valid],
+            rel_codes[valid], [str(t) for t in rel_types], edge_refs[valid],
+            version=version
+        )
+
+    @classmethod
+    def from_networkx(cls, G, version: str = "") -> 'CompactGraph':
+        """Build the graph from a NetworkX DiGraph with the attributes used by build_graph"""
+        concept_rows = [
+            (node, attrs.get("name", str(node)), attrs.get("description"),
+             attrs.get("category"), attrs.get("reference_count", 1))
+            for node, attrs in G.nodes(data=True)
+        ]
+        rel_rows = [
+            (u, v, attrs.get("relationship", "related_to"), attrs.get("confidence", 1.0),
+             attrs.get("reference_count", 1))
+            for u, v, attrs in G.edges(data=True)
+        ]
+        return cls.from_rows(concept_rows, rel_rows, version=version)
+
+    # ------------------------------------------------------------------
+    # Basic queries
+    # ------------------------------------------------------------------
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.indices)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, concept_id) -> bool:
+        return concept_id in self._index_of
+
+    def index_of(self, concept_id: int) -> Optional[int]:
+        """Node index for a concept ID, or None if the concept is not in the graph"""
+        return self._index_of.get(concept_id)
+
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def in_degrees(self) -> np.ndarray:
+        return np.bincount(self.indices, minlength=len(self.node_ids))
+
+    def edge_sources(self) -> np.ndarray:
+        """Source node index of every edge, in CSR order"""
+        return np.repeat(np.arange(len(self.node_ids), dtype=np.int32), self.out_degrees())
+
+    def reverse(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Incoming-edge CSR (built on first use)
+
+        Returns:
+            Tuple of (indptr, source indices, forward edge positions)
+        """
+        if self._reverse is None:
+            sources = self.edge_sources()
+            order = np.argsort(self.indices, kind='stable')
+            indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+            np.cumsum(self.in_degrees(), out=indptr[1:])
+            self._reverse = (indptr, sources[order], order)
+        return self._reverse
+
+    def successors(self, concept_id: int) -> List[int]:
+        i = self._index_of[concept_id]
+        return self.node_ids[self.indices[self.indptr[i]:self.indptr[i + 1]]].tolist()
+
+    def predecessors(self, concept_id: int) -> List[int]:
+        i = self._index_of[concept_id]
+        indptr, sources, _ = self.reverse()
+        return self.node_ids[sources[indptr[i]:indptr[i + 1]]].tolist()
+
+    def edge_position(self, source_index: int, target_index: int) -> Optional[int]:
+        """Position of an edge in the CSR arrays, or None if it does not exist"""
+        start, end = self.indptr[source_index], self.indptr[source_index + 1]
+        hits = np.nonzero(self.indices[start:end] == target_index)[0]
+        return int(start + hits[0]) if len(hits) else None
+
+    def edge_attributes(self, source_id: int, target_id: int) -> Optional[Dict[str, Any]]:
+        """Relationship, confidence and reference count of an edge, or None"""
+        if source_id not in self._index_of or target_id not in self._index_of:
+            return None
+        pos = self.edge_position(self._index_of[source_id], self._index_of[target_id])
+        if pos is None:
+            return None
+        return {
+            "relationship": self.rel_types[self.rel_codes[pos]],
+            "confidence": float(self.confidence[pos]),
+            "reference_count": int(self.edge_reference_counts[pos])
+        }
+
+    def node_attributes(self, index: int) -> Dict[str, Any]:
+        """Attributes of the node at an index, in the shape build_graph stores them"""
+        return {
+            "name": self.names[index],
+            "description": self.descriptions[index],
+            "category": self.categories[index],
+            "reference_count": int(self.node_reference_counts[index])
+        }
+
+    def iter_edges(self) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """Yield (source_id, target_id, attributes) for every edge"""
+        sources = self.edge_sources()
+        for pos in range(len(self.indices)):
+            yield (int(self.node_ids[sources[pos]]), int(self.node_ids[self.indices[pos]]), {
+                "relationship": self.rel_types[self.rel_codes[pos]],
+                "confidence": float(self.confidence[pos]),
+                "reference_count": int(self.edge_reference_counts[pos])
+            })
+
+    def nbytes(self) -> int:
+        """Memory held by the NumPy arrays (excluding node name/description strings)"""
+        arrays = [self.node_ids, self.node_reference_counts, self.indptr, self.indices,
+                  self.confidence, self.rel_codes, self.edge_reference_counts]
+        return sum(a.nbytes for a in arrays)
+
+    # ------------------------------------------------------------------
+    # NetworkX interop
+    # ------------------------------------------------------------------
+
+    def to_networkx(self, concept_ids=None):
+        """
+        Convert to a NetworkX DiGraph (only use for NetworkX-specific algorithms)
+
+        Args:
+            concept_ids: If given, only build the subgraph induced by these concepts
+
+        Returns:
+            NetworkX DiGraph with the same node and edge attributes as build_graph
+            (the full conversion is cached)
+        """
+        if concept_ids is None and self._networkx is not None:
+            return self._networkx
+
+        import networkx as nx
+
+        if concept_ids is None:
+            nodes = np.arange(len(self.node_ids))
+            positions = np.arange(len(self.indices))
+        else:
+            nodes = np.array(sorted(self._index_of[c] for c in concept_ids if c in self._index_of),
+                             dtype=np.int64)
+            member = np.zeros(len(self.node_ids), dtype=bool)
+            member[nodes] = True
+            positions = np.concatenate(
+                [np.arange(self.indptr[i], self.indptr[i + 1]) for i in nodes] or [np.array([], dtype=np.int64)]
+            ).astype(np.int64)
+            positions = positions[member[self.indices[positions]]]
+
+        sources = self.edge_sources()
+
+        G = nx.DiGraph()
+        G.add_nodes_from((int(self.node_ids[i]), self.node_attributes(i)) for i in nodes)
+        G.add_edges_from(
+            (int(self.node_ids[sources[pos]]), int(self.node_ids[self.indices[pos]]), {
+                "relationship": self.rel_types[self.rel_codes[pos]],
+                "confidence": float(self.confidence[pos]),
+                "reference_count": int(self.edge_reference_counts[pos]),
+                "weight": float(self.confidence[pos])
+            })
+            for pos in positions
+        )
+
+        if concept_ids is None:
+            self._networkx = G
+        return G
+
+
+def benchmark_graph_build(db_path: Optional[str] = None, **params) -> Dict[str, Any]:
+    """
+    Compare build time and memory of the per-row NetworkX build against CompactGraph
+
+    Args:
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        **params: Build parameters (min_confidence, min_references, ...)
+
+    Returns:
+        Dictionary with timings (seconds) and traced peak memory (bytes) for both builds
+    """
+    import tracemalloc
+    import networkx as nx
+
+    db_path = db_path or config.DB_PATH
+    min_confidence = params.get("min_confidence", 0.5)
+    min_references = params.get("min_references", 1)
+
+    def build_networkx():
+        # Mirrors the original KnowledgeGraph.build_graph: one add_node/add_edge per row
+        G = nx.DiGraph()
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, name, description, category, reference_count
+                FROM concepts WHERE reference_count >= ?
+            """, (min_references,))
+            for concept_id, name, description, category, ref_count in cursor.fetchall():
+                G.add_node(concept_id, name=name, description=description,
+                           category=category, reference_count=ref_count)
+            cursor.execute("""
+                SELECT source_concept_id, target_concept_id, relationship_type,
+                       confidence_score, reference_count
+                FROM concept_relationships WHERE confidence_score >= ?
+            """, (min_confidence,))
+            for source_id, target_id, rel_type, confidence, ref_count in cursor.fetchall():
+                if source_id in G and target_id in G:
+                    G.add_edge(source_id, target_id, relationship=rel_type,
+                               confidence=confidence, reference_count=ref_count,
+                               weight=confidence)
+        finally:
+            conn.close()
+        return G
+
+    def measure(builder):
+        tracemalloc.start()
+        start = time.perf_counter()
+        graph = builder()
+        elapsed = time.perf_counter() - start
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return graph, elapsed, peak, retained
+
+    nx_graph, nx_time, nx_peak, nx_retained = measure(build_networkx)
+    nodes, edges = nx_graph.number_of_nodes(), nx_graph.number_of_edges()
+    del nx_graph
+
+    compact, compact_time, compact_peak, compact_retained = measure(
+        lambda: CompactGraph.from_database(db_path, min_confidence=min_confidence,
+                                           min_references=min_references)
+    )
+
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "compact_edges": compact.number_of_edges(),
+        "networkx": {"build_seconds": nx_time, "peak_bytes": nx_peak, "retained_bytes": nx_retained},
+        "compact": {"build_seconds": compact_time, "peak_bytes": compact_peak,
+                    "retained_bytes": compact_retained, "array_bytes": compact.nbytes()}
+    }
+
+
+def create_synthetic_graph_db(db_path: str, num_concepts: int, num_relationships: int,
+                              seed: int = 42) -> None:
+    """
+    Create a database with random concepts and relationships for benchmarking
+
+    Args:
+        db_path: Path of the SQLite database to create
+        num_concepts: Number of concepts
+        num_relationships: Number of relationships
+        seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    categories = ["algorithm", "model_architecture", "dataset", "training_technique", "evaluation_metric"]
+    rel_types = ["uses", "is_part_of", "improves", "related_to", "extends"]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS concepts (
+                id INTEGER PRIMARY KEY, name TEXT NOT NULL, description TEXT, category TEXT,
+                first_seen_date TEXT, last_updated TEXT, reference_count INTEGER DEFAULT 1,
+                UNIQUE(name)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS concept_relationships (
+                id INTEGER PRIMARY KEY, source_concept_id INTEGER NOT NULL,
+                target_concept_id INTEGER NOT NULL, relationship_type TEXT NOT NULL,
+                first_seen_date TEXT, last_updated TEXT, reference_count INTEGER DEFAULT 1,
+                confidence_score REAL DEFAULT 1.0,
+                UNIQUE(source_concept_id, target_concept_id, relationship_type)
+            )
+        """)
+        cursor.executemany(
+            "INSERT INTO concepts (id, name, description, category, reference_count) VALUES (?, ?, ?, ?, ?)",
+            [(i, f"concept {i}", f"Synthetic concept {i}", categories[i % len(categories)],
+              int(rng.integers(1, 50))) for i in range(1, num_concepts + 1)]
+        )
+
+        # Preferential-attachment-like targets give a realistic skewed degree distribution
+        sources = rng.integers(1, num_concepts + 1, size=num_relationships)
+        targets = (rng.pareto(1.5, size=num_relationships) * 10).astype(np.int64) % num_concepts + 1
+        cursor.executemany(
+            """INSERT OR IGNORE INTO concept_relationships
+               (source_concept_id, target_concept_id, relationship_type, confidence_score, reference_count)
+               VALUES (?, ?, ?, ?, ?)""",
+            [(int(s), int(t), rel_types[k % len(rel_types)], float(c), int(r))
+             for k, (s, t, c, r) in enumerate(zip(sources, targets,
+                                                 rng.uniform(0.3, 1.0, size=num_relationships),
+                                                 rng.integers(1, 10, size=num_relationships)))
+             if s != t]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    """Main function for direct script execution"""
+    import argparse
+    import os
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Compact concept graph engine")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare NetworkX and CompactGraph build time and memory")
+    parser.add_argument("--synthetic", type=int, nargs=2, metavar=("CONCEPTS", "RELATIONSHIPS"),
+                        help="Benchmark on a generated database of this size instead of config.DB_PATH")
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--min-references", type=int, default=1)
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+
+    db_path = config.DB_PATH
+    tmp_dir = None
+    if args.synthetic:
+        tmp_dir = tempfile.mkdtemp(prefix="graph_bench_")
+        db_path = os.path.join(tmp_dir, "synthetic.db")
+        print(f"Generating synthetic graph ({args.synthetic[0]} concepts, {args.synthetic[1]} relationships)...")
+        create_synthetic_graph_db(db_path, args.synthetic[0], args.synthetic[1])
+
+    result = benchmark_graph_build(db_path, min_confidence=args.min_confidence,
+                                   min_references=args.min_references)
+
+    mb = 1024 * 1024
+    print(f"\nGraph: {result['nodes']} nodes, {result['edges']} edges")
+    print(f"{'':<12}{'build (s)':>12}{'peak (MB)':>12}{'retained (MB)':>16}")
+    for label in ("networkx", "compact"):
+        r = result[label]
+        print(f"{label:<12}{r['build_seconds']:>12.3f}{r['peak_bytes'] / mb:>12.1f}{r['retained_bytes'] / mb:>16.1f}")
+    speedup = result["networkx"]["build_seconds"] / max(result["compact"]["build_seconds"], 1e-9)
+    saving = result["networkx"]["retained_bytes"] / max(result["compact"]["retained_bytes"], 1)
+    print(f"\nCompactGraph: {speedup:.1f}x faster build, {saving:.1f}x less retained memory")
+
+    if tmp_dir:
+        os.remove(db_path)
+        os.rmdir(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,582 @@
+"""
+Multilevel force-directed layout for the concept graph
+
+The graph is coarsened by repeatedly merging heavy-edge matched node
+pairs (and unmatched nodes into a neighbor), the coarsest graph is laid out with exact
+Fruchterman-Reingold forces, and positions are refined on the way back
+to the full graph. On large levels, repulsion is approximated with a
+Barnes-Hut style grid: distant nodes act through the centers of mass of
+grid cells. Layouts are persisted per graph version in SQLite, and the
+coarsening hierarchy doubles as a clustering for level-of-detail views.
+"""
+import io
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# Import local modules
+import config
+from graph_engine import CompactGraph, symmetric_adjacency
+
+logger = logging.getLogger('graph_layout')
+
+LAYOUT_TABLE = 'graph_layouts'
+
+# Stop coarsening once a level has at most this many nodes
+COARSEST_SIZE = 200
+MAX_LEVELS = 30
+# Handshake rounds of heavy-edge matching per coarsening step
+MATCHING_ROUNDS = 3
+# Levels up to this size use exact pairwise repulsion
+EXACT_REPULSION_LIMIT = 1500
+# Grid cells per side for approximate repulsion
+GRID_SIZE = 16
+# In-cell neighbors (in cell order) that repel each other exactly
+LOCAL_NEIGHBORS = 8
+# Force-directed iterations on the coarsest level and on each refinement level
+COARSEST_ITERATIONS = 200
+REFINE_ITERATIONS = 30
+# Layouts kept in the database and in memory
+KEEP_VERSIONS = 5
+
+# Level-of-detail defaults
+LOD_MAX_NODES = 1500
+LOD_TOP_K_EDGES = 3
+
+
+class GraphLayout:
+    """Node positions plus the coarsening hierarchy used to compute them"""
+
+    def __init__(self, node_ids: np.ndarray, positions: np.ndarray,
+                 hierarchy: List[np.ndarray], version: str = "",
+                 compute_seconds: float = 0.0):
+        """
+        Args:
+            node_ids: Concept IDs in node-index order
+            positions: (n, 2) array of coordinates in [-1, 1]
+            hierarchy: Cluster label per node for each coarsening level, finest first
+            version: Graph version the layout belongs to
+            compute_seconds: Time spent computing the layout
+        """
+        self.node_ids = node_ids
+        self.positions = positions
+        self.hierarchy = hierarchy
+        self.version = version
+        self.compute_seconds = compute_seconds
+
+    def positions_by_id(self) -> Dict[int, Tuple[float, float]]:
+        """Mapping of concept ID to (x, y), as returned by NetworkX layouts"""
+        return {int(node_id): (float(x), float(y))
+                for node_id, (x, y) in zip(self.node_ids, self.positions)}
+
+    def clusters(self, max_clusters: int) -> np.ndarray:
+        """
+        Cluster label per node from the finest level with at most max_clusters clusters
+
+        Isolated nodes always form one shared cluster.
+        """
+        for labels in self.hierarchy:
+            if len(np.unique(labels)) <= max_clusters:
+                return labels
+        return np.zeros(len(self.node_ids), dtype=np.int64)
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        arrays = {f"level_{i}": labels for i, labels in enumerate(self.hierarchy)}
+        np.savez_compressed(buffer, node_ids=self.node_ids, positions=self.positions, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, version: str = "", compute_seconds: float = 0.0) -> 'GraphLayout':
+        with np.load(io.BytesIO(data)) as arrays:
+            levels = sorted((k for k in arrays.files if k.startswith("level_")),
+                            key=lambda k: int(k.split("_")[1]))
+            return cls(arrays["node_ids"], arrays["positions"],
+                       [arrays[k] for k in levels], version, compute_seconds)
+
+
+# ----------------------------------------------------------------------
+# Layout computation
+# ----------------------------------------------------------------------
+
+def _heaviest_neighbors(adj: sp.csr_matrix, rows: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Heaviest neighbor per node by the given entry weights (-1 where no entry is positive)"""
+    n = adj.shape[0]
+    has_edges = np.diff(adj.indptr) > 0
+    # Rows are sorted, so the last entry of each row after sorting by (row, weight) is the maximum
+    order = np.lexsort((weights, rows))
+    last = order[adj.indptr[1:][has_edges] - 1]
+    heaviest = np.full(n, -1, dtype=np.int64)
+    heaviest[has_edges] = np.where(weights[last] > 0, adj.indices[last], -1)
+    return heaviest
+
+
+def _coarsen(adj: sp.csr_matrix, rng: np.random.Generator) -> np.ndarray:
+    """
+    One coarsening step: heavy-edge matching, then unmatched nodes join a neighbor
+
+    A few handshake rounds match nodes that are each other's heaviest
+    unmatched neighbor; every node left over joins the pair (or node) of
+    its heaviest neighbor, which also collapses star-shaped regions.
+
+    Returns:
+        Cluster label per node (contiguous from 0)
+    """
+    n = adj.shape[0]
+    rows = np.repeat(np.arange(n), np.diff(adj.indptr))
+    weights = adj.data + rng.random(len(adj.data)) * 1e-6
+
+    parent = np.arange(n)
+    matched = np.zeros(n, dtype=bool)
+    for _ in range(MATCHING_ROUNDS):
+        free = ~matched[rows] & ~matched[adj.indices]
+        if not free.any():
+            break
+        choice = _heaviest_neighbors(adj, rows, np.where(free, weights, -1.0))
+        candidates = np.nonzero(choice >= 0)[0]
+        mutual = candidates[choice[choice[candidates]] == candidates]
+        pairs = mutual[mutual < choice[mutual]]
+        parent[choice[pairs]] = pairs
+        matched[pairs] = True
+        matched[choice[pairs]] = True
+
+    heaviest = _heaviest_neighbors(adj, rows, weights)
+    leftover = np.nonzero(~matched & (heaviest >= 0))[0]
+    parent[leftover] = parent[heaviest[leftover]]
+
+    return np.unique(parent, return_inverse=True)[1]
+
+
+def _prolong_adjacency(adj: sp.csr_matrix, labels: np.ndarray) -> sp.csr_matrix:
+    """Adjacency of the coarse graph: P^T A P without self-loops"""
+    m = int(labels.max()) + 1
+    P = sp.csr_matrix((np.ones(len(labels)), (np.arange(len(labels)), labels)),
+                      shape=(len(labels), m))
+    coarse = (P.T @ adj @ P).tocsr()
+    coarse.setdiag(0)
+    coarse.eliminate_zeros()
+    return coarse
+
+
+def _repulsion(pos: np.ndarray, k: float) -> np.ndarray:
+    """Fruchterman-Reingold repulsion (k^2 / d), exact or grid-approximated"""
+    n = len(pos)
+    k2 = k * k
+
+    if n <= EXACT_REPULSION_LIMIT:
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist2 = np.maximum((delta ** 2).sum(axis=2), 1e-9)
+        return (delta * (k2 / dist2)[:, :, None]).sum(axis=1)
+
+    # Far field: every cell acts through its center of mass, own cell excluded
+    lo = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - lo, 1e-9)
+    cell_xy = np.minimum((GRID_SIZE * (pos - lo) / span).astype(np.int64), GRID_SIZE - 1)
+    cell = cell_xy[:, 0] * GRID_SIZE + cell_xy[:, 1]
+    cells = GRID_SIZE * GRID_SIZE
+
+    mass = np.bincount(cell, minlength=cells).astype(np.float64)
+    occupied = mass > 0
+    centers = np.zeros((cells, 2))
+    centers[:, 0] = np.bincount(cell, weights=pos[:, 0], minlength=cells)
+    centers[:, 1] = np.bincount(cell, weights=pos[:, 1], minlength=cells)
+    centers[occupied] /= mass[occupied][:, None]
+    centers, mass = centers[occupied], mass[occupied]
+    cell_rank = np.cumsum(occupied) - 1
+
+    px, py = pos[:, 0], pos[:, 1]
+    disp = np.zeros_like(pos)
+    for start in range(0, n, 4096):
+        chunk = slice(start, start + 4096)
+        dx = px[chunk, None] - centers[None, :, 0]
+        dy = py[chunk, None] - centers[None, :, 1]
+        strength = mass[None, :] * k2 / np.maximum(dx * dx + dy * dy, 1e-9)
+        strength[np.arange(strength.shape[0]), cell_rank[cell[chunk]]] = 0.0
+        disp[chunk, 0] = (dx * strength).sum(axis=1)
+        disp[chunk, 1] = (dy * strength).sum(axis=1)
+
+    # Near field: exact repulsion between nearby nodes of the same cell
+    order = np.argsort(cell, kind='stable')
+    for offset in range(1, LOCAL_NEIGHBORS + 1):
+        a, b = order[:-offset], order[offset:]
+        same = cell[a] == cell[b]
+        a, b = a[same], b[same]
+        delta = pos[a] - pos[b]
+        force = delta * (k2 / np.maximum((delta ** 2).sum(axis=1), 1e-9))[:, None]
+        disp -= _scatter_sum(b, force, n)
+        disp += _scatter_sum(a, force, n)
+
+    return disp
+
+
+def _scatter_sum(index: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Sum 2-D vectors into n slots by index (faster than np.add.at)"""
+    return np.column_stack((np.bincount(index, weights=values[:, 0], minlength=n),
+                            np.bincount(index, weights=values[:, 1], minlength=n)))
+
+
+def _force_directed(adj: sp.csr_matrix, pos: np.ndarray, iterations: int,
+                    temperature: float) -> np.ndarray:
+    """Run Fruchterman-Reingold iterations on one level, cooling linearly"""
+    n = len(pos)
+    if n <= 1:
+        return pos
+
+    k = 1.0 / np.sqrt(n)
+    upper = sp.triu(adj, k=1).tocoo()
+    rows, cols, weights = upper.row, upper.col, upper.data
+
+    for iteration in range(iterations):
+        disp = _repulsion(pos, k)
+
+        delta = pos[rows] - pos[cols]
+        dist = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-9)
+        force = delta * (weights * dist / k)[:, None]
+        disp -= _scatter_sum(rows, force, n)
+        disp += _scatter_sum(cols, force, n)
+
+        step = temperature * (1.0 - iteration / iterations)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-9)
+        pos = pos + disp * (np.minimum(length, step) / length)[:, None]
+
+    return pos
+
+
+def _normalize(pos: np.ndarray) -> np.ndarray:
+    if not len(pos):
+        return pos
+    pos = pos - pos.mean(axis=0)
+    scale = np.abs(pos).max()
+    return pos / scale if scale > 0 else pos
+
+
+def compute_layout(graph: CompactGraph, seed: int = 42,
+                   initial: Optional[Dict[int, Tuple[float, float]]] = None) -> GraphLayout:
+    """
+    Compute a multilevel force-directed layout
+
+    Args:
+        graph: Compact concept graph
+        seed: Random seed
+        initial: Positions by concept ID from a previous layout; when most nodes
+                 are covered, only the finest level is refined
+
+    Returns:
+        GraphLayout with positions in [-1, 1] and the coarsening hierarchy
+    """
+    start_time = time.time()
+    rng = np.random.default_rng(seed)
+    n = graph.number_of_nodes()
+
+    adj = symmetric_adjacency(graph)
+    connected = np.nonzero(np.diff(adj.indptr) > 0)[0]
+    isolated = np.nonzero(np.diff(adj.indptr) == 0)[0]
+    adj = adj[connected][:, connected].tocsr()
+
+    # Coarsening hierarchy over connected nodes
+    levels = [adj]
+    mappings = []
+    while levels[-1].shape[0] > COARSEST_SIZE and len(mappings) < MAX_LEVELS:
+        labels = _coarsen(levels[-1], rng)
+        if labels.max() + 1 > 0.95 * levels[-1].shape[0]:
+            break
+        mappings.append(labels)
+        levels.append(_prolong_adjacency(levels[-1], labels))
+
+    known = None
+    if initial:
+        known = np.array([initial.get(int(graph.node_ids[i])) is not None for i in connected], dtype=bool)
+
+    if known is not None and len(connected) and known.mean() >= 0.5:
+        # Incremental: start from the previous positions, place new nodes next to known neighbors
+        pos = np.zeros((len(connected), 2))
+        pos[known] = [initial[int(graph.node_ids[i])] for i in connected[known]]
+        neighbor_sum = adj @ np.where(known[:, None], pos, 0.0)
+        neighbor_count = adj @ known.astype(np.float64)
+        new = ~known
+        placed = new & (neighbor_count > 0)
+        pos[placed] = neighbor_sum[placed] / neighbor_count[placed][:, None]
+        pos[new] += rng.normal(scale=0.01, size=(int(new.sum()), 2))
+        pos = _force_directed(adj, _normalize(pos) * 0.5, REFINE_ITERATIONS,
+                              temperature=0.5 / np.sqrt(len(connected)))
+    elif len(connected):
+        pos = rng.random((levels[-1].shape[0], 2))
+        pos = _force_directed(levels[-1], pos, COARSEST_ITERATIONS, temperature=0.1)
+        for level, labels in zip(reversed(levels[:-1]), reversed(mappings)):
+            k = 1.0 / np.sqrt(level.shape[0])
+            pos = _normalize(pos)[labels] * 0.5 + rng.normal(scale=k * 0.1, size=(level.shape[0], 2))
+            pos = _force_directed(level, pos, REFINE_ITERATIONS, temperature=2 * k)
+    else:
+        pos = np.zeros((0, 2))
+
+    positions = np.zeros((n, 2), dtype=np.float32)
+    positions[connected] = _normalize(pos)
+
+    # Isolated concepts go on a ring around the connected layout
+    if len(isolated):
+        angles = np.linspace(0, 2 * np.pi, len(isolated), endpoint=False)
+        positions[isolated] = np.column_stack((np.cos(angles), np.sin(angles))) * 1.1
+        positions = positions / 1.1
+
+    # Cluster labels per level in node-index space (isolated nodes share one extra cluster)
+    hierarchy = []
+    current = np.arange(len(connected))
+    for depth in range(len(mappings) + 1):
+        if depth:
+            current = mappings[depth - 1][current]
+        full = np.full(n, current.max() + 1 if len(current) else 0, dtype=np.int64)
+        full[connected] = current
+        hierarchy.append(full)
+
+    return GraphLayout(graph.node_ids, positions, hierarchy, graph.version,
+                       compute_seconds=time.time() - start_time)
+
+
+# ----------------------------------------------------------------------
+# Persistence
+# ----------------------------------------------------------------------
+
+def ensure_layout_table(cursor: sqlite3.Cursor) -> None:
+    """Create the layout table if it does not exist"""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LAYOUT_TABLE} (
+            graph_version TEXT PRIMARY KEY,
+            node_count INTEGER NOT NULL,
+            compute_seconds REAL,
+            created_at REAL NOT NULL,
+            data BLOB NOT NULL
+        )
+    """)
+
+
+def load_layout(version: str, db_path: Optional[str] = None) -> Optional[GraphLayout]:
+    """Load a persisted layout for a graph version, or None"""
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        ensure_layout_table(cursor)
+        cursor.execute(f"SELECT data, compute_seconds FROM {LAYOUT_TABLE} WHERE graph_version = ?",
+                       (version,))
+        row = cursor.fetchone()
+        return GraphLayout.from_bytes(row[0], version, row[1] or 0.0) if row else None
+    finally:
+        conn.close()
+
+
+def load_previous_layout(version: str, db_path: Optional[str] = None) -> Optional[GraphLayout]:
+    """Most recent layout built with the same graph parameters (any data generation)"""
+    params = version.split("-", 1)[-1]
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        ensure_layout_table(cursor)
+        cursor.execute(f"""
+            SELECT graph_version, data FROM {LAYOUT_TABLE}
+            WHERE graph_version LIKE ? AND graph_version != ?
+            ORDER BY created_at DESC LIMIT 1
+        """, (f"%-{params}", version))
+        row = cursor.fetchone()
+        return GraphLayout.from_bytes(row[1], row[0]) if row else None
+    finally:
+        conn.close()
+
+
+def save_layout(layout: GraphLayout, db_path: Optional[str] = None) -> None:
+    """Persist a layout and drop all but the KEEP_VERSIONS most recent ones"""
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        ensure_layout_table(cursor)
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO {LAYOUT_TABLE}
+                (graph_version, node_count, compute_seconds, created_at, data)
+            VALUES (?, ?, ?, ?, ?)
+        """, (layout.version, len(layout.node_ids), layout.compute_seconds,
+              time.time(), layout.to_bytes()))
+        cursor.execute(f"""
+            DELETE FROM {LAYOUT_TABLE} WHERE graph_version NOT IN (
+                SELECT graph_version FROM {LAYOUT_TABLE} ORDER BY created_at DESC LIMIT ?
+            )
+        """, (KEEP_VERSIONS,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+_layouts = OrderedDict()
+_layouts_lock = threading.Lock()
+
+
+def get_layout(graph: CompactGraph, db_path: Optional[str] = None) -> GraphLayout:
+    """
+    Layout for a graph: from memory, from the database, or computed and persisted
+
+    Graphs without a version (built from NetworkX) are laid out without persistence.
+    """
+    if not graph.version:
+        return compute_layout(graph)
+
+    with _layouts_lock:
+        if graph.version in _layouts:
+            _layouts.move_to_end(graph.version)
+            return _layouts[graph.version]
+
+    layout = None
+    try:
+        layout = load_layout(graph.version, db_path)
+    except Exception as e:
+        logger.warning(f"Could not load persisted layout: {str(e)}")
+
+    if layout is None:
+        initial = None
+        try:
+            previous = load_previous_layout(graph.version, db_path)
+            if previous is not None:
+                initial = previous.positions_by_id()
+        except Exception as e:
+            logger.warning(f"Could not load previous layout: {str(e)}")
+
+        layout = compute_layout(graph, initial=initial)
+        logger.info(f"Computed layout for {graph.number_of_nodes()} nodes in {layout.compute_seconds:.2f}s"
+                    f"{' (incremental)' if initial else ''}")
+        try:
+            save_layout(layout, db_path)
+        except Exception as e:
+            logger.warning(f"Could not persist layout: {str(e)}")
+
+    with _layouts_lock:
+        _layouts[graph.version] = layout
+        while len(_layouts) > KEEP_VERSIONS:
+            _layouts.popitem(last=False)
+    return layout
+
+
+# ----------------------------------------------------------------------
+# Level of detail
+# ----------------------------------------------------------------------
+
+def top_k_edges(graph: CompactGraph, k: int) -> np.ndarray:
+    """Edge positions of the k most confident outgoing edges of every node"""
+    sources = graph.edge_sources()
+    order = np.lexsort((-graph.confidence, sources))
+    rank = np.arange(len(order)) - graph.indptr[sources[order]]
+    return np.sort(order[rank < k])
+
+
+def level_of_detail(graph: CompactGraph, layout: GraphLayout,
+                    max_nodes: int = LOD_MAX_NODES, top_k: int = LOD_TOP_K_EDGES,
+                    communities: Optional[Dict[int, int]] = None) -> Dict[str, Any]:
+    """
+    Reduce a graph to at most max_nodes drawable nodes
+
+    Small graphs keep every node with their top-k edges. Larger graphs are
+    collapsed into cluster super-nodes (given communities, or clusters from
+    the layout hierarchy) placed at their members' centroid, with the top-k
+    aggregated edges per super-node.
+
+    Returns:
+        Dictionary with 'nodes' and 'edges' lists and an 'aggregated' flag
+    """
+    n = graph.number_of_nodes()
+    positions = layout.positions
+    sources = graph.edge_sources()
+
+    if n <= max_nodes:
+        kept = top_k_edges(graph, top_k)
+        nodes = [
+            dict(graph.node_attributes(i), id=int(graph.node_ids[i]),
+                 x=float(positions[i, 0]), y=float(positions[i, 1]), members=1)
+            for i in range(n)
+        ]
+        edges = [
+            {"source": int(graph.node_ids[sources[pos]]),
+             "target": int(graph.node_ids[graph.indices[pos]]),
+             "relationship": graph.rel_types[graph.rel_codes[pos]],
+             "confidence": float(graph.confidence[pos]),
+             "count": 1}
+            for pos in kept
+        ]
+        return {"nodes": nodes, "edges": edges, "aggregated": False}
+
+    if communities:
+        raw = np.array([communities.get(int(node_id), -1) for node_id in graph.node_ids])
+        labels = np.unique(raw, return_inverse=True)[1]
+        # Too many communities: fall back to the layout clusters
+        if labels.max() + 1 > max_nodes:
+            labels = layout.clusters(max_nodes)
+    else:
+        labels = layout.clusters(max_nodes)
+    m = int(labels.max()) + 1 if n else 0
+
+    size = np.bincount(labels, minlength=m)
+    refs = np.bincount(labels, weights=graph.node_reference_counts, minlength=m)
+    cx = np.bincount(labels, weights=positions[:, 0], minlength=m) / np.maximum(size, 1)
+    cy = np.bincount(labels, weights=positions[:, 1], minlength=m) / np.maximum(size, 1)
+
+    # Label each super-node with its most referenced member
+    order = np.lexsort((-graph.node_reference_counts, labels))
+    first = np.searchsorted(labels[order], np.arange(m))
+    representatives = order[np.minimum(first, n - 1)]
+
+    nodes = []
+    for c in range(m):
+        if not size[c]:
+            continue
+        rep = representatives[c]
+        nodes.append({
+            "id": int(c),
+            "name": f"{graph.names[rep]} (+{size[c] - 1})" if size[c] > 1 else graph.names[rep],
+            "category": graph.categories[rep],
+            "description": None,
+            "reference_count": int(refs[c]),
+            "members": int(size[c]),
+            "x": float(cx[c]),
+            "y": float(cy[c])
+        })
+
+    # Aggregate edges between clusters
+    cs, ct = labels[sources], labels[graph.indices]
+    between = cs != ct
+    keys = cs[between] * m + ct[between]
+    pair_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    confidence = np.bincount(inverse, weights=graph.confidence[between]) / np.maximum(counts, 1)
+    pair_sources, pair_targets = pair_keys // m, pair_keys % m
+
+    order = np.lexsort((-counts, pair_sources))
+    row_start = np.searchsorted(pair_sources[order], pair_sources[order])
+    kept = order[np.arange(len(order)) - row_start < top_k]
+
+    edges = [
+        {"source": int(pair_sources[i]), "target": int(pair_targets[i]),
+         "relationship": "aggregated", "confidence": float(confidence[i]), "count": int(counts[i])}
+        for i in kept
+    ]
+    return {"nodes": nodes, "edges": edges, "aggregated": True}
+
+
+def main():
+    """Main function for direct script execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concept graph layout")
+    parser.add_argument("--min-confidence", type=float, default=0.5, help="Minimum relationship confidence")
+    parser.add_argument("--recompute", action="store_true", help="Ignore persisted layouts")
+    args = parser.parse_args()
+
+    graph = CompactGraph.from_database(min_confidence=args.min_confidence)
+    start_time = time.time()
+    layout = compute_layout(graph) if args.recompute else get_layout(graph)
+    print(f"Layout for {graph.number_of_nodes()} nodes / {graph.number_of_edges()} edges "
+          f"ready in {time.time() - start_time:.2f}s (computed in {layout.compute_seconds:.2f}s)")
+    print(f"Hierarchy levels: {[len(np.unique(labels)) for labels in layout.hierarchy]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Bounded, ranked path search on the compact concept graph
+
+Paths are produced lazily in order of total -log(confidence) with Yen's
+k-shortest simple paths algorithm, so the most trustworthy chains of
+relationships come first and enumeration stops as soon as enough paths
+have been found. A bidirectional BFS first checks that the target is
+reachable within the hop limit, and every search runs under a time
+budget so the worst-case latency stays bounded on dense graphs.
+"""
+import heapq
+import logging
+import math
+import time
+import weakref
+from typing import Iterator, List, Optional, Set, Tuple
+
+from graph_engine import CompactGraph
+
+logger = logging.getLogger('graph_paths')
+
+# Same hop limit as the previous all_simple_paths(cutoff=6) search
+DEFAULT_MAX_HOPS = 6
+# Wall-clock budget for one path search, in seconds
+DEFAULT_TIME_BUDGET = 1.0
+# Confidence floor so that -log(confidence) stays finite
+MIN_CONFIDENCE = 1e-6
+
+# (total weight, node indices, edge positions)
+Path = Tuple[float, Tuple[int, ...], Tuple[int, ...]]
+
+
+class SearchBudgetExceeded(Exception):
+    """Raised internally when a path search runs out of time"""
+
+
+class PathFinder:
+    """Shortest-path searches over a CompactGraph, using plain lists for fast Python loops"""
+
+    def __init__(self, graph: CompactGraph):
+        """
+        Prepare adjacency lists and edge weights
+
+        Args:
+            graph: Compact concept graph
+        """
+        self.graph = graph
+        self.indptr = graph.indptr.tolist()
+        self.indices = graph.indices.tolist()
+        self.weights = [-math.log(min(max(c, MIN_CONFIDENCE), 1.0))
+                        for c in graph.confidence.tolist()]
+
+        rev_indptr, rev_sources, _ = graph.reverse()
+        self.rev_indptr = rev_indptr.tolist()
+        self.rev_sources = rev_sources.tolist()
+
+    def hop_distance(self, source: int, target: int, max_hops: int) -> Optional[int]:
+        """
+        Number of hops on the shortest path via bidirectional BFS
+
+        Args:
+            source: Source node index
+            target: Target node index
+            max_hops: Give up beyond this many hops
+
+        Returns:
+            Hop count, or None if the target is not reachable within max_hops
+        """
+        if source == target:
+            return 0
+
+        forward = {source: 0}
+        backward = {target: 0}
+        forward_frontier = [source]
+        backward_frontier = [target]
+        forward_depth = backward_depth = 0
+
+        while forward_frontier and backward_frontier and forward_depth + backward_depth < max_hops:
+            # Expand the smaller frontier
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_depth += 1
+                next_frontier = []
+                for u in forward_frontier:
+                    for pos in range(self.indptr[u], self.indptr[u + 1]):
+                        v = self.indices[pos]
+                        if v in backward:
+                            return forward_depth + backward[v]
+                        if v not in forward:
+                            forward[v] = forward_depth
+                            next_frontier.append(v)
+                forward_frontier = next_frontier
+            else:
+                backward_depth += 1
+                next_frontier = []
+                for v in backward_frontier:
+                    for pos in range(self.rev_indptr[v], self.rev_indptr[v + 1]):
+                        u = self.rev_sources[pos]
+                        if u in forward:
+                            return backward_depth + forward[u]
+                        if u not in backward:
+                            backward[u] = backward_depth
+                            next_frontier.append(u)
+                backward_frontier = next_frontier
+
+        return None
+
+    def shortest_path(self, source: int, target: int, max_hops: int,
+                      blocked_nodes: Set[int] = frozenset(),
+                      blocked_edges: Set[int] = frozenset(),
+                      deadline: Optional[float] = None) -> Optional[Path]:
+        """
+        Lowest-weight path within max_hops, avoiding blocked nodes and edges
+
+        Dijkstra runs over (node, hops) states rather than nodes, ordered by
+        (weight, hops): a node reached cheaply over many hops must not hide
+        a slightly heavier route with fewer hops that still fits the limit.
+        A state is skipped once its node was settled with no more hops
+        (that earlier state was also no heavier).
+
+        Returns:
+            (weight, node indices, edge positions), or None if there is no path
+        """
+        best = {(source, 0): 0.0}
+        parent = {(source, 0): None}
+        heap = [(0.0, 0, source)]
+        # Fewest hops among the settled states of each node
+        fewest_hops = {}
+        popped = 0
+
+        while heap:
+            dist, h, u = heapq.heappop(heap)
+            if fewest_hops.get(u, max_hops + 1) <= h:
+                continue
+            fewest_hops[u] = h
+
+            if u == target:
+                state = (u, h)
+                nodes, edges = [u], []
+                while parent[state] is not None:
+                    u, h, pos = parent[state]
+                    nodes.append(u)
+                    edges.append(pos)
+                    state = (u, h)
+                return dist, tuple(reversed(nodes)), tuple(reversed(edges))
+
+            popped += 1
+            if deadline is not None and popped % 256 == 0 and time.time() > deadline:
+                raise SearchBudgetExceeded()
+
+            if h >= max_hops:
+                continue
+
+            for pos in range(self.indptr[u], self.indptr[u + 1]):
+                v = self.indices[pos]
+                if v in blocked_nodes or pos in blocked_edges or fewest_hops.get(v, max_hops + 1) <= h + 1:
+                    continue
+                state = (v, h + 1)
+                candidate = dist + self.weights[pos]
+                if candidate < best.get(state, math.inf):
+                    best[state] = candidate
+                    parent[state] = (u, h, pos)
+                    heapq.heappush(heap, (candidate, h + 1, v))
+
+        return None
+
+    def k_shortest_paths(self, source: int, target: int,
+                         max_hops: int = DEFAULT_MAX_HOPS,
+                         time_budget: Optional[float] = DEFAULT_TIME_BUDGET) -> Iterator[Path]:
+        """
+        Yield simple paths in increasing -log(confidence) weight (Yen's algorithm)
+
+        Stops early when the time budget runs out; the paths yielded so far
+        are still valid and correctly ordered.
+
+        Args:
+            source: Source node index
+            target: Target node index
+            max_hops: Maximum number of edges per path
+            time_budget: Seconds allowed for the whole enumeration (None for no limit)
+        """
+        deadline = time.time() + time_budget if time_budget is not None else None
+
+        if source == target or self.hop_distance(source, target, max_hops) is None:
+            return
+
+        try:
+            first = self.shortest_path(source, target, max_hops, deadline=deadline)
+            if first is None:
+                return
+
+            accepted = [first]
+            seen = {first[1]}
+            candidates = []
+            yield first
+
+            while True:
+                _, prev_nodes, prev_edges = accepted[-1]
+
+                for i in range(len(prev_nodes) - 1):
+                    spur = prev_nodes[i]
+                    root_nodes = prev_nodes[:i + 1]
+                    root_weight = sum(self.weights[pos] for pos in prev_edges[:i])
+
+                    # Remove the next edge of every accepted path sharing this root
+                    blocked_edges = {edges[i] for _, nodes, edges in accepted
+                                     if len(edges) > i and nodes[:i + 1] == root_nodes}
+                    blocked_nodes = set(root_nodes[:-1])
+
+                    spur_path = self.shortest_path(spur, target, max_hops - i,
+                                                   blocked_nodes, blocked_edges, deadline)
+                    if spur_path is None:
+                        continue
+
+                    weight, spur_nodes, spur_edges = spur_path
+                    nodes = root_nodes[:-1] + spur_nodes
+                    if nodes not in seen:
+                        seen.add(nodes)
+                        heapq.heappush(candidates, (root_weight + weight, nodes,
+                                                    prev_edges[:i] + spur_edges))
+
+                if not candidates:
+                    return
+
+                path = heapq.heappop(candidates)
+                accepted.append(path)
+                yield path
+
+        except SearchBudgetExceeded:
+            logger.warning(f"Path search between node {source} and {target} "
+                           f"stopped after {time_budget}s time budget")
+
+
+_finders = weakref.WeakKeyDictionary()
+
+
+def get_path_finder(graph: CompactGraph) -> PathFinder:
+    """Return the PathFinder for a graph, reusing it while the graph is alive"""
+    finder = _finders.get(graph)
+    if finder is None:
+        finder = PathFinder(graph)
+        _finders[graph] = finder
+    return finder
+
+
+def find_paths(graph: CompactGraph, source_id: int, target_id: int, max_paths: int = 3,
+               max_hops: int = DEFAULT_MAX_HOPS,
+               time_budget: Optional[float] = DEFAULT_TIME_BUDGET) -> List[Path]:
+    """
+    Up to max_paths most confident simple paths between two concepts
+
+    Args:
+        graph: Compact concept graph
+        source_id: Source concept ID
+        target_id: Target concept ID
+        max_paths: Maximum number of paths to return
+        max_hops: Maximum number of edges per path
+        time_budget: Seconds allowed for the search (None for no limit)
+
+    Returns:
+        List of (weight, node indices, edge positions), best first
+    """
+    source = graph.index_of(source_id)
+    target = graph.index_of(target_id)
+    if source is None or target is None or max_paths <= 0:
+        return []
+
+    paths = []
+    for path in get_path_finder(graph).k_shortest_paths(source, target, max_hops, time_budget):
+        paths.append(path)
+        if len(paths) >= max_paths:
+            break
+    return paths
@@ -0,0 +1,414 @@
+"""
+Graph-expansion retrieval stage for hybrid search
+
+Query terms are matched against concept names with a token-level
+Aho-Corasick automaton, the matched concepts are expanded 1-2 hops over
+the compact concept graph, and content linked to the reached concepts is
+returned with scores that decay with every hop and with relationship
+confidence. The whole stage runs under a per-query time budget and the
+in-memory index is rebuilt in the background when the data generation
+changes.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Import local modules
+import config
+from graph_engine import CompactGraph, gather_ranges
+from response_cache import read_data_generation, GENERATION_CHECK_INTERVAL
+
+logger = logging.getLogger('graph_retrieval')
+
+# Expansion defaults
+DEFAULT_MAX_HOPS = 2
+DEFAULT_HOP_DECAY = 0.5
+DEFAULT_TIME_BUDGET_MS = 50
+DEFAULT_MAX_CONTENT = 50
+# Concepts scoring below this are not expanded further
+MIN_CONCEPT_SCORE = 0.05
+# Only follow relationships at least this confident
+MIN_EDGE_CONFIDENCE = 0.5
+# Seed score for a concept whose name is contained in a longer matched name
+SUBSUMED_MATCH_SCORE = 0.5
+
+# Weight of a content-concept link by the importance assigned at extraction
+IMPORTANCE_WEIGHTS = {"high": 1.0, "medium": 0.7, "low": 0.4}
+DEFAULT_IMPORTANCE_WEIGHT = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for both concept names and queries"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class ConceptMatcher:
+    """Token-level Aho-Corasick automaton over concept names"""
+
+    def __init__(self, names: Iterable[Tuple[int, str]]):
+        """
+        Build the automaton
+
+        Args:
+            names: (node index, concept name) pairs
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        # Per state: list of (pattern length in tokens, node index)
+        self._output = [[]]
+
+        for index, name in names:
+            tokens = tokenize(name or "")
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][token] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append((len(tokens), index))
+
+        # Breadth-first failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def match(self, text: str) -> Dict[int, float]:
+        """
+        Find concept names occurring in a text
+
+        Args:
+            text: Query text
+
+        Returns:
+            Mapping of node index to seed score (lower for names covered by a longer match)
+        """
+        spans = []
+        state = 0
+        for position, token in enumerate(tokenize(text)):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, index in self._output[state]:
+                spans.append((position - length + 1, position, index))
+
+        seeds = {}
+        for start, end, index in spans:
+            subsumed = any(s <= start and end <= e and (e - s) > (end - start)
+                           for s, e, _ in spans)
+            score = SUBSUMED_MATCH_SCORE if subsumed else 1.0
+            seeds[index] = max(seeds.get(index, 0.0), score)
+        return seeds
+
+
+class GraphExpander:
+    """In-memory concept matcher, concept graph and concept-to-content links"""
+
+    def __init__(self, db_path: Optional[str] = None, min_confidence: float = MIN_EDGE_CONFIDENCE):
+        """
+        Load the concept graph and content links from the database
+
+        Args:
+            db_path: Path to SQLite database (defaults to config.DB_PATH)
+            min_confidence: Minimum relationship confidence to follow
+        """
+        self.db_path = db_path or config.DB_PATH
+        start_time = time.time()
+
+        self.graph = CompactGraph.from_database(self.db_path, min_confidence=min_confidence)
+        self.matcher = ConceptMatcher(enumerate(self.graph.names))
+        self._rev_indptr, self._rev_sources, self._rev_positions = self.graph.reverse()
+        self._load_content_links()
+
+        logger.info(f"Built graph expansion index for {self.graph.number_of_nodes()} concepts, "
+                    f"{len(self.link_content_ids)} content links "
+                    f"in {time.time() - start_time:.2f}s")
+
+    def _load_content_links(self) -> None:
+        """Concept-to-content links as CSR arrays indexed by node position"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT concept_id, content_id, importance FROM content_concepts")
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        nodes, content_ids, weights = [], [], []
+        for concept_id, content_id, importance in rows:
+            index = self.graph.index_of(concept_id)
+            if index is None:
+                continue
+            nodes.append(index)
+            content_ids.append(content_id)
+            weights.append(IMPORTANCE_WEIGHTS.get((importance or "").lower(), DEFAULT_IMPORTANCE_WEIGHT))
+
+        nodes = np.asarray(nodes, dtype=np.int64)
+        order = np.argsort(nodes, kind='stable')
+        self.link_content_ids = np.asarray(content_ids, dtype=np.int64)[order]
+        self.link_weights = np.asarray(weights, dtype=np.float32)[order]
+        self.link_indptr = np.zeros(self.graph.number_of_nodes() + 1, dtype=np.int64)
+        np.cumsum(np.bincount(nodes, minlength=self.graph.number_of_nodes()), out=self.link_indptr[1:])
+
+    def expand_concepts(self, seeds: Dict[int, float], max_hops: int, decay: float,
+                        deadline: float) -> np.ndarray:
+        """
+        Spread seed scores over relationships in both directions, one hop per step
+
+        Returns:
+            Best score reached per node index (0 for unreached nodes)
+        """
+        graph = self.graph
+        scores = np.zeros(graph.number_of_nodes())
+        scores[list(seeds)] = list(seeds.values())
+        frontier = np.fromiter(seeds, dtype=np.int64)
+
+        for _ in range(max_hops):
+            if time.time() > deadline:
+                break
+
+            out_sources, out_positions = gather_ranges(graph.indptr, frontier)
+            in_targets, in_positions = gather_ranges(self._rev_indptr, frontier)
+            origins = np.concatenate((out_sources, in_targets))
+            neighbors = np.concatenate((graph.indices[out_positions],
+                                        self._rev_sources[in_positions])).astype(np.int64)
+            confidence = np.concatenate((graph.confidence[out_positions],
+                                         graph.confidence[self._rev_positions[in_positions]]))
+
+            reached = scores[origins] * decay * confidence
+            keep = reached >= MIN_CONCEPT_SCORE
+            best = np.zeros_like(scores)
+            np.maximum.at(best, neighbors[keep], reached[keep])
+
+            improved = best > scores
+            if not improved.any():
+                break
+            scores[improved] = best[improved]
+            frontier = np.nonzero(improved)[0]
+
+        return scores
+
+    def expand(self, query: str, max_hops: int = DEFAULT_MAX_HOPS,
+               decay: float = DEFAULT_HOP_DECAY,
+               time_budget_ms: float = DEFAULT_TIME_BUDGET_MS,
+               max_content: int = DEFAULT_MAX_CONTENT) -> Dict[int, Dict[str, Any]]:
+        """
+        Content reachable from the concepts named in a query
+
+        Args:
+            query: Search query
+            max_hops: Relationship hops to follow from matched concepts
+            decay: Score multiplier per hop (also scaled by relationship confidence)
+            time_budget_ms: Time allowed for matching and expansion
+            max_content: Maximum number of content items to return
+
+        Returns:
+            Mapping of content_id to {'score', 'concept_id'} for the best-scoring link
+        """
+        deadline = time.time() + time_budget_ms / 1000.0
+
+        seeds = self.matcher.match(query)
+        if not seeds:
+            return {}
+
+        concept_scores = self.expand_concepts(seeds, max_hops, decay, deadline)
+
+        nodes, positions = gather_ranges(self.link_indptr, np.nonzero(concept_scores)[0])
+        if not len(positions):
+            return {}
+        link_scores = concept_scores[nodes] * self.link_weights[positions]
+        content_ids = self.link_content_ids[positions]
+
+        # Highest-scoring link per content item, then the overall top max_content
+        order = np.argsort(-link_scores, kind='stable')
+        _, first = np.unique(content_ids[order], return_index=True)
+        best = order[first]
+        if len(best) > max_content:
+            best = best[np.argpartition(-link_scores[best], max_content - 1)[:max_content]]
+        best = best[np.argsort(-link_scores[best], kind='stable')]
+
+        return {
+            int(self.link_content_ids[positions[i]]): {
+                "score": float(link_scores[i]),
+                "concept_id": int(self.graph.node_ids[nodes[i]])
+            }
+            for i in best
+        }
+
+
+_expander = None
+_expander_generation = None
+_expander_checked = 0.0
+_expander_rebuilding = False
+_expander_lock = threading.Lock()
+
+
+def _rebuild_expander(db_path: Optional[str], generation: int) -> None:
+    """Build a new expander and swap it in (runs on a background thread)"""
+    global _expander, _expander_generation, _expander_rebuilding
+    try:
+        expander = GraphExpander(db_path)
+    except Exception as e:
+        logger.warning(f"Rebuilding the graph expansion index failed: {str(e)}")
+        expander = None
+    with _expander_lock:
+        if expander is not None:
+            _expander = expander
+            _expander_generation = generation
+        _expander_rebuilding = False
+
+
+def get_graph_expander(db_path: Optional[str] = None) -> GraphExpander:
+    """
+    Return the process-wide expander
+
+    Only the first call builds the index in the request. After the data
+    generation changes, the index is rebuilt on a background thread and
+    the previous one keeps serving queries until the new one is ready;
+    most generation bumps (new papers, repositories, embeddings) do not
+    touch concepts at all.
+    """
+    global _expander, _expander_generation, _expander_checked, _expander_rebuilding
+
+    now = time.time()
+    if _expander is not None and now - _expander_checked < GENERATION_CHECK_INTERVAL:
+        return _expander
+
+    with _expander_lock:
+        generation = read_data_generation(db_path)[0]
+        _expander_checked = now
+        if _expander is None:
+            _expander = GraphExpander(db_path)
+            _expander_generation = generation
+        elif generation != _expander_generation and not _expander_rebuilding:
+            _expander_rebuilding = True
+            threading.Thread(target=_rebuild_expander, args=(db_path, generation),
+                             name="graph-expander-rebuild", daemon=True).start()
+        return _expander
+
+
+def expand_query_through_graph(query: str, max_hops: int = DEFAULT_MAX_HOPS,
+                               decay: float = DEFAULT_HOP_DECAY,
+                               time_budget_ms: float = DEFAULT_TIME_BUDGET_MS,
+                               max_content: int = DEFAULT_MAX_CONTENT) -> Dict[int, Dict[str, Any]]:
+    """
+    Graph-expansion candidates for a query (see GraphExpander.expand)
+
+    Returns an empty mapping when the concept tables are missing or empty.
+    """
+    try:
+        expander = get_graph_expander()
+    except Exception as e:
+        logger.warning(f"Graph expansion unavailable: {str(e)}")
+        return {}
+    return expander.expand(query, max_hops=max_hops, decay=decay,
+                           time_budget_ms=time_budget_ms, max_content=max_content)
+
+
+def benchmark_expansion(queries: List[str], **params) -> Dict[str, Any]:
+    """
+    Measure the latency added by graph expansion
+
+    Args:
+        queries: Queries to expand
+        **params: Arguments passed to GraphExpander.expand
+
+    Returns:
+        Dictionary with index build time and per-query latency percentiles (ms)
+    """
+    start_time = time.time()
+    expander = GraphExpander()
+    build_time = time.time() - start_time
+
+    latencies = []
+    candidates = []
+    for query in queries:
+        start_time = time.time()
+        results = expander.expand(query, **params)
+        latencies.append((time.time() - start_time) * 1000)
+        candidates.append(len(results))
+
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "concepts": expander.graph.number_of_nodes(),
+        "automaton_states": len(expander.matcher),
+        "build_seconds": round(build_time, 3),
+        "queries": len(queries),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        "latency_ms_max": round(float(latencies.max()), 3),
+        "avg_candidates": round(sum(candidates) / len(candidates), 1) if candidates else 0
+    }
+
+
+def main():
+    """Main function for direct script execution"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Graph-expansion retrieval")
+    parser.add_argument("query", nargs="*", help="Queries to expand")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Measure expansion latency (uses the latest test dataset if no query is given)")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="Compare hybrid search recall with and without graph expansion")
+    parser.add_argument("--dataset-id", type=int, help="Test dataset for --benchmark/--evaluate")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query for --evaluate")
+    parser.add_argument("--max-hops", type=int, default=DEFAULT_MAX_HOPS, help="Relationship hops")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_TIME_BUDGET_MS, help="Time budget per query")
+
+    args = parser.parse_args()
+
+    if args.evaluate:
+        from evaluation.test_runner import RAGTestRunner
+        runner = RAGTestRunner()
+        dataset = runner.load_test_dataset(dataset_id=args.dataset_id)
+        if not dataset:
+            print("No test dataset found")
+            return
+        print(json.dumps(runner.compare_graph_expansion(dataset, top_k=args.top_k), indent=2))
+    elif args.benchmark:
+        queries = args.query
+        if not queries:
+            from evaluation.test_runner import RAGTestRunner
+            dataset = RAGTestRunner().load_test_dataset(dataset_id=args.dataset_id)
+            if not dataset:
+                print("No test dataset found")
+                return
+            queries = [q['query_text'] for q in dataset['queries']]
+        print(json.dumps(benchmark_expansion(queries, max_hops=args.max_hops,
+                                             time_budget_ms=args.budget_ms), indent=2))
+    else:
+        for query in args.query:
+            results = expand_query_through_graph(query, max_hops=args.max_hops,
+                                                 time_budget_ms=args.budget_ms)
+            print(f"\n{query}: {len(results)} content items")
+            for content_id, info in list(results.items())[:10]:
+                print(f"  content {content_id}: score {info['score']:.3f} via concept {info['concept_id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Shared on-disk HTTP cache with conditional requests
+
+The collectors fetch the same URLs on every run (repository info, READMEs,
+contents listings, arXiv pages). A session with the cache installed
+remembers the ETag and Last-Modified of every GET response that has one
+and sends them back as If-None-Match / If-Modified-Since. When the server
+answers 304 Not Modified, the response is rebuilt from the local body
+store, so callers see an ordinary 200. On GitHub a 304 does not count
+against the rate limit at all.
+
+Entries are kept in a small SQLite database (WAL mode, shared between
+processes) and bodies in a content-addressed directory next to it, one
+file per SHA-256. Streamed requests (large downloads) and bodies over
+HTTP_CACHE_MAX_BODY bytes are passed through untouched. Hits, misses and
+bytes saved are counted per host, for this process and in total.
+
+Usage:
+    session = install_http_cache(requests.Session())
+    python http_cache.py --stats | --prune | --clear
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import argparse
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import config
+
+logger = logging.getLogger('http_cache')
+
+HTTP_CACHE_DIR = os.path.join(config.DATA_DIR, 'cache', 'http')
+ENTRY_TABLE = 'http_cache_entries'
+HOST_TABLE = 'http_cache_hosts'
+# Largest body kept in the store (bytes)
+DEFAULT_MAX_BODY = 10 * 1024 * 1024
+# Seconds to wait for another process holding the write lock
+BUSY_TIMEOUT = 30.0
+# Headers that describe the transfer rather than the (decoded) body we store
+TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+def cache_key(url: str, accept: Optional[str]) -> str:
+    """Cache key of a GET request (the Accept header selects the representation)"""
+    return hashlib.sha256(f"GET {url}\n{accept or ''}".encode('utf-8')).hexdigest()
+
+
+class HTTPCache:
+    """Validator and body store shared by every cached session"""
+
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR, max_body: Optional[int] = None):
+        """
+        Open (and create) the cache
+
+        Args:
+            cache_dir: Directory of the database and the body store
+            max_body: Largest body to store in bytes (defaults to
+                config.HTTP_CACHE_MAX_BODY, then 10 MB)
+        """
+        self.cache_dir = cache_dir
+        self.body_dir = os.path.join(cache_dir, 'bodies')
+        self.max_body = max_body if max_body is not None else getattr(config, 'HTTP_CACHE_MAX_BODY', DEFAULT_MAX_BODY)
+        self._lock = threading.Lock()
+        # Per-host counters of this process
+        self._stats = {}
+
+        os.makedirs(self.body_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'http_cache.db'), timeout=BUSY_TIMEOUT,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {ENTRY_TABLE} (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                status INTEGER NOT NULL,
+                reason TEXT,
+                headers TEXT NOT NULL,
+                body_sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                validated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {HOST_TABLE} (
+                host TEXT PRIMARY KEY,
+                requests INTEGER NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0,
+                stored INTEGER NOT NULL DEFAULT 0,
+                bytes_saved INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.commit()
+
+    def _body_path(self, sha256: str) -> str:
+        return os.path.join(self.body_dir, sha256[:2], sha256)
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """
+        Stored entry for a cache key
+
+        Returns:
+            Dict with etag, last_modified, status, reason, headers,
+            body_sha256 and size, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT etag, last_modified, status, reason, headers, body_sha256, size "
+                f"FROM {ENTRY_TABLE} WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "status": row[2], "reason": row[3],
+                "headers": json.loads(row[4]), "body_sha256": row[5], "size": row[6]}
+
+    def read_body(self, entry: Dict) -> Optional[bytes]:
+        """Stored body of an entry, or None if it is missing or damaged"""
+        try:
+            with open(self._body_path(entry["body_sha256"]), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(body).hexdigest() != entry["body_sha256"]:
+            return None
+        return body
+
+    def store(self, key: str, url: str, response: requests.Response) -> bool:
+        """
+        Store a 200 response that carries a validator
+
+        Returns:
+            bool: True if the response was stored
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        body = response.content
+        if not (etag or last_modified) or len(body) > self.max_body:
+            return False
+
+        sha256 = hashlib.sha256(body).hexdigest()
+        path = self._body_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in TRANSFER_HEADERS}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {ENTRY_TABLE} "
+                f"(key, url, etag, last_modified, status, reason, headers, body_sha256, size, stored_at, validated_at) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, response.status_code, response.reason,
+                 json.dumps(headers), sha256, len(body), now, now)
+            )
+            self._conn.commit()
+        return True
+
+    def revalidated(self, key: str, not_modified: requests.Response, entry: Dict) -> CaseInsensitiveDict:
+        """
+        Merge the headers of a 304 into an entry and record the revalidation
+
+        Returns:
+            Headers for the response rebuilt from the entry
+        """
+        headers = CaseInsensitiveDict(entry["headers"])
+        for name, value in not_modified.headers.items():
+            if name.lower() not in TRANSFER_HEADERS:
+                headers[name] = value
+        headers['Content-Length'] = str(entry["size"])
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE {ENTRY_TABLE} SET etag = ?, last_modified = ?, headers = ?, validated_at = ? WHERE key = ?",
+                (headers.get('ETag'), headers.get('Last-Modified'), json.dumps(dict(headers)), time.time(), key)
+            )
+            self._conn.commit()
+        return headers
+
+    def record(self, host: str, hit: bool = False, stored: bool = False, bytes_saved: int = 0) -> None:
+        """Count a request to a host"""
+        with self._lock:
+            stats = self._stats.setdefault(host, {"requests": 0, "hits": 0, "stored": 0, "bytes_saved": 0})
+            stats["requests"] += 1
+            stats["hits"] += int(hit)
+            stats["stored"] += int(stored)
+            stats["bytes_saved"] += bytes_saved
+            self._conn.execute(f"INSERT OR IGNORE INTO {HOST_TABLE} (host) VALUES (?)", (host,))
+            self._conn.execute(
+                f"UPDATE {HOST_TABLE} SET requests = requests + 1, hits = hits + ?, stored = stored + ?, "
+                f"bytes_saved = bytes_saved + ? WHERE host = ?",
+                (int(hit), int(stored), bytes_saved, host)
+            )
+            self._conn.commit()
+
+    def stats(self, total: bool = False) -> Dict[str, Dict]:
+        """
+        Per-host counters
+
+        Args:
+            total: Counters of every run instead of this process
+
+        Returns:
+            Dict host -> requests, hits, stored, bytes_saved and hit_rate
+        """
+        with self._lock:
+            if total:
+                rows = self._conn.execute(
+                    f"SELECT host, requests, hits, stored, bytes_saved FROM {HOST_TABLE} ORDER BY host"
+                ).fetchall()
+                stats = {row[0]: {"requests": row[1], "hits": row[2], "stored": row[3], "bytes_saved": row[4]}
+                         for row in rows}
+            else:
+                stats = {host: dict(counts) for host, counts in sorted(self._stats.items())}
+        for counts in stats.values():
+            counts["hit_rate"] = round(counts["hits"] / counts["requests"], 3) if counts["requests"] else 0.0
+        return stats
+
+    def log_stats(self) -> None:
+        """Log the hit rate of each host contacted by this process"""
+        for host, counts in self.stats().items():
+            logger.info(f"HTTP cache {host}: {counts['hits']}/{counts['requests']} not modified "
+                        f"({counts['hit_rate']:.0%}), {counts['stored']} stored, "
+                        f"{counts['bytes_saved'] / 1e6:.1f} MB not transferred")
+
+    def prune(self) -> int:
+        """
+        Delete bodies no entry refers to
+
+        Returns:
+            int: Number of files deleted
+        """
+        with self._lock:
+            referenced = {row[0] for row in self._conn.execute(f"SELECT body_sha256 FROM {ENTRY_TABLE}")}
+        deleted = 0
+        for root, _, files in os.walk(self.body_dir):
+            for name in files:
+                if name not in referenced:
+                    os.remove(os.path.join(root, name))
+                    deleted += 1
+        return deleted
+
+    def clear(self) -> None:
+        """Delete every entry, body and counter"""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {ENTRY_TABLE}")
+            self._conn.execute(f"DELETE FROM {HOST_TABLE}")
+            self._conn.commit()
+            self._stats.clear()
+        self.prune()
+
+
+class CachingAdapter(HTTPAdapter):
+    """Transport adapter that revalidates GET responses against an HTTPCache"""
+
+    def __init__(self, cache: HTTPCache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, stream=False, **kwargs):
+        host = urlparse(request.url).hostname or ''
+        # Leave streamed downloads, partial and already conditional requests alone
+        if request.method != 'GET' or stream or any(
+                name in request.headers for name in ('Range', 'If-None-Match', 'If-Modified-Since')):
+            return super().send(request, stream=stream, **kwargs)
+
+        key = cache_key(request.url, request.headers.get('Accept'))
+        entry = self.cache.lookup(key)
+        if entry:
+            if entry["etag"]:
+                request.headers['If-None-Match'] = entry["etag"]
+            if entry["last_modified"]:
+                request.headers['If-Modified-Since'] = entry["last_modified"]
+
+        response = super().send(request, stream=stream, **kwargs)
+
+        if response.status_code == 304 and entry:
+            body = self.cache.read_body(entry)
+            if body is not None:
+                response.close()
+                cached = requests.Response()
+                cached.status_code = entry["status"]
+                cached.reason = entry["reason"]
+                cached.headers = self.cache.revalidated(key, response, entry)
+                cached._content = body
+                cached.encoding = get_encoding_from_headers(cached.headers)
+                cached.url = response.url
+                cached.request = request
+                cached.connection = self
+                cached.elapsed = response.elapsed
+                cached.from_cache = True
+                self.cache.record(host, hit=True, bytes_saved=len(body))
+                return cached
+            # Body lost: ask again without validators
+            logger.warning(f"Cached body of {request.url} is missing, refetching")
+            response.close()
+            request.headers.pop('If-None-Match', None)
+            request.headers.pop('If-Modified-Since', None)
+            response = super().send(request, stream=stream, **kwargs)
+
+        stored = False
+        if response.status_code == 200:
+            try:
+                stored = self.cache.store(key, request.url, response)
+            except Exception as e:
+                logger.warning(f"Could not cache {request.url}: {str(e)}")
+        self.cache.record(host, stored=stored)
+        return response
+
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> HTTPCache:
+    """Shared HTTP cache of this process"""
+    global _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HTTPCache()
+        return _http_cache
+
+
+def install_http_cache(session: requests.Session, cache: Optional[HTTPCache] = None) -> requests.Session:
+    """
+    Route a session's http(s) requests through the shared HTTP cache
+
+    Disabled with HTTP_CACHE_ENABLED = False in config.py.
+
+    Args:
+        session: Session to install the cache on
+        cache: Cache to use (defaults to the shared one)
+
+    Returns:
+        The same session
+    """
+    if not getattr(config, 'HTTP_CACHE_ENABLED', True):
+        return session
+    try:
+        adapter = CachingAdapter(cache or get_http_cache())
+    except Exception as e:
+        logger.warning(f"HTTP cache unavailable, requests will not be cached: {str(e)}")
+        return session
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def log_http_cache_stats() -> None:
+    """Log per-host hit rates if the cache was used by this process"""
+    if _http_cache is not None:
+        _http_cache.log_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clean the shared HTTP cache")
+    parser.add_argument('--stats', action='store_true', help="Show per-host hit rates of all runs")
+    parser.add_argument('--prune', action='store_true', help="Delete bodies no entry refers to")
+    parser.add_argument('--clear', action='store_true', help="Delete every cached response")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    cache = get_http_cache()
+    if args.clear:
+        cache.clear()
+        logger.info("HTTP cache cleared")
+    if args.prune:
+        logger.info(f"Deleted {cache.prune()} unreferenced bodies")
+    if args.stats or not (args.clear or args.prune):
+        for host, counts in cache.stats(total=True).items():
+            print(f"{host}: {counts['hits']}/{counts['requests']} not modified ({counts['hit_rate']:.0%}), "
+                  f"{counts['stored']} stored, {counts['bytes_saved'] / 1e6:.1f} MB not transferred")
+
+
+if __name__ == "__main__":
+    main()
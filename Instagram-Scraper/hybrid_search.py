@@ -17,6 +17,7 @@ from typing import List, Dict, Any, Optional, Tuple, Union
 import config
 from embeddings import EmbeddingGenerator
 from vector_search import search_by_text, enrich_search_results
+from graph_retrieval import expand_query_through_graph
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +26,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger('hybrid_search')
 
+# Weight of the graph-expansion score in the combined score (0 disables the stage)
+DEFAULT_GRAPH_WEIGHT = 0.2
+
 def keyword_search(query: str, top_k: int = 10, 
                   source_type: Optional[str] = None) -> List[Dict[str, Any]]:
     """
@@ -265,14 +269,45 @@ def determine_weights(query: str) -> Tuple[float, float]:
     
     return vector_weight, keyword_weight
 
+def filter_by_source_type(results: Dict[int, Any], source_type: str) -> Dict[int, Any]:
+    """
+    Keep only results whose content has the given source type
+    
+    Args:
+        results: Mapping of content_id to result data
+        source_type: Source type name
+        
+    Returns:
+        Filtered mapping
+    """
+    conn = sqlite3.connect(config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        content_ids = list(results)
+        placeholders = ",".join("?" * len(content_ids))
+        cursor.execute(f"""
+            SELECT c.id FROM ai_content c
+            JOIN source_types st ON c.source_type_id = st.id
+            WHERE st.name = ? AND c.id IN ({placeholders})
+        """, [source_type] + content_ids)
+        keep = {row[0] for row in cursor.fetchall()}
+        return {content_id: result for content_id, result in results.items() if content_id in keep}
+    finally:
+        conn.close()
+
 def hybrid_search(query: str, top_k: int = 5, 
                  source_type: Optional[str] = None,
                  vector_weight: Optional[float] = None,
                  keyword_weight: Optional[float] = None,
-                 embedding_generator: Optional[EmbeddingGenerator] = None) -> List[Dict[str, Any]]:
+                 embedding_generator: Optional[EmbeddingGenerator] = None,
+                 graph_weight: float = DEFAULT_GRAPH_WEIGHT) -> List[Dict[str, Any]]:
     """
     Perform hybrid search combining vector and keyword search
     
+    Content linked to concepts named in the query (and their 1-2 hop
+    neighbors in the concept graph) is added as extra candidates with
+    a decayed graph score.
+    
     Args:
         query: The search query
         top_k: Maximum number of results to return
@@ -280,6 +315,7 @@ def hybrid_search(query: str, top_k: int = 5,
         vector_weight: Weight for vector search results (0-1)
         keyword_weight: Weight for keyword search results (0-1)
         embedding_generator: Optional pre-initialized embedding generator
+        graph_weight: Weight for graph-expansion results (0 disables graph expansion)
         
     Returns:
         List of search results with combined scores
@@ -373,11 +409,40 @@ def hybrid_search(query: str, top_k: int = 5,
                 all_results[content_id]['has_keyword_match'] = True
                 all_results[content_id]['snippet'] = result.get('snippet', '')
         
+        # Add graph-expansion results
+        graph_results = {}
+        if graph_weight > 0:
+            graph_results = expand_query_through_graph(query, max_content=expanded_top_k * 5)
+            if source_type and graph_results:
+                graph_results = filter_by_source_type(graph_results, source_type)
+        
+        for content_id, result in all_results.items():
+            graph_result = graph_results.get(content_id)
+            result['graph_score'] = graph_result['score'] if graph_result else 0.0
+            result['has_graph_match'] = graph_result is not None
+        
+        for content_id, graph_result in graph_results.items():
+            if content_id not in all_results:
+                all_results[content_id] = {
+                    'content_id': content_id,
+                    'vector_score': 0.0,
+                    'keyword_score': 0.0,
+                    'graph_score': graph_result['score'],
+                    'chunk_text': None,
+                    'title': '',
+                    'source_type': '',
+                    'has_vector_match': False,
+                    'has_keyword_match': False,
+                    'has_graph_match': True,
+                    'search_type': 'hybrid'
+                }
+        
         # Calculate combined scores
         for content_id, result in all_results.items():
             result['combined_score'] = (
                 vector_weight * result['vector_score'] + 
-                keyword_weight * result['keyword_score']
+                keyword_weight * result['keyword_score'] +
+                graph_weight * result['graph_score']
             )
         
         # Convert to list and sort by combined score
@@ -391,6 +456,12 @@ def hybrid_search(query: str, top_k: int = 5,
         # Return top k results
         top_results = results_list[:top_k]
         
+        # Fetch chunk text only for graph-only results that made the cut
+        for result in top_results:
+            if result['chunk_text'] is None:
+                chunks = get_content_chunks(result['content_id'], limit=1)
+                result['chunk_text'] = chunks[0]['chunk_text'] if chunks else ''
+        
         # Enrich the top results with additional metadata
         return enrich_search_results(top_results)
         
@@ -643,6 +714,8 @@ def main():
     parser.add_argument("--vector-weight", type=float, help="Weight for vector search (0-1)")
     parser.add_argument("--keyword-weight", type=float, help="Weight for keyword search (0-1)")
     parser.add_argument("--adaptive", action="store_true", help="Use adaptive weights based on query")
+    parser.add_argument("--graph-weight", type=float, default=DEFAULT_GRAPH_WEIGHT,
+                        help="Weight for concept graph expansion (0 to disable)")
     
     args = parser.parse_args()
     
@@ -682,7 +755,8 @@ def main():
         top_k=args.top_k,
         source_type=args.source_type,
         vector_weight=vector_weight,
-        keyword_weight=keyword_weight
+        keyword_weight=keyword_weight,
+        graph_weight=args.graph_weight
     )
     
     # Display results
@@ -692,7 +766,8 @@ def main():
     
     for i, result in enumerate(results):
         print(f"\nResult {i+1} - Combined Score: {result.get('combined_score', 0):.4f}")
-        print(f"Vector Score: {result.get('vector_score', 0):.4f}, Keyword Score: {result.get('keyword_score', 0):.4f}")
+        print(f"Vector Score: {result.get('vector_score', 0):.4f}, Keyword Score: {result.get('keyword_score', 0):.4f}, "
+              f"Graph Score: {result.get('graph_score', 0):.4f}")
         print(f"Title: {result.get('title', 'Unknown')}")
         print(f"Source: {result.get('source_type', 'Unknown')}")
         print(f"Content ID: {result['content_id']}")
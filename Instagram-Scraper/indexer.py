@@ -12,6 +12,7 @@ from config import (
     DB_PATH,
     TRANSCRIPT_DIR
 )
+from response_cache import bump_data_generation
 
 # Configure logging
 logging.basicConfig(
@@ -220,6 +221,8 @@ def index_transcripts():
             logger.error(f"Error indexing {transcript_path}: {str(e)}")
     
     # Final commit
+    if new_count or updated_count:
+        bump_data_generation(cursor, 'indexer')
     conn.commit()
     conn.close()
     
@@ -14,8 +14,16 @@ import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Union, Tuple, Set
 
+import numpy as np
+
 # Import local modules
 import config
+from concept_stats import read_concept_stats, check_concept_stats
+from graph_engine import CompactGraph
+from graph_centrality import compute_centrality, top_k
+from graph_paths import find_paths, DEFAULT_MAX_HOPS, DEFAULT_TIME_BUDGET
+from graph_layout import get_layout, level_of_detail, LOD_MAX_NODES, LOD_TOP_K_EDGES
+from graph_communities import get_communities, community_summaries
 
 # Configure logging
 logging.basicConfig(
@@ -111,7 +119,52 @@ class ConceptQuery:
             }
         finally:
             conn.close()
-    
+
+    def get_concepts_by_ids(self, concept_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Get several concepts with one query per chunk of IDs
+
+        Args:
+            concept_ids: IDs of the concepts
+
+        Returns:
+            Dictionary mapping concept ID to concept data (missing IDs are omitted)
+        """
+        ids = list(dict.fromkeys(int(cid) for cid in concept_ids))
+        if not ids:
+            return {}
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            concepts = {}
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"""
+                    SELECT id, name, description, category, first_seen_date,
+                           last_updated, reference_count
+                    FROM concepts
+                    WHERE id IN ({placeholders})
+                """, chunk)
+
+                for row in cursor.fetchall():
+                    concepts[row[0]] = {
+                        "id": row[0],
+                        "name": row[1],
+                        "description": row[2],
+                        "category": row[3],
+                        "first_seen_date": row[4],
+                        "last_updated": row[5],
+                        "reference_count": row[6]
+                    }
+
+            return concepts
+        finally:
+            conn.close()
+
     def get_concept_by_name(self, concept_name: str) -> Optional[Dict[str, Any]]:
         """
         Get a concept by name
@@ -634,7 +687,7 @@ class RelationshipQuery:
 
 
 class KnowledgeGraph:
-    """Build and analyze a NetworkX graph from concept data"""
+    """Build and analyze the concept graph (compact CSR storage, NetworkX on demand)"""
     
     def __init__(self, db_path: str = None):
         """
@@ -649,15 +702,32 @@ class KnowledgeGraph:
         self.db_path = db_path or config.DB_PATH
         self.concept_query = ConceptQuery(db_path)
         self.rel_query = RelationshipQuery(db_path)
-        self.graph = None
+        self.compact = None
+        self.communities = None
+        self._graph = None
+    
+    @property
+    def graph(self) -> Optional[nx.DiGraph]:
+        """NetworkX view of the graph, converted from the compact graph on first use"""
+        if self._graph is None and self.compact is not None:
+            self._graph = self.compact.to_networkx()
+        return self._graph
+    
+    @graph.setter
+    def graph(self, G: Optional[nx.DiGraph]) -> None:
+        self._graph = G
+        self.compact = CompactGraph.from_networkx(G) if G is not None else None
         
     def build_graph(self, min_confidence: float = 0.5, 
                   min_references: int = 1,
                   include_categories: List[str] = None,
                   exclude_categories: List[str] = None,
-                  relationship_types: List[str] = None) -> nx.DiGraph:
+                  relationship_types: List[str] = None) -> CompactGraph:
         """
-        Build a NetworkX directed graph from concept relationships
+        Build the concept graph with two bulk reads into compact CSR arrays
+        
+        Use the graph property (or CompactGraph.to_networkx) when a
+        NetworkX-specific algorithm is needed.
         
         Args:
             min_confidence: Minimum confidence score for relationships
@@ -667,186 +737,83 @@ class KnowledgeGraph:
             relationship_types: Only include these relationship types (if provided)
             
         Returns:
-            NetworkX DiGraph object
+            CompactGraph object
         """
         logger.info("Building knowledge graph from concept database")
         
-        # Create a new directed graph
-        G = nx.DiGraph()
-        
-        # Get all concepts that meet criteria
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.compact = CompactGraph.from_database(
+            self.db_path,
+            min_confidence=min_confidence,
+            min_references=min_references,
+            include_categories=include_categories,
+            exclude_categories=exclude_categories,
+            relationship_types=relationship_types
+        )
+        self._graph = None
         
-        try:
-            # Build query to get concepts
-            query = """
-                SELECT id, name, description, category, reference_count
-                FROM concepts
-                WHERE reference_count >= ?
-            """
-            params = [min_references]
-            
-            if include_categories:
-                placeholders = ", ".join(["?"] * len(include_categories))
-                query += f" AND category IN ({placeholders})"
-                params.extend(include_categories)
-                
-            if exclude_categories:
-                placeholders = ", ".join(["?"] * len(exclude_categories))
-                query += f" AND category NOT IN ({placeholders})"
-                params.extend(exclude_categories)
-                
-            cursor.execute(query, params)
-            
-            # Add nodes for concepts
-            for row in cursor.fetchall():
-                concept_id, name, description, category, ref_count = row
-                G.add_node(concept_id, 
-                           name=name, 
-                           description=description, 
-                           category=category,
-                           reference_count=ref_count)
-            
-            # Get relationships
-            rel_query = """
-                SELECT source_concept_id, target_concept_id, relationship_type, 
-                       confidence_score, reference_count
-                FROM concept_relationships
-                WHERE confidence_score >= ?
-            """
-            rel_params = [min_confidence]
-            
-            if relationship_types:
-                placeholders = ", ".join(["?"] * len(relationship_types))
-                rel_query += f" AND relationship_type IN ({placeholders})"
-                rel_params.extend(relationship_types)
-                
-            cursor.execute(rel_query, rel_params)
-            
-            # Add edges for relationships
-            for row in cursor.fetchall():
-                source_id, target_id, rel_type, confidence, ref_count = row
-                
-                # Only add edges between nodes that exist in the graph
-                if source_id in G and target_id in G:
-                    G.add_edge(source_id, target_id, 
-                              relationship=rel_type,
-                              confidence=confidence,
-                              reference_count=ref_count,
-                              weight=confidence)  # Use confidence as edge weight
-            
-            logger.info(f"Built graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
-            self.graph = G
-            return G
-            
-        finally:
-            conn.close()
+        logger.info(f"Built graph with {self.compact.number_of_nodes()} nodes and {self.compact.number_of_edges()} edges")
+        return self.compact
     
     def get_central_concepts(self, limit: int = 10, 
                            centrality_type: str = "degree") -> List[Dict[str, Any]]:
         """
         Get the most central concepts in the graph
-        
+
+        Scores are computed on the compact graph and cached per graph
+        version; betweenness is approximated from sampled sources.
+
         Args:
             limit: Maximum number of concepts to return
             centrality_type: Type of centrality ('degree', 'betweenness', 'eigenvector', 'pagerank')
-            
+
         Returns:
             List of concepts with centrality scores
         """
-        if not self.graph:
+        if self.compact is None:
             raise ValueError("Graph not built yet. Call build_graph() first.")
-            
-        if centrality_type == "degree":
-            centrality = nx.degree_centrality(self.graph)
-        elif centrality_type == "betweenness":
-            centrality = nx.betweenness_centrality(self.graph)
-        elif centrality_type == "eigenvector":
-            centrality = nx.eigenvector_centrality(self.graph, max_iter=300)
-        elif centrality_type == "pagerank":
-            centrality = nx.pagerank(self.graph)
-        else:
-            raise ValueError(f"Unknown centrality type: {centrality_type}")
-            
-        # Get top concepts by centrality
-        top_concepts = sorted(centrality.items(), key=lambda x: x[1], reverse=True)[:limit]
-        
-        # Get full concept info
+
+        scores = compute_centrality(self.compact, centrality_type)
+        top_indices = top_k(scores, limit)
+
+        # Get full concept info in one query
+        concept_ids = [int(self.compact.node_ids[i]) for i in top_indices]
+        concepts = self.concept_query.get_concepts_by_ids(concept_ids)
+
         results = []
-        for concept_id, score in top_concepts:
-            concept_data = self.concept_query.get_concept_by_id(concept_id)
+        for index, concept_id in zip(top_indices, concept_ids):
+            concept_data = concepts.get(concept_id)
             if concept_data:
-                concept_data["centrality_score"] = score
+                concept_data["centrality_score"] = float(scores[index])
                 results.append(concept_data)
-                
+
         return results
     
-    def get_concept_communities(self, algorithm: str = "louvain") -> Dict[int, int]:
+    def get_concept_communities(self, algorithm: str = "louvain",
+                                full: bool = False) -> Dict[int, int]:
         """
         Detect communities/clusters of concepts
         
+        Assignments are persisted per algorithm and graph parameters. After
+        new relationships are added, louvain and label propagation
+        assignments are updated only around the concepts they touch.
+        
         Args:
             algorithm: Community detection algorithm ('louvain', 'label_propagation', 'clique')
+            full: Recompute from scratch instead of reusing stored assignments
             
         Returns:
             Dictionary mapping node IDs to community IDs
         """
-        if not self.graph:
+        if self.compact is None:
             raise ValueError("Graph not built yet. Call build_graph() first.")
             
-        # Convert to undirected graph for community detection
-        undirected_graph = self.graph.to_undirected()
-        
-        if algorithm == "louvain":
-            try:
-                import community as community_louvain
-                communities = community_louvain.best_partition(undirected_graph)
-            except ImportError:
-                logger.warning("python-louvain package not installed. Using label propagation instead.")
-                communities = self._label_propagation_communities()
-        elif algorithm == "label_propagation":
-            communities = self._label_propagation_communities()
-        elif algorithm == "clique":
-            communities = self._clique_communities()
-        else:
-            raise ValueError(f"Unknown community detection algorithm: {algorithm}")
-            
-        return communities
-    
-    def _label_propagation_communities(self) -> Dict[int, int]:
-        """Use label propagation for community detection"""
-        result = {}
-        undirected_graph = self.graph.to_undirected()
-        
-        for i, community in enumerate(nx.algorithms.community.label_propagation_communities(undirected_graph)):
-            for node in community:
-                result[node] = i
-                
-        return result
-    
-    def _clique_communities(self) -> Dict[int, int]:
-        """Use clique percolation for community detection"""
-        result = {}
-        undirected_graph = self.graph.to_undirected()
-        
-        for i, community in enumerate(nx.algorithms.community.k_clique_communities(undirected_graph, 3)):
-            for node in community:
-                result[node] = i
-                
-        # Assign remaining nodes to their own communities
-        next_id = max(result.values()) + 1 if result else 0
-        for node in undirected_graph.nodes():
-            if node not in result:
-                result[node] = next_id
-                next_id += 1
-                
-        return result
+        self.communities = get_communities(self.compact, algorithm, self.db_path, full=full)
+        return self.communities.as_dict()
     
     def get_community_summary(self, communities: Dict[int, int], 
                             min_community_size: int = 3) -> List[Dict[str, Any]]:
         """
-        Generate summary of community contents
+        Generate summary of community contents with one grouped query
         
         Args:
             communities: Output from get_concept_communities()
@@ -855,107 +822,70 @@ class KnowledgeGraph:
         Returns:
             List of community summaries
         """
-        if not self.graph:
+        if self.compact is None:
             raise ValueError("Graph not built yet. Call build_graph() first.")
             
-        # Group nodes by community
-        community_nodes = {}
-        for node, community_id in communities.items():
-            if community_id not in community_nodes:
-                community_nodes[community_id] = []
-            community_nodes[community_id].append(node)
-            
-        # Generate summaries for communities that meet size threshold
-        summaries = []
-        for community_id, nodes in community_nodes.items():
-            if len(nodes) >= min_community_size:
-                # Get concept details for each node
-                concepts = []
-                for node in nodes:
-                    concept_data = self.concept_query.get_concept_by_id(node)
-                    if concept_data:
-                        concepts.append(concept_data)
-                
-                # Get category distribution
-                category_counts = {}
-                for concept in concepts:
-                    category = concept.get("category", "unknown")
-                    if category not in category_counts:
-                        category_counts[category] = 0
-                    category_counts[category] += 1
-                    
-                # Get top concept by reference count
-                top_concept = max(concepts, key=lambda x: x.get("reference_count", 0)) if concepts else None
-                
-                summaries.append({
-                    "community_id": community_id,
-                    "size": len(nodes),
-                    "top_concept": top_concept["name"] if top_concept else None,
-                    "top_concept_id": top_concept["id"] if top_concept else None,
-                    "category_distribution": category_counts,
-                    "concepts": concepts
-                })
-                
-        # Sort by community size
-        return sorted(summaries, key=lambda x: x["size"], reverse=True)
+        # Persisted assignments are summarized straight from the communities table;
+        # ones that were not saved (data changed during the build) from memory
+        assignment = self.communities
+        if assignment is not None and assignment.persisted and communities is assignment.as_dict():
+            return community_summaries(communities, key=assignment.partition_key,
+                                       min_community_size=min_community_size, db_path=self.db_path,
+                                       graph_version=assignment.version)
+        return community_summaries(communities, min_community_size=min_community_size,
+                                   db_path=self.db_path)
     
     def find_paths_between_concepts(self, source_id: int, target_id: int, 
-                                  max_paths: int = 3) -> List[List[Dict[str, Any]]]:
+                                  max_paths: int = 3,
+                                  max_hops: int = DEFAULT_MAX_HOPS,
+                                  time_budget: Optional[float] = DEFAULT_TIME_BUDGET) -> List[List[Dict[str, Any]]]:
         """
-        Find paths between two concepts in the graph
+        Find the most confident paths between two concepts in the graph
+        
+        Paths are ranked by total -log(confidence) and found lazily, so the
+        search stops after max_paths paths or when the time budget runs out.
         
         Args:
             source_id: Source concept ID
             target_id: Target concept ID
             max_paths: Maximum number of paths to find
+            max_hops: Maximum number of relationships per path
+            time_budget: Seconds allowed for the search (None for no limit)
             
         Returns:
             List of paths, where each path is a list of concepts with relationships
         """
-        if not self.graph:
+        if self.compact is None:
             raise ValueError("Graph not built yet. Call build_graph() first.")
             
-        if source_id not in self.graph or target_id not in self.graph:
+        if source_id not in self.compact or target_id not in self.compact:
             return []
             
-        # Find simple paths between source and target
-        all_paths = list(nx.all_simple_paths(self.graph, source_id, target_id, cutoff=6))[:max_paths]
+        paths = find_paths(self.compact, source_id, target_id, max_paths=max_paths,
+                           max_hops=max_hops, time_budget=time_budget)
+        
+        # Get concept data for every node on every path in one query
+        node_ids = self.compact.node_ids
+        concepts = self.concept_query.get_concepts_by_ids(
+            [int(node_ids[i]) for _, nodes, _ in paths for i in nodes]
+        )
         
         # Format results
         result_paths = []
-        for path in all_paths:
+        for _, nodes, edges in paths:
             path_data = []
-            
-            # Add source node
-            source_concept = self.concept_query.get_concept_by_id(path[0])
-            if source_concept:
+            for step, index in enumerate(nodes):
+                concept_id = int(node_ids[index])
+                concept_data = concepts.get(concept_id) or self.compact.node_attributes(index)
+                pos = edges[step - 1] if step > 0 else None
                 path_data.append({
-                    "id": source_concept["id"],
-                    "name": source_concept["name"],
-                    "category": source_concept["category"],
-                    "relationship": None
+                    "id": concept_id,
+                    "name": concept_data["name"],
+                    "category": concept_data["category"],
+                    "relationship": self.compact.rel_types[self.compact.rel_codes[pos]] if pos is not None else None,
+                    "confidence": float(self.compact.confidence[pos]) if pos is not None else None
                 })
-                
-            # Add intermediate nodes with relationships
-            for i in range(1, len(path)):
-                prev_id = path[i-1]
-                curr_id = path[i]
-                
-                # Get relationship data
-                rel_data = self.rel_query.get_relationship(prev_id, curr_id)
-                
-                # Get concept data
-                concept_data = self.concept_query.get_concept_by_id(curr_id)
-                if concept_data:
-                    path_data.append({
-                        "id": concept_data["id"],
-                        "name": concept_data["name"],
-                        "category": concept_data["category"],
-                        "relationship": rel_data["relationship_type"] if rel_data else "unknown"
-                    })
-                    
-            if len(path_data) > 1:
-                result_paths.append(path_data)
+            result_paths.append(path_data)
                 
         return result_paths
     
@@ -971,10 +901,10 @@ class KnowledgeGraph:
         Returns:
             NetworkX DiGraph of the neighborhood
         """
-        if not self.graph:
-            raise ValueError("No graph set for visualization")
+        if self.compact is None:
+            raise ValueError("Graph not built yet. Call build_graph() first.")
             
-        if concept_id not in self.graph:
+        if concept_id not in self.compact:
             return nx.DiGraph()
             
         # Get all nodes within max_distance
@@ -986,20 +916,18 @@ class KnowledgeGraph:
             
             for node in current_frontier:
                 # Add successors (outgoing edges)
-                successors = set(self.graph.successors(node))
-                next_frontier.update(successors)
+                next_frontier.update(self.compact.successors(node))
                 
                 # Add predecessors (incoming edges)
-                predecessors = set(self.graph.predecessors(node))
-                next_frontier.update(predecessors)
+                next_frontier.update(self.compact.predecessors(node))
                 
             # Remove nodes we've already seen
             next_frontier -= neighborhood_nodes
             neighborhood_nodes.update(next_frontier)
             current_frontier = next_frontier
             
-        # Create subgraph
-        return self.graph.subgraph(neighborhood_nodes).copy()
+        # Create subgraph without converting the whole graph
+        return self.compact.to_networkx(concept_ids=neighborhood_nodes)
     
     def analyze_concept(self, concept_id: int) -> Dict[str, Any]:
         """
@@ -1011,10 +939,10 @@ class KnowledgeGraph:
         Returns:
             Dictionary with analysis results
         """
-        if not self.graph:
+        if self.compact is None:
             raise ValueError("Graph not built yet. Call build_graph() first.")
             
-        if concept_id not in self.graph:
+        if concept_id not in self.compact:
             return {"error": f"Concept ID {concept_id} not found in graph"}
             
         # Get basic concept data
@@ -1023,18 +951,19 @@ class KnowledgeGraph:
             return {"error": f"Concept ID {concept_id} not found in database"}
             
         # Get graph metrics
-        in_degree = self.graph.in_degree(concept_id)
-        out_degree = self.graph.out_degree(concept_id)
-        
-        # Get centrality metrics
+        index = self.compact.index_of(concept_id)
+        in_degree = int(self.compact.in_degrees()[index])
+        out_degree = int(self.compact.out_degrees()[index])
+
+        # Get centrality metrics (cached per graph version)
         try:
-            betweenness = nx.betweenness_centrality(self.graph, k=100)[concept_id]
-        except:
+            betweenness = float(compute_centrality(self.compact, "betweenness")[index])
+        except Exception:
             betweenness = 0
-            
+
         try:
-            pagerank = nx.pagerank(self.graph)[concept_id]
-        except:
+            pagerank = float(compute_centrality(self.compact, "pagerank")[index])
+        except Exception:
             pagerank = 0
             
         # Get related concepts
@@ -1073,7 +1002,7 @@ class GraphVisualizer:
             graph: NetworkX graph to visualize (optional)
             output_dir: Directory to save visualizations
         """
-        self.graph = graph
+        self._graph = graph
         self.output_dir = output_dir
         
         # Create output directory if it doesn't exist
@@ -1083,24 +1012,134 @@ class GraphVisualizer:
         if not NETWORKX_AVAILABLE:
             raise ImportError("NetworkX not available. Install with 'pip install networkx'")
             
-    def set_graph(self, graph: nx.DiGraph) -> None:
+    @property
+    def graph(self) -> Optional[nx.DiGraph]:
+        """Graph being visualized (a CompactGraph is converted to NetworkX on first use)"""
+        if isinstance(self._graph, CompactGraph):
+            return self._graph.to_networkx()
+        return self._graph
+        
+    def set_graph(self, graph: Union[nx.DiGraph, CompactGraph]) -> None:
         """
         Set the graph to visualize
         
         Args:
-            graph: NetworkX graph
+            graph: NetworkX graph or CompactGraph
+        """
+        self._graph = graph
+        
+    def _compact_graph(self) -> CompactGraph:
+        """Graph being visualized as a CompactGraph"""
+        if isinstance(self._graph, CompactGraph):
+            return self._graph
+        return CompactGraph.from_networkx(self._graph)
+        
+    def _render_level_of_detail(self, output_file: str, interactive: bool,
+                              max_nodes: int, top_k_edges: int,
+                              communities: Optional[Dict[int, int]] = None) -> str:
+        """
+        Render a graph too large to draw node by node as cluster super-nodes
+        
+        Args:
+            output_file: Filename for the output (HTML if interactive, image otherwise)
+            interactive: Whether to write a Plotly HTML file or a matplotlib image
+            max_nodes: Maximum number of super-nodes to draw
+            top_k_edges: Aggregated edges kept per super-node
+            communities: Community assignments to group by (defaults to layout clusters)
+            
+        Returns:
+            Path to saved visualization file
         """
-        self.graph = graph
+        compact = self._compact_graph()
+        lod = level_of_detail(compact, get_layout(compact), max_nodes=max_nodes,
+                              top_k=top_k_edges, communities=communities)
+        nodes, edges = lod["nodes"], lod["edges"]
+        
+        position = {node["id"]: (node["x"], node["y"]) for node in nodes}
+        sizes = np.array([node["members"] for node in nodes], dtype=float)
+        categories = sorted({node["category"] or "unknown" for node in nodes})
+        title = (f"Knowledge Graph ({compact.number_of_nodes()} concepts, "
+                 f"{compact.number_of_edges()} relationships; {len(nodes)} clusters shown)")
+        output_path = os.path.join(self.output_dir, output_file)
+        
+        # Edge segments separated by NaN breaks
+        segments = np.full((len(edges), 3, 2), np.nan)
+        for i, edge in enumerate(edges):
+            segments[i, 0] = position[edge["source"]]
+            segments[i, 1] = position[edge["target"]]
+        
+        if interactive:
+            palette = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+            category_colors = {c: palette[i % len(palette)] for i, c in enumerate(categories)}
+            
+            edge_trace = go.Scatter(
+                x=segments[:, :, 0].ravel(), y=segments[:, :, 1].ravel(),
+                line=dict(width=0.5, color='#888'),
+                hoverinfo='none',
+                mode='lines')
+            node_trace = go.Scatter(
+                x=[node["x"] for node in nodes], y=[node["y"] for node in nodes],
+                mode='markers',
+                hoverinfo='text',
+                hovertext=[
+                    f"Cluster: {node['name']}<br>Category: {node['category']}<br>"
+                    f"Concepts: {node['members']}<br>References: {node['reference_count']}"
+                    for node in nodes
+                ],
+                marker=dict(
+                    color=[category_colors[node["category"] or "unknown"] for node in nodes],
+                    size=(6 + 3 * np.sqrt(sizes)).tolist(),
+                    line=dict(width=1, color='#333')
+                )
+            )
+            fig = go.Figure(data=[edge_trace, node_trace],
+                          layout=go.Layout(
+                              title=title,
+                              showlegend=False,
+                              hovermode='closest',
+                              margin=dict(b=20, l=5, r=5, t=40),
+                              xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                              yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                              plot_bgcolor='#fff'
+                          ))
+            pio.write_html(fig, file=output_path, auto_open=False)
+        else:
+            from matplotlib.collections import LineCollection
+            
+            plt.figure(figsize=(16, 12), dpi=300)
+            ax = plt.gca()
+            if len(edges):
+                ax.add_collection(LineCollection(segments[:, :2], colors='gray', linewidths=0.3, alpha=0.5))
+            for i, category in enumerate(categories):
+                members = [node for node in nodes if (node["category"] or "unknown") == category]
+                ax.scatter([node["x"] for node in members], [node["y"] for node in members],
+                           s=[10 + 5 * node["members"] ** 0.5 for node in members],
+                           color=plt.cm.tab20(i % 20), alpha=0.8, label=category)
+            plt.legend(scatterpoints=1, loc='lower right')
+            plt.axis('off')
+            plt.title(title)
+            plt.tight_layout()
+            plt.savefig(output_path, bbox_inches='tight')
+            plt.close()
+        
+        logger.info(f"Saved level-of-detail visualization ({len(nodes)} clusters) to {output_path}")
+        return output_path
         
     def visualize_with_matplotlib(self, output_file: str = "knowledge_graph.png",
                                 layout: str = "spring",
                                 node_size_by: str = "reference_count",
                                 edge_width_by: str = "confidence",
                                 show_labels: bool = True,
-                                label_font_size: int = 8) -> str:
+                                label_font_size: int = 8,
+                                max_nodes: int = LOD_MAX_NODES,
+                                top_k_edges: int = LOD_TOP_K_EDGES) -> str:
         """
         Create a static visualization using matplotlib
         
+        Graphs with more than max_nodes concepts are drawn as cluster
+        super-nodes. The 'spring' layout is computed by the multilevel layout
+        engine and cached per graph version.
+        
         Args:
             output_file: Filename for the output image
             layout: Graph layout algorithm ('spring', 'circular', 'kamada_kawai', 'shell')
@@ -1108,6 +1147,8 @@ class GraphVisualizer:
             edge_width_by: Edge attribute to scale edge widths by
             show_labels: Whether to show node labels
             label_font_size: Font size for node labels
+            max_nodes: Draw super-nodes instead of concepts above this many nodes
+            top_k_edges: Aggregated edges kept per super-node
             
         Returns:
             Path to saved visualization file
@@ -1115,9 +1156,13 @@ class GraphVisualizer:
         if not MATPLOTLIB_AVAILABLE:
             raise ImportError("Matplotlib not available. Install with 'pip install matplotlib'")
             
-        if not self.graph:
+        if self._graph is None:
             raise ValueError("No graph set for visualization")
             
+        if self._graph.number_of_nodes() > max_nodes:
+            return self._render_level_of_detail(output_file, interactive=False,
+                                                max_nodes=max_nodes, top_k_edges=top_k_edges)
+            
         if self.graph.number_of_nodes() > 100:
             logger.warning(f"Graph has {self.graph.number_of_nodes()} nodes, which may be too many for a clear visualization")
         
@@ -1126,7 +1171,7 @@ class GraphVisualizer:
         
         # Define layout
         if layout == "spring":
-            pos = nx.spring_layout(self.graph, seed=42)
+            pos = get_layout(self._compact_graph()).positions_by_id()
         elif layout == "circular":
             pos = nx.circular_layout(self.graph)
         elif layout == "kamada_kawai":
@@ -1138,11 +1183,11 @@ class GraphVisualizer:
             
         # Get node sizes based on attribute
         if node_size_by and nx.get_node_attributes(self.graph, node_size_by):
-            node_sizes = []
+            node_sizes = {}
             for node in self.graph.nodes():
                 size = self.graph.nodes[node].get(node_size_by, 1)
                 # Scale size for visibility
-                node_sizes.append(50 + (size * 20))
+                node_sizes[node] = 50 + (size * 20)
         else:
             node_sizes = 300
             
@@ -1172,7 +1217,7 @@ class GraphVisualizer:
                 self.graph, 
                 pos, 
                 nodelist=nodes,
-                node_size=[node_sizes[list(self.graph.nodes()).index(n)] for n in nodes] if isinstance(node_sizes, list) else node_sizes,
+                node_size=[node_sizes[n] for n in nodes] if isinstance(node_sizes, dict) else node_sizes,
                 node_color=[category_colors[category]] * len(nodes),
                 alpha=0.8,
                 label=category
@@ -1236,10 +1281,17 @@ class GraphVisualizer:
                            node_size_by: str = "reference_count",
                            edge_width_by: str = "confidence",
                            show_communities: bool = False,
-                           communities: Optional[Dict[int, int]] = None) -> str:
+                           communities: Optional[Dict[int, int]] = None,
+                           max_nodes: int = LOD_MAX_NODES,
+                           top_k_edges: int = LOD_TOP_K_EDGES) -> str:
         """
         Create an interactive HTML visualization using Plotly
         
+        Graphs with more than max_nodes concepts are drawn as community (or
+        layout cluster) super-nodes with their top-k aggregated edges. The
+        'force' layout is computed by the multilevel layout engine and cached
+        per graph version.
+        
         Args:
             output_file: Filename for the output HTML
             layout: Graph layout algorithm ('force', 'circular', 'random')
@@ -1247,6 +1299,8 @@ class GraphVisualizer:
             edge_width_by: Edge attribute to scale edge widths by
             show_communities: Whether to color nodes by communities
             communities: Community assignments (if None, uses modularity-based communities)
+            max_nodes: Draw super-nodes instead of concepts above this many nodes
+            top_k_edges: Aggregated edges kept per super-node
             
         Returns:
             Path to saved visualization file
@@ -1254,15 +1308,20 @@ class GraphVisualizer:
         if not PLOTLY_AVAILABLE:
             raise ImportError("Plotly not available. Install with 'pip install plotly'")
             
-        if not self.graph:
+        if self._graph is None:
             raise ValueError("No graph set for visualization")
+            
+        if self._graph.number_of_nodes() > max_nodes:
+            return self._render_level_of_detail(output_file, interactive=True,
+                                                max_nodes=max_nodes, top_k_edges=top_k_edges,
+                                                communities=communities if show_communities else None)
         
         # Create undirected graph for layout (but keep track of directed edges)
         G_undirected = self.graph.to_undirected()
         
         # Compute layout positions
         if layout == "force":
-            pos = nx.spring_layout(G_undirected, seed=42)
+            pos = get_layout(self._compact_graph()).positions_by_id()
         elif layout == "circular":
             pos = nx.circular_layout(G_undirected)
         elif layout == "random":
@@ -1273,16 +1332,7 @@ class GraphVisualizer:
         # Get node communities if requested
         if show_communities:
             if communities is None:
-                # Use networkx community detection
-                try:
-                    import community as community_louvain
-                    communities = community_louvain.best_partition(G_undirected)
-                except ImportError:
-                    # Fall back to built-in method
-                    communities = {}
-                    for i, comm in enumerate(nx.algorithms.community.greedy_modularity_communities(G_undirected)):
-                        for node in comm:
-                            communities[node] = i
+                communities = get_communities(self._compact_graph()).as_dict()
             
             # Get unique community IDs
             community_ids = set(communities.values())
@@ -1299,25 +1349,9 @@ class GraphVisualizer:
             x0, y0 = pos[u]
             x1, y1 = pos[v]
             
-            # Create a slightly curved edge by adding an intermediate point
-            n_points = 10  # Number of points for the curve
-            edge_trace_x = []
-            edge_trace_y = []
-            
-            for i in range(n_points + 1):
-                t = i / n_points
-                # Straight line: (x0, y0) to (x1, y1)
-                x = x0 * (1 - t) + x1 * t
-                y = y0 * (1 - t) + y1 * t
-                edge_trace_x.append(x)
-                edge_trace_y.append(y)
-            
-            edge_x.extend(edge_trace_x)
-            edge_y.extend(edge_trace_y)
-            
-            # Add None values to create a break in the line
-            edge_x.append(None)
-            edge_y.append(None)
+            # Straight line segment followed by None to create a break in the line
+            edge_x.extend((x0, x1, None))
+            edge_y.extend((y0, y1, None))
             
             # Store edge data for hover info
             rel_type = data.get("relationship", "related_to")
@@ -1514,12 +1548,15 @@ class GraphVisualizer:
         Returns:
             Path to saved visualization file
         """
-        if not self.graph:
+        if self._graph is None:
             raise ValueError("No graph set for visualization")
             
         # Create a knowledge graph instance to use neighborhood function
         kg = KnowledgeGraph()
-        kg.graph = self.graph
+        if isinstance(self._graph, CompactGraph):
+            kg.compact = self._graph
+        else:
+            kg.graph = self._graph
         
         # Get the concept neighborhood
         neighborhood = kg.get_concept_neighborhood(concept_id, max_distance)
@@ -1528,7 +1565,7 @@ class GraphVisualizer:
             raise ValueError(f"Concept ID {concept_id} not found in graph")
             
         # Get the central concept name
-        center_name = self.graph.nodes[concept_id].get("name", str(concept_id))
+        center_name = neighborhood.nodes[concept_id].get("name", str(concept_id))
         
         # Set the subgraph
         self.set_graph(neighborhood)
@@ -1630,7 +1667,7 @@ class KnowledgeGraphManager:
             
         try:
             self.graph_builder.build_graph(**kwargs)
-            self.visualizer.set_graph(self.graph_builder.graph)
+            self.visualizer.set_graph(self.graph_builder.compact)
             self.graph_built = True
             return True
         except Exception as e:
@@ -1758,7 +1795,7 @@ class KnowledgeGraphManager:
             content = self.concept_query.get_content_with_concept(top_concept["id"])
             
             # Analyze concept (if graph is available)
-            if self.graph_built and top_concept["id"] in self.graph_builder.graph:
+            if self.graph_built and top_concept["id"] in self.graph_builder.compact:
                 analysis = self.graph_builder.analyze_concept(top_concept["id"])
             else:
                 analysis = None
@@ -1807,7 +1844,7 @@ class KnowledgeGraphManager:
             if not self.graph_built:
                 self.build_graph()
                 
-            if self.graph_built and concept_id in self.graph_builder.graph:
+            if self.graph_built and concept_id in self.graph_builder.compact:
                 analysis = self.graph_builder.analyze_concept(concept_id)
                 
         return {
@@ -1820,65 +1857,36 @@ class KnowledgeGraphManager:
             "analysis": analysis
         }
     
-    def get_knowledge_graph_stats(self) -> Dict[str, Any]:
+    def get_knowledge_graph_stats(self, include_graph: bool = True) -> Dict[str, Any]:
         """
         Get statistics about the knowledge graph
         
+        Counts and top-N lists come from the materialized concept_stats table;
+        only the optional graph metrics require building the graph.
+        
+        Args:
+            include_graph: Also build the graph and compute graph metrics
+            
         Returns:
             Dictionary with graph statistics
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            stats = {}
-            
-            # Count concepts
-            cursor.execute("SELECT COUNT(*) FROM concepts")
-            stats["concept_count"] = cursor.fetchone()[0]
-            
-            # Count relationships
-            cursor.execute("SELECT COUNT(*) FROM concept_relationships")
-            stats["relationship_count"] = cursor.fetchone()[0]
-            
-            # Count content with concepts
-            cursor.execute("SELECT COUNT(DISTINCT content_id) FROM content_concepts")
-            stats["content_with_concepts"] = cursor.fetchone()[0]
-            
-            # Get top categories
-            cursor.execute("""
-                SELECT category, COUNT(*) as count
-                FROM concepts
-                WHERE category IS NOT NULL AND category != ''
-                GROUP BY category
-                ORDER BY count DESC
-                LIMIT 10
-            """)
-            stats["top_categories"] = [{"category": row[0], "count": row[1]} for row in cursor.fetchall()]
-            
-            # Get top relationship types
-            cursor.execute("""
-                SELECT relationship_type, COUNT(*) as count
-                FROM concept_relationships
-                GROUP BY relationship_type
-                ORDER BY count DESC
-                LIMIT 10
-            """)
-            stats["top_relationship_types"] = [{"type": row[0], "count": row[1]} for row in cursor.fetchall()]
+            materialized = read_concept_stats(self.db_path, limit=10)
+            
+            stats = {
+                "concept_count": materialized["concept_count"],
+                "relationship_count": materialized["relationship_count"],
+                "content_with_concepts": materialized["content_with_concepts"],
+                "top_categories": [c for c in materialized["categories"] if c["category"]][:10],
+                "top_relationship_types": materialized["relationship_types"],
+                "most_connected_concepts": [
+                    {"id": c["id"], "name": c["name"], "category": c["category"], "connections": c["count"]}
+                    for c in materialized["most_connected_concepts"]
+                ]
+            }
             
-            # Get most connected concepts
-            cursor.execute("""
-                SELECT c.id, c.name, c.category,
-                    (SELECT COUNT(*) FROM concept_relationships 
-                     WHERE source_concept_id = c.id OR target_concept_id = c.id) as connection_count
-                FROM concepts c
-                ORDER BY connection_count DESC
-                LIMIT 10
-            """)
-            stats["most_connected_concepts"] = [
-                {"id": row[0], "name": row[1], "category": row[2], "connections": row[3]} 
-                for row in cursor.fetchall()
-            ]
+            if not include_graph:
+                return stats
             
             # Build graph if we have NetworkX
             if self.graph_builder and not self.graph_built:
@@ -1931,8 +1939,6 @@ class KnowledgeGraphManager:
         except Exception as e:
             logger.error(f"Error getting graph stats: {str(e)}")
             return {"error": str(e)}
-        finally:
-            conn.close()
 
 
 def run_concept_extraction(content_id=None, batch=False, batch_size=10, 
@@ -2040,6 +2046,10 @@ if __name__ == "__main__":
     analysis_parser.add_argument("--concept-id", type=int, help="Analyze a specific concept")
     analysis_parser.add_argument("--communities", action="store_true", help="Detect and analyze communities")
     analysis_parser.add_argument("--centrality", action="store_true", help="Analyze concept centrality")
+    analysis_parser.add_argument("--check-stats", action="store_true", 
+                               help="Recompute graph statistics from scratch and report drift")
+    analysis_parser.add_argument("--repair", action="store_true", 
+                               help="With --check-stats, rewrite drifted statistics")
     analysis_parser.add_argument("--output", type=str, help="Output file for analysis results (JSON)")
     
     # Parse arguments
@@ -2382,6 +2392,27 @@ if __name__ == "__main__":
                     json.dump(centrality_results, f, indent=2)
                 print(f"\nSaved centrality analysis to {args.output}")
         
+        elif args.check_stats:
+            # Verify the materialized statistics against the raw tables
+            result = check_concept_stats(repair=args.repair)
+            
+            print(f"Checked {result['checked']} statistics")
+            if not result["drift"]:
+                print("No drift found")
+            else:
+                print(f"Found {len(result['drift'])} drifted statistics:")
+                for entry in result["drift"][:50]:
+                    print(f"- {entry['group']}/{entry['key']}: stored {entry['stored']}, actual {entry['actual']}")
+                if result["repaired"]:
+                    print("Statistics rebuilt from raw tables")
+                else:
+                    print("Run with --repair to rebuild them")
+            
+            if args.output:
+                with open(args.output, 'w') as f:
+                    json.dump(result, f, indent=2)
+                print(f"\nSaved consistency check to {args.output}")
+        
         else:
             analysis_parser.print_help()
     
@@ -0,0 +1,381 @@
+"""
+Resumable direct media downloads
+
+Each file is streamed into a .part file next to its destination. After an
+interruption the next attempt asks for the rest of the file with a Range
+request (guarded by If-Range so a changed file starts over), and only a
+transfer whose size matches the server's length is renamed into place, so
+a truncated video never appears under its final name. A sidecar manifest
+records the size and SHA-256 of every completed file.
+
+Downloads run on a bounded thread pool; each worker keeps its own
+keep-alive session, so consecutive files reuse the CDN connection.
+Bytes, bandwidth, resumes and retries are collected per run.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('media_downloader')
+
+# Concurrent downloads
+DEFAULT_WORKERS = 4
+# Bytes read from the socket per write
+CHUNK_SIZE = 256 * 1024
+# Attempts per file (each one resumes from the .part file)
+MAX_ATTEMPTS = 5
+# First retry delay in seconds, doubled per attempt
+BACKOFF_SECONDS = 1.0
+# Connect and read timeout in seconds
+TIMEOUT = 30
+# Statuses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+PART_SUFFIX = ".part"
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+class DownloadError(Exception):
+    """A download that failed for good (not worth retrying)"""
+
+
+def manifest_path(path: str) -> str:
+    return path + MANIFEST_SUFFIX
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(path: str) -> Optional[Dict]:
+    """The manifest of a downloaded file, or None if it has none"""
+    try:
+        with open(manifest_path(path), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def verify_download(path: str, full_hash: bool = False) -> bool:
+    """
+    Check a downloaded file against its manifest
+
+    Args:
+        path: Downloaded file
+        full_hash: Also recompute the SHA-256 (the size check alone catches truncation)
+
+    Returns:
+        True if the file exists and matches its manifest
+    """
+    manifest = read_manifest(path)
+    if not manifest or not os.path.exists(path):
+        return False
+    if os.path.getsize(path) != manifest.get("size"):
+        return False
+    return not full_hash or file_sha256(path) == manifest.get("sha256")
+
+
+def _write_json_atomic(path: str, data: Dict) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class DownloadStats:
+    """Thread-safe counters for one download run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.files = 0
+            self.failures = 0
+            self.bytes = 0
+            self.resumed_bytes = 0
+            self.resumes = 0
+            self.retries = 0
+            self.transfer_seconds = 0.0
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict:
+        """Counters plus wall-clock bandwidth since the run started"""
+        with self._lock:
+            elapsed = time.time() - self.started
+            return {
+                "files": self.files,
+                "failures": self.failures,
+                "bytes": self.bytes,
+                "resumed_bytes": self.resumed_bytes,
+                "resumes": self.resumes,
+                "retries": self.retries,
+                "elapsed_seconds": round(elapsed, 2),
+                "bandwidth_mbps": round(self.bytes * 8 / elapsed / 1e6, 2) if elapsed else 0.0,
+                "per_stream_mbps": round(self.bytes * 8 / self.transfer_seconds / 1e6, 2)
+                if self.transfer_seconds else 0.0
+            }
+
+
+class MediaDownloader:
+    """Bounded pool of resumable downloads over keep-alive sessions"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_attempts: int = MAX_ATTEMPTS,
+                 chunk_size: int = CHUNK_SIZE, timeout: float = TIMEOUT,
+                 headers: Optional[Dict[str, str]] = None, rate_limiter=None):
+        """
+        Args:
+            workers: Concurrent downloads (and open connections per host)
+            max_attempts: Attempts per file before giving up
+            chunk_size: Bytes per read
+            timeout: Connect and read timeout in seconds
+            headers: Headers sent with every request
+            rate_limiter: Object with an acquire() method (e.g. a
+                download_scheduler.TokenBucket) called before every request,
+                retries included; shared limiters pace several pools at once
+        """
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.rate_limiter = rate_limiter
+        self.stats = DownloadStats()
+        self._local = threading.local()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Submitted but unfinished downloads; submit blocks while the pool is full
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+
+    def _session(self) -> requests.Session:
+        """The calling thread's session (connections stay open between files)"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled here so they can resume; the adapter only pools
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=1, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _attempt(self, url: str, path: str, validator: Dict) -> int:
+        """
+        One transfer into the .part file, resuming it if possible
+
+        Returns:
+            Expected total size of the file (or -1 if the server did not say)
+        """
+        part_path = path + PART_SUFFIX
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if validator.get("etag") or validator.get("last_modified"):
+                headers["If-Range"] = validator.get("etag") or validator.get("last_modified")
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        start = time.time()
+        with self._session().get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                # Nothing left to send: the .part file is already complete
+                total = _content_range_total(response.headers.get("Content-Range"))
+                if total == offset:
+                    return total
+                # The .part file is longer than the file now on the server
+                os.remove(part_path)
+                raise IOError(f"Range not satisfiable at offset {offset}")
+            if response.status_code in RETRY_STATUSES:
+                raise IOError(f"HTTP {response.status_code}")
+            if response.status_code >= 400:
+                raise DownloadError(f"HTTP {response.status_code}")
+
+            if response.status_code == 206 and offset:
+                total = _content_range_total(response.headers.get("Content-Range"))
+                range_start = _content_range_start(response.headers.get("Content-Range"))
+                if range_start != offset:
+                    raise IOError(f"Server resumed at byte {range_start}, expected {offset}")
+                mode = "ab"
+                self.stats.add(resumes=1, resumed_bytes=offset)
+                logger.info(f"Resuming {os.path.basename(path)} at {offset} bytes")
+            else:
+                # Full response: no partial data, the server ignores ranges, or the file changed
+                length = response.headers.get("Content-Length")
+                total = int(length) if length and "Content-Encoding" not in response.headers else -1
+                mode = "wb"
+                validator.clear()
+                validator.update({"etag": response.headers.get("ETag"),
+                                  "last_modified": response.headers.get("Last-Modified")})
+                _write_json_atomic(part_path + ".json", validator)
+
+            received = 0
+            try:
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        received += len(chunk)
+            finally:
+                self.stats.add(bytes=received, transfer_seconds=time.time() - start)
+        return total
+
+    def download(self, url: str, path: str) -> Dict:
+        """
+        Download a file to path, resuming any .part file left by an earlier run
+
+        Args:
+            url: Media URL
+            path: Destination file
+
+        Returns:
+            The manifest (size, sha256, ...) of the completed file
+
+        Raises:
+            DownloadError: If the file could not be downloaded completely
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        part_path = path + PART_SUFFIX
+        try:
+            with open(part_path + ".json", "r") as f:
+                validator = json.load(f)
+        except (OSError, ValueError):
+            validator = {}
+
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                self.stats.add(retries=1)
+                time.sleep(BACKOFF_SECONDS * 2 ** (attempt - 2))
+            try:
+                total = self._attempt(url, path, validator)
+            except DownloadError as e:
+                error = e
+                break
+            except (requests.RequestException, IOError) as e:
+                error = e
+                logger.warning(f"Attempt {attempt}/{self.max_attempts} for {os.path.basename(path)} failed: {str(e)}")
+                continue
+
+            size = os.path.getsize(part_path)
+            if total >= 0 and size != total:
+                error = IOError(f"Got {size} of {total} bytes")
+                logger.warning(f"Attempt {attempt}/{self.max_attempts} for {os.path.basename(path)} "
+                               f"was truncated ({size}/{total} bytes)")
+                if size > total:
+                    os.remove(part_path)
+                continue
+
+            manifest = {
+                "file": os.path.basename(path),
+                "size": size,
+                "sha256": file_sha256(part_path),
+                "etag": validator.get("etag"),
+                "downloaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            }
+            os.replace(part_path, path)
+            _write_json_atomic(manifest_path(path), manifest)
+            try:
+                os.remove(part_path + ".json")
+            except OSError:
+                pass
+            self.stats.add(files=1)
+            return manifest
+
+        self.stats.add(failures=1)
+        raise DownloadError(f"Download of {url} failed: {str(error)}")
+
+    def submit(self, url: str, path: str,
+               on_done: Optional[Callable[[Optional[Dict], Optional[Exception]], None]] = None) -> Future:
+        """
+        Queue a download on the pool
+
+        Blocks while 2 x workers downloads are already queued, so callers
+        producing many downloads never get far ahead of the pool.
+
+        Args:
+            url: Media URL
+            path: Destination file
+            on_done: Called in the worker with (manifest, None) or (None, error)
+
+        Returns:
+            Future resolving to the manifest (or raising DownloadError)
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media")
+        self._slots.acquire()
+
+        def run():
+            try:
+                manifest = self.download(url, path)
+            except Exception as e:
+                if on_done:
+                    on_done(None, e)
+                raise
+            finally:
+                self._slots.release()
+            if on_done:
+                on_done(manifest, None)
+            return manifest
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def close(self) -> None:
+        """Wait for queued downloads and shut the pool down"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+def _content_range_total(value: Optional[str]) -> int:
+    """Total size from a Content-Range header ('bytes 0-99/1234' or 'bytes */1234')"""
+    try:
+        total = value.rsplit("/", 1)[1]
+        return -1 if total == "*" else int(total)
+    except (AttributeError, IndexError, ValueError):
+        return -1
+
+
+def _content_range_start(value: Optional[str]) -> int:
+    try:
+        return int(value.split()[1].split("-")[0])
+    except (AttributeError, IndexError, ValueError):
+        return -1
+
+
+_downloader = None
+_downloader_lock = threading.Lock()
+
+
+def get_media_downloader(workers: int = DEFAULT_WORKERS) -> MediaDownloader:
+    """The process-wide downloader (one pool shared by all crawl workers)"""
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = MediaDownloader(workers=workers)
+        return _downloader
@@ -0,0 +1,521 @@
+"""
+Content-addressed media store
+
+Downloaded videos are kept once, under their SHA-256, in DATA_DIR/media;
+the account directories hold symlinks to the stored files, and an index
+(SQLite, WAL mode) maps every (account, file) and shortcode to its blob.
+A repost that arrives with the same bytes from another account therefore
+costs no extra disk, and the index answers "do we have this post" without
+guessing file name patterns.
+
+Reposts are usually re-encoded, so byte hashes differ. Each blob also gets
+a compact audio fingerprint (per-frame signs of band-energy differences,
+in the spirit of Haitsma and Kalker's robust audio hash) and a video
+fingerprint (a difference hash of two frames a second). Blobs whose audio
+and video both match one stored earlier with the same duration share that
+blob's canonical id; the transcriber transcribes one video per canonical
+id and copies the transcript to the others. Audio alone is not enough:
+different reels often share a background music track.
+"""
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from audio_stream import decode_audio
+from config import DATA_DIR
+
+logger = logging.getLogger('media_store')
+
+MEDIA_DIR = os.path.join(DATA_DIR, "media")
+STORE_DB = os.path.join(DATA_DIR, "state", "media_store.db")
+# Seconds to wait for another process holding the write lock
+BUSY_TIMEOUT = 30.0
+
+# Fingerprints are computed on low-rate mono audio
+FINGERPRINT_RATE = 8000
+# Samples per fingerprint frame (128 ms), overlapping by 7/8 so that
+# re-encodes whose frames fall at other offsets still line up
+FINGERPRINT_FRAME = 1024
+FINGERPRINT_HOP = 128
+# Edges (Hz) of 32 bands; the 31 neighbour differences give the bits of a frame
+FINGERPRINT_BANDS = np.geomspace(250, 3000, 33)
+# Clips quieter than this RMS (dBFS) get no fingerprint (silence matches everything)
+MIN_LEVEL_DB = -55.0
+# Fingerprints match when at most this fraction of bits differ...
+MAX_BIT_ERROR = 0.3
+# ...over the best alignment within this many hops (about half a second)
+MAX_SHIFT_FRAMES = 32
+# Duplicates differ in duration by at most this fraction (or 0.5 s)
+DURATION_TOLERANCE = 0.02
+
+# Video frames sampled per second, each reduced to a 9x8 grey image whose
+# 64 horizontal gradient signs are its hash
+VIDEO_HASH_FPS = 2
+# Frames with a smaller grey level range (solid colour) are not hashed
+MIN_FRAME_CONTRAST = 16
+# Videos match when the median aligned frame hash differs in at most this many bits...
+MAX_FRAME_DISTANCE = 10
+# ...over the best alignment within this many frames (one second)
+MAX_VIDEO_SHIFT = 2
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def audio_fingerprint(audio: np.ndarray, sample_rate: int = FINGERPRINT_RATE) -> Optional[np.ndarray]:
+    """
+    Robust audio hash: one 32-bit word per frame
+
+    Bit b of a frame is the sign of the change, from the previous frame,
+    of the energy difference between bands b and b+1. Gain changes and
+    lossy re-encoding barely move these signs.
+
+    Args:
+        audio: Mono float samples
+        sample_rate: Sample rate of the audio
+
+    Returns:
+        uint32 array, or None for silent or very short clips
+    """
+    if len(audio) < FINGERPRINT_FRAME + 2 * FINGERPRINT_HOP:
+        return None
+    audio = audio.astype(np.float64)
+    if 10 * np.log10(np.mean(audio * audio) + 1e-12) < MIN_LEVEL_DB:
+        return None
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FINGERPRINT_FRAME)[::FINGERPRINT_HOP]
+    window = np.hanning(FINGERPRINT_FRAME)
+    edges = np.searchsorted(np.fft.rfftfreq(FINGERPRINT_FRAME, 1.0 / sample_rate), FINGERPRINT_BANDS)
+    # Band energies, a block of frames at a time to bound memory on long clips
+    energy = np.concatenate([
+        np.log(np.add.reduceat(np.abs(np.fft.rfft(frames[start:start + 4096] * window, axis=1)) ** 2,
+                               edges, axis=1)[:, :-1] + 1e-10)
+        for start in range(0, len(frames), 4096)
+    ])
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = (1 << np.arange(bits.shape[1], dtype=np.uint64)).astype(np.uint64)
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+
+def fingerprint_distance(a: np.ndarray, b: np.ndarray, max_shift: int = MAX_SHIFT_FRAMES) -> float:
+    """
+    Smallest bit error rate between two fingerprints over small time shifts
+
+    Returns:
+        Fraction of differing bits (1.0 if the fingerprints barely overlap)
+    """
+    best = 1.0
+    bits_per_word = len(FINGERPRINT_BANDS) - 2
+    for shift in range(-max_shift, max_shift + 1):
+        x = a[max(0, shift):]
+        y = b[max(0, -shift):]
+        length = min(len(x), len(y))
+        if length < 0.9 * min(len(a), len(b)):
+            continue
+        differing = np.unpackbits(np.bitwise_xor(x[:length], y[:length]).view(np.uint8)).sum()
+        best = min(best, differing / (length * bits_per_word))
+    return best
+
+
+def frame_hashes(frames: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Difference hash of each frame: one 64-bit word per 8x9 grey frame
+
+    Args:
+        frames: uint8 array of shape (frames, 8, 9)
+
+    Returns:
+        uint64 array, or None if no frame has enough contrast
+    """
+    frames = frames[np.ptp(frames.reshape(len(frames), -1), axis=1) >= MIN_FRAME_CONTRAST].astype(np.int16)
+    if not len(frames):
+        return None
+    bits = (frames[:, :, 1:] > frames[:, :, :-1]).reshape(len(frames), 64)
+    weights = (1 << np.arange(64, dtype=np.uint64)).astype(np.uint64)
+    return bits.astype(np.uint64) @ weights
+
+
+def video_fingerprint(path: str) -> Optional[np.ndarray]:
+    """
+    Frame hashes of a video file, sampled VIDEO_HASH_FPS times a second
+
+    Returns:
+        uint64 array, or None if the file has no (usable) video or ffmpeg fails
+    """
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-an", "-map", "0:v:0?",
+           "-vf", f"fps={VIDEO_HASH_FPS},scale=9:8:flags=area,format=gray", "-f", "rawvideo", "-"]
+    try:
+        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        logger.error(f"Could not run ffmpeg for {path}: {str(e)}")
+        return None
+    if process.returncode != 0 or len(process.stdout) < 72:
+        return None
+    frames = np.frombuffer(process.stdout[:len(process.stdout) // 72 * 72], dtype=np.uint8)
+    return frame_hashes(frames.reshape(-1, 8, 9))
+
+
+def video_distance(a: np.ndarray, b: np.ndarray, max_shift: int = MAX_VIDEO_SHIFT) -> float:
+    """
+    Smallest median bit distance between aligned frame hashes over small time shifts
+
+    Returns:
+        Median number of differing bits (64 if the fingerprints barely overlap)
+    """
+    best = 64.0
+    for shift in range(-max_shift, max_shift + 1):
+        x = a[max(0, shift):]
+        y = b[max(0, -shift):]
+        length = min(len(x), len(y))
+        if length == 0 or length < 0.8 * min(len(a), len(b)):
+            continue
+        differing = np.unpackbits(np.bitwise_xor(x[:length], y[:length]).view(np.uint8)).reshape(length, 64)
+        best = min(best, float(np.median(differing.sum(axis=1))))
+    return best
+
+
+class MediaStore:
+    """Hash-keyed video files with a per-account index and duplicate detection"""
+
+    def __init__(self, root: str = MEDIA_DIR, path: str = STORE_DB):
+        """
+        Open (and create) the store
+
+        Args:
+            root: Directory holding the stored files
+            path: Path of the SQLite index
+        """
+        self.root = root
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    duration REAL,
+                    fingerprint BLOB,
+                    video_fingerprint BLOB,
+                    fingerprinted INTEGER NOT NULL DEFAULT 0,
+                    canonical TEXT,
+                    transcript_path TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            # Stores matched on audio alone: fingerprint and match everything again
+            columns = [row["name"] for row in cursor.execute("PRAGMA table_info(blobs)")]
+            if "video_fingerprint" not in columns:
+                cursor.execute("ALTER TABLE blobs ADD COLUMN video_fingerprint BLOB")
+                cursor.execute("UPDATE blobs SET fingerprinted = 0, canonical = NULL")
+            cursor.execute("CREATE INDEX IF NOT EXISTS blobs_duration ON blobs (duration)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS blobs_canonical ON blobs (canonical)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS media (
+                    account TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    shortcode TEXT,
+                    sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (account, name)
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS media_shortcode ON media (account, shortcode)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS media_sha256 ON media (sha256)")
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        """Run statements in one transaction (BEGIN IMMEDIATE takes the write lock up front)"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], f"{sha256}.mp4")
+
+    def _stored_sha(self, path: str) -> Optional[str]:
+        """The hash of a path that already links into the store"""
+        if not os.path.islink(path):
+            return None
+        target = os.path.realpath(path)
+        if os.path.dirname(os.path.dirname(target)) != os.path.realpath(self.root):
+            return None
+        return os.path.splitext(os.path.basename(target))[0]
+
+    def ingest(self, path: str, account: str, shortcode: Optional[str] = None,
+               sha256: Optional[str] = None) -> str:
+        """
+        Move a downloaded file into the store and leave a symlink in its place
+
+        A file whose bytes are already stored is deleted and linked to the
+        existing copy. Paths that already link into the store are only indexed.
+
+        Args:
+            path: Downloaded video in an account directory
+            account: Account the video was downloaded for
+            shortcode: Post shortcode, if known
+            sha256: Hash of the file if already known (e.g. from a download manifest)
+
+        Returns:
+            SHA-256 of the file
+        """
+        stored_sha = self._stored_sha(path)
+        sha256 = stored_sha or sha256 or file_sha256(path)
+        blob = self.blob_path(sha256)
+        size = os.path.getsize(path)
+
+        if stored_sha is None:
+            if os.path.exists(blob):
+                logger.info(f"{account}/{os.path.basename(path)} duplicates stored file {sha256[:12]}")
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                # Copy through other links; move plain files
+                tmp_blob = blob + ".tmp"
+                if os.path.islink(path):
+                    shutil.copyfile(path, tmp_blob)
+                else:
+                    os.replace(path, tmp_blob)
+                os.replace(tmp_blob, blob)
+            _link(blob, path)
+
+        now = time.time()
+        with self._transaction(immediate=True) as cursor:
+            cursor.execute("INSERT OR IGNORE INTO blobs (sha256, size, created_at) VALUES (?, ?, ?)",
+                           (sha256, size, now))
+            cursor.execute("""
+                INSERT INTO media (account, name, shortcode, sha256, added_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (account, name) DO UPDATE SET
+                    sha256 = excluded.sha256, shortcode = COALESCE(excluded.shortcode, media.shortcode)
+            """, (account, os.path.basename(path), shortcode, sha256, now))
+        return sha256
+
+    def lookup(self, account: str, shortcode: Optional[str] = None, name: Optional[str] = None) -> Optional[Dict]:
+        """
+        Index entry of an account's video, by shortcode or file name
+
+        Returns:
+            Dictionary with name, shortcode and sha256, or None if the video is not indexed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, shortcode, sha256 FROM media WHERE account = ? AND (shortcode = ? OR name = ?) LIMIT 1",
+                (account, shortcode, name)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def fingerprint(self, sha256: str) -> None:
+        """Compute and save the duration, audio fingerprint and video fingerprint of a stored file"""
+        audio = decode_audio(self.blob_path(sha256), sample_rate=FINGERPRINT_RATE)
+        duration = len(audio) / FINGERPRINT_RATE if audio is not None else None
+        fingerprint = audio_fingerprint(audio) if audio is not None else None
+        # Without an audio fingerprint the file never matches; skip decoding its frames
+        frames = video_fingerprint(self.blob_path(sha256)) if fingerprint is not None else None
+        with self._transaction(immediate=True) as cursor:
+            cursor.execute(
+                "UPDATE blobs SET duration = ?, fingerprint = ?, video_fingerprint = ?, fingerprinted = 1 "
+                "WHERE sha256 = ?",
+                (duration, fingerprint.tobytes() if fingerprint is not None else None,
+                 frames.tobytes() if frames is not None else None, sha256)
+            )
+
+    def fingerprint_missing(self, hashes: Iterable[str], workers: int = 4) -> int:
+        """
+        Fingerprint the given files that have no fingerprint yet (ffmpeg runs in parallel)
+
+        Returns:
+            Number of files fingerprinted
+        """
+        hashes = list(set(hashes))
+        with self._lock:
+            missing = [row["sha256"] for row in self._conn.execute(
+                "SELECT sha256 FROM blobs WHERE fingerprinted = 0 AND sha256 IN (SELECT value FROM json_each(?))",
+                (json.dumps(hashes),)
+            )]
+        if missing:
+            logger.info(f"Fingerprinting audio of {len(missing)} stored videos")
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                list(executor.map(self.fingerprint, missing))
+        return len(missing)
+
+    def resolve_canonical(self, sha256: str) -> str:
+        """
+        The canonical id of a stored file, matching its fingerprint on first use
+
+        A file is canonical for itself unless both its audio and its video
+        match an earlier canonical file of the same duration.
+
+        Returns:
+            SHA-256 of the canonical file
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            return sha256
+        if row["canonical"]:
+            return row["canonical"]
+        if not row["fingerprinted"]:
+            self.fingerprint(sha256)
+            with self._lock:
+                row = self._conn.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+
+        canonical = sha256
+        if row["fingerprint"] is not None and row["video_fingerprint"] is not None and row["duration"]:
+            fingerprint = np.frombuffer(row["fingerprint"], dtype=np.uint32)
+            frames = np.frombuffer(row["video_fingerprint"], dtype=np.uint64)
+            tolerance = max(0.5, row["duration"] * DURATION_TOLERANCE)
+            with self._lock:
+                candidates = self._conn.execute("""
+                    SELECT sha256, fingerprint, video_fingerprint FROM blobs
+                    WHERE duration BETWEEN ? AND ? AND canonical = sha256
+                      AND fingerprint IS NOT NULL AND video_fingerprint IS NOT NULL
+                    ORDER BY created_at
+                """, (row["duration"] - tolerance, row["duration"] + tolerance)).fetchall()
+            for candidate in candidates:
+                distance = fingerprint_distance(fingerprint, np.frombuffer(candidate["fingerprint"], dtype=np.uint32))
+                if distance > MAX_BIT_ERROR:
+                    continue
+                frame_distance = video_distance(frames, np.frombuffer(candidate["video_fingerprint"], dtype=np.uint64))
+                if frame_distance <= MAX_FRAME_DISTANCE:
+                    canonical = candidate["sha256"]
+                    logger.info(f"{sha256[:12]} matches {canonical[:12]} (audio bit error {distance:.3f}, "
+                                f"frame distance {frame_distance:.0f} bits)")
+                    break
+                logger.info(f"Audio of {sha256[:12]} matches {candidate['sha256'][:12]} but the video differs "
+                            f"({frame_distance:.0f} bits), not a duplicate")
+
+        with self._transaction(immediate=True) as cursor:
+            cursor.execute("UPDATE blobs SET canonical = ? WHERE sha256 = ? AND canonical IS NULL",
+                           (canonical, sha256))
+            stored = cursor.execute("SELECT canonical FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return stored["canonical"]
+
+    def resolved_media(self, video_paths: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """
+        Videos that are already ingested and matched (one query, no hashing)
+
+        Args:
+            video_paths: Videos in the account directories
+
+        Returns:
+            Mapping of video path to (sha256, canonical id) for the paths that
+            still link to their indexed file and whose file has a canonical id
+        """
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT media.account, media.name, media.sha256, blobs.canonical
+                FROM media JOIN blobs ON blobs.sha256 = media.sha256
+                WHERE blobs.canonical IS NOT NULL
+            """).fetchall()
+        known = {(row["account"], row["name"]): (row["sha256"], row["canonical"]) for row in rows}
+
+        resolved = {}
+        for video_path in video_paths:
+            entry = known.get((os.path.basename(os.path.dirname(video_path)), os.path.basename(video_path)))
+            if entry and self._stored_sha(video_path) == entry[0]:
+                resolved[video_path] = entry
+        return resolved
+
+    def set_transcripts(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """
+        Record the transcripts made from stored files (one transaction)
+
+        Args:
+            entries: (sha256, transcript path) pairs
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        with self._transaction(immediate=True) as cursor:
+            cursor.executemany("UPDATE blobs SET transcript_path = ? WHERE sha256 = ?",
+                               [(transcript_path, sha256) for sha256, transcript_path in entries])
+
+    def transcript_for(self, canonical: str) -> Optional[str]:
+        """
+        An existing transcript of any file with this canonical id
+
+        Returns:
+            Path of the transcript, or None if none of the duplicates is transcribed
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT transcript_path FROM blobs WHERE (canonical = ? OR sha256 = ?) AND transcript_path IS NOT NULL",
+                (canonical, canonical)
+            ).fetchall()
+        for row in rows:
+            if os.path.exists(row["transcript_path"]):
+                return row["transcript_path"]
+        return None
+
+    def stats(self) -> Dict:
+        """Counts of indexed videos, stored files and distinct canonical recordings"""
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT (SELECT COUNT(*) FROM media) AS videos,
+                       (SELECT COUNT(*) FROM blobs) AS files,
+                       (SELECT COALESCE(SUM(size), 0) FROM blobs) AS bytes,
+                       (SELECT COUNT(DISTINCT COALESCE(canonical, sha256)) FROM blobs) AS recordings
+            """).fetchone()
+        return dict(row)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def _link(blob: str, path: str) -> None:
+    """Atomically point path at a stored file (relative symlink, else hard link)"""
+    tmp_path = path + ".link"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.symlink(os.path.relpath(blob, os.path.dirname(os.path.abspath(path))), tmp_path)
+    except OSError:
+        os.link(blob, tmp_path)
+    os.replace(tmp_path, path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_media_store() -> MediaStore:
+    """The process-wide media store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MediaStore()
+        return _store
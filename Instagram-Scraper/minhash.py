@@ -0,0 +1,142 @@
+"""
+MinHash signatures and an LSH banding index for near-duplicate detection
+
+Sets (character n-grams, word shingles) are reduced to fixed-size MinHash
+signatures whose agreement estimates Jaccard similarity. The LSH index
+splits signatures into bands, so candidate pairs are found by bucket
+collisions instead of comparing every pair.
+"""
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+import numpy as np
+
+# Number of hash permutations per signature
+DEFAULT_NUM_PERM = 64
+# Bands for LSH (rows per band = num_perm / bands); 16 x 4 puts the threshold near 0.5
+DEFAULT_BANDS = 16
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def char_ngrams(text: str, n: int = 3) -> Set[str]:
+    """Character n-grams of a string padded with spaces (the string itself if shorter)"""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def word_shingles(words: List[str], n: int = 3) -> Set[str]:
+    """Word n-grams of a token list (the joined tokens if shorter)"""
+    if len(words) <= n:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def jaccard(a: Set, b: Set) -> float:
+    """Exact Jaccard similarity of two sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures from universal hashes (a * x + b) mod p"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        """
+        Args:
+            num_perm: Number of hash functions per signature
+            seed: Seed for the hash function parameters
+        """
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Keep a * x + b below 2**64 for 32-bit x
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        """
+        MinHash signature of a set of strings
+
+        Args:
+            items: Set elements (an empty set gives an all-max signature)
+
+        Returns:
+            uint64 array of length num_perm
+        """
+        hashes = np.fromiter((zlib.crc32(item.encode("utf-8")) for item in items), dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        values = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME
+        return values.min(axis=0) & _MAX_HASH
+
+    @staticmethod
+    def estimate(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Estimated Jaccard similarity from two signatures"""
+        return float(np.mean(sig_a == sig_b))
+
+    @staticmethod
+    def to_bytes(signature: np.ndarray) -> bytes:
+        """Compact storage form of a signature (32 bits per hash)"""
+        return signature.astype(np.uint32).tobytes()
+
+    @staticmethod
+    def from_bytes(data: bytes) -> np.ndarray:
+        """Signature from its storage form"""
+        return np.frombuffer(data, dtype=np.uint32).astype(np.uint64)
+
+
+class LSHIndex:
+    """Banded LSH buckets over MinHash signatures"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS):
+        """
+        Args:
+            num_perm: Signature length
+            bands: Number of bands (must divide num_perm)
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: List[Dict[bytes, List[Hashable]]] = [defaultdict(list) for _ in range(bands)]
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Bucket key of each band of a signature"""
+        return [signature[i * self.rows:(i + 1) * self.rows].astype(np.uint32).tobytes()
+                for i in range(self.bands)]
+
+    def add(self, key: Hashable, signature: np.ndarray) -> None:
+        """Insert a signature under a key"""
+        for band, band_key in enumerate(self.band_keys(signature)):
+            self.buckets[band][band_key].append(key)
+
+    def query(self, signature: np.ndarray) -> Set[Hashable]:
+        """Keys sharing at least one band bucket with the signature"""
+        found = set()
+        for band, band_key in enumerate(self.band_keys(signature)):
+            found.update(self.buckets[band].get(band_key, ()))
+        return found
+
+    def candidate_pairs(self, max_bucket: int = 200) -> Iterator[Tuple[Hashable, Hashable]]:
+        """
+        Distinct key pairs that share a bucket
+
+        Args:
+            max_bucket: Skip buckets larger than this (degenerate, very common bands)
+        """
+        seen = set()
+        for buckets in self.buckets:
+            for keys in buckets.values():
+                if len(keys) < 2 or len(keys) > max_bucket:
+                    continue
+                for i in range(len(keys)):
+                    for j in range(i + 1, len(keys)):
+                        pair = (keys[i], keys[j]) if keys[i] < keys[j] else (keys[j], keys[i])
+                        if pair not in seen:
+                            seen.add(pair)
+                            yield pair
@@ -0,0 +1,377 @@
+"""
+Near-duplicate detection for research papers
+
+Every stored paper gets a MinHash signature of its word 5-gram shingles,
+one of its abstract and a normalized title key, kept in the
+paper_signatures table next to research_papers. The signature is also split into LSH bands stored in
+the paper_lsh_bands table (one indexed row per band), so checking a new
+paper is a single IN query over its band keys followed by a signature
+comparison with the few papers that share a bucket, instead of a pairwise
+scan. The whole corpus is covered, not just recent rows. A paper with
+the same title as a stored one is a duplicate only if their abstracts or
+texts also agree: distinct papers often share generic titles.
+
+The tables are created the first time a query finds them missing, so
+checks and inserts do not run DDL.
+
+Papers are referenced by the rowid of research_papers, which exists in
+both the TEXT-id and the INTEGER-id versions of the table.
+"""
+import re
+import time
+import functools
+import logging
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+from minhash import LSHIndex, MinHasher
+
+logger = logging.getLogger('paper_dedup')
+
+SIGNATURE_TABLE = 'paper_signatures'
+BAND_TABLE = 'paper_lsh_bands'
+
+# Hashes per signature
+NUM_PERM = 128
+# 32 bands of 4 rows: papers at 0.8 similarity collide with near certainty,
+# and the candidates are then checked against the threshold
+LSH_BANDS = 32
+# Words per shingle (as in the original pairwise check)
+SHINGLE_SIZE = 5
+# Minimum estimated Jaccard similarity of the shingles for a duplicate
+DEFAULT_THRESHOLD = 0.8
+# Titles with fewer words are too generic to even suggest a duplicate
+MIN_TITLE_WORDS = 3
+# Minimum abstract or text similarity confirming a paper with the same title
+# (lower than DEFAULT_THRESHOLD: revised versions reword their abstracts)
+TITLE_CONFIRM_THRESHOLD = 0.5
+# Texts shorter than this are probably failed extractions; only the title is compared
+MIN_TEXT_LENGTH = 100
+# Shingles hashed at once (bounds the size of the hash matrix)
+HASH_CHUNK = 4096
+# Candidates checked per query (a larger bucket means a degenerate signature)
+MAX_CANDIDATES = 500
+
+_WORD = re.compile(r"\w+")
+
+_hasher = MinHasher(num_perm=NUM_PERM)
+_bands = LSHIndex(num_perm=NUM_PERM, bands=LSH_BANDS)
+
+
+def ensure_dedup_tables(conn: sqlite3.Connection) -> None:
+    """Create the signature and band tables if they do not exist (without committing)"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SIGNATURE_TABLE} (
+            paper_rowid INTEGER PRIMARY KEY,
+            title_key TEXT,
+            signature BLOB,
+            abstract_signature BLOB,
+            updated_at REAL NOT NULL
+        )
+    """)
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({SIGNATURE_TABLE})")]
+    if "abstract_signature" not in columns:
+        conn.execute(f"ALTER TABLE {SIGNATURE_TABLE} ADD COLUMN abstract_signature BLOB")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{SIGNATURE_TABLE}_title ON {SIGNATURE_TABLE}(title_key)")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BAND_TABLE} (
+            bucket BLOB NOT NULL,
+            paper_rowid INTEGER NOT NULL,
+            PRIMARY KEY (bucket, paper_rowid)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{BAND_TABLE}_paper ON {BAND_TABLE}(paper_rowid)")
+
+
+def _creating_tables(function):
+    """Run a query function, creating (or upgrading) the tables the first time they are missing"""
+    @functools.wraps(function)
+    def wrapper(conn, *args, **kwargs):
+        try:
+            return function(conn, *args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not str(e).startswith("no such"):
+                raise
+        ensure_dedup_tables(conn)
+        return function(conn, *args, **kwargs)
+    return wrapper
+
+
+def title_key(title: Optional[str]) -> Optional[str]:
+    """Case- and punctuation-insensitive form of a title (None if it has no words)"""
+    words = _WORD.findall((title or "").lower())
+    return " ".join(words) or None
+
+
+def paper_signature(text: Optional[str]) -> Optional[np.ndarray]:
+    """
+    MinHash signature of a paper's word shingles
+
+    Args:
+        text: Extracted full text
+
+    Returns:
+        Signature, or None if the text is too short to compare
+    """
+    if not text or len(text) < MIN_TEXT_LENGTH:
+        return None
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return None
+    shingles = list({" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)})
+    signature = None
+    for start in range(0, len(shingles), HASH_CHUNK):
+        chunk = _hasher.signature(shingles[start:start + HASH_CHUNK])
+        signature = chunk if signature is None else np.minimum(signature, chunk)
+    return signature
+
+
+def _buckets(signature: np.ndarray) -> List[bytes]:
+    """Band keys prefixed with their band number, so one indexed column holds every band"""
+    return [bytes([band]) + key for band, key in enumerate(_bands.band_keys(signature))]
+
+
+@_creating_tables
+def find_duplicate(conn: sqlite3.Connection, text: Optional[str], title: Optional[str] = None,
+                   threshold: float = DEFAULT_THRESHOLD,
+                   exclude_rowid: Optional[int] = None,
+                   abstract: Optional[str] = None) -> Optional[Dict]:
+    """
+    Find a stored paper that the given paper nearly duplicates
+
+    A paper with the same normalized title (of at least MIN_TITLE_WORDS
+    words) is a duplicate if its abstract or text also reaches
+    TITLE_CONFIRM_THRESHOLD similarity; otherwise the papers sharing an
+    LSH bucket are compared by estimated shingle similarity.
+
+    Args:
+        conn: Database connection
+        text: Full text of the paper
+        title: Title of the paper
+        threshold: Minimum estimated Jaccard similarity of the shingles
+        exclude_rowid: Row of the paper itself, when it is already stored
+        abstract: Abstract of the paper
+
+    Returns:
+        Dict with rowid, score and reason ('title' or 'content') of the best
+        match, or None
+    """
+    cursor = conn.cursor()
+    signature = paper_signature(text)
+
+    key = title_key(title)
+    abstract_signature = paper_signature(abstract)
+    if key and len(key.split()) >= MIN_TITLE_WORDS and (signature is not None or abstract_signature is not None):
+        # Joined with research_papers so deleted papers are never reported
+        cursor.execute(f"SELECT s.paper_rowid, s.signature, s.abstract_signature FROM {SIGNATURE_TABLE} s "
+                       f"JOIN research_papers p ON p.rowid = s.paper_rowid "
+                       f"WHERE s.title_key = ? AND s.paper_rowid != ?",
+                       (key, -1 if exclude_rowid is None else exclude_rowid))
+        for rowid, stored, stored_abstract in cursor.fetchall():
+            scores = [MinHasher.estimate(mine, MinHasher.from_bytes(theirs))
+                      for mine, theirs in ((signature, stored), (abstract_signature, stored_abstract))
+                      if mine is not None and theirs is not None]
+            if scores and max(scores) >= TITLE_CONFIRM_THRESHOLD:
+                return {"rowid": rowid, "score": max(scores), "reason": "title"}
+
+    if signature is None:
+        return None
+    buckets = _buckets(signature)
+    cursor.execute(
+        f"SELECT DISTINCT paper_rowid FROM {BAND_TABLE} WHERE bucket IN ({','.join('?' * len(buckets))}) LIMIT ?",
+        (*buckets, MAX_CANDIDATES)
+    )
+    candidates = [row[0] for row in cursor.fetchall() if row[0] != exclude_rowid]
+    if not candidates:
+        return None
+
+    cursor.execute(
+        f"SELECT s.paper_rowid, s.signature FROM {SIGNATURE_TABLE} s JOIN research_papers p ON p.rowid = s.paper_rowid "
+        f"WHERE s.paper_rowid IN ({','.join('?' * len(candidates))}) AND s.signature IS NOT NULL",
+        candidates
+    )
+    best = None
+    for rowid, stored in cursor.fetchall():
+        score = MinHasher.estimate(signature, MinHasher.from_bytes(stored))
+        if score >= threshold and (best is None or score > best["score"]):
+            best = {"rowid": rowid, "score": score, "reason": "content"}
+    return best
+
+
+@_creating_tables
+def index_paper(conn: sqlite3.Connection, rowid: int, title: Optional[str], text: Optional[str],
+                signature: Optional[np.ndarray] = None, abstract: Optional[str] = None) -> None:
+    """
+    Store (or replace) the signatures and LSH buckets of a paper
+
+    The caller commits.
+
+    Args:
+        conn: Database connection
+        rowid: rowid of the paper in research_papers
+        title: Title of the paper
+        text: Full text of the paper
+        signature: Precomputed signature (computed from text if not given)
+        abstract: Abstract of the paper
+    """
+    abstract_signature = paper_signature(abstract)
+    if signature is None:
+        signature = paper_signature(text)
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM {BAND_TABLE} WHERE paper_rowid = ?", (rowid,))
+    cursor.execute(
+        f"INSERT OR REPLACE INTO {SIGNATURE_TABLE} "
+        f"(paper_rowid, title_key, signature, abstract_signature, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (rowid, title_key(title), MinHasher.to_bytes(signature) if signature is not None else None,
+         MinHasher.to_bytes(abstract_signature) if abstract_signature is not None else None, time.time())
+    )
+    if signature is not None:
+        cursor.executemany(f"INSERT OR IGNORE INTO {BAND_TABLE} (bucket, paper_rowid) VALUES (?, ?)",
+                           ((bucket, rowid) for bucket in _buckets(signature)))
+
+
+def index_paper_by_id(conn: sqlite3.Connection, paper_id, title: Optional[str], text: Optional[str],
+                      abstract: Optional[str] = None) -> None:
+    """index_paper for a paper known by its research_papers id"""
+    row = conn.execute("SELECT rowid FROM research_papers WHERE id = ?", (paper_id,)).fetchone()
+    if row:
+        index_paper(conn, row[0], title, text, abstract=abstract)
+
+
+def paper_id_for_rowid(conn: sqlite3.Connection, rowid: int):
+    """The research_papers id of a row (the rowid itself if the row has no id)"""
+    row = conn.execute("SELECT id FROM research_papers WHERE rowid = ?", (rowid,)).fetchone()
+    return row[0] if row and row[0] is not None else rowid
+
+
+def _text_columns(conn: sqlite3.Connection) -> List[str]:
+    """Columns holding full text in this version of research_papers"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(research_papers)")}
+    return [column for column in ("content", "full_text") if column in columns]
+
+
+def backfill(db_path: Optional[str] = None, batch_size: int = 200, rebuild: bool = False) -> Dict:
+    """
+    Index the stored papers that have no signature yet (or no abstract
+    signature although they have an abstract, from before abstracts were indexed)
+
+    Args:
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        batch_size: Papers read and committed per batch
+        rebuild: Drop all signatures first and index every paper again
+
+    Returns:
+        Counts of indexed papers and papers without usable text
+    """
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        ensure_dedup_tables(conn)
+        if rebuild:
+            conn.execute(f"DELETE FROM {BAND_TABLE}")
+            conn.execute(f"DELETE FROM {SIGNATURE_TABLE}")
+            conn.commit()
+
+        columns = _text_columns(conn)
+        text_expr = f"COALESCE({', '.join(columns)})" if len(columns) > 1 else (columns[0] if columns else "NULL")
+        has_abstract = "abstract" in {row[1] for row in conn.execute("PRAGMA table_info(research_papers)")}
+        abstract_expr = "p.abstract" if has_abstract else "NULL"
+        start_time = time.time()
+        stats = {"indexed": 0, "without_text": 0}
+        last_rowid = -1
+        while True:
+            rows = conn.execute(
+                f"SELECT p.rowid, p.title, {text_expr}, {abstract_expr} FROM research_papers p "
+                f"WHERE p.rowid > ? AND NOT EXISTS "
+                f"(SELECT 1 FROM {SIGNATURE_TABLE} s WHERE s.paper_rowid = p.rowid "
+                f"AND (s.abstract_signature IS NOT NULL OR length(COALESCE({abstract_expr}, '')) < ?)) "
+                f"ORDER BY p.rowid LIMIT ?",
+                (last_rowid, MIN_TEXT_LENGTH, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            for rowid, title, text, abstract in rows:
+                signature = paper_signature(text)
+                index_paper(conn, rowid, title, text, signature=signature, abstract=abstract)
+                stats["indexed"] += 1
+                if signature is None:
+                    stats["without_text"] += 1
+            conn.commit()
+            last_rowid = rows[-1][0]
+            logger.info(f"Indexed {stats['indexed']} papers")
+
+        elapsed = time.time() - start_time
+        stats["seconds"] = round(elapsed, 2)
+        logger.info(f"Backfilled {stats['indexed']} paper signatures in {elapsed:.1f}s "
+                    f"({stats['without_text']} without usable text)")
+        return stats
+    finally:
+        conn.close()
+
+
+def duplicate_groups(db_path: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[int, int, float]]:
+    """
+    Pairs of stored papers that are near duplicates of each other
+
+    Args:
+        db_path: Path to SQLite database (defaults to config.DB_PATH)
+        threshold: Minimum estimated Jaccard similarity
+
+    Returns:
+        (rowid, duplicate_rowid, score) tuples, most similar first
+    """
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        ensure_dedup_tables(conn)
+        signatures = {rowid: MinHasher.from_bytes(data) for rowid, data in conn.execute(
+            f"SELECT paper_rowid, signature FROM {SIGNATURE_TABLE} WHERE signature IS NOT NULL")}
+        pairs = set()
+        for members, in conn.execute(
+                f"SELECT group_concat(paper_rowid) FROM {BAND_TABLE} GROUP BY bucket "
+                f"HAVING COUNT(*) > 1 AND COUNT(*) <= ?", (MAX_CANDIDATES,)):
+            rowids = sorted(int(rowid) for rowid in members.split(","))
+            pairs.update((a, b) for i, a in enumerate(rowids) for b in rowids[i + 1:])
+        result = []
+        for a, b in pairs:
+            if a not in signatures or b not in signatures:
+                continue
+            score = MinHasher.estimate(signatures[a], signatures[b])
+            if score >= threshold:
+                result.append((a, b, round(score, 4)))
+        return sorted(result, key=lambda pair: -pair[2])
+    finally:
+        conn.close()
+
+
+def main():
+    """Main function for direct script execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Research paper near-duplicate index")
+    parser.add_argument("--backfill", action="store_true", help="Index stored papers without a signature")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every stored paper")
+    parser.add_argument("--duplicates", action="store_true", help="List near-duplicate pairs among stored papers")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Minimum shingle similarity for a duplicate")
+    args = parser.parse_args()
+
+    if args.backfill or args.rebuild:
+        stats = backfill(rebuild=args.rebuild)
+        print(f"Indexed {stats['indexed']} papers in {stats['seconds']:.1f}s "
+              f"({stats['without_text']} without usable text)")
+
+    if args.duplicates:
+        pairs = duplicate_groups(threshold=args.threshold)
+        conn = sqlite3.connect(config.DB_PATH)
+        try:
+            for a, b, score in pairs:
+                print(f"- {paper_id_for_rowid(conn, b)} duplicates {paper_id_for_rowid(conn, a)} ({score:.2f})")
+        finally:
+            conn.close()
+        print(f"Found {len(pairs)} near-duplicate pairs")
+
+
+if __name__ == "__main__":
+    main()
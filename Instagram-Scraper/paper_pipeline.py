@@ -0,0 +1,300 @@
+"""
+Concurrent arXiv collection pipeline
+
+Papers move through overlapping stages instead of one at a time:
+1. Metadata: feed queries are fetched and parsed into paper dicts
+2. Download: PDFs are fetched on a small thread pool (resumable, see
+   media_downloader)
+3. Extraction: downloaded PDFs are parsed on the pdf_extractor process pool
+4. Writing: the calling thread stores finished papers in batches, one
+   transaction per batch
+
+Every request sent to arXiv (feed queries, PDF downloads and their
+retries) takes a token from one global bucket, ARXIV_REQUEST_INTERVAL
+seconds apart (3 by default, as arXiv asks), so the pipeline is exactly
+as polite as the old sequential loop. It is faster because downloading,
+parsing and writing now happen while the next request waits for its
+token instead of adding to the time per paper.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+import concurrent.futures
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import feedparser
+import requests
+
+import config
+from download_scheduler import TokenBucket
+from http_cache import install_http_cache
+from media_downloader import MediaDownloader, verify_download
+from pdf_extractor import PDFExtractor, get_pdf_extractor, join_pages
+
+logger = logging.getLogger('paper_pipeline')
+
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+# Seconds between requests to arXiv (feed queries and PDFs alike)
+DEFAULT_REQUEST_INTERVAL = 3.0
+# Concurrent PDF downloads (they share the request rate, so a few are enough
+# to keep one transfer running while the next waits for its token)
+DEFAULT_DOWNLOAD_WORKERS = 4
+# Papers written per transaction
+DEFAULT_WRITE_BATCH = 20
+# Seconds the writer waits for more papers before writing a partial batch
+WRITE_IDLE_SECONDS = 2.0
+# Feed query timeout in seconds
+FEED_TIMEOUT = 30
+
+
+def parse_feed_entry(entry, category: Optional[str] = None) -> Dict:
+    """
+    Paper dict from an arXiv API feed entry
+
+    Args:
+        entry: feedparser entry
+        category: Category the entry was listed under
+
+    Returns:
+        Dict with paper_id, title, authors, abstract, published (datetime),
+        pdf_url, article_url and category
+    """
+    paper_id = entry.id.split('/abs/')[-1] if hasattr(entry, 'id') else f"arxiv_{int(time.time())}"
+
+    published = datetime.now()
+    if hasattr(entry, 'published_parsed') and entry.published_parsed:
+        try:
+            published = datetime(
+                year=entry.published_parsed[0],
+                month=entry.published_parsed[1],
+                day=entry.published_parsed[2]
+            )
+        except Exception as e:
+            logger.warning(f"Error parsing publication date: {str(e)}")
+
+    authors = ""
+    if hasattr(entry, 'authors'):
+        try:
+            authors = ", ".join(author.get('name', '') for author in entry.authors)
+        except Exception as e:
+            logger.warning(f"Error extracting authors: {str(e)}")
+
+    pdf_url = None
+    if hasattr(entry, 'links'):
+        for link in entry.links:
+            if link.get('title') == 'pdf':
+                pdf_url = link.get('href')
+                break
+
+    return {
+        "paper_id": paper_id,
+        "title": entry.get('title', f"Unknown Paper {paper_id}"),
+        "authors": authors,
+        "abstract": entry.get('summary', ""),
+        "published": published,
+        "pdf_url": pdf_url or f"https://arxiv.org/pdf/{paper_id}.pdf",
+        "article_url": f"https://arxiv.org/abs/{paper_id}",
+        "category": category
+    }
+
+
+class PaperPipeline:
+    """Rate-limited download, parallel extraction and batched writing of papers"""
+
+    def __init__(self, pdf_dir: str, request_interval: Optional[float] = None,
+                 download_workers: int = DEFAULT_DOWNLOAD_WORKERS, write_batch: int = DEFAULT_WRITE_BATCH,
+                 extractor: Optional[PDFExtractor] = None, headers: Optional[Dict[str, str]] = None,
+                 api_url: str = ARXIV_API_URL):
+        """
+        Args:
+            pdf_dir: Directory the PDFs are saved to
+            request_interval: Seconds between requests to arXiv
+                (defaults to config.ARXIV_REQUEST_INTERVAL, then 3)
+            download_workers: Concurrent PDF downloads
+            write_batch: Papers passed to the writer at once
+            extractor: PDF extraction pool (defaults to the shared one)
+            headers: Headers sent with every request
+            api_url: arXiv API query endpoint
+        """
+        if request_interval is None:
+            request_interval = getattr(config, 'ARXIV_REQUEST_INTERVAL', DEFAULT_REQUEST_INTERVAL)
+        self.pdf_dir = pdf_dir
+        self.write_batch = max(1, write_batch)
+        self.api_url = api_url
+        self.extractor = extractor
+        # One bucket for every request this pipeline sends; no bursts
+        self.rate_limiter = TokenBucket(rate=1.0 / request_interval, burst=1) if request_interval > 0 else None
+        self.session = install_http_cache(requests.Session())
+        self.session.headers.update(headers or {})
+        self.downloader = MediaDownloader(workers=download_workers, headers=headers,
+                                          rate_limiter=self.rate_limiter)
+
+    def fetch_feed(self, search_query: str, max_results: int, start: int = 0) -> List:
+        """
+        Run an arXiv API query (newest submissions first)
+
+        Args:
+            search_query: arXiv search query, e.g. "cat:cs.AI"
+            max_results: Entries to return
+            start: Offset of the first entry
+
+        Returns:
+            feedparser entries
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        response = self.session.get(self.api_url, params={
+            "search_query": search_query,
+            "sortBy": "submittedDate",
+            "sortOrder": "descending",
+            "start": start,
+            "max_results": max_results
+        }, timeout=FEED_TIMEOUT)
+        response.raise_for_status()
+        return feedparser.parse(response.content).entries
+
+    def run(self, papers: Iterable[Dict], write_batch: Callable[[List[Dict]], int],
+            extract: Union[bool, Callable[[str], str]] = True) -> Dict:
+        """
+        Download, extract and write papers with the stages overlapping
+
+        Args:
+            papers: Paper dicts with paper_id and pdf_url (consumed lazily, in
+                a background thread); pdf_path is set on each of them
+            write_batch: Called in this thread with lists of papers whose PDF
+                was downloaded; returns how many it stored. Papers carry
+                text and extraction_error when extract is on (text is empty
+                when the extraction failed or timed out)
+            extract: True to extract text on the process pool, a function
+                mapping a PDF path to its text to extract sequentially with
+                it (e.g. OCR), or False to skip extraction
+
+        Returns:
+            Run statistics
+        """
+        start_time = time.time()
+        self.downloader.stats.reset()
+        stats = {"papers": 0, "downloaded": 0, "download_failures": 0, "extraction_failures": 0,
+                 "written": 0, "batches": 0}
+        lock = threading.Lock()
+        by_path = {}
+        downloaded = queue.Queue()
+        finished = queue.Queue()
+
+        def on_downloaded(paper, manifest, error):
+            with lock:
+                if error is not None:
+                    stats["download_failures"] += 1
+                else:
+                    stats["downloaded"] += 1
+            if error is not None:
+                logger.error(f"Error downloading PDF for {paper['paper_id']}: {str(error)}")
+            elif extract:
+                downloaded.put(paper["pdf_path"])
+            else:
+                finished.put(paper)
+
+        def feed():
+            """Metadata and download stages"""
+            futures = []
+            try:
+                for paper in papers:
+                    pdf_path = os.path.join(self.pdf_dir, f"{paper['paper_id'].replace('/', '_')}.pdf")
+                    paper["pdf_path"] = pdf_path
+                    with lock:
+                        stats["papers"] += 1
+                        by_path[pdf_path] = paper
+                    if verify_download(pdf_path):
+                        # Completed by an earlier, interrupted run
+                        on_downloaded(paper, None, None)
+                        continue
+                    futures.append(self.downloader.submit(
+                        paper["pdf_url"], pdf_path,
+                        on_done=lambda manifest, error, paper=paper: on_downloaded(paper, manifest, error)))
+            except Exception as e:
+                logger.error(f"Error queueing paper downloads: {str(e)}")
+            finally:
+                concurrent.futures.wait(futures)
+                self.downloader.close()
+                (downloaded if extract else finished).put(None)
+
+        def extraction():
+            """Extraction stage"""
+            try:
+                if callable(extract):
+                    for pdf_path in iter(downloaded.get, None):
+                        paper = by_path[pdf_path]
+                        try:
+                            paper["text"] = extract(pdf_path) or ""
+                            paper["extraction_error"] = None
+                        except Exception as e:
+                            logger.error(f"Error extracting text from {pdf_path}: {str(e)}")
+                            paper["text"], paper["extraction_error"] = "", str(e)
+                        finished.put(paper)
+                else:
+                    extractor = self.extractor or get_pdf_extractor()
+                    for result in extractor.extract_many(iter(downloaded.get, None)):
+                        paper = by_path[result["pdf_path"]]
+                        # The pages before a timeout or parser error are not the paper's text
+                        paper["text"] = join_pages(result["pages"]) if result["complete"] else ""
+                        paper["extraction_error"] = result["error"]
+                        finished.put(paper)
+            except Exception as e:
+                # Papers downloaded from here on are not written (the queue is unbounded,
+                # so the download stage still runs to the end)
+                logger.error(f"Error in PDF extraction stage: {str(e)}")
+            finally:
+                finished.put(None)
+
+        threads = [threading.Thread(target=feed, name="paper-download", daemon=True)]
+        if extract:
+            threads.append(threading.Thread(target=extraction, name="paper-extraction", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        # Writing stage
+        batch = []
+
+        def flush():
+            if not batch:
+                return
+            try:
+                written = write_batch(list(batch))
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} papers: {str(e)}")
+                written = 0
+            stats["written"] += written or 0
+            stats["batches"] += 1
+            batch.clear()
+
+        while True:
+            try:
+                paper = finished.get(timeout=WRITE_IDLE_SECONDS)
+            except queue.Empty:
+                flush()
+                continue
+            if paper is None:
+                break
+            if paper.get("extraction_error"):
+                stats["extraction_failures"] += 1
+            batch.append(paper)
+            if len(batch) >= self.write_batch:
+                flush()
+        flush()
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.time() - start_time
+        download_stats = self.downloader.stats.snapshot()
+        stats["bytes"] = download_stats["bytes"]
+        stats["retries"] = download_stats["retries"]
+        stats["seconds"] = round(elapsed, 2)
+        stats["papers_per_minute"] = round(stats["written"] * 60 / elapsed, 1) if elapsed else 0.0
+        logger.info(f"Pipeline finished in {elapsed:.1f}s: {stats['downloaded']}/{stats['papers']} PDFs downloaded "
+                    f"({stats['bytes'] / 1e6:.1f} MB, {stats['download_failures']} failed), "
+                    f"{stats['written']} papers written in {stats['batches']} batches "
+                    f"({stats['papers_per_minute']} papers/min)")
+        return stats
@@ -0,0 +1,485 @@
+"""
+Parallel PDF text extraction on worker processes
+
+Text is extracted with pypdf (or PyPDF2 if only that is installed) on a
+small pool of long-lived worker processes. The parent hands each worker
+one document at a time over its own pipe, and the worker sends the text
+back page by page, so callers can consume a large paper while it is
+still being parsed. Every document has a deadline: a worker that runs
+past it (a malformed PDF can make the parser loop for minutes) is
+killed and replaced, and the pages it produced so far are returned as a
+partial result.
+
+Completed extractions are cached in SQLite under the SHA-256 of the PDF
+and the extractor version, so re-runs over the same files skip parsing
+entirely. Throughput is reported in pages per second.
+"""
+import os
+import time
+import signal
+import hashlib
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from config import DATA_DIR
+
+try:
+    import pypdf as pdf_backend
+except ImportError:
+    try:
+        import PyPDF2 as pdf_backend
+    except ImportError:
+        pdf_backend = None
+
+logger = logging.getLogger('pdf_extractor')
+
+PDF_TEXT_DB = os.path.join(DATA_DIR, "state", "pdf_text.db")
+# Seconds a worker may spend on one document before it is killed
+DEFAULT_TIMEOUT = 120.0
+# Seconds to wait for another process holding the cache's write lock
+BUSY_TIMEOUT = 30.0
+# Cache entries are only valid for the parser that produced them
+EXTRACTOR_VERSION = (f"{pdf_backend.__name__}-{getattr(pdf_backend, '__version__', '0')}"
+                     if pdf_backend else "none")
+
+
+def pdf_sha256(path: str) -> str:
+    """Hex SHA-256 of a PDF file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def join_pages(pages: Iterable[str]) -> str:
+    """Full document text in the layout the collectors store (pages separated by blank lines)"""
+    return "".join(page + "\n\n" for page in pages)
+
+
+def _worker_main(conn) -> None:
+    """Worker process: extract the documents sent over conn, page by page"""
+    # Interrupts are handled by the parent, which kills the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            pdf_path = conn.recv()
+        except EOFError:
+            return
+        if pdf_path is None:
+            return
+        try:
+            with open(pdf_path, "rb") as f:
+                reader = pdf_backend.PdfReader(f)
+                count = len(reader.pages)
+                for index in range(count):
+                    try:
+                        text = reader.pages[index].extract_text() or ""
+                        # Handle encoding issues
+                        text = text.encode("utf-8", errors="replace").decode("utf-8")
+                    except Exception as e:
+                        conn.send(("warning", f"page {index + 1}: {str(e)}"))
+                        text = ""
+                    conn.send(("page", index, text))
+            conn.send(("done", count))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class PDFTextCache:
+    """Extracted pages keyed by PDF hash and extractor version"""
+
+    def __init__(self, path: str = PDF_TEXT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pdf_documents (
+                sha256 TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                pages INTEGER NOT NULL,
+                chars INTEGER NOT NULL,
+                seconds REAL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (sha256, extractor)
+            );
+            CREATE TABLE IF NOT EXISTS pdf_pages (
+                sha256 TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (sha256, extractor, page)
+            );
+        """)
+        self._conn.commit()
+
+    def page_count(self, sha256: str, extractor: str = EXTRACTOR_VERSION) -> Optional[int]:
+        """Number of pages of a cached document, or None if it is not cached"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pages FROM pdf_documents WHERE sha256 = ? AND extractor = ?",
+                (sha256, extractor)
+            ).fetchone()
+        return row[0] if row else None
+
+    def iter_pages(self, sha256: str, extractor: str = EXTRACTOR_VERSION) -> Iterator[str]:
+        """Pages of a cached document in order, read one at a time"""
+        page = 0
+        while True:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT text FROM pdf_pages WHERE sha256 = ? AND extractor = ? AND page = ?",
+                    (sha256, extractor, page)
+                ).fetchone()
+            if row is None:
+                return
+            yield row[0]
+            page += 1
+
+    def put(self, sha256: str, pages: List[str], seconds: float,
+            extractor: str = EXTRACTOR_VERSION) -> None:
+        """Store a completely extracted document"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pdf_pages WHERE sha256 = ? AND extractor = ?", (sha256, extractor))
+            self._conn.executemany(
+                "INSERT INTO pdf_pages (sha256, extractor, page, text) VALUES (?, ?, ?, ?)",
+                ((sha256, extractor, index, text) for index, text in enumerate(pages))
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_documents (sha256, extractor, pages, chars, seconds, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, extractor, len(pages), sum(len(text) for text in pages), seconds, time.time())
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _Worker:
+    """A worker process and the document it is working on"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = None
+
+    def stop(self, kill: bool = False) -> None:
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PDFExtractor:
+    """Pool of PDF text extraction processes with per-document timeouts and a hash-keyed cache"""
+
+    def __init__(self, workers: int = 0, timeout: float = DEFAULT_TIMEOUT,
+                 cache: Optional[PDFTextCache] = None):
+        """
+        Args:
+            workers: Worker processes (0 = one per CPU); started on first use
+            timeout: Seconds allowed per document (time the caller spends
+                handling its pages does not count)
+            cache: Cache of extracted text (None = the default database)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cache = cache if cache is not None else PDFTextCache()
+        # Spawn gives workers a clean interpreter (the parent holds SQLite and logging threads)
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def stream(self, pdf_paths: Iterable[str]) -> Iterator[tuple]:
+        """
+        Extract several PDFs in parallel, as a stream of pages and results
+
+        pdf_paths is read on a background thread, so it may be fed by a
+        producer that is still downloading files; waiting for the next path
+        never holds up the pages of documents already being extracted.
+
+        Args:
+            pdf_paths: PDF files
+
+        Yields:
+            ("page", pdf_path, page_index, text) as each page arrives, and
+            ("result", result) when a document is finished; see extract_many
+            for the result fields
+        """
+        stats = {"documents": 0, "pages": 0, "cached": 0, "errors": 0, "timeouts": 0}
+        start_time = time.time()
+        try:
+            with self._lock:
+                yield from self._run(pdf_paths, stats)
+        finally:
+            self._log_stats(stats, time.time() - start_time)
+
+    @staticmethod
+    def _feed(pdf_paths: Iterable[str], inbox) -> None:
+        """Feeder thread: pass the paths to the relay loop as they arrive, then None"""
+        try:
+            for pdf_path in pdf_paths:
+                inbox.send(pdf_path)
+            inbox.send(None)
+        except OSError:
+            # The relay loop was closed before the paths ran out
+            pass
+        except Exception as e:
+            logger.error(f"Error reading PDF paths to extract: {str(e)}")
+            try:
+                inbox.send(None)
+            except OSError:
+                pass
+        finally:
+            inbox.close()
+
+    def _prepare(self, pdf_path: str, stats: Dict) -> Iterator[tuple]:
+        """
+        Check whether a path needs a worker
+
+        Cached, unreadable and unextractable files are answered on the way
+        (as events); the generator's return value is the PDF's sha256 if a
+        worker has to extract it, otherwise None.
+        """
+        try:
+            sha256 = pdf_sha256(pdf_path)
+        except OSError as e:
+            stats["errors"] += 1
+            yield "result", self._result(pdf_path, None, [], error=str(e))
+            return None
+        if self.cache.page_count(sha256) is not None:
+            pages = []
+            for text in self.cache.iter_pages(sha256):
+                yield "page", pdf_path, len(pages), text
+                pages.append(text)
+            stats["cached"] += 1
+            stats["pages"] += len(pages)
+            yield "result", self._result(pdf_path, sha256, pages, complete=True, cached=True)
+            return None
+        if pdf_backend is None:
+            logger.error("Neither pypdf nor PyPDF2 is installed, cannot extract PDF text")
+            stats["errors"] += 1
+            yield "result", self._result(pdf_path, sha256, [], error="no PDF library available")
+            return None
+        return sha256
+
+    def _run(self, pdf_paths: Iterable[str], stats: Dict) -> Iterator[tuple]:
+        """Hand the paths to the workers and relay their pages and results"""
+        busy = []
+        # Paths arrive over a pipe so that wait() wakes up for them and for worker output alike
+        inbox, feeder_conn = multiprocessing.Pipe(duplex=False)
+        threading.Thread(target=self._feed, args=(pdf_paths, feeder_conn),
+                         name="pdf-extractor-feed", daemon=True).start()
+        try:
+            while True:
+                # Only take paths that have already arrived, and only while a worker is free
+                while inbox is not None and len(busy) < self.workers and inbox.poll():
+                    try:
+                        pdf_path = inbox.recv()
+                    except EOFError:
+                        pdf_path = None
+                    if pdf_path is None:
+                        inbox.close()
+                        inbox = None
+                        break
+                    sha256 = yield from self._hand_over(self._prepare(pdf_path, stats), busy)
+                    if sha256 is None:
+                        continue
+                    worker = self._idle.pop() if self._idle else _Worker(self._context)
+                    worker.job = {"pdf_path": pdf_path, "sha256": sha256, "pages": [],
+                                  "started": time.time()}
+                    worker.conn.send(pdf_path)
+                    busy.append(worker)
+                if not busy and inbox is None:
+                    break
+
+                waiting = [worker.conn for worker in busy]
+                if inbox is not None and len(busy) < self.workers:
+                    waiting.append(inbox)
+                timeout = None
+                if busy:
+                    deadline = min(worker.job["started"] for worker in busy) + self.timeout
+                    timeout = max(0.0, deadline - time.time())
+                ready = wait(waiting, timeout=timeout)
+
+                for worker in list(busy):
+                    job = worker.job
+                    finished = None
+                    if worker.conn in ready:
+                        for event in self._drain(worker):
+                            if event[0] == "result":
+                                finished = event[1]
+                            else:
+                                yield from self._hand_over(iter((event,)), busy)
+                    if finished is None and time.time() - job["started"] > self.timeout:
+                        logger.warning(f"Extraction of {os.path.basename(job['pdf_path'])} timed out after "
+                                       f"{self.timeout:.0f}s ({len(job['pages'])} pages extracted)")
+                        stats["timeouts"] += 1
+                        finished = self._result(job["pdf_path"], job["sha256"], job["pages"],
+                                                seconds=time.time() - job["started"], error="timeout")
+                        busy.remove(worker)
+                        worker.stop(kill=True)
+                    elif finished is not None:
+                        busy.remove(worker)
+                        if finished["error"] != "worker died" and worker.process.is_alive():
+                            worker.job = None
+                            self._idle.append(worker)
+                        else:
+                            worker.stop(kill=True)
+                        if finished["error"]:
+                            stats["errors"] += 1
+                        else:
+                            stats["documents"] += 1
+
+                    if finished is not None:
+                        stats["pages"] += len(finished["pages"])
+                        yield from self._hand_over(iter((("result", finished),)), busy)
+        finally:
+            # Closing the inbox also stops the feeder thread at its next path
+            if inbox is not None:
+                inbox.close()
+            # Workers of abandoned (generator closed) or interrupted jobs are in an unknown state
+            for worker in busy:
+                worker.stop(kill=True)
+
+    @staticmethod
+    def _hand_over(events: Iterator[tuple], busy: List[_Worker]):
+        """
+        Yield events to the consumer without charging the time it holds them to the busy workers
+
+        The generator is suspended while the consumer handles an event, and a
+        worker whose pipe fills up meanwhile is blocked too, so the deadlines
+        (job start times) of the busy workers move forward by that time.
+        Returns the return value of events.
+        """
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as stop:
+                return stop.value
+            handed_over = time.time()
+            yield event
+            held = time.time() - handed_over
+            for worker in busy:
+                worker.job["started"] += held
+
+    def _drain(self, worker: _Worker) -> Iterator[tuple]:
+        """Read a worker's pending messages as page events, ending with a result once the document is done"""
+        job = worker.job
+        try:
+            while worker.conn.poll():
+                message = worker.conn.recv()
+                if message[0] == "page":
+                    job["pages"].append(message[2])
+                    yield "page", job["pdf_path"], message[1], message[2]
+                elif message[0] == "warning":
+                    logger.warning(f"{os.path.basename(job['pdf_path'])}: {message[1]}")
+                elif message[0] == "done":
+                    seconds = time.time() - job["started"]
+                    self.cache.put(job["sha256"], job["pages"], seconds)
+                    yield "result", self._result(job["pdf_path"], job["sha256"], job["pages"],
+                                                 complete=True, seconds=seconds)
+                    return
+                elif message[0] == "error":
+                    # The worker itself is fine; only this document failed
+                    logger.error(f"Error extracting text from PDF {job['pdf_path']}: {message[1]}")
+                    yield "result", self._result(job["pdf_path"], job["sha256"], job["pages"],
+                                                 seconds=time.time() - job["started"], error=message[1])
+                    return
+        except (EOFError, OSError):
+            # The worker died (e.g. out of memory)
+            logger.error(f"Extraction worker died while reading {job['pdf_path']}")
+            yield "result", self._result(job["pdf_path"], job["sha256"], job["pages"],
+                                         seconds=time.time() - job["started"], error="worker died")
+
+    def extract_many(self, pdf_paths: Iterable[str],
+                     on_page: Optional[Callable[[str, int, str], None]] = None) -> Iterator[Dict]:
+        """
+        Extract several PDFs in parallel, yielding each one as it completes
+
+        Args:
+            pdf_paths: PDF files
+            on_page: Called with (pdf_path, page_index, text) as each page arrives
+
+        Yields:
+            Dicts with pdf_path, sha256, pages (list of page texts), complete,
+            cached, seconds and error (None on success); a timed-out document
+            comes back incomplete with the pages extracted before the deadline
+        """
+        for event in self.stream(pdf_paths):
+            if event[0] == "result":
+                yield event[1]
+            elif on_page:
+                on_page(*event[1:])
+
+    @staticmethod
+    def _result(pdf_path: str, sha256: Optional[str], pages: List[str], complete: bool = False,
+                cached: bool = False, seconds: float = 0.0, error: Optional[str] = None) -> Dict:
+        return {"pdf_path": pdf_path, "sha256": sha256, "pages": pages, "complete": complete,
+                "cached": cached, "seconds": round(seconds, 3), "error": error}
+
+    @staticmethod
+    def _log_stats(stats: Dict, wall_seconds: float) -> None:
+        total = stats["documents"] + stats["cached"] + stats["errors"] + stats["timeouts"]
+        if not total:
+            return
+        rate = stats["pages"] / wall_seconds if wall_seconds else 0.0
+        logger.info(f"Extracted {stats['pages']} pages from {total} PDFs in {wall_seconds:.1f}s "
+                    f"({rate:.1f} pages/s): {stats['cached']} from cache, "
+                    f"{stats['errors']} errors, {stats['timeouts']} timeouts")
+
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
+        """
+        Text of one PDF, page by page as the worker extracts it
+
+        Args:
+            pdf_path: PDF file
+
+        Yields:
+            Page texts in order (only the pages before a timeout or error)
+        """
+        for event in self.stream([pdf_path]):
+            if event[0] == "page":
+                yield event[3]
+
+    def extract_text(self, pdf_path: str) -> str:
+        """Full text of one PDF (pages separated by blank lines); empty if nothing could be read"""
+        return join_pages(self.iter_pages(pdf_path))
+
+    def close(self) -> None:
+        """Stop the idle workers"""
+        with self._lock:
+            for worker in self._idle:
+                worker.stop()
+            self._idle = []
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_pdf_extractor(workers: int = 0, timeout: float = DEFAULT_TIMEOUT) -> PDFExtractor:
+    """The process-wide extractor (its workers are reused between calls)"""
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            _extractor = PDFExtractor(workers=workers, timeout=timeout)
+        return _extractor
@@ -0,0 +1,301 @@
+"""
+Shared response cache for read-heavy web and API endpoints
+
+Entries live in a bounded in-memory TTL+LRU store and are keyed by a
+database generation counter. Collectors and indexers call
+bump_data_generation() in the same transaction as their writes, so any
+cached response built from older data is never served again.
+Flask views wrapped with cached_response() also get ETag and
+Last-Modified headers and answer conditional requests with 304.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import config
+
+logger = logging.getLogger('response_cache')
+
+GENERATION_TABLE = 'data_generation'
+
+# Default cache sizing
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 300
+# How often the generation counter is re-read from the database
+GENERATION_CHECK_INTERVAL = 1.0
+
+
+def ensure_generation_table(cursor: sqlite3.Cursor) -> None:
+    """Create the data generation table if it does not exist"""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {GENERATION_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL,
+            updated_by TEXT
+        )
+    """)
+
+
+def bump_data_generation(cursor: sqlite3.Cursor, source: Optional[str] = None) -> None:
+    """
+    Mark the knowledge base as changed
+
+    Call this with the writer's own cursor before committing, so the bump
+    is part of the same transaction as the data change.
+
+    Args:
+        cursor: Cursor of the connection performing the write
+        source: Name of the component that changed the data (for debugging)
+    """
+    ensure_generation_table(cursor)
+    cursor.execute(f"""
+        INSERT INTO {GENERATION_TABLE} (id, generation, updated_at, updated_by)
+        VALUES (1, 1, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            generation = generation + 1,
+            updated_at = excluded.updated_at,
+            updated_by = excluded.updated_by
+    """, (time.time(), source))
+
+
+def read_data_generation(db_path: Optional[str] = None) -> Tuple[int, float]:
+    """
+    Read the current data generation from the database
+
+    Returns:
+        Tuple of (generation, unix timestamp of the last change)
+    """
+    conn = sqlite3.connect(db_path or config.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT generation, updated_at FROM {GENERATION_TABLE} WHERE id = 1")
+        row = cursor.fetchone()
+        if row:
+            return row[0], row[1]
+        return 0, 0.0
+    except sqlite3.OperationalError:
+        # Table not created yet - nothing has bumped the counter
+        return 0, 0.0
+    finally:
+        conn.close()
+
+
+class ResponseCache:
+    """Bounded TTL+LRU cache whose entries are scoped to a data generation"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 default_ttl: float = DEFAULT_TTL_SECONDS,
+                 db_path: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached entries across all namespaces
+            default_ttl: Default time-to-live in seconds
+            db_path: Database holding the generation counter (defaults to config.DB_PATH)
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = (0, 0.0)
+        self._generation_checked = 0.0
+        self._stats = {}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self) -> Tuple[int, float]:
+        """
+        Current (generation, last change timestamp), re-read at most once per interval
+
+        Entries from an older generation are dropped as soon as a change is seen.
+        """
+        now = time.time()
+        if now - self._generation_checked < GENERATION_CHECK_INTERVAL:
+            return self._generation
+
+        try:
+            current = read_data_generation(self.db_path)
+        except Exception as e:
+            logger.warning(f"Could not read data generation: {str(e)}")
+            current = self._generation
+
+        with self._lock:
+            if current[0] != self._generation[0] and self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self._generation = current
+            self._generation_checked = now
+        return current
+
+    def get(self, namespace: str, key: Any) -> Tuple[bool, Any]:
+        """
+        Look up an entry
+
+        Returns:
+            Tuple of (found, value)
+        """
+        generation = self.generation()[0]
+        full_key = (namespace, generation, key)
+        now = time.time()
+
+        with self._lock:
+            stats = self._namespace_stats(namespace)
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(full_key)
+                    stats['hits'] += 1
+                    return True, value
+                del self._entries[full_key]
+            stats['misses'] += 1
+            return False, None
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        """Store an entry, evicting the least recently used entries when full"""
+        generation = self.generation()[0]
+        full_key = (namespace, generation, key)
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+
+        with self._lock:
+            self._entries[full_key] = (expires_at, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """Drop all entries, or only those of one namespace"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for full_key in [k for k in self._entries if k[0] == namespace]:
+                    del self._entries[full_key]
+            self.invalidations += 1
+
+    def record_not_modified(self, namespace: str) -> None:
+        """Count a conditional request answered with 304"""
+        with self._lock:
+            self._namespace_stats(namespace)['not_modified'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per namespace and overall"""
+        with self._lock:
+            namespaces = {}
+            total_hits = total_misses = 0
+            for namespace, counts in self._stats.items():
+                lookups = counts['hits'] + counts['misses']
+                namespaces[namespace] = dict(
+                    counts, hit_rate=round(counts['hits'] / lookups, 4) if lookups else 0.0
+                )
+                total_hits += counts['hits']
+                total_misses += counts['misses']
+
+            lookups = total_hits + total_misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'generation': self._generation[0],
+                'hits': total_hits,
+                'misses': total_misses,
+                'hit_rate': round(total_hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'namespaces': namespaces
+            }
+
+    def _namespace_stats(self, namespace: str) -> Dict[str, int]:
+        if namespace not in self._stats:
+            self._stats[namespace] = {'hits': 0, 'misses': 0, 'not_modified': 0}
+        return self._stats[namespace]
+
+
+# Process-wide cache shared by app.py and the API blueprints
+response_cache = ResponseCache()
+
+
+def cached_call(namespace: str, ttl: Optional[float] = None) -> Callable:
+    """
+    Memoize a function in the shared cache (generation-aware replacement for lru_cache)
+
+    Args:
+        namespace: Cache namespace for this function
+        ttl: Time-to-live in seconds (defaults to the cache default)
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            found, value = response_cache.get(namespace, key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            response_cache.set(namespace, key, value, ttl)
+            return value
+
+        wrapper.cache_clear = lambda: response_cache.invalidate(namespace)
+        return wrapper
+    return decorator
+
+
+def cached_response(namespace: str, ttl: Optional[float] = None) -> Callable:
+    """
+    Cache a Flask view's successful responses and support conditional requests
+
+    Responses carry an ETag (hash of the body) and Last-Modified (time of the
+    last data change), so repeat fetches with If-None-Match/If-Modified-Since
+    get a 304 without a body.
+
+    Args:
+        namespace: Cache namespace for this view
+        ttl: Time-to-live in seconds (defaults to the cache default)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, make_response
+
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            found, entry = response_cache.get(namespace, key)
+
+            if found:
+                body, mimetype, etag, last_modified = entry
+                response = make_response(body)
+                response.mimetype = mimetype
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                changed_at = response_cache.generation()[1]
+                last_modified = (datetime.fromtimestamp(changed_at, tz=timezone.utc)
+                                 if changed_at else None)
+                response_cache.set(namespace, key,
+                                   (body, response.mimetype, etag, last_modified), ttl)
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Ask browsers to revalidate every time so unchanged data comes back as 304
+            response.cache_control.no_cache = True
+            response.headers['X-Cache'] = 'HIT' if found else 'MISS'
+
+            response = response.make_conditional(request)
+            if response.status_code == 304:
+                response_cache.record_not_modified(namespace)
+            return response
+
+        return wrapper
+    return decorator
@@ -10,66 +10,71 @@ import sqlite3
 # Import our modules
 from config import DATA_DIR
 import config
-import downloader
-import transcriber
-import indexer
-import summarizer
-from app import app
-
-# Import the new modules
-try:
-    import db_migration
-    has_db_migration = True
-except ImportError:
-    has_db_migration = False
-
-try:
-    import github_collector
-except ImportError as e:
-    github_collector_error = str(e)
-    github_collector = None
-
-try:
-    import arxiv_collector
-except ImportError as e:
-    arxiv_collector_error = str(e)
-    arxiv_collector = None
-
-try:
-    import concept_extractor
-    import chunking
-    import embeddings
-    import generate_embeddings
-    import vector_search
-    import hybrid_search
-    import context_builder
-    import llm_integration
-    has_vector_search = True
-    has_rag = True
-except ImportError as e:
-    has_vector_search = False
-    has_rag = False
-    import_error = str(e)
-    missing_module = str(e).split("No module named ")[-1].strip("'")
-    import sys
-    print(f"Current sys.path: {sys.path}")
-    import traceback
-    print(f"Traceback: {traceback.format_exc()}")
-
-# Try to import knowledge graph module
-try:
-    import knowledge_graph
-    has_knowledge_graph = True
-except ImportError:
-    has_knowledge_graph = False
-
-# Try to import evaluation modules
-try:
-    from evaluation import dashboard
-    from evaluation.test_runner import RAGTestRunner
-    has_evaluation = True
-except ImportError:
-    has_evaluation = False
+
+# Spawned worker processes (transcription, PDF extraction) re-import this file as
+# __mp_main__ before running their task; they need none of the application modules,
+# and importing them would load torch, Whisper and Flask into every worker
+if __name__ != "__mp_main__":
+    import downloader
+    import transcriber
+    import indexer
+    import summarizer
+    from app import app
+
+    # Import the new modules
+    try:
+        import db_migration
+        has_db_migration = True
+    except ImportError:
+        has_db_migration = False
+
+    try:
+        import github_collector
+    except ImportError as e:
+        github_collector_error = str(e)
+        github_collector = None
+
+    try:
+        import arxiv_collector
+    except ImportError as e:
+        arxiv_collector_error = str(e)
+        arxiv_collector = None
+
+    try:
+        import concept_extractor
+        import chunking
+        import embeddings
+        import generate_embeddings
+        import vector_search
+        import hybrid_search
+        import context_builder
+        import llm_integration
+        has_vector_search = True
+        has_rag = True
+    except ImportError as e:
+        has_vector_search = False
+        has_rag = False
+        import_error = str(e)
+        missing_module = str(e).split("No module named ")[-1].strip("'")
+        import sys
+        print(f"Current sys.path: {sys.path}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+
+    # Try to import knowledge graph module
+    try:
+        import knowledge_graph
+        has_knowledge_graph = True
+    except ImportError:
+        has_knowledge_graph = False
+
+    # Try to import evaluation modules
+    try:
+        from evaluation import dashboard
+        from evaluation.test_runner import RAGTestRunner
+        has_evaluation = True
+    except ImportError:
+        has_evaluation = False
 
 # Configure logging
 logging.basicConfig(
@@ -94,14 +99,22 @@ def run_downloader(force_refresh=False, use_auth=True):
     downloader.download_from_instagram(force_refresh=force_refresh, use_auth=use_auth)
     logger.info(f"Download completed in {time() - start_time:.2f} seconds")
 
-def run_transcriber(batch_size=16, extraction_workers=4, auto_batch_size=True):
+def run_transcriber(batch_size=16, extraction_workers=4, auto_batch_size=True,
+                    transcription_workers=0, threads_per_worker=0, stream_audio=False, keep_audio=False,
+                    use_vad=True, dedup=True):
     """Run the audio extraction and transcription"""
     logger.info("Starting audio extraction and transcription")
     start_time = time()
     transcriber.process_videos(
         batch_size=batch_size,
         extraction_workers=extraction_workers,
-        auto_batch_size=auto_batch_size
+        auto_batch_size=auto_batch_size,
+        transcription_workers=transcription_workers,
+        threads_per_worker=threads_per_worker,
+        stream_audio=stream_audio,
+        keep_audio=keep_audio,
+        use_vad=use_vad,
+        dedup=dedup
     )
     logger.info(f"Transcription completed in {time() - start_time:.2f} seconds")
 
@@ -608,6 +621,12 @@ def parse_args():
     parser.add_argument('--batch-size', type=int, default=16, help='Batch size for transcription')
     parser.add_argument('--extraction-workers', type=int, default=4, help='Number of parallel audio extraction workers')
     parser.add_argument('--auto-batch-size', action='store_true', help='Automatically determine optimal batch size')
+    parser.add_argument('--transcription-workers', type=int, default=0, help='CPU transcription worker processes (0 = auto, 1 = single process)')
+    parser.add_argument('--threads-per-worker', type=int, default=0, help='Threads per CPU transcription worker (0 = auto)')
+    parser.add_argument('--stream-audio', action='store_true', help='Decode audio in memory instead of writing WAV files')
+    parser.add_argument('--keep-audio', action='store_true', help='With --stream-audio, also save the decoded audio')
+    parser.add_argument('--no-vad', action='store_true', help='Transcribe the full audio instead of only the detected speech')
+    parser.add_argument('--no-dedup', action='store_true', help='Transcribe reposted videos again instead of copying the transcript')
     
     # Other arguments
     parser.add_argument('--download-papers', action='store_true', help='Download papers without processing')
@@ -642,7 +661,13 @@ def main():
         run_transcriber(
             batch_size=args.batch_size,
             extraction_workers=args.extraction_workers,
-            auto_batch_size=args.auto_batch_size
+            auto_batch_size=args.auto_batch_size,
+            transcription_workers=args.transcription_workers,
+            threads_per_worker=args.threads_per_worker,
+            stream_audio=args.stream_audio,
+            keep_audio=args.keep_audio,
+            use_vad=not args.no_vad,
+            dedup=not args.no_dedup
         )
 
     # The following if statements refer to arguments that no longer exist
@@ -12,6 +12,13 @@ import requests
 import argparse
 from datetime import datetime
 
+# Revalidate repeated requests through the shared HTTP cache when the project config is available
+try:
+    from http_cache import install_http_cache, log_http_cache_stats
+except ImportError:
+    install_http_cache = None
+    log_http_cache_stats = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,6 +33,8 @@ os.makedirs(DATA_DIR, exist_ok=True)
 def create_github_session(token=None):
     """Create a GitHub API session with authentication if token is provided."""
     session = requests.Session()
+    if install_http_cache:
+        install_http_cache(session)
     
     # Set user agent
     session.headers.update({
@@ -252,6 +261,8 @@ def process_repos_from_file(file_path, token=None, max_files=10):
     
     logger.info(f"Repository batch processing complete. Successfully processed {success_count}/{len(repo_names)} repositories.")
     logger.info(f"Data stored in: {DATA_DIR}")
+    if log_http_cache_stats:
+        log_http_cache_stats()
     return success_count
 
 if __name__ == "__main__":
@@ -268,5 +279,7 @@ if __name__ == "__main__":
     elif args.repo:
         # Process a single repository
         process_repo(args.repo, args.token, args.max_files)
+        if log_http_cache_stats:
+            log_http_cache_stats()
     else:
         parser.print_help() 
\ No newline at end of file
@@ -7,12 +7,11 @@ import time
 import sqlite3
 import logging
 import re
-import uuid
 from anthropic import Anthropic
-from anthropic.types.message_create_params import MessageCreateParamsNonStreaming
-from anthropic.types.messages.batch_create_params import Request
 
 from config import DB_PATH, TRANSCRIPT_DIR, DATA_DIR
+from summary_cache import SummaryCache, transcript_hash
+from batch_orchestrator import BatchOrchestrator, DEFAULT_BATCH_SIZE, DEFAULT_MAX_IN_FLIGHT
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +24,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger('summarizer')
 
+# Bump when the prompt or summary format changes so cached summaries are regenerated
+PROMPT_VERSION = "1"
+# Prefix of batch request custom ids (followed by the shortcode)
+BATCH_ID_PREFIX = "sc_"
+
 class ClaudeSummarizer:
     def __init__(self, api_key=None):
         """Initialize the Claude summarizer with API key"""
@@ -34,24 +38,11 @@ class ClaudeSummarizer:
         
         self.cache_dir = os.path.join(DATA_DIR, "summaries_cache")
         os.makedirs(self.cache_dir, exist_ok=True)
-        self.cache_file = os.path.join(self.cache_dir, "summary_cache.json")
-        self._load_cache()
-    
-    def _load_cache(self):
-        """Load summary cache from file"""
-        try:
-            with open(self.cache_file, 'r') as f:
-                self.cache = json.load(f)
-                logger.info(f"Loaded {len(self.cache)} cached summaries")
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.cache = {}
-            logger.info("Created new summary cache")
-    
-    def _save_cache(self):
-        """Save summary cache to file"""
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f)
-            logger.info(f"Saved {len(self.cache)} summaries to cache")
+        self.cache = SummaryCache(
+            os.path.join(self.cache_dir, "summary_cache.db"),
+            PROMPT_VERSION,
+            legacy_json=os.path.join(self.cache_dir, "summary_cache.json")
+        )
     
     def _create_enhanced_prompt(self, transcript, metadata=None):
         """Create an enhanced prompt for Claude with context about the video"""
@@ -213,34 +204,29 @@ CONTENT TYPE: [content type classification]
         
         return result
     
+    def _short_summary(self, transcript):
+        """Structured summary for transcripts too short to send to Claude"""
+        # Even for short transcripts, provide some structure
+        key_topics = self._extract_key_phrases(transcript, transcript)[:3]
+        
+        summary_text = f"SUMMARY: {transcript}\n\n"
+        summary_text += "KEY TOPICS:\n" + "\n".join([f"- {topic}" for topic in key_topics])
+        summary_text += "\n\nCONTENT TYPE: Short clip"
+        return summary_text
+    
     def summarize(self, transcript, shortcode, metadata=None, max_retries=3):
         """Generate a summary using Claude API with retry logic"""
         # Check cache first
-        if shortcode in self.cache:
+        cached = self.cache.get(shortcode, transcript)
+        if cached is not None:
             logger.info(f"Using cached summary for {shortcode}")
-            return self.cache[shortcode]
+            return cached
         
         # If transcript is too short, use it as the summary
         if len(transcript.split()) < 30:
             logger.info(f"Transcript too short for {shortcode}, using as summary")
-            
-            # Even for short transcripts, provide some structure
-            structured_response = {
-                'summary': transcript,
-                'key_topics': self._extract_key_phrases(transcript, transcript)[:3],
-                'entities': [],
-                'tone': 'Brief',
-                'key_insights': [],
-                'actionable_items': [],
-                'content_type': 'Short clip'
-            }
-            
-            summary_text = f"SUMMARY: {structured_response['summary']}\n\n"
-            summary_text += "KEY TOPICS:\n" + "\n".join([f"- {topic}" for topic in structured_response['key_topics']])
-            summary_text += "\n\nCONTENT TYPE: Short clip"
-            
-            self.cache[shortcode] = summary_text
-            self._save_cache()
+            summary_text = self._short_summary(transcript)
+            self.cache.put(shortcode, transcript, summary_text)
             return summary_text
         
         # Retry logic with exponential backoff
@@ -276,8 +262,7 @@ CONTENT TYPE: [content type classification]
                     structured_data['key_topics'] = key_phrases[:5]
                 
                 # Cache the result (store the full text response)
-                self.cache[shortcode] = summary
-                self._save_cache()
+                self.cache.put(shortcode, transcript, summary, model="claude-3-haiku-20240307")
                 
                 logger.info(f"Successfully generated summary for {shortcode}")
                 return summary
@@ -301,169 +286,129 @@ CONTENT TYPE: [content type classification]
         
         return "Summary generation failed"
     
-    def process_batch(self, transcript_data, max_batch_size=100, model="claude-3-haiku-20240307"):
+    def summarize_batches(self, items, on_summary, model="claude-3-haiku-20240307",
+                          batch_size=DEFAULT_BATCH_SIZE, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
         """
-        Process multiple transcripts as a batch using the Message Batches API.
+        Summarize transcripts with several Message Batches in flight
+        
+        Items are consumed lazily. Cached and very short transcripts are
+        answered immediately, items whose transcript is already being
+        summarized (reposts) wait for that summary, and the rest are
+        submitted in batches whose ids
+        are checkpointed, so an interrupted run resumes polling them.
+        Each summary is handed to on_summary as soon as its batch ends.
         
         Args:
-            transcript_data: List of dicts with keys 'shortcode', 'transcript', 'metadata'
-            max_batch_size: Maximum number of items per batch (API limit is 100,000)
+            items: Iterable of dicts with keys 'shortcode', 'transcript', 'metadata'
+            on_summary: Called with (shortcode, summary) for every finished summary
             model: Claude model to use
+            batch_size: Maximum number of requests per batch
+            max_in_flight: Maximum number of batches pending at once
             
         Returns:
-            Dict mapping shortcodes to summaries
+            Orchestrator run statistics
         """
-        # Filter out transcripts that are already in cache or too short
-        batch_items = []
-        shortcode_map = {}  # Maps custom_id to shortcode
-        results = {}  # Final results to return
-        
-        logger.info(f"Preparing batch of {len(transcript_data)} transcripts")
-        
-        for item in transcript_data:
-            shortcode = item['shortcode']
-            transcript = item['transcript']
-            metadata = item.get('metadata', {})
-            
-            # Skip if already in cache
-            if shortcode in self.cache:
-                logger.info(f"Using cached summary for {shortcode}")
-                results[shortcode] = self.cache[shortcode]
-                continue
+        transcripts = {}  # Maps custom_id to (shortcode, transcript)
+        finished = []  # Summaries of the current batch, cached in one write
+        requested = {}  # Maps transcript hash to the custom_id summarizing it
+        duplicates = {}  # Maps custom_id to shortcodes with the same transcript
+        
+        def requests():
+            for item in items:
+                shortcode = item['shortcode']
+                transcript = item['transcript']
                 
-            # Handle very short transcripts locally
-            if len(transcript.split()) < 30:
-                logger.info(f"Transcript too short for {shortcode}, using as summary")
+                cached = self.cache.get(shortcode, transcript)
+                if cached is not None:
+                    logger.info(f"Using cached summary for {shortcode}")
+                    on_summary(shortcode, cached)
+                    continue
                 
-                # Even for short transcripts, provide some structure
-                structured_response = {
-                    'summary': transcript,
-                    'key_topics': self._extract_key_phrases(transcript, transcript)[:3],
-                    'entities': [],
-                    'tone': 'Brief',
-                    'key_insights': [],
-                    'actionable_items': [],
-                    'content_type': 'Short clip'
-                }
+                # Handle very short transcripts locally
+                if len(transcript.split()) < 30:
+                    logger.info(f"Transcript too short for {shortcode}, using as summary")
+                    summary_text = self._short_summary(transcript)
+                    self.cache.put(shortcode, transcript, summary_text)
+                    on_summary(shortcode, summary_text)
+                    continue
                 
-                summary_text = f"SUMMARY: {structured_response['summary']}\n\n"
-                summary_text += "KEY TOPICS:\n" + "\n".join([f"- {topic}" for topic in structured_response['key_topics']])
-                summary_text += "\n\nCONTENT TYPE: Short clip"
+                # Reposts with the same transcript share one request
+                key = transcript_hash(transcript)
+                if requested.get(key) in transcripts:
+                    duplicates.setdefault(requested[key], []).append(shortcode)
+                    continue
                 
-                self.cache[shortcode] = summary_text
-                results[shortcode] = summary_text
-                continue
-            
-            # Create a unique ID for this request in the batch
-            custom_id = f"req_{uuid.uuid4().hex[:8]}_{shortcode}"
-            shortcode_map[custom_id] = shortcode
-            
-            # Create enhanced prompt
-            prompt = self._create_enhanced_prompt(transcript, metadata)
+                custom_id = f"{BATCH_ID_PREFIX}{shortcode}"
+                if custom_id in transcripts:
+                    # Same shortcode listed twice: custom ids must be unique, so it shares the pending request
+                    duplicates.setdefault(custom_id, []).append(shortcode)
+                    continue
+                transcripts[custom_id] = (shortcode, transcript)
+                requested[key] = custom_id
+                prompt = self._create_enhanced_prompt(transcript, item.get('metadata'))
+                yield custom_id, {
+                    "model": model,
+                    "max_tokens": 1024,
+                    "messages": [{"role": "user", "content": prompt}]
+                }
+        
+        def on_result(custom_id, entry):
+            # Results of resumed batches have no transcript in memory
+            shortcode, transcript = transcripts.pop(custom_id, (custom_id[len(BATCH_ID_PREFIX):], None))
             
-            # Add to batch requests
-            batch_items.append(
-                Request(
-                    custom_id=custom_id,
-                    params=MessageCreateParamsNonStreaming(
-                        model=model,
-                        max_tokens=1024,
-                        messages=[{
-                            "role": "user",
-                            "content": prompt
-                        }]
-                    )
+            if entry.result.type == "succeeded":
+                summary = entry.result.message.content[0].text
+                if transcript is not None:
+                    finished.append((shortcode, transcript, summary))
+                logger.info(f"Successfully processed summary for {shortcode}")
+            else:
+                error_type = entry.result.type
+                logger.error(f"Error processing {shortcode}: {error_type}")
+                
+                # Provide a basic response for failed summaries
+                summary = (
+                    f"SUMMARY: Summary generation failed due to {error_type}.\n\n"
+                    "KEY TOPICS:\n- Unknown\n\n"
+                    "CONTENT TYPE: Unknown"
                 )
-            )
+            on_summary(shortcode, summary)
+            for duplicate in duplicates.pop(custom_id, []):
+                on_summary(duplicate, summary)
         
-        # If no items need batch processing, return early
-        if not batch_items:
-            logger.info("No transcripts need batch processing")
-            self._save_cache()  # Save cache for short transcripts
-            return results
+        def on_batch_done(batch_id):
+            self.cache.put_many(finished, model=model)
+            finished.clear()
         
-        # Split into smaller batches if needed (API limit is 100,000 but we use a smaller max for safety)
-        batches = [batch_items[i:i+max_batch_size] for i in range(0, len(batch_items), max_batch_size)]
+        orchestrator = BatchOrchestrator(
+            self.client, purpose="summaries", db_path=DB_PATH,
+            max_in_flight=max_in_flight, batch_size=batch_size
+        )
+        stats = orchestrator.run(requests(), on_result, on_batch_done)
+        logger.info(f"Batch summarization stats: {stats}")
+        return stats
+    
+    def process_batch(self, transcript_data, max_batch_size=DEFAULT_BATCH_SIZE,
+                      model="claude-3-haiku-20240307", max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        """
+        Process multiple transcripts using the Message Batches API.
         
-        for batch_idx, batch in enumerate(batches):
-            logger.info(f"Processing batch {batch_idx+1}/{len(batches)} with {len(batch)} items")
+        Args:
+            transcript_data: List of dicts with keys 'shortcode', 'transcript', 'metadata'
+            max_batch_size: Maximum number of items per batch (API limit is 100,000)
+            model: Claude model to use
+            max_in_flight: Maximum number of batches pending at once
             
-            try:
-                # Create the batch
-                message_batch = self.client.messages.batches.create(requests=batch)
-                batch_id = message_batch.id
-                logger.info(f"Created batch {batch_id} with {len(batch)} requests")
-                
-                # Poll for completion
-                completed = False
-                start_time = time.time()
-                max_wait_time = 3600  # 1 hour max wait time
-                
-                while not completed and (time.time() - start_time) < max_wait_time:
-                    # Check status every 30 seconds for the first 5 minutes, then every 2 minutes
-                    if (time.time() - start_time) < 300:
-                        sleep_time = 30
-                    else:
-                        sleep_time = 120
-                        
-                    logger.info(f"Waiting {sleep_time} seconds for batch processing...")
-                    time.sleep(sleep_time)
-                    
-                    message_batch = self.client.messages.batches.retrieve(batch_id)
-                    logger.info(f"Batch {batch_id} status: {message_batch.processing_status}")
-                    
-                    if message_batch.processing_status == "ended":
-                        completed = True
-                        break
-                
-                if not completed:
-                    logger.error(f"Batch {batch_id} did not complete in the expected time")
-                    continue
-                
-                # Process batch results
-                batch_results_processed = 0
-                
-                logger.info(f"Processing results for batch {batch_id}")
-                for result in self.client.messages.batches.results(batch_id):
-                    batch_results_processed += 1
-                    custom_id = result.custom_id
-                    shortcode = shortcode_map.get(custom_id)
-                    
-                    if not shortcode:
-                        logger.error(f"Could not find shortcode for custom_id {custom_id}")
-                        continue
-                    
-                    # Process result based on its type
-                    if result.result.type == "succeeded":
-                        # Extract message content
-                        message = result.result.message
-                        summary = message.content[0].text
-                        
-                        # Save to cache and results
-                        self.cache[shortcode] = summary
-                        results[shortcode] = summary
-                        logger.info(f"Successfully processed summary for {shortcode}")
-                    else:
-                        # Handle error cases
-                        error_type = result.result.type
-                        logger.error(f"Error processing {shortcode}: {error_type}")
-                        
-                        # Provide a basic response for failed summaries
-                        basic_response = (
-                            f"SUMMARY: Summary generation failed due to {error_type}.\n\n"
-                            "KEY TOPICS:\n- Unknown\n\n"
-                            "CONTENT TYPE: Unknown"
-                        )
-                        results[shortcode] = basic_response
-                
-                logger.info(f"Processed {batch_results_processed} results from batch {batch_id}")
-                
-            except Exception as e:
-                logger.error(f"Error processing batch: {str(e)}")
+        Returns:
+            Dict mapping shortcodes to summaries
+        """
+        logger.info(f"Preparing batches for {len(transcript_data)} transcripts")
+        results = {}
         
-        # Save all results to cache
-        self._save_cache()
+        def collect(shortcode, summary):
+            results[shortcode] = summary
         
+        self.summarize_batches(transcript_data, collect, model=model,
+                               batch_size=max_batch_size, max_in_flight=max_in_flight)
         return results
 
 
@@ -511,7 +456,8 @@ def analyze_content_quality(transcript):
     }
 
 
-def process_transcripts_with_claude(batch_size=25, delay_between_batches=5, use_batch_api=True):
+def process_transcripts_with_claude(batch_size=25, delay_between_batches=5, use_batch_api=True,
+                                    max_in_flight=DEFAULT_MAX_IN_FLIGHT):
     """Process transcripts in batches using Claude API"""
     try:
         # Check for API key
@@ -545,70 +491,76 @@ def process_transcripts_with_claude(batch_size=25, delay_between_batches=5, use_
             # Use the Batch API for better efficiency
             logger.info(f"Using Message Batches API to process {total_videos} videos")
             
-            # Prepare data for batch processing
-            transcript_data = []
             video_lookup = {}  # Maps shortcode to video DB record
             
-            for video in videos:
-                video_id = video['id']
-                shortcode = video['shortcode']
-                account = video['account']
-                transcript = video['transcript']
-                
-                # Get full metadata for enhanced context
-                metadata = get_video_metadata(shortcode, conn)
-                
-                # Calculate content quality metrics
-                quality_metrics = analyze_content_quality(transcript)
+            def transcript_items():
+                # Metadata is loaded lazily, one batch ahead of submission
+                for video in videos:
+                    shortcode = video['shortcode']
+                    transcript = video['transcript']
+                    
+                    # Calculate content quality metrics
+                    quality_metrics = analyze_content_quality(transcript)
+                    
+                    # Store video record for updating later
+                    video_lookup[shortcode] = {
+                        'id': video['id'],
+                        'word_count': quality_metrics.get('word_count', 0),
+                        'estimated_read_time': quality_metrics.get('estimated_read_time_seconds', 0)
+                    }
+                    
+                    yield {
+                        'shortcode': shortcode,
+                        'transcript': transcript,
+                        # Get full metadata for enhanced context
+                        'metadata': get_video_metadata(shortcode, conn)
+                    }
+            
+            updated_count = 0
+            
+            def store_summary(shortcode, summary):
+                # Write each summary as soon as its batch ends
+                nonlocal updated_count
+                video_data = video_lookup.get(shortcode)
+                if video_data is None:
+                    # Result of a batch resumed from an interrupted run
+                    cursor.execute("SELECT id, transcript FROM videos WHERE shortcode = ?", (shortcode,))
+                    row = cursor.fetchone()
+                    if not row:
+                        logger.warning(f"No video found for resumed summary {shortcode}")
+                        return
+                    quality_metrics = analyze_content_quality(row['transcript'] or "")
+                    video_data = {
+                        'id': row['id'],
+                        'word_count': quality_metrics.get('word_count', 0),
+                        'estimated_read_time': quality_metrics.get('estimated_read_time_seconds', 0)
+                    }
                 
-                # Store for batch processing
-                transcript_data.append({
-                    'shortcode': shortcode,
-                    'transcript': transcript,
-                    'metadata': metadata
-                })
+                # Extract key phrases for database storage
+                structured_data = summarizer._parse_structured_summary(summary)
+                key_phrases_json = json.dumps(structured_data.get('key_topics', []))
                 
-                # Store video record for updating later
-                video_lookup[shortcode] = {
-                    'id': video_id,
-                    'word_count': quality_metrics.get('word_count', 0),
-                    'estimated_read_time': quality_metrics.get('estimated_read_time_seconds', 0)
-                }
+                # Update database record
+                cursor.execute(
+                    """UPDATE videos SET 
+                       summary = ?, 
+                       word_count = ?,
+                       key_phrases = ?,
+                       duration_seconds = ?
+                       WHERE id = ?""",
+                    (summary, video_data['word_count'], key_phrases_json, 
+                     video_data['estimated_read_time'], video_data['id'])
+                )
+                conn.commit()
+                updated_count += 1
             
-            # Process all videos in batch
+            # Several batches are kept in flight; no fixed delays are needed
             start_time = time.time()
-            batch_results = summarizer.process_batch(transcript_data)
+            summarizer.summarize_batches(transcript_items(), store_summary, max_in_flight=max_in_flight)
             processing_time = time.time() - start_time
             
-            # Update database with results
-            updated_count = 0
-            
-            for shortcode, summary in batch_results.items():
-                if shortcode in video_lookup:
-                    video_data = video_lookup[shortcode]
-                    video_id = video_data['id']
-                    word_count = video_data['word_count']
-                    
-                    # Extract key phrases for database storage
-                    structured_data = summarizer._parse_structured_summary(summary)
-                    key_phrases_json = json.dumps(structured_data.get('key_topics', []))
-                    
-                    # Update database record
-                    cursor.execute(
-                        """UPDATE videos SET 
-                           summary = ?, 
-                           word_count = ?,
-                           key_phrases = ?,
-                           duration_seconds = ?
-                           WHERE id = ?""",
-                        (summary, word_count, key_phrases_json, 
-                         video_data['estimated_read_time'], video_id)
-                    )
-                    conn.commit()
-                    updated_count += 1
-            
             logger.info(f"Batch processing complete. Updated {updated_count}/{total_videos} videos in {processing_time:.2f} seconds")
-            logger.info(f"Processing speed: {total_videos/processing_time:.2f} videos per second")
+            logger.info(f"Processing speed: {updated_count/max(processing_time, 1e-6):.2f} videos per second")
             
         else:
             # Use the original sequential processing for small batches or when batch API is disabled
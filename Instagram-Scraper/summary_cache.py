@@ -0,0 +1,195 @@
+"""
+Persistent summary cache for the transcript summarizer
+
+Summaries are stored in a small SQLite database (WAL mode) keyed by
+shortcode, a hash of the transcript and the prompt version, so an edited
+transcript or a changed prompt misses the cache instead of returning a
+stale summary. Each write is a single-row insert, lookups are point
+queries (nothing is loaded up front), and several summarizer processes
+can share the file. A video whose transcript is identical to one already
+summarized (a repost whose transcript was copied from the original)
+reuses that summary. Entries from the old summary_cache.json are
+imported once as shortcode-only fallbacks.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('summary_cache')
+
+CACHE_TABLE = 'summary_cache'
+# Placeholder key parts for entries imported from the JSON cache
+LEGACY_HASH = '*'
+LEGACY_PROMPT_VERSION = 'legacy'
+# Seconds to wait for another process holding the write lock
+BUSY_TIMEOUT = 30.0
+
+
+def transcript_hash(transcript: str) -> str:
+    """Stable hash of a transcript's text"""
+    return hashlib.sha256((transcript or "").encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """SQLite-backed summary cache shared between summarizer processes"""
+
+    def __init__(self, path: str, prompt_version: str, legacy_json: Optional[str] = None):
+        """
+        Open (and create) the cache
+
+        Args:
+            path: Path of the SQLite cache file
+            prompt_version: Version of the prompt that produces the summaries
+            legacy_json: Path of an old JSON cache to import once, if it exists
+        """
+        self.path = path
+        self.prompt_version = prompt_version
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (
+                shortcode TEXT NOT NULL,
+                transcript_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                model TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (shortcode, transcript_hash, prompt_version)
+            )
+        """)
+        self._conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS {CACHE_TABLE}_hash ON {CACHE_TABLE} (transcript_hash, prompt_version)
+        """)
+        self._conn.commit()
+
+        if legacy_json and os.path.exists(legacy_json):
+            self.import_json(legacy_json)
+
+    def get(self, shortcode: str, transcript: str) -> Optional[str]:
+        """
+        Cached summary for a transcript under the current prompt version
+
+        Prefers the video's own entry, then a summary of the identical
+        transcript made for another video, then an imported shortcode-only
+        entry from the old JSON cache.
+
+        Args:
+            shortcode: Video shortcode
+            transcript: Transcript text the summary was made from
+
+        Returns:
+            Summary text or None
+        """
+        with self._lock:
+            row = self._conn.execute(f"""
+                SELECT summary FROM {CACHE_TABLE}
+                WHERE (transcript_hash = ? AND prompt_version = ?)
+                   OR (shortcode = ? AND transcript_hash = ? AND prompt_version = ?)
+                ORDER BY prompt_version = ?, shortcode != ? LIMIT 1
+            """, (transcript_hash(transcript), self.prompt_version,
+                  shortcode, LEGACY_HASH, LEGACY_PROMPT_VERSION,
+                  LEGACY_PROMPT_VERSION, shortcode)).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, items: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Cached summaries for several (shortcode, transcript) pairs
+
+        Returns:
+            Dictionary mapping shortcode to summary for the hits
+        """
+        wanted = {shortcode: transcript_hash(transcript) for shortcode, transcript in items}
+        shortcodes = list(wanted)
+        found = {}
+        with self._lock:
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(shortcodes), 900):
+                chunk = shortcodes[start:start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(f"""
+                    SELECT shortcode, transcript_hash, prompt_version, summary FROM {CACHE_TABLE}
+                    WHERE shortcode IN ({placeholders}) AND prompt_version IN (?, ?)
+                """, chunk + [self.prompt_version, LEGACY_PROMPT_VERSION]).fetchall()
+                for shortcode, hash_value, prompt_version, summary in rows:
+                    if prompt_version == self.prompt_version and hash_value == wanted[shortcode]:
+                        found[shortcode] = summary
+                    elif prompt_version == LEGACY_PROMPT_VERSION:
+                        found.setdefault(shortcode, summary)
+        return found
+
+    def put(self, shortcode: str, transcript: str, summary: str, model: Optional[str] = None) -> None:
+        """Store one summary (a single-row insert)"""
+        self.put_many([(shortcode, transcript, summary)], model)
+
+    def put_many(self, entries: List[Tuple[str, str, str]], model: Optional[str] = None) -> None:
+        """
+        Store several summaries in one transaction
+
+        Args:
+            entries: (shortcode, transcript, summary) tuples
+            model: Model that produced the summaries
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = [(shortcode, transcript_hash(transcript), self.prompt_version, summary, model, now)
+                for shortcode, transcript, summary in entries]
+        with self._lock:
+            self._conn.executemany(f"""
+                INSERT OR REPLACE INTO {CACHE_TABLE}
+                    (shortcode, transcript_hash, prompt_version, summary, model, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.commit()
+
+    def import_json(self, json_path: str) -> int:
+        """
+        Import an old shortcode -> summary JSON cache and rename the file
+
+        Args:
+            json_path: Path of the JSON cache
+
+        Returns:
+            Number of imported entries
+        """
+        try:
+            with open(json_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read legacy summary cache {json_path}: {str(e)}")
+            return 0
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(f"""
+                INSERT OR IGNORE INTO {CACHE_TABLE}
+                    (shortcode, transcript_hash, prompt_version, summary, model, created_at)
+                VALUES (?, ?, ?, ?, NULL, ?)
+            """, [(shortcode, LEGACY_HASH, LEGACY_PROMPT_VERSION, summary, now)
+                  for shortcode, summary in entries.items() if isinstance(summary, str)])
+            self._conn.commit()
+        try:
+            os.replace(json_path, json_path + ".imported")
+        except OSError:
+            # Another summarizer process imported it first
+            pass
+        logger.info(f"Imported {len(entries)} summaries from {json_path}")
+        return len(entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {CACHE_TABLE}").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
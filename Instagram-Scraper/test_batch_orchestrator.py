@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+Test script for the pipelined Message Batches orchestrator
+
+Runs the Anthropic client against a local fake Message Batches server
+(batches end after a few polls, the first submission is answered 429,
+and batches with repeated custom ids are rejected like the real API
+does) and checks that:
+1. No more than max_in_flight batches are pending at once, and the limit is used
+2. A rate-limited submission is retried and every request gets one result
+3. Repeated custom ids are sent once instead of failing the batch
+4. A restarted run resumes the checkpointed batches instead of resubmitting them
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anthropic import Anthropic
+
+from batch_orchestrator import BATCH_TABLE, BatchOrchestrator
+
+# Polls a batch takes to end
+POLLS_TO_END = 3
+
+batches = {}  # batch id -> {"custom_ids", "polls", "collected"}
+events = {"creates": 0, "rate_limited": 0, "rejected": 0, "max_in_flight": 0}
+lock = threading.Lock()
+
+
+class FakeBatchesHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/messages/batches endpoint"""
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload, content_type="application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _batch(self, batch_id):
+        batch = batches[batch_id]
+        ended = batch["polls"] >= POLLS_TO_END
+        return {
+            "id": batch_id, "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else len(batch["custom_ids"]),
+                               "succeeded": len(batch["custom_ids"]) if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": "2024-01-01T00:00:00Z", "expires_at": "2024-01-02T00:00:00Z",
+            "ended_at": "2024-01-01T00:01:00Z" if ended else None,
+            "archived_at": None, "cancel_initiated_at": None,
+            "results_url": f"/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        custom_ids = [item["custom_id"] for item in request["requests"]]
+        with lock:
+            if events["creates"] == 0 and not events["rate_limited"]:
+                events["rate_limited"] += 1
+                self._send_json(429, {"type": "error", "error": {"type": "rate_limit_error",
+                                                                 "message": "Too many requests"}})
+                return
+            if len(set(custom_ids)) != len(custom_ids):
+                events["rejected"] += 1
+                self._send_json(400, {"type": "error", "error": {"type": "invalid_request_error",
+                                                                 "message": "Duplicate custom_id"}})
+                return
+            events["creates"] += 1
+            batch_id = f"msgbatch_{events['creates']:03d}"
+            batches[batch_id] = {"custom_ids": custom_ids, "polls": 0, "collected": False}
+            pending = sum(1 for batch in batches.values() if not batch["collected"])
+            events["max_in_flight"] = max(events["max_in_flight"], pending)
+            payload = self._batch(batch_id)
+        self._send_json(200, payload)
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/messages/batches/(\w+)(/results)?", self.path.split("?")[0])
+        if not match or match.group(1) not in batches:
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": "Not found"}})
+            return
+        batch_id = match.group(1)
+        with lock:
+            batch = batches[batch_id]
+            if not match.group(2):
+                batch["polls"] += 1
+                payload = self._batch(batch_id)
+                self._send_json(200, payload)
+                return
+            batch["collected"] = True
+        lines = [json.dumps({"custom_id": custom_id, "result": {"type": "succeeded", "message": {
+            "id": f"msg_{custom_id}", "type": "message", "role": "assistant", "model": "claude-3-haiku-20240307",
+            "content": [{"type": "text", "text": f"summary of {custom_id}"}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 5}}}}) for custom_id in batch["custom_ids"]]
+        self._send_json(200, ("\n".join(lines) + "\n").encode(), "application/binary")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_orchestrator(client, db_path):
+    """Orchestrator with short poll intervals"""
+    return BatchOrchestrator(client, purpose="test", db_path=db_path, max_in_flight=2, batch_size=3,
+                             initial_poll_interval=0.01, max_poll_interval=0.05)
+
+
+def source(ids):
+    return ((custom_id, {"model": "claude-3-haiku-20240307", "max_tokens": 16,
+                         "messages": [{"role": "user", "content": custom_id}]}) for custom_id in ids)
+
+
+class Interrupted(Exception):
+    """Stands in for the process being killed"""
+
+
+def run_test():
+    """Run the orchestrator against the fake server"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBatchesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    # SDK retries are off so that the orchestrator's own retry is tested
+    client = Anthropic(api_key="test", base_url=base_url, max_retries=0)
+    db_path = os.path.join(tempfile.mkdtemp(), "batches.db")
+    print(f"Fake batches server listening on {base_url}")
+
+    ok = True
+
+    # 1-3. Pipelined run with a rate-limited first submission and a repeated id
+    ids = [f"sc_{i:02d}" for i in range(14)]
+    results = []
+    stats = make_orchestrator(client, db_path).run(source(ids[:2] + ["sc_01"] + ids[2:]),
+                                                   lambda custom_id, entry: results.append(custom_id))
+    print(f"Stats: {stats}")
+    if events["max_in_flight"] == 2:
+        print("✅ At most 2 batches were pending at once, and 2 were")
+    else:
+        print(f"❌ Expected 2 batches in flight at most, saw {events['max_in_flight']}")
+        ok = False
+    if events["rate_limited"] == 1 and stats["api_errors"] == 1 and sorted(results) == ids:
+        print("✅ Submission retried after 429, every request answered once")
+    else:
+        print(f"❌ Retry after 429 failed: {len(results)} results, {stats['api_errors']} API errors")
+        ok = False
+    if events["rejected"] == 0 and stats["duplicate_requests"] == 1 and stats["batches_submitted"] == 5:
+        print("✅ Repeated custom id sent once, no batch rejected")
+    else:
+        print(f"❌ Repeated custom id: {events['rejected']} batches rejected")
+        ok = False
+
+    # 4. Interrupted run, then resume
+    ids = [f"sc_{i:02d}" for i in range(100, 109)]
+    creates_before = events["creates"]
+
+    def interrupt(custom_id, entry):
+        raise Interrupted()
+
+    try:
+        make_orchestrator(client, db_path).run(source(ids), interrupt)
+    except Interrupted:
+        pass
+    conn = sqlite3.connect(db_path)
+    checkpointed = conn.execute(f"SELECT COUNT(*) FROM {BATCH_TABLE} WHERE status != 'processed'").fetchone()[0]
+    conn.close()
+    submitted = events["creates"] - creates_before
+
+    results = []
+    stats = make_orchestrator(client, db_path).run(source(ids), lambda custom_id, entry: results.append(custom_id))
+    resubmitted = events["creates"] - creates_before - submitted
+    print(f"Interrupted with {checkpointed} unprocessed batches, resumed: {stats}")
+    if checkpointed == 2 and stats["batches_resumed"] == 2 and sorted(results) == ids \
+            and resubmitted == len(ids) // 3 - 2:
+        print("✅ Restarted run resumed the checkpointed batches and submitted only the rest")
+    else:
+        print(f"❌ Resume failed: {stats['batches_resumed']} resumed, {resubmitted} new batches, "
+              f"{len(results)} results")
+        ok = False
+
+    server.shutdown()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
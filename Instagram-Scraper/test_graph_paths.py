@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Test script for the bounded k-shortest path search
+
+Checks that:
+1. A cheap route with too many hops does not hide a heavier route that
+   fits the hop limit (1->3 at confidence 0.1 next to 1->2->3)
+2. On random graphs, the paths found under a hop limit match a brute-force
+   enumeration of all simple paths within that limit, in weight order
+"""
+import sys
+import math
+import random
+from itertools import islice
+
+from graph_engine import CompactGraph
+from graph_paths import MIN_CONFIDENCE, PathFinder, find_paths
+
+
+def make_graph(edges):
+    """CompactGraph from (source, target, confidence) triples"""
+    node_ids = sorted({u for u, _, _ in edges} | {v for _, v, _ in edges})
+    concept_rows = [(node_id, f"c{node_id}", "", "", 1) for node_id in node_ids]
+    rel_rows = [(u, v, "related_to", confidence, 1) for u, v, confidence in edges]
+    return CompactGraph.from_rows(concept_rows, rel_rows)
+
+
+def brute_force(edges, source, target, max_hops):
+    """Weights of all simple paths within max_hops, lightest first"""
+    adjacency = {}
+    for u, v, confidence in edges:
+        adjacency.setdefault(u, []).append((v, -math.log(min(max(confidence, MIN_CONFIDENCE), 1.0))))
+    weights = []
+
+    def walk(node, visited, weight):
+        if node == target:
+            weights.append(weight)
+            return
+        if len(visited) > max_hops:
+            return
+        for v, w in adjacency.get(node, []):
+            if v not in visited:
+                walk(v, visited | {v}, weight + w)
+
+    walk(source, {source}, 0.0)
+    return sorted(weights)
+
+
+def run_test():
+    """Run the regression graph and the random comparison"""
+    ok = True
+
+    # 1. Hop limit regression
+    graph = make_graph([(1, 3, 0.1), (1, 2, 1.0), (2, 3, 1.0), (3, 4, 1.0)])
+    paths = find_paths(graph, 1, 4, max_hops=2)
+    found = [[int(graph.node_ids[i]) for i in nodes] for _, nodes, _ in paths]
+    if found == [[1, 3, 4]]:
+        print("✅ 1->3->4 found within 2 hops next to the cheaper 3-hop route")
+    else:
+        print(f"❌ Expected [[1, 3, 4]] within 2 hops, got {found}")
+        ok = False
+    found = [[int(graph.node_ids[i]) for i in nodes] for _, nodes, _ in find_paths(graph, 1, 4, max_hops=3)]
+    if found == [[1, 2, 3, 4], [1, 3, 4]]:
+        print("✅ Both routes found, cheapest first, within 3 hops")
+    else:
+        print(f"❌ Expected both routes within 3 hops, got {found}")
+        ok = False
+
+    # 2. Random graphs against brute force
+    rng = random.Random(7)
+    mismatches = 0
+    for trial in range(200):
+        n = rng.randint(5, 12)
+        edges = {(u, v): rng.choice([1.0, 0.9, 0.5, 0.1, rng.random()])
+                 for u in range(n) for v in range(n) if u != v and rng.random() < 0.25}
+        edges = [(u, v, c) for (u, v), c in edges.items()]
+        if not edges:
+            continue
+        graph = make_graph(edges)
+        finder = PathFinder(graph)
+        source, target = rng.sample(sorted({u for u, _, _ in edges} | {v for _, v, _ in edges}), 2)
+        max_hops = rng.randint(1, 4)
+        expected = brute_force(edges, source, target, max_hops)
+        got = [weight for weight, _, _ in islice(
+            finder.k_shortest_paths(graph.index_of(source), graph.index_of(target), max_hops, None), 5)]
+        if len(got) != min(5, len(expected)) or any(abs(a - b) > 1e-5 for a, b in zip(got, expected)):
+            mismatches += 1
+    if mismatches == 0:
+        print("✅ Path weights match brute force on 200 random graphs")
+    else:
+        print(f"❌ {mismatches} random graphs disagree with brute force")
+        ok = False
+
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Test script for the graph-expansion retrieval stage
+
+Builds a small knowledge base where every topic has a concept named in the
+query, a related concept, and content about either one, and checks that:
+1. After a data generation bump the current index keeps serving while a new
+   one is built in the background, and the new one replaces it when ready
+2. On the evaluation harness, hybrid search with graph expansion recalls the
+   content about related concepts that search without it misses, and does
+   not change queries that name no concept
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+
+import config
+
+# Searches and the evaluation harness read config at call time
+TEMP_DIR = tempfile.mkdtemp()
+config.DB_PATH = os.path.join(TEMP_DIR, "knowledge_base.db")
+config.DATA_DIR = TEMP_DIR
+
+import graph_retrieval
+from evaluation.test_runner import RAGTestRunner
+from response_cache import bump_data_generation
+
+TOPICS = 20
+NOISE_DOCS = 200
+
+
+def make_words(rng, count):
+    """Distinct made-up words"""
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(3)))
+    return sorted(words)
+
+
+def build_knowledge_base(db_path, rng):
+    """Topics with a query concept (2 documents) and a related concept (3 documents)"""
+    words = iter(make_words(rng, TOPICS * 4 + NOISE_DOCS * 8))
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.executescript("""
+        CREATE TABLE source_types (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+        CREATE TABLE ai_content (
+            id INTEGER PRIMARY KEY, source_type_id INTEGER NOT NULL, source_id TEXT NOT NULL,
+            title TEXT, description TEXT, content TEXT, url TEXT, date_created TEXT,
+            date_collected TEXT NOT NULL, metadata TEXT
+        );
+        CREATE TABLE content_embeddings (
+            id INTEGER PRIMARY KEY, content_id INTEGER NOT NULL, embedding_vector BLOB NOT NULL,
+            embedding_model TEXT NOT NULL, chunk_index INTEGER DEFAULT 0, chunk_text TEXT,
+            date_created TEXT NOT NULL
+        );
+        CREATE TABLE concepts (
+            id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, description TEXT, category TEXT,
+            first_seen_date TEXT, last_updated TEXT, reference_count INTEGER DEFAULT 1
+        );
+        CREATE TABLE concept_relationships (
+            id INTEGER PRIMARY KEY, source_concept_id INTEGER NOT NULL, target_concept_id INTEGER NOT NULL,
+            relationship_type TEXT NOT NULL, first_seen_date TEXT, last_updated TEXT,
+            reference_count INTEGER DEFAULT 1, confidence_score REAL DEFAULT 1.0
+        );
+        CREATE TABLE content_concepts (
+            id INTEGER PRIMARY KEY, content_id INTEGER, concept_id INTEGER, importance TEXT, metadata TEXT
+        );
+        INSERT INTO source_types (id, name) VALUES (1, 'research_paper');
+    """)
+
+    def add_content(text, concept_id=None):
+        cursor.execute("INSERT INTO ai_content (source_type_id, source_id, title, content, date_collected) "
+                       "VALUES (1, ?, ?, ?, '2024-01-01')", (text[:20], text[:40], text))
+        if concept_id is not None:
+            cursor.execute("INSERT INTO content_concepts (content_id, concept_id, importance) VALUES (?, ?, 'high')",
+                           (cursor.lastrowid, concept_id))
+        return cursor.lastrowid
+
+    queries = []
+    for topic in range(TOPICS):
+        name = f"{next(words)} {next(words)}"
+        related = f"{next(words)} {next(words)}"
+        cursor.execute("INSERT INTO concepts (name, category) VALUES (?, 'algorithm')", (name,))
+        concept_id = cursor.lastrowid
+        cursor.execute("INSERT INTO concepts (name, category) VALUES (?, 'algorithm')", (related,))
+        related_id = cursor.lastrowid
+        cursor.execute("INSERT INTO concept_relationships (source_concept_id, target_concept_id, "
+                       "relationship_type, confidence_score) VALUES (?, ?, 'extends', 0.9)",
+                       (related_id, concept_id))
+        relevant = [add_content(f"An introduction to {name} with worked examples", concept_id)
+                    for _ in range(2)]
+        relevant += [add_content(f"Benchmarks of {related} on standard tasks", related_id)
+                     for _ in range(3)]
+        queries.append({"query_id": f"topic_{topic}", "query_text": name, "relevant_content": relevant})
+
+    # Weak links between topics, and content about nothing in particular
+    concept_ids = [row[0] for row in cursor.execute("SELECT id FROM concepts").fetchall()]
+    for _ in range(TOPICS):
+        source, target = rng.sample(concept_ids, 2)
+        cursor.execute("INSERT INTO concept_relationships (source_concept_id, target_concept_id, "
+                       "relationship_type, confidence_score) VALUES (?, ?, 'related_to', 0.6)", (source, target))
+    noise = [add_content(" ".join(next(words) for _ in range(8))) for _ in range(NOISE_DOCS)]
+
+    # Queries naming no concept: graph expansion must leave them alone
+    for index, content_id in enumerate(noise[:5]):
+        text = cursor.execute("SELECT content FROM ai_content WHERE id = ?", (content_id,)).fetchone()[0]
+        queries.append({"query_id": f"plain_{index}", "query_text": text.split()[0],
+                        "relevant_content": [content_id]})
+
+    bump_data_generation(cursor, 'test_graph_retrieval')
+    conn.commit()
+    conn.close()
+    return {"name": "synthetic_graph_topics", "queries": queries}
+
+
+def run_test():
+    """Check the background rebuild and the recall comparison"""
+    rng = random.Random(5)
+    dataset = build_knowledge_base(config.DB_PATH, rng)
+    ok = True
+
+    # 1. Background rebuild
+    first = graph_retrieval.get_graph_expander()
+    conn = sqlite3.connect(config.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO concepts (name, category) VALUES ('fresh concept', 'algorithm')")
+    bump_data_generation(cursor, 'test_graph_retrieval')
+    conn.commit()
+    conn.close()
+
+    graph_retrieval._expander_checked = 0.0
+    start_time = time.time()
+    served = graph_retrieval.get_graph_expander()
+    served_ms = (time.time() - start_time) * 1000
+    for thread in threading.enumerate():
+        if thread.name == "graph-expander-rebuild":
+            thread.join()
+    graph_retrieval._expander_checked = 0.0
+    rebuilt = graph_retrieval.get_graph_expander()
+    if served is first and rebuilt is not first and rebuilt.matcher.match("a fresh concept") \
+            and not first.matcher.match("a fresh concept"):
+        print(f"✅ Old index served during the rebuild ({served_ms:.1f} ms), new index swapped in afterwards")
+    else:
+        print("❌ Index was not rebuilt in the background")
+        ok = False
+
+    # 2. Recall with and without graph expansion
+    results = RAGTestRunner(db_path=config.DB_PATH).compare_graph_expansion(dataset, top_k=5)
+    baseline, expanded = results["metrics"].values()
+    print(f"Recall@5 without graph expansion: {baseline['avg_recall']:.3f}, "
+          f"with: {expanded['avg_recall']:.3f} (gain {results['recall_gain']:+.3f})")
+    print(f"Latency without: {results['latency']['hybrid_no_graph']['avg_ms']:.1f} ms, "
+          f"with: {list(results['latency'].values())[1]['avg_ms']:.1f} ms")
+    if results["recall_gain"] > 0.3:
+        print("✅ Graph expansion finds content about related concepts")
+    else:
+        print("❌ Graph expansion did not improve recall")
+        ok = False
+
+    import hybrid_search
+    unchanged = all(
+        [r["content_id"] for r in hybrid_search.hybrid_search(q["query_text"], top_k=5, graph_weight=0.0)] ==
+        [r["content_id"] for r in hybrid_search.hybrid_search(q["query_text"], top_k=5)]
+        for q in dataset["queries"] if q["query_id"].startswith("plain_"))
+    if unchanged:
+        print("✅ Queries naming no concept return the same results with and without expansion")
+    else:
+        print("❌ Graph expansion changed results of queries naming no concept")
+        ok = False
+
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Test script for the shared HTTP cache
+
+Serves JSON from a local HTTP server that supports ETag, Last-Modified
+and gzip, and checks that:
+1. A repeated request is revalidated and answered 304, with the cached body
+2. A changed resource replaces the cached body
+3. Responses without validators and streamed requests pass through uncached
+4. Hits are counted per host
+"""
+import sys
+import gzip
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_cache import HTTPCache, install_http_cache
+
+# Current body of each path, and the status codes sent
+RESOURCES = {"/repos/a/b": {"name": "b", "stars": 1}, "/repos/a/b/readme": {"content": "x" * 5000}}
+sent = []
+lock = threading.Lock()
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """Serves RESOURCES with ETags (the version is part of the tag); /no-cache has none"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/no-cache":
+            body, etag = b'{"now": 1}', None
+        elif self.path in RESOURCES:
+            body = json.dumps(RESOURCES[self.path]).encode()
+            etag = f'"{hash(body) & 0xffffffff:x}"'
+        else:
+            self.send_error(404)
+            return
+
+        if etag and self.headers.get("If-None-Match") == etag:
+            status, payload = 304, b""
+        else:
+            status = 200
+            payload = gzip.compress(body) if "gzip" in self.headers.get("Accept-Encoding", "") else body
+        with lock:
+            sent.append((self.path, status))
+
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("X-RateLimit-Remaining", str(5000 - len(sent)))
+        if status == 200:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            if payload is not body:
+                self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_test():
+    """Fetch the fake API through a cached session and check revalidation"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAPIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    cache = HTTPCache(tempfile.mkdtemp())
+    session = install_http_cache(requests.Session(), cache)
+    print(f"Fake API listening on {base_url}")
+
+    ok = True
+
+    # 1. Revalidation
+    first = session.get(base_url + "/repos/a/b/readme").json()
+    second = session.get(base_url + "/repos/a/b/readme")
+    if sent[-1] == ("/repos/a/b/readme", 304) and second.status_code == 200 \
+            and second.json() == first and getattr(second, "from_cache", False) \
+            and second.headers["X-RateLimit-Remaining"] == str(5000 - len(sent)):
+        print("✅ Repeated request answered 304 and served from the cache with fresh headers")
+    else:
+        print(f"❌ Repeated request not revalidated: {sent[-1]}, {second.status_code}")
+        ok = False
+
+    # 2. Changed resource
+    session.get(base_url + "/repos/a/b")
+    RESOURCES["/repos/a/b"]["stars"] = 2
+    changed = session.get(base_url + "/repos/a/b")
+    again = session.get(base_url + "/repos/a/b")
+    if changed.json()["stars"] == 2 and not getattr(changed, "from_cache", False) and again.json()["stars"] == 2 \
+            and sent[-1] == ("/repos/a/b", 304):
+        print("✅ Changed resource refetched and the new body cached")
+    else:
+        print("❌ Stale body served after the resource changed")
+        ok = False
+
+    # 3. Pass-through
+    session.get(base_url + "/no-cache")
+    session.get(base_url + "/no-cache")
+    streamed = session.get(base_url + "/repos/a/b", stream=True)
+    streamed.content
+    if sent[-3:] == [("/no-cache", 200), ("/no-cache", 200), ("/repos/a/b", 200)]:
+        print("✅ Responses without validators and streamed requests are not cached")
+    else:
+        print(f"❌ Unexpected requests: {sent[-3:]}")
+        ok = False
+    server.shutdown()
+
+    # 4. Per-host stats
+    stats = cache.stats()["127.0.0.1"]
+    print(f"Stats: {stats}")
+    if stats["hits"] != 2 or stats["requests"] != 7 or stats["bytes_saved"] <= 5000:
+        print("❌ Unexpected cache statistics")
+        ok = False
+
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
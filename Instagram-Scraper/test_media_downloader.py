@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Test script for resumable media downloads
+
+Serves fake videos from a local HTTP server that drops the first
+connection of every file halfway through, and checks that:
+1. Interrupted downloads resume with a Range request instead of starting over
+2. Completed files match the server's bytes and their manifest
+3. No truncated file is left under the final name when a download fails
+"""
+import os
+import sys
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import media_downloader
+from media_downloader import DownloadError, MediaDownloader, read_manifest, verify_download
+
+FILE_SIZE = 3 * 1024 * 1024
+FILES = {f"/video{i}.mp4": os.urandom(FILE_SIZE) for i in range(6)}
+
+# Paths whose first request was already cut off, and the Range headers received
+interrupted = set()
+ranges = []
+lock = threading.Lock()
+
+
+class FakeCDNHandler(BaseHTTPRequestHandler):
+    """Serves FILES with Range support; /broken.mp4 always stops halfway"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = FILES.get(self.path, FILES["/video0.mp4"] if self.path == "/broken.mp4" else None)
+        if body is None:
+            self.send_error(404)
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header:
+            start = int(range_header.split("=")[1].split("-")[0])
+            with lock:
+                ranges.append((self.path, start))
+        with lock:
+            cut = self.path == "/broken.mp4" or (self.path not in interrupted and not range_header)
+            interrupted.add(self.path)
+
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.send_header("ETag", '"v1"')
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        if cut:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        payload = body[start:]
+        self.wfile.write(payload[:len(payload) // 2] if cut else payload)
+        if cut:
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_test():
+    """Download the fake videos and check resume, integrity and failure handling"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCDNHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    target_dir = tempfile.mkdtemp()
+    print(f"Fake CDN listening on {base_url}, downloading to {target_dir}")
+
+    # Retry quickly; the fake server recovers at once
+    media_downloader.BACKOFF_SECONDS = 0.05
+    downloader = MediaDownloader(workers=3, max_attempts=3)
+
+    futures = {name: downloader.submit(base_url + name, os.path.join(target_dir, name.lstrip("/")))
+               for name in FILES}
+    broken_path = os.path.join(target_dir, "broken.mp4")
+    broken = downloader.submit(base_url + "/broken.mp4", broken_path)
+    downloader.close()
+    server.shutdown()
+
+    ok = True
+
+    # 1. Resume instead of restart
+    resumed = {path for path, start in ranges if path in FILES and start == FILE_SIZE // 2}
+    if resumed == set(FILES):
+        print(f"✅ All {len(FILES)} interrupted downloads resumed at byte {FILE_SIZE // 2}")
+    else:
+        print(f"❌ Resumed only {sorted(resumed)}")
+        ok = False
+
+    # 2. Integrity
+    for name, future in futures.items():
+        path = os.path.join(target_dir, name.lstrip("/"))
+        manifest = future.result()
+        expected = hashlib.sha256(FILES[name]).hexdigest()
+        if manifest["sha256"] != expected or not verify_download(path, full_hash=True) \
+                or read_manifest(path)["size"] != FILE_SIZE or os.path.exists(path + ".part"):
+            print(f"❌ {name} does not match the served file")
+            ok = False
+    if ok:
+        print("✅ Every file matches the server's bytes and its manifest")
+
+    # 3. Failed downloads stay out of place
+    try:
+        broken.result()
+        print("❌ Truncated download reported as complete")
+        ok = False
+    except DownloadError:
+        if os.path.exists(broken_path):
+            print("❌ Truncated file left under its final name")
+            ok = False
+        else:
+            print("✅ Truncated download failed without leaving a partial file in place")
+
+    stats = downloader.stats.snapshot()
+    print(f"Stats: {stats}")
+    if stats["files"] != len(FILES) or stats["failures"] != 1 or stats["retries"] < len(FILES):
+        print("❌ Unexpected download statistics")
+        ok = False
+
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Test script for duplicate detection in the media store
+
+Builds three videos from synthetic audio and frames: an original, a
+re-encoded repost of it (gain change, noise, a short trim), and a different
+reel over the same background music. ffmpeg decoding is replaced by the
+synthetic signals. Checks that:
+1. The repost gets the original's canonical id
+2. The reel sharing only the music keeps its own canonical id, although its
+   audio alone would match
+3. Videos matched on an earlier run are returned without fingerprinting
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import media_store
+from media_store import (FINGERPRINT_RATE, MAX_BIT_ERROR, VIDEO_HASH_FPS, MediaStore, audio_fingerprint,
+                         file_sha256, fingerprint_distance, frame_hashes)
+
+DURATION = 20.0
+
+
+def music(rng):
+    """Broadband sound whose spectrum changes every quarter second"""
+    segment = FINGERPRINT_RATE // 4
+    parts = []
+    for _ in range(int(DURATION * 4)):
+        spectrum = np.fft.rfft(rng.standard_normal(segment))
+        envelope = np.interp(np.arange(len(spectrum)), np.linspace(0, len(spectrum), 12), rng.random(12))
+        parts.append(np.fft.irfft(spectrum * envelope, segment))
+    audio = np.concatenate(parts)
+    return 0.3 * audio / audio.std()
+
+
+def voice(rng, level):
+    """Bursts of noise standing in for speech"""
+    samples = int(DURATION * FINGERPRINT_RATE)
+    envelope = np.repeat(rng.random(samples // 800 + 1) > 0.5, 800)[:samples]
+    return level * rng.standard_normal(samples) * envelope
+
+
+def frames(rng):
+    """Smooth random grey frames, two a second"""
+    count = int(DURATION * VIDEO_HASH_FPS)
+    coarse = rng.integers(0, 256, (count, 3, 4)).astype(float)
+    rows = np.linspace(0, 2, 8)
+    cols = np.linspace(0, 3, 9)
+    image = np.empty((count, 8, 9))
+    for i, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            r, c = min(int(row), 1), min(int(col), 2)
+            fr, fc = row - r, col - c
+            image[:, i, j] = ((1 - fr) * (1 - fc) * coarse[:, r, c] + (1 - fr) * fc * coarse[:, r, c + 1]
+                              + fr * (1 - fc) * coarse[:, r + 1, c] + fr * fc * coarse[:, r + 1, c + 1])
+    return image
+
+
+def run_test():
+    """Ingest and match the three videos"""
+    rng = np.random.default_rng(3)
+    temp_dir = tempfile.mkdtemp()
+    store = MediaStore(root=os.path.join(temp_dir, "media"), path=os.path.join(temp_dir, "media_store.db"))
+
+    background = music(rng)
+    original_voice = voice(rng, 0.05)
+    original_audio = background + original_voice
+    original_frames = frames(rng)
+    trim = FINGERPRINT_RATE // 10
+    signals = {
+        "original": (original_audio, original_frames),
+        "repost": (0.8 * original_audio[trim:] + 0.01 * rng.standard_normal(len(original_audio) - trim),
+                   np.clip(original_frames + rng.normal(0, 3, original_frames.shape), 0, 255)),
+        "other": (background + voice(rng, 0.05), frames(rng)),
+    }
+
+    # Each "video" file holds its name; decoding returns that video's signals
+    by_sha = {}
+    paths = {}
+    for account, name in (("alice", "original"), ("bob", "repost"), ("carol", "other")):
+        os.makedirs(os.path.join(temp_dir, "downloads", account))
+        path = os.path.join(temp_dir, "downloads", account, f"{name}.mp4")
+        with open(path, "w") as f:
+            f.write(name)
+        by_sha[file_sha256(path)] = name
+        paths[name] = path
+
+    decoded = []
+
+    def signals_of(blob_path):
+        return signals[by_sha[os.path.splitext(os.path.basename(blob_path))[0]]]
+
+    def fake_decode_audio(path, sample_rate):
+        decoded.append(path)
+        return signals_of(path)[0]
+
+    def fake_video_fingerprint(path):
+        return frame_hashes(np.round(signals_of(path)[1]).astype(np.uint8))
+
+    media_store.decode_audio = fake_decode_audio
+    media_store.video_fingerprint = fake_video_fingerprint
+
+    ok = True
+    hashes = {}
+    for name in ("original", "repost", "other"):
+        path = paths[name]
+        hashes[name] = store.ingest(path, os.path.basename(os.path.dirname(path)))
+    store.fingerprint_missing(hashes.values())
+    canonical = {name: store.resolve_canonical(sha256) for name, sha256 in hashes.items()}
+
+    # 1. Repost
+    if canonical["repost"] == hashes["original"]:
+        print("✅ Re-encoded repost matched to the original")
+    else:
+        print("❌ Re-encoded repost was not matched to the original")
+        ok = False
+
+    # 2. Same music, different reel
+    audio_error = fingerprint_distance(audio_fingerprint(signals["other"][0]), audio_fingerprint(original_audio))
+    print(f"Audio bit error between the reels sharing music: {audio_error:.3f} (limit {MAX_BIT_ERROR})")
+    if audio_error <= MAX_BIT_ERROR and canonical["other"] == hashes["other"]:
+        print("✅ Reel with the same background music but other video kept its own canonical id")
+    elif audio_error > MAX_BIT_ERROR:
+        print("❌ Synthetic reels do not share enough audio to test the video check")
+        ok = False
+    else:
+        print("❌ Reel sharing only background music was treated as a duplicate")
+        ok = False
+
+    # 3. Next run
+    decoded.clear()
+    resolved = store.resolved_media(paths.values())
+    expected = {paths[name]: (hashes[name], canonical[name]) for name in paths}
+    if resolved == expected and not decoded:
+        print("✅ Videos matched on the earlier run are returned without fingerprinting")
+    else:
+        print(f"❌ Earlier matches not reused: {len(resolved)}/3 returned, {len(decoded)} decoded")
+        ok = False
+
+    store.close()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
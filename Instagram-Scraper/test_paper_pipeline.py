@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Test script for the concurrent arXiv pipeline
+
+Serves an Atom feed and small PDFs from a local stand-in for arXiv and
+checks that:
+1. Every paper is downloaded, extracted and written
+2. No two requests (feed or PDF) are closer than the configured interval
+3. Papers are extracted and written while later PDFs are still downloading
+"""
+import sys
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from paper_pipeline import PaperPipeline, parse_feed_entry
+
+NUM_PAPERS = 10
+REQUEST_INTERVAL = 0.25
+
+# Request times and write times seen by the test
+requests_seen = []
+writes = []
+lock = threading.Lock()
+
+
+def make_pdf(text: str) -> bytes:
+    """One-page PDF showing text"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return pdf
+
+
+PDFS = {f"/pdf/2401.{i:05d}v1": make_pdf(f"Body of paper number {i}") for i in range(NUM_PAPERS)}
+
+
+def make_feed(base_url: str) -> bytes:
+    """Atom feed listing every paper in PDFS"""
+    entries = "".join(f"""
+  <entry>
+    <id>http://arxiv.org/abs/{path.rsplit('/', 1)[1]}</id>
+    <published>2024-01-0{i % 9 + 1}T00:00:00Z</published>
+    <title>Stand-in paper {i}</title>
+    <summary>Abstract {i}</summary>
+    <author><name>Author {i}</name></author>
+    <link title="pdf" href="{base_url}{path}" rel="related" type="application/pdf"/>
+  </entry>""" for i, path in enumerate(PDFS))
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">{entries}
+</feed>""".encode()
+
+
+class FakeArxivHandler(BaseHTTPRequestHandler):
+    """Serves /api/query and the PDFs, recording when each request arrives"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with lock:
+            requests_seen.append((time.monotonic(), self.path))
+        if self.path.startswith("/api/query"):
+            body = make_feed(f"http://127.0.0.1:{self.server.server_address[1]}")
+        else:
+            body = PDFS.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        # Slow enough that transfers overlap with the rate-limit wait
+        time.sleep(0.1)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_test():
+    """Run the pipeline against the stand-in server and check rate and overlap"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeArxivHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    pdf_dir = tempfile.mkdtemp()
+    print(f"Fake arXiv listening on {base_url}, downloading to {pdf_dir}")
+
+    pipeline = PaperPipeline(pdf_dir, request_interval=REQUEST_INTERVAL, write_batch=2,
+                             api_url=base_url + "/api/query")
+    papers = [parse_feed_entry(entry, "cs.AI") for entry in pipeline.fetch_feed("cat:cs.AI", NUM_PAPERS)]
+
+    written = []
+
+    def write_batch(batch):
+        with lock:
+            writes.append(time.monotonic())
+        written.extend(batch)
+        return len(batch)
+
+    stats = pipeline.run(papers, write_batch)
+    server.shutdown()
+    print(f"Stats: {stats}")
+
+    ok = True
+
+    # 1. Everything arrives
+    texts = {paper["paper_id"]: paper.get("text", "") for paper in written}
+    missing = [paper["paper_id"] for paper in papers
+               if f"number {int(paper['paper_id'][5:10])}" not in texts.get(paper["paper_id"], "")]
+    if len(papers) == NUM_PAPERS and not missing and stats["written"] == NUM_PAPERS:
+        print(f"✅ All {NUM_PAPERS} papers downloaded, extracted and written")
+    else:
+        print(f"❌ Papers missing or without text: {missing}")
+        ok = False
+
+    # 2. Global rate
+    times = sorted(t for t, _ in requests_seen)
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    if min(gaps) >= REQUEST_INTERVAL * 0.9:
+        print(f"✅ {len(times)} requests, never closer than {min(gaps):.2f}s (limit {REQUEST_INTERVAL}s)")
+    else:
+        print(f"❌ Requests only {min(gaps):.2f}s apart (limit {REQUEST_INTERVAL}s)")
+        ok = False
+
+    # 3. Stages overlap
+    last_request = times[-1]
+    if writes and writes[0] < last_request:
+        print(f"✅ First batch written {last_request - writes[0]:.2f}s before the last PDF was requested")
+    else:
+        print("❌ Nothing was written until every PDF had been downloaded")
+        ok = False
+
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
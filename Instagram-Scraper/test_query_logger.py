@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Test script for the buffered query log writer
+
+Checks that:
+1. flush() returns only once every queued row is committed, even while
+   the writer is still collecting its batch and the queue is already empty
+2. Rows logged from many threads are all written, with unique ids
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+from api.query_logger import QueryLogWriter
+
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM query_logs").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def run_test():
+    """Log queries and check what flush() guarantees"""
+    db_path = os.path.join(tempfile.mkdtemp(), "query_logs.db")
+    ok = True
+
+    # 1. The writer waits up to the flush interval for more rows after
+    # taking the last one, so the queue is empty well before the commit
+    writer = QueryLogWriter(db_path=db_path, flush_interval_ms=300, max_batch_rows=1000)
+    for i in range(50):
+        writer.log(f"query {i}", "hybrid", i)
+    start_time = time.time()
+    writer.flush()
+    waited = time.time() - start_time
+    rows = count_rows(db_path)
+    if rows == 50:
+        print(f"✅ flush() returned after the commit ({waited * 1000:.0f} ms), all 50 rows written")
+    else:
+        print(f"❌ flush() returned after {waited * 1000:.0f} ms with {rows}/50 rows written")
+        ok = False
+
+    # 2. Concurrent logging
+    ids = []
+    lock = threading.Lock()
+
+    def log_many(thread_index):
+        for i in range(100):
+            query_id = writer.log(f"thread {thread_index} query {i}", "vector", 1)
+            with lock:
+                ids.append(query_id)
+
+    threads = [threading.Thread(target=log_many, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.flush()
+    rows = count_rows(db_path)
+    if rows == 850 and len(set(ids)) == 800 and writer.written == 850 and writer.dropped == 0:
+        print("✅ 800 rows logged from 8 threads were written with unique ids")
+    else:
+        print(f"❌ Expected 850 rows, found {rows} ({writer.written} written, {writer.dropped} dropped)")
+        ok = False
+
+    writer.close()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_test() else 1)
@@ -23,6 +23,10 @@ from config import (
     TRANSCRIPT_DIR,
     WHISPER_MODEL
 )
+from transcription_pool import TRANSCRIBE_OPTIONS, transcribe_parallel
+from audio_stream import decode_audio, prefetch_audio, write_wav
+from vad import transcribe_speech
+from media_store import get_media_store
 
 # Configure logging
 logging.basicConfig(
@@ -132,13 +136,113 @@ def extract_audio_batch(video_audio_pairs: List[Tuple[str, str]], max_workers: i
     logger.info(f"Successfully extracted audio from {len(successful_audio_paths)}/{len(video_audio_pairs)} videos")
     return successful_audio_paths
 
+def save_transcript(transcript_path: str, result: Dict, filename: str, account: str, metadata: Dict) -> None:
+    """
+    Write a Whisper result with the video's metadata as a transcript JSON file
+    
+    Args:
+        transcript_path: Output path
+        result: Whisper result with text, segments and language
+        filename: Video filename
+        account: Account name
+        metadata: Video metadata merged into the transcript
+    """
+    # Create transcript with metadata
+    transcript_data = {
+        "text": result["text"],
+        "segments": result["segments"],
+        "language": result["language"],
+        "filename": filename,
+        "account": account,
+        **metadata
+    }
+    
+    # Save transcript
+    os.makedirs(os.path.dirname(transcript_path), exist_ok=True)
+    with open(transcript_path, 'w', encoding='utf-8') as f:
+        json.dump(transcript_data, f, ensure_ascii=False, indent=4)
+
+def transcribe_parallel_batch(
+    audio_paths: List[str],
+    account_map: Dict[str, str],
+    base_name_map: Dict[str, str],
+    metadata_map: Dict[str, Dict],
+    workers: int = 0,
+    threads_per_worker: int = 0,
+    stream: bool = False,
+    sources: Optional[Dict[str, str]] = None,
+    keep_audio: bool = False,
+    use_vad: bool = False
+) -> Dict:
+    """
+    Transcribe audio files on parallel CPU worker processes
+    
+    Args:
+        audio_paths: List of audio file paths to transcribe
+        account_map: Mapping of audio paths to account names
+        base_name_map: Mapping of audio paths to base filenames
+        metadata_map: Mapping of audio paths to metadata
+        workers: Number of worker processes (0 = derive from the CPU count)
+        threads_per_worker: Threads per worker (0 = derive from the model size)
+        stream: Decode audio in memory ahead of the workers instead of reading audio files
+        sources: Mapping of audio paths to the media files to decode when streaming
+        keep_audio: When streaming, also save the decoded audio to the audio path
+        use_vad: Transcribe only the detected speech, with timestamps on the original timeline
+        
+    Returns:
+        Run statistics from the worker pool
+    """
+    pending = []
+    for audio_path in audio_paths:
+        # Check if audio file exists and has content
+        if not stream and (not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0):
+            logger.warning(f"Skipping non-existent or empty audio file: {audio_path}")
+            continue
+        transcript_path = os.path.join(TRANSCRIPT_DIR, account_map[audio_path], f"{base_name_map[audio_path]}.json")
+        if os.path.exists(transcript_path):
+            logger.info(f"Skipping already transcribed file: {base_name_map[audio_path]}.mp4")
+            continue
+        pending.append(audio_path)
+    
+    if not pending:
+        return {}
+    
+    def write_result(audio_path, result):
+        # Results arrive in this process, which is the only transcript writer
+        account = account_map[audio_path]
+        base_name = base_name_map[audio_path]
+        transcript_path = os.path.join(TRANSCRIPT_DIR, account, f"{base_name}.json")
+        save_transcript(transcript_path, result, f"{base_name}.mp4", account, metadata_map.get(audio_path, {}))
+        logger.info(f"Transcription complete for {base_name}.mp4")
+    
+    def keep_decoded(audio_path, audio):
+        if not os.path.exists(audio_path):
+            write_wav(audio_path, audio)
+    
+    return transcribe_parallel(
+        pending,
+        write_result,
+        model_name=WHISPER_MODEL,
+        workers=workers,
+        threads_per_worker=threads_per_worker,
+        should_stop=lambda: shutdown_requested,
+        sources=sources,
+        stream=stream,
+        on_audio=keep_decoded if keep_audio else None,
+        use_vad=use_vad
+    )
+
 def transcribe_batch(
     model, 
     audio_paths: List[str], 
     account_map: Dict[str, str], 
     base_name_map: Dict[str, str],
     metadata_map: Dict[str, Dict],
-    batch_size: int = 16
+    batch_size: int = 16,
+    stream: bool = False,
+    sources: Optional[Dict[str, str]] = None,
+    keep_audio: bool = False,
+    use_vad: bool = False
 ) -> None:
     """
     Transcribe a batch of audio files
@@ -150,7 +254,12 @@ def transcribe_batch(
         base_name_map: Mapping of audio paths to base filenames
         metadata_map: Mapping of audio paths to metadata
         batch_size: Number of files to process in one batch
+        stream: Decode audio in memory (the next file while the current one is transcribed)
+        sources: Mapping of audio paths to the media files to decode when streaming
+        keep_audio: When streaming, also save the decoded audio to the audio path
+        use_vad: Transcribe only the detected speech, with timestamps on the original timeline
     """
+    sources = sources or {}
     global shutdown_requested
     total_batches = (len(audio_paths)-1)//batch_size + 1
     
@@ -162,14 +271,29 @@ def transcribe_batch(
         batch = audio_paths[i:i+batch_size]
         logger.info(f"Processing batch {i//batch_size + 1}/{total_batches} with {len(batch)} files")
         
-        for audio_path in tqdm(batch, desc=f"Transcribing batch {i//batch_size + 1}/{total_batches}"):
+        if stream:
+            # Don't spend a decode on files that are already transcribed
+            batch = [audio_path for audio_path in batch if not os.path.exists(
+                os.path.join(TRANSCRIPT_DIR, account_map[audio_path], f"{base_name_map[audio_path]}.json"))]
+            entries = prefetch_audio(batch, source=lambda path: sources.get(path, path),
+                                     should_stop=lambda: shutdown_requested)
+        else:
+            entries = ((audio_path, None) for audio_path in batch)
+        
+        for audio_path, audio in tqdm(entries, total=len(batch), desc=f"Transcribing batch {i//batch_size + 1}/{total_batches}"):
             try:
                 if shutdown_requested:
                     logger.info("Shutdown requested, finishing current file...")
                     break
-                    
+                
+                if stream:
+                    # Decoding failed or the video has no audio
+                    if audio is None:
+                        continue
+                    if keep_audio and not os.path.exists(audio_path):
+                        write_wav(audio_path, audio)
                 # Check if audio file exists and has content
-                if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+                elif not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
                     logger.warning(f"Skipping non-existent or empty audio file: {audio_path}")
                     continue
                 
@@ -188,28 +312,15 @@ def transcribe_batch(
                     continue
                 
                 # Transcribe audio
-                result = model.transcribe(
-                    audio_path,
-                    beam_size=1,            # Reduce beam size (default is 5)
-                    best_of=1,              # Don't generate multiple candidates
-                    temperature=0.0,        # Use greedy decoding (no sampling)
-                    fp16=False              # Use full precision (avoid half-precision errors)
-                )
-                
-                # Create transcript with metadata
-                transcript_data = {
-                    "text": result["text"],
-                    "segments": result["segments"],
-                    "language": result["language"],
-                    "filename": filename,
-                    "account": account,
-                    **metadata
-                }
-                
-                # Save transcript
-                os.makedirs(os.path.dirname(transcript_path), exist_ok=True)
-                with open(transcript_path, 'w', encoding='utf-8') as f:
-                    json.dump(transcript_data, f, ensure_ascii=False, indent=4)
+                if use_vad:
+                    if audio is None:
+                        audio = decode_audio(audio_path)
+                        if audio is None:
+                            continue
+                    result = transcribe_speech(model, audio, TRANSCRIBE_OPTIONS)
+                else:
+                    result = model.transcribe(audio if stream else audio_path, **TRANSCRIBE_OPTIONS)
+                save_transcript(transcript_path, result, filename, account, metadata)
                 
                 logger.info(f"Transcription complete for {filename}")
                 
@@ -238,14 +349,75 @@ def get_metadata(download_dir: str, account: str, base_name: str) -> Dict:
             logger.error(f"Error loading metadata from {metadata_path}: {str(e)}")
     return metadata
 
-def process_videos(batch_size: int = 16, extraction_workers: int = 4, auto_batch_size: bool = True):
+def resolve_duplicates(video_paths: List[str], workers: int = 4) -> Dict[str, Tuple[str, str]]:
+    """
+    Add videos to the media store and find the recording each one duplicates
+    
+    Args:
+        video_paths: Videos in the account directories
+        workers: Parallel ffmpeg processes for audio fingerprints
+        
+    Returns:
+        Mapping of video path to (sha256, canonical id); videos sharing a
+        canonical id have the same audio and video
+    """
+    store = get_media_store()
+    # Videos matched on an earlier run are not ingested or fingerprinted again
+    resolved = store.resolved_media(video_paths)
+    hashes = {}
+    for video_path in video_paths:
+        if video_path in resolved:
+            continue
+        account = os.path.basename(os.path.dirname(video_path))
+        try:
+            hashes[video_path] = store.ingest(video_path, account)
+        except OSError as e:
+            logger.warning(f"Could not add {video_path} to the media store: {str(e)}")
+    
+    if hashes:
+        logger.info(f"Matching {len(hashes)} new videos ({len(resolved)} matched on earlier runs)")
+    store.fingerprint_missing(hashes.values(), workers=workers)
+    resolved.update({video_path: (sha256, store.resolve_canonical(sha256)) for video_path, sha256 in hashes.items()})
+    return resolved
+
+def copy_transcript(source_path: str, transcript_path: str, filename: str, account: str, metadata: Dict) -> None:
+    """
+    Write a duplicate video's transcript from the transcript of the video it duplicates
+    
+    Args:
+        source_path: Transcript of the original video
+        transcript_path: Output path
+        filename: Video filename
+        account: Account name
+        metadata: The duplicate's own metadata
+    """
+    with open(source_path, 'r', encoding='utf-8') as f:
+        source = json.load(f)
+    duplicate_of = f"{source.get('account', '')}/{source.get('filename', '')}"
+    save_transcript(transcript_path, source, filename, account, {**metadata, "duplicate_of": duplicate_of})
+    logger.info(f"Copied transcript for {account}/{filename} from duplicate {duplicate_of}")
+
+def process_videos(batch_size: int = 16, extraction_workers: int = 4, auto_batch_size: bool = True,
+                   transcription_workers: int = 0, threads_per_worker: int = 0,
+                   stream_audio: bool = False, keep_audio: bool = False, use_vad: bool = True,
+                   dedup: bool = True):
     """
     Process all downloaded videos that haven't been transcribed yet, using batch processing
     
+    On CPU, transcription runs on parallel worker processes (each with its own
+    model); with a GPU, or with transcription_workers=1, one model transcribes
+    the files in batches.
+    
     Args:
         batch_size: Number of audio files to transcribe in one batch
         extraction_workers: Number of parallel audio extraction processes
         auto_batch_size: Whether to automatically determine optimal batch size
+        transcription_workers: CPU transcription worker processes (0 = derive from the CPU count)
+        threads_per_worker: Threads per CPU transcription worker (0 = derive from the model size)
+        stream_audio: Pipe ffmpeg's PCM output straight to the model instead of writing WAV files
+        keep_audio: When streaming, also save the decoded audio to the audio directory
+        use_vad: Cut silence before transcription (segment times stay on the original timeline)
+        dedup: Transcribe each recording once; reposts (same bytes or same audio) get a copy of its transcript
     """
     global shutdown_requested
     setup_directories()
@@ -263,10 +435,14 @@ def process_videos(batch_size: int = 16, extraction_workers: int = 4, auto_batch
             batch_size = estimate_optimal_batch_size(vram_gb=vram_gb)
             logger.info(f"Auto-determined batch size: {batch_size}")
     
-    # Load Whisper model with GPU acceleration if available
-    logger.info(f"Loading Whisper model: {WHISPER_MODEL}")
-    model = whisper.load_model(WHISPER_MODEL).to(device)
-    logger.info("Model loaded successfully")
+    # One model per GPU; on CPU several worker processes share the cores
+    use_workers = device == "cpu" and transcription_workers != 1
+    model = None
+    if not use_workers:
+        # Load Whisper model with GPU acceleration if available
+        logger.info(f"Loading Whisper model: {WHISPER_MODEL}")
+        model = whisper.load_model(WHISPER_MODEL).to(device)
+        logger.info("Model loaded successfully")
     
     try:
         # Get all video files
@@ -279,11 +455,32 @@ def process_videos(batch_size: int = 16, extraction_workers: int = 4, auto_batch
         
         logger.info(f"Found {len(all_videos)} total videos to process")
         
+        # Reposts share a canonical id with the first copy of the recording
+        media_ids = {}       # Maps video_path -> (sha256, canonical id)
+        claimed = {}         # Maps canonical id -> (sha256, transcript_path) of the copy transcribed this run
+        duplicates = []      # Videos waiting for the transcript of a copy transcribed this run
+        copied_count = 0
+        if dedup:
+            media_ids = resolve_duplicates(all_videos, workers=extraction_workers)
+            store = get_media_store()
+            
+            # Record existing transcripts so their duplicates can reuse them
+            existing = []
+            for video_path, (sha256, _) in media_ids.items():
+                account = os.path.basename(os.path.dirname(video_path))
+                base_name = os.path.splitext(os.path.basename(video_path))[0]
+                transcript_path = os.path.join(TRANSCRIPT_DIR, account, f"{base_name}.json")
+                if os.path.exists(transcript_path):
+                    existing.append((sha256, transcript_path))
+            store.set_transcripts(existing)
+            logger.info(f"Media store: {store.stats()}")
+        
         # Prepare for batch processing
         video_audio_pairs = []
         account_map = {}     # Maps audio_path -> account
         base_name_map = {}   # Maps audio_path -> base_name
         metadata_map = {}    # Maps audio_path -> metadata
+        source_map = {}      # Maps audio_path -> file decoded when streaming
         
         # Collect videos that need processing
         for video_path in all_videos:
@@ -305,8 +502,26 @@ def process_videos(batch_size: int = 16, extraction_workers: int = 4, auto_batch
             if os.path.exists(transcript_path):
                 continue
             
+            if video_path in media_ids:
+                sha256, canonical = media_ids[video_path]
+                source_path = store.transcript_for(canonical)
+                if source_path:
+                    copy_transcript(source_path, transcript_path, filename, account,
+                                    get_metadata(DOWNLOAD_DIR, account, base_name))
+                    copied_count += 1
+                    continue
+                if canonical in claimed:
+                    # Another copy is transcribed in this run
+                    duplicates.append((canonical, transcript_path, filename, account, base_name))
+                    continue
+                claimed[canonical] = (sha256, transcript_path)
+            
+            has_audio = os.path.exists(audio_path) and os.path.getsize(audio_path) > 0
+            if stream_audio:
+                # Decode previously extracted audio if there is any, else the video itself
+                source_map[audio_path] = audio_path if has_audio else video_path
             # Add to processing queue if audio extraction is needed
-            if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+            elif not has_audio:
                 os.makedirs(os.path.dirname(audio_path), exist_ok=True)
                 video_audio_pairs.append((video_path, audio_path))
             
@@ -340,18 +555,53 @@ def process_videos(batch_size: int = 16, extraction_workers: int = 4, auto_batch
             if audio_path not in audio_to_transcribe and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
                 audio_to_transcribe.append(audio_path)
         
-        # Transcribe in batches
-        logger.info(f"Transcribing {len(audio_to_transcribe)} audio files in batches of {batch_size}")
-        if audio_to_transcribe:
+        # When streaming, every collected video is decoded on the fly
+        if stream_audio:
+            audio_to_transcribe = list(source_map)
+        
+        if use_workers and audio_to_transcribe:
+            logger.info(f"Transcribing {len(audio_to_transcribe)} audio files on parallel workers")
+            transcribe_parallel_batch(
+                audio_to_transcribe,
+                account_map,
+                base_name_map,
+                metadata_map,
+                workers=transcription_workers,
+                threads_per_worker=threads_per_worker,
+                stream=stream_audio,
+                sources=source_map,
+                keep_audio=keep_audio,
+                use_vad=use_vad
+            )
+        elif audio_to_transcribe:
+            # Transcribe in batches
+            logger.info(f"Transcribing {len(audio_to_transcribe)} audio files in batches of {batch_size}")
             transcribe_batch(
                 model, 
                 audio_to_transcribe, 
                 account_map, 
                 base_name_map, 
                 metadata_map,
-                batch_size=batch_size
+                batch_size=batch_size,
+                stream=stream_audio,
+                sources=source_map,
+                keep_audio=keep_audio,
+                use_vad=use_vad
             )
         
+        # Hand the new transcripts to the duplicates waiting for them
+        new_transcripts = [entry for entry in claimed.values() if os.path.exists(entry[1])]
+        if new_transcripts:
+            store.set_transcripts(new_transcripts)
+        for canonical, transcript_path, filename, account, base_name in duplicates:
+            source_path = claimed[canonical][1]
+            if os.path.exists(source_path):
+                copy_transcript(source_path, transcript_path, filename, account,
+                                get_metadata(DOWNLOAD_DIR, account, base_name))
+                copied_count += 1
+        if copied_count:
+            logger.info(f"Reused transcripts for {copied_count} duplicate videos instead of transcribing them")
+        
         if shutdown_requested:
             logger.info("Transcription process stopped due to shutdown request")
         else:
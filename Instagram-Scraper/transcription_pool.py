@@ -0,0 +1,320 @@
+"""
+Parallel Whisper transcription on CPU worker processes
+
+Each worker process loads the Whisper model once and is pinned to a fixed
+number of BLAS/torch threads, so N workers use the cores without
+oversubscribing them. Jobs are ordered longest-duration-first (durations
+from ffprobe), which keeps one long file from finishing alone at the end
+of the run. Workers only transcribe; results come back to the parent,
+which is the single writer of transcript files. Throughput is reported
+as audio-seconds transcribed per wall-second.
+
+With streaming enabled, the parent decodes audio in memory a few files
+ahead of the workers (see audio_stream) instead of reading WAV files.
+"""
+import os
+import time
+import signal
+import logging
+import subprocess
+import contextlib
+import multiprocessing
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import WHISPER_MODEL
+from audio_stream import DEFAULT_PREFETCH, SAMPLE_RATE, decode_audio, prefetch_audio
+from vad import transcribe_speech
+
+logger = logging.getLogger('transcription_pool')
+
+# Decoding options shared by the sequential and the parallel transcriber
+TRANSCRIBE_OPTIONS = {
+    "beam_size": 1,         # Reduce beam size (default is 5)
+    "best_of": 1,           # Don't generate multiple candidates
+    "temperature": 0.0,     # Use greedy decoding (no sampling)
+    "fp16": False           # Use full precision (avoid half-precision errors)
+}
+# Threads per worker when not given; larger models favour fewer, wider workers
+DEFAULT_THREADS_PER_WORKER = {"tiny": 2, "base": 2, "small": 4, "medium": 4, "large": 8}
+# Bytes per second of 16 kHz mono 16-bit PCM, used when ffprobe gives no duration
+PCM_BYTES_PER_SECOND = 32000
+# Environment variables read by the BLAS/OpenMP runtimes at import time
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# Per-process state of a worker
+_model = None
+
+
+def probe_duration(path: str) -> float:
+    """
+    Duration of a media file in seconds
+
+    Args:
+        path: Audio or video file
+
+    Returns:
+        Duration from ffprobe, or an estimate from the file size if ffprobe fails
+    """
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30
+        )
+        return float(result.stdout.decode("utf-8").strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        try:
+            return os.path.getsize(path) / PCM_BYTES_PER_SECOND
+        except OSError:
+            return 0.0
+
+
+def probe_durations(paths: Iterable[str], max_workers: int = 8) -> Dict[str, float]:
+    """Durations of several files, probed in parallel"""
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(probe_duration, paths)))
+
+
+def plan_workers(model_name: str = WHISPER_MODEL, workers: int = 0,
+                 threads_per_worker: int = 0, job_count: int = 0) -> Tuple[int, int]:
+    """
+    Choose the number of worker processes and threads per worker
+
+    Args:
+        model_name: Whisper model size
+        workers: Requested workers (0 = derive from the CPU count)
+        threads_per_worker: Requested threads per worker (0 = derive)
+        job_count: Number of jobs (no more workers than jobs)
+
+    Returns:
+        (workers, threads_per_worker)
+    """
+    cpus = os.cpu_count() or 1
+    if not threads_per_worker:
+        if workers:
+            threads_per_worker = max(1, cpus // workers)
+        else:
+            threads_per_worker = min(cpus, DEFAULT_THREADS_PER_WORKER.get(model_name.split(".")[0], 4))
+    if not workers:
+        workers = max(1, cpus // threads_per_worker)
+    if job_count:
+        workers = min(workers, job_count)
+    return workers, threads_per_worker
+
+
+def _init_worker(model_name: str, device: str, threads: int) -> None:
+    """Pin the worker's thread pools and load the model once"""
+    global _model
+    # Interrupts are handled by the parent, which stops submitting work
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # The BLAS/OpenMP limits come from the environment inherited from the parent
+    # (see _thread_limits); torch's own pool is sized here
+    import torch
+    import whisper
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already initialized in this process
+        pass
+    _model = whisper.load_model(model_name, device=device)
+
+
+@contextlib.contextmanager
+def _thread_limits(threads: int):
+    """
+    Set the BLAS/OpenMP thread variables while worker processes are started
+
+    Spawned workers inherit the environment, so the limits are in place
+    before anything in the worker imports numpy or torch. The parent's own
+    values are restored afterwards.
+    """
+    saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    os.environ.update((name, str(threads)) for name in THREAD_ENV_VARS)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _transcribe_job(audio_path: str, audio, duration: float, use_vad: bool = False) -> Dict:
+    """Transcribe one file (or decoded samples) in a worker process"""
+    start_time = time.time()
+    speech_seconds = duration
+    try:
+        if use_vad:
+            if audio is None:
+                audio = decode_audio(audio_path)
+                if audio is None:
+                    raise ValueError("no decodable audio")
+            result = transcribe_speech(_model, audio, TRANSCRIBE_OPTIONS)
+            duration = result["audio_seconds"]
+            speech_seconds = result["speech_seconds"]
+        else:
+            result = _model.transcribe(audio if audio is not None else audio_path, **TRANSCRIBE_OPTIONS)
+    except Exception as e:
+        return {"audio_path": audio_path, "error": str(e), "worker": os.getpid(),
+                "seconds": time.time() - start_time}
+    return {
+        "audio_path": audio_path,
+        "text": result["text"],
+        "segments": result["segments"],
+        "language": result["language"],
+        "duration": duration,
+        "speech_seconds": speech_seconds,
+        "seconds": time.time() - start_time,
+        "worker": os.getpid()
+    }
+
+
+def transcribe_parallel(
+    audio_paths: List[str],
+    on_result: Callable[[str, Dict], None],
+    model_name: str = WHISPER_MODEL,
+    workers: int = 0,
+    threads_per_worker: int = 0,
+    device: str = "cpu",
+    durations: Optional[Dict[str, float]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    sources: Optional[Dict[str, str]] = None,
+    stream: bool = False,
+    prefetch: int = DEFAULT_PREFETCH,
+    on_audio: Optional[Callable[[str, np.ndarray], None]] = None,
+    use_vad: bool = False
+) -> Dict:
+    """
+    Transcribe files on a pool of worker processes, longest first
+
+    In streaming mode this process decodes each source with ffmpeg straight
+    into memory, a few files ahead of the workers, and sends the samples
+    to the workers; no audio file has to exist on disk.
+
+    Args:
+        audio_paths: Job keys (the audio files to transcribe unless streaming)
+        on_result: Called in this process with (audio_path, result) for each
+            transcribed file; result has the keys text, segments and language
+        model_name: Whisper model to load in each worker
+        workers: Worker processes (0 = derive from the CPU count)
+        threads_per_worker: Torch/BLAS threads per worker (0 = derive)
+        device: Device for the workers' models
+        durations: Known durations in seconds (missing ones are probed)
+        should_stop: Polled between results; when true, queued jobs are cancelled
+        sources: Maps a key to the media file to probe and decode (defaults to the key)
+        stream: Decode sources in memory instead of letting workers read audio files
+        prefetch: Files decoded or queued beyond the ones the workers are busy with
+        on_audio: Called with (audio_path, samples) for each decoded file when streaming
+        use_vad: Transcribe only the detected speech (see vad.transcribe_speech)
+
+    Returns:
+        Run statistics including audio-seconds per wall-second
+    """
+    start_time = time.time()
+    sources = sources or {}
+    durations = dict(durations or {})
+    missing = [path for path in audio_paths if path not in durations]
+    if missing:
+        probed = probe_durations(sources.get(path, path) for path in missing)
+        durations.update((path, probed[sources.get(path, path)]) for path in missing)
+
+    # Longest processing time first: the long tail starts early
+    jobs = sorted(audio_paths, key=lambda path: durations.get(path, 0.0), reverse=True)
+    workers, threads_per_worker = plan_workers(model_name, workers, threads_per_worker, len(jobs))
+    logger.info(f"Transcribing {len(jobs)} files ({sum(durations.get(p, 0.0) for p in jobs):.0f}s of audio) "
+                f"on {workers} workers x {threads_per_worker} threads"
+                f"{' with streamed audio' if stream else ''}")
+
+    stats = {"files": 0, "errors": 0, "cancelled": 0, "audio_seconds": 0.0, "speech_seconds": 0.0,
+             "worker_seconds": 0.0, "workers": workers, "threads_per_worker": threads_per_worker}
+    busy = {}  # Maps worker pid to seconds spent transcribing
+
+    if stream:
+        feed = prefetch_audio(jobs, source=lambda path: sources.get(path, path),
+                              depth=prefetch, decoders=workers, should_stop=should_stop)
+    else:
+        feed = ((path, None) for path in jobs)
+    # Queue only a few jobs beyond the busy workers, so decoded audio never piles up
+    max_pending = workers + max(1, prefetch)
+
+    # Spawn gives each worker a fresh interpreter, so the thread limits apply before torch loads
+    # (workers are started by submit, inside the block)
+    context = multiprocessing.get_context("spawn")
+    with _thread_limits(threads_per_worker), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                initargs=(model_name, device, threads_per_worker)) as executor:
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    entry = next(feed, None)
+                    if entry is None:
+                        exhausted = True
+                        break
+                    audio_path, audio = entry
+                    duration = durations.get(audio_path, 0.0)
+                    if stream:
+                        if audio is None:
+                            stats["errors"] += 1
+                            continue
+                        duration = len(audio) / SAMPLE_RATE
+                        if on_audio:
+                            on_audio(audio_path, audio)
+                    pending.add(executor.submit(_transcribe_job, audio_path, audio, duration, use_vad))
+
+                if not pending:
+                    break
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # A worker died (e.g. out of memory); the pool is unusable afterwards
+                        logger.error(f"Transcription worker failed: {str(e)}")
+                        stats["errors"] += 1
+                        continue
+
+                    busy[result["worker"]] = busy.get(result["worker"], 0.0) + result["seconds"]
+                    if "error" in result:
+                        logger.error(f"Error transcribing {result['audio_path']}: {result['error']}")
+                        stats["errors"] += 1
+                    else:
+                        on_result(result["audio_path"], result)
+                        stats["files"] += 1
+                        stats["audio_seconds"] += result["duration"]
+                        stats["speech_seconds"] += result["speech_seconds"]
+
+                if should_stop and should_stop() and not exhausted:
+                    logger.info("Shutdown requested, finishing the files in progress")
+                    stats["cancelled"] = sum(future.cancel() for future in pending)
+                    pending = {future for future in pending if not future.cancelled()}
+                    exhausted = True
+        except KeyboardInterrupt:
+            stats["cancelled"] = sum(future.cancel() for future in pending)
+            raise
+        finally:
+            if stream:
+                feed.close()
+
+    wall_seconds = time.time() - start_time
+    stats["worker_seconds"] = round(sum(busy.values()), 2)
+    stats["wall_seconds"] = round(wall_seconds, 2)
+    stats["audio_seconds"] = round(stats["audio_seconds"], 2)
+    stats["speech_seconds"] = round(stats["speech_seconds"], 2)
+    stats["throughput"] = round(stats["audio_seconds"] / wall_seconds, 2) if wall_seconds else 0.0
+    stats["utilization"] = round(stats["worker_seconds"] / (wall_seconds * workers), 2) if wall_seconds else 0.0
+    speech = f" ({stats['speech_seconds']:.0f}s of speech after VAD)" if use_vad else ""
+    logger.info(f"Transcribed {stats['files']} files ({stats['audio_seconds']:.0f}s of audio{speech}) in "
+                f"{wall_seconds:.1f}s: {stats['throughput']:.2f} audio-seconds per second, "
+                f"worker utilization {stats['utilization']:.0%}, {stats['errors']} errors")
+    return stats
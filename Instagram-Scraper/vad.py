@@ -0,0 +1,226 @@
+"""
+Energy-based voice activity detection before transcription
+
+Silent or near-silent stretches (intros, outros, long pauses) are found
+from per-frame RMS energy against a threshold adapted to each file's
+noise floor and peak level, and cut out before the audio reaches Whisper.
+The speech regions are spliced together with short gaps, transcribed in
+one pass, and the segment timestamps are mapped back onto the original
+timeline. Whisper's compute scales with the audio it is given, so the
+time saved is roughly proportional to the silence removed.
+
+Energy alone cannot tell speech from loud music; music-only stretches
+are kept and left to Whisper.
+"""
+import bisect
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_stream import SAMPLE_RATE
+
+logger = logging.getLogger('vad')
+
+# Analysis frame length (milliseconds)
+FRAME_MS = 30
+# Frames this far above the noise floor (dB) count as speech...
+NOISE_MARGIN_DB = 10.0
+# ...unless that is within this many dB of the file's peak level
+PEAK_HEADROOM_DB = 25.0
+# Frames quieter than this (dBFS) are always non-speech
+ABSOLUTE_FLOOR_DB = -50.0
+# Pauses shorter than this stay inside a speech region (milliseconds)
+MIN_SILENCE_MS = 600
+# Speech regions shorter than this are dropped as clicks (milliseconds)
+MIN_SPEECH_MS = 250
+# Audio kept around each speech region (milliseconds)
+PADDING_MS = 200
+# Silence inserted between spliced regions (seconds)
+SPLICE_GAP = 0.3
+# Transcribe the untouched audio when trimming would remove less than this fraction
+MIN_TRIM_FRACTION = 0.05
+
+# A region of the spliced audio: (spliced start, original start, length) in seconds
+Offset = Tuple[float, float, float]
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """
+    Find speech regions by frame energy
+
+    Args:
+        audio: Mono float samples
+        sample_rate: Sample rate of the audio
+
+    Returns:
+        Sorted, non-overlapping (start, end) sample ranges
+    """
+    frame = int(sample_rate * FRAME_MS / 1000)
+    count = len(audio) // frame
+    if count == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = audio[:count * frame].reshape(count, frame).astype(np.float64)
+    level = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    noise, peak = np.percentile(level, [10, 99])
+    threshold = max(ABSOLUTE_FLOOR_DB, min(noise + NOISE_MARGIN_DB, peak - PEAK_HEADROOM_DB))
+    active = level > threshold
+    if not active.any():
+        return []
+
+    # Region boundaries as (start frame, end frame) pairs
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    regions = edges.reshape(-1, 2).tolist()
+
+    # Close short pauses, then drop short bursts
+    min_silence = MIN_SILENCE_MS // FRAME_MS
+    merged = [regions[0]]
+    for start, end in regions[1:]:
+        if start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    min_speech = max(1, MIN_SPEECH_MS // FRAME_MS)
+    merged = [region for region in merged if region[1] - region[0] >= min_speech]
+
+    # Pad in samples and merge regions the padding made overlap
+    padding = int(sample_rate * PADDING_MS / 1000)
+    speech = []
+    for start, end in merged:
+        start = max(0, start * frame - padding)
+        end = min(len(audio), end * frame + padding)
+        if speech and start <= speech[-1][1]:
+            speech[-1] = (speech[-1][0], end)
+        else:
+            speech.append((start, end))
+    return speech
+
+
+def splice_speech(audio: np.ndarray, regions: List[Tuple[int, int]],
+                  sample_rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, List[Offset]]:
+    """
+    Join speech regions with short silent gaps
+
+    Args:
+        audio: Mono float samples
+        regions: Speech regions from detect_speech
+        sample_rate: Sample rate of the audio
+
+    Returns:
+        (spliced samples, offsets mapping the spliced timeline to the original)
+    """
+    gap = np.zeros(int(sample_rate * SPLICE_GAP), dtype=audio.dtype)
+    pieces = []
+    offsets = []
+    position = 0
+    for start, end in regions:
+        if pieces:
+            pieces.append(gap)
+            position += len(gap)
+        pieces.append(audio[start:end])
+        offsets.append((position / sample_rate, start / sample_rate, (end - start) / sample_rate))
+        position += end - start
+    spliced = np.concatenate(pieces) if pieces else audio[:0]
+    return spliced, offsets
+
+
+def to_original_time(t: float, offsets: List[Offset], starts: Optional[List[float]] = None) -> float:
+    """Map a time on the spliced timeline to the original timeline"""
+    if not offsets:
+        return t
+    starts = starts or [offset[0] for offset in offsets]
+    index = max(0, bisect.bisect_right(starts, t) - 1)
+    spliced_start, original_start, length = offsets[index]
+    # Times inside a splice gap are clamped to the end of the region before it
+    return round(original_start + min(max(t - spliced_start, 0.0), length), 3)
+
+
+def remap_segments(segments: List[Dict], offsets: List[Offset]) -> List[Dict]:
+    """
+    Move segment (and word) timestamps back onto the original timeline
+
+    Args:
+        segments: Whisper segments of the spliced audio
+        offsets: Offsets from splice_speech
+
+    Returns:
+        The segments with original start and end times
+    """
+    starts = [offset[0] for offset in offsets]
+    for segment in segments:
+        segment["start"] = to_original_time(segment["start"], offsets, starts)
+        segment["end"] = to_original_time(segment["end"], offsets, starts)
+        for word in segment.get("words") or []:
+            word["start"] = to_original_time(word["start"], offsets, starts)
+            word["end"] = to_original_time(word["end"], offsets, starts)
+    return segments
+
+
+def dedupe_segments(segments: List[Dict]) -> List[Dict]:
+    """
+    Drop segments that repeat the previous segment's text
+
+    Whisper tends to loop on the same phrase over silence or music; the
+    repeats carry no content.
+
+    Args:
+        segments: Whisper segments in time order
+
+    Returns:
+        Segments without consecutive repeats, renumbered
+    """
+    kept = []
+    previous = None
+    for segment in segments:
+        key = re.sub(r"[^\w]+", " ", segment.get("text", "").lower()).strip()
+        if key and key == previous:
+            continue
+        previous = key
+        kept.append(segment)
+    for index, segment in enumerate(kept):
+        segment["id"] = index
+    return kept
+
+
+def transcribe_speech(model, audio: np.ndarray, options: Dict, sample_rate: int = SAMPLE_RATE) -> Dict:
+    """
+    Transcribe only the speech in a clip
+
+    Args:
+        model: Loaded Whisper model
+        audio: Mono float samples at Whisper's sample rate
+        options: Options for model.transcribe
+        sample_rate: Sample rate of the audio
+
+    Returns:
+        Whisper-style result (text, segments on the original timeline,
+        language) plus audio_seconds and speech_seconds
+    """
+    audio_seconds = len(audio) / sample_rate
+    regions = detect_speech(audio, sample_rate)
+    speech_seconds = sum(end - start for start, end in regions) / sample_rate
+
+    if not regions:
+        logger.info(f"No speech detected in {audio_seconds:.1f}s of audio, skipping transcription")
+        return {"text": "", "segments": [], "language": None,
+                "audio_seconds": audio_seconds, "speech_seconds": 0.0}
+
+    if speech_seconds > audio_seconds * (1 - MIN_TRIM_FRACTION):
+        result = model.transcribe(audio, **options)
+        speech_seconds = audio_seconds
+    else:
+        spliced, offsets = splice_speech(audio, regions, sample_rate)
+        logger.info(f"VAD kept {speech_seconds:.1f}s of {audio_seconds:.1f}s in {len(regions)} regions")
+        result = model.transcribe(spliced, **options)
+        remap_segments(result["segments"], offsets)
+
+    segments = dedupe_segments(result["segments"])
+    return {
+        "text": "".join(segment["text"] for segment in segments) if segments else result["text"],
+        "segments": segments,
+        "language": result["language"],
+        "audio_seconds": audio_seconds,
+        "speech_seconds": speech_seconds
+    }
@@ -13,15 +13,19 @@ import requests
 from urllib.parse import urlparse
 import random
 import hashlib
+import heapq
+import tarfile
 import argparse
 import shutil
 import sys
 import getpass
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the Instagram-Scraper directory to the path
 sys.path.append('/home/adi235/MistralOCR/Instagram-Scraper')
 from config import DATA_DIR, DB_PATH, PROXY_SERVERS
+from http_cache import install_http_cache, log_http_cache_stats
 
 # Set filesystem storage path
 FS_STORAGE_PATH = "/home/adi235/MistralOCR/Instagram-Scraper/data/github"
@@ -134,6 +138,8 @@ HIGH_VALUE_FILES = [
 ]
 
 MAX_FILE_SIZE = 1 * 1024 * 1024  # 1MB limit for files
+FILE_FETCH_WORKERS = 8  # Parallel file downloads from raw.githubusercontent.com
+TARBALL_MAX_KB = 100000  # Largest repository (KB) read from a tarball when its tree listing is truncated
 
 def setup_directories(clean=False):
     """Create necessary directories"""
@@ -213,6 +219,8 @@ def get_github_api_client(token=None, prompt_for_token=True, bypass_proxy=False)
         'Accept': 'application/vnd.github.v3+json',
         'User-Agent': 'AI-Knowledge-Base-Collector/1.0'
     })
+    # Unchanged responses are revalidated with a 304, which does not count against the rate limit
+    install_http_cache(session)
     
     if has_token:
         # GitHub API accepts both formats, but "token" prefix is more widely used
@@ -788,92 +796,104 @@ def store_repo_in_db(conn, repo_info, readme_content, valuable_files=None):
         logger.error(f"Error storing repository {repo_info['full_name']} in database: {str(e)}")
         return False
 
-def get_repo_directory_structure(session, repo_name, path="", page=1, recursive=False, max_depth=1, current_depth=0):
+def get_repo_tree(session, repo_name, ref="HEAD"):
     """
-    Get the directory structure with pagination and rate limiting
+    List every file and directory of a repository with one recursive Git Trees call
     
     Args:
         session: GitHub API session
         repo_name: Repository name in the format "owner/repo"
-        path: Directory path within the repository
-        page: Page number for pagination
-        recursive: Whether to recursively explore subdirectories
-        max_depth: Maximum depth for recursive exploration
-        current_depth: Current exploration depth (used internally)
+        ref: Branch, tag or commit to list
         
     Returns:
-        List of directory contents from GitHub API
+        Tuple (contents, truncated): contents-style dicts with path, name,
+        type ('file' or 'dir'), size, sha and download_url, and whether
+        GitHub cut the listing short. contents is None if the listing failed
     """
+    tree_url = f"https://api.github.com/repos/{repo_name}/git/trees/{requests.utils.quote(ref)}"
     try:
-        # Add delay to respect rate limits
-        time.sleep(0.5)
-        
-        response = session.get(
-            f"https://api.github.com/repos/{repo_name}/contents/{path}",
-            params={"per_page": 100, "page": page}
-        )
+        response = session.get(tree_url, params={"recursive": 1})
         
         # Handle rate limiting
         if handle_rate_limit(response):
             # Retry the request after waiting for rate limit reset
-            response = session.get(
-                f"https://api.github.com/repos/{repo_name}/contents/{path}",
-                params={"per_page": 100, "page": page}
-            )
-        
-        # Check rate limit headers regardless
-        remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-        reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
+            response = session.get(tree_url, params={"recursive": 1})
         
-        if remaining < 10:
-            current_time = time.time()
-            sleep_time = max(0, reset_time - current_time) + 10
-            logger.warning(f"GitHub API rate limit almost reached. Sleeping for {sleep_time:.2f} seconds")
-            time.sleep(sleep_time)
-            
-        response.raise_for_status()
-        contents = response.json()
-        
-        # Handle case where contents is a file, not a directory
-        if not isinstance(contents, list):
-            return [contents]
+        if response.status_code != 200:
+            logger.warning(f"Failed to get file tree for {repo_name}. Status code: {response.status_code}")
+            return None, False
+        
+        data = response.json()
+        contents = []
+        for item in data.get('tree', []):
+            # Submodules are listed as commits
+            if item.get('type') not in ('blob', 'tree'):
+                continue
             
-        # Check if there might be more pages
-        if len(contents) == 100:
-            try:
-                next_page = get_repo_directory_structure(
-                    session, repo_name, path, page + 1, 
-                    recursive=recursive, max_depth=max_depth, current_depth=current_depth
-                )
-                contents.extend(next_page)
-            except Exception as e:
-                logger.warning(f"Error getting next page for {repo_name}/{path}: {str(e)}")
-        
-        # Handle recursive exploration if requested
-        if recursive and current_depth < max_depth:
-            all_contents = contents.copy()
-            for item in contents:
-                if item.get('type') == 'dir':
-                    try:
-                        # Skip known low-value directories
-                        dir_path = item.get('path', '')
-                        if any(skip_dir in dir_path.lower() for skip_dir in SKIP_DIRECTORIES):
-                            continue
-                            
-                        # Explore subdirectory
-                        sub_contents = get_repo_directory_structure(
-                            session, repo_name, item.get('path', ''), 
-                            recursive=recursive, max_depth=max_depth, current_depth=current_depth + 1
-                        )
-                        all_contents.extend(sub_contents)
-                    except Exception as e:
-                        logger.warning(f"Error exploring subdirectory {item.get('path', '')}: {str(e)}")
-            return all_contents
-                
-        return contents
+            path = item['path']
+            is_file = item['type'] == 'blob'
+            contents.append({
+                'path': path,
+                'name': os.path.basename(path),
+                'type': 'file' if is_file else 'dir',
+                'size': item.get('size', 0) if is_file else 0,
+                'sha': item.get('sha'),
+                'download_url': (f"https://raw.githubusercontent.com/{repo_name}/{ref}/{requests.utils.quote(path)}"
+                                 if is_file else None)
+            })
+        
+        return contents, bool(data.get('truncated'))
     except Exception as e:
-        logger.error(f"Error getting directory structure for {repo_name}/{path}: {str(e)}")
+        logger.error(f"Error getting file tree for {repo_name}: {str(e)}")
+        return None, False
+
+def get_repo_directory_structure(session, repo_name, path="", page=1, recursive=False, max_depth=1, current_depth=0, ref="HEAD"):
+    """
+    Get the directory structure from one Git Trees call
+    
+    The whole repository is listed at once, so there is no request per
+    directory or page and no delay between them.
+    
+    Args:
+        session: GitHub API session
+        repo_name: Repository name in the format "owner/repo"
+        path: Directory path within the repository
+        page: Unused, the tree listing is not paginated (kept for compatibility)
+        recursive: Whether to include the contents of subdirectories
+        max_depth: Maximum depth for recursive exploration
+        current_depth: Depth of path in an outer exploration
+        ref: Branch, tag or commit to list
+        
+    Returns:
+        List of contents-style dicts (see get_repo_tree)
+    """
+    contents, truncated = get_repo_tree(session, repo_name, ref)
+    if contents is None:
         return []
+    if truncated:
+        logger.warning(f"File tree of {repo_name} is truncated, listing only the files GitHub returned")
+    
+    path = path.strip('/')
+    prefix = f"{path}/" if path else ""
+    depth_limit = max_depth - current_depth if recursive else 0
+    
+    structure = []
+    for item in contents:
+        # Handle case where path is a file, not a directory
+        if item['path'] == path and item['type'] == 'file':
+            return [item]
+        if not item['path'].startswith(prefix):
+            continue
+        
+        subdirectories = item['path'][len(prefix):].split('/')[:-1]
+        if len(subdirectories) > depth_limit:
+            continue
+        # Skip the contents of known low-value directories
+        if subdirectories and any(skip_dir in '/'.join(subdirectories).lower() for skip_dir in SKIP_DIRECTORIES):
+            continue
+        structure.append(item)
+    
+    return structure
 
 def get_file_value_score(file_info):
     """
@@ -1352,74 +1372,45 @@ def calculate_repo_quality_score(repo_info, valuable_files=None):
     
     return int(score)
 
-def collect_file_content(session, repo_name, file_path, file_info=None):
+def collect_file_content(session, repo_name, file_path, file_info=None, ref="HEAD"):
     """
     Collect content for a file
     
+    The file is downloaded from raw.githubusercontent.com, which does not
+    count against the API rate limit, unless file_info already carries its
+    content.
+    
     Args:
         session: GitHub API session
         repo_name: Repository name in the format "owner/repo"
         file_path: Path to the file within the repository
         file_info: File information dictionary (optional)
+        ref: Branch, tag or commit to read when file_info has no download_url
         
     Returns:
         File content as string or None if failed
     """
+    file_info = file_info or {}
     try:
-        # If file_info is not provided, get it
-        if not file_info:
-            response = session.get(f"https://api.github.com/repos/{repo_name}/contents/{file_path}")
-            if response.status_code != 200:
-                logger.error(f"Failed to get file info for {file_path}: Status {response.status_code}")
-                return None
-            file_info = response.json()
-        
-        # Check if the file is too large for direct download
-        if file_info.get('size', 0) > 1000000:  # > ~1MB
-            logger.warning(f"File {file_path} is too large for direct download. Using raw URL instead.")
-            
-            # Use the raw URL for large files
-            download_url = file_info.get('download_url')
-            if not download_url:
-                logger.error(f"No download_url for large file {file_path}")
-                return None
-                
-            response = session.get(download_url)
-            if response.status_code != 200:
-                logger.error(f"Failed to download file {file_path}: Status {response.status_code}")
-                return None
-                
-            return response.text
-        
-        # GitHub API returns content as base64 encoded
+        # Contents API entries carry small files base64 encoded
         if 'content' in file_info and file_info.get('encoding') == 'base64':
             try:
-                content = base64.b64decode(file_info['content']).decode('utf-8', errors='replace')
-                return content
+                return base64.b64decode(file_info['content']).decode('utf-8', errors='replace')
             except Exception as e:
                 logger.error(f"Error decoding content for {file_path}: {str(e)}")
                 return None
-        elif 'content' in file_info:
-            # Handle case where content is available but not base64 encoded
-            logger.warning(f"File {file_path} has content but not base64 encoded. Encoding: {file_info.get('encoding', 'unknown')}")
-            return str(file_info['content'])
-        else:
-            # Try to get the raw content directly
-            download_url = file_info.get('download_url')
-            if download_url:
-                try:
-                    response = session.get(download_url)
-                    if response.status_code == 200:
-                        return response.text
-                except Exception as e:
-                    logger.error(f"Error getting raw content for {file_path}: {str(e)}")
-            
-            logger.error(f"No content field for {file_path}")
+        
+        download_url = (file_info.get('download_url') or
+                        f"https://raw.githubusercontent.com/{repo_name}/{ref}/{requests.utils.quote(file_path)}")
+        response = session.get(download_url, timeout=30)
+        if response.status_code != 200:
+            logger.error(f"Failed to download file {file_path}: Status {response.status_code}")
             return None
+        
+        return response.content.decode('utf-8', errors='replace')
             
     except Exception as e:
         logger.error(f"Error collecting content for {file_path}: {str(e)}")
-        logger.error(f"File info: {file_info}")
         return None
 
 def process_notebook(content, repo_name="", file_path=""):
@@ -2207,6 +2198,94 @@ def calculate_file_value_score(file_path, content, repo_info=None):
     
     return int(score)
 
+def get_candidate_file_score(file_info, max_file_size=MAX_FILE_SIZE, test_mode=False):
+    """
+    Path-based value score of a listed file, or 0 if it should not be collected
+    
+    Args:
+        file_info: Contents-style file information (path and size)
+        max_file_size: Maximum file size in bytes to collect
+        test_mode: If True, log why files are skipped
+        
+    Returns:
+        Value score from get_file_value_score, 0 for skipped files
+    """
+    file_path = file_info.get('path', '')
+    file_size = file_info.get('size', 0)
+    
+    # Large files are skipped unless they are important implementation files
+    if file_size > max_file_size and not should_include_large_file(file_path, file_size, max_file_size, test_mode):
+        if test_mode:
+            logger.info(f"Skipping large file: {file_path} ({file_size} bytes)")
+        return 0
+    
+    # Skip files in SKIP_DIRECTORIES directories
+    if any(skip_dir in os.path.dirname(file_path).lower() for skip_dir in SKIP_DIRECTORIES):
+        return 0
+    
+    # Skip files with extensions to ignore
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext.lstrip('.') in SKIP_EXTENSIONS:
+        return 0
+    
+    value_score = get_file_value_score(file_info)
+    return value_score if value_score >= 5 else 0
+
+def collect_files_from_tarball(session, repo_name, ref, max_files, max_file_size=MAX_FILE_SIZE, test_mode=False):
+    """
+    Read the best candidate files of a repository from one streamed tarball
+    
+    Used when the tree listing is truncated. Files are scored with
+    get_candidate_file_score as they stream past and only the best
+    max_files bodies are kept in memory.
+    
+    Args:
+        session: GitHub API session
+        repo_name: Repository name (owner/repo)
+        ref: Branch, tag or commit to read
+        max_files: Maximum number of files to keep
+        max_file_size: Maximum file size in bytes to collect
+        test_mode: If True, log why files are skipped
+        
+    Returns:
+        List of (file_path, file_info, content) tuples, best first, or None
+        if the tarball could not be read
+    """
+    best = []  # Heap of (value_score, file_path, file_info, content)
+    try:
+        response = session.get(f"https://api.github.com/repos/{repo_name}/tarball/{ref}", stream=True, timeout=60)
+        if response.status_code != 200:
+            logger.warning(f"Failed to download tarball of {repo_name}. Status code: {response.status_code}")
+            return None
+        
+        with tarfile.open(fileobj=response.raw, mode='r|gz') as archive:
+            for member in archive:
+                # Member names start with an "owner-repo-commit/" directory
+                if not member.isfile() or '/' not in member.name:
+                    continue
+                
+                file_path = member.name.split('/', 1)[1]
+                file_info = {'path': file_path, 'name': os.path.basename(file_path), 'type': 'file', 'size': member.size}
+                value_score = get_candidate_file_score(file_info, max_file_size, test_mode)
+                if not value_score:
+                    continue
+                if len(best) >= max_files and (value_score, file_path) <= best[0][:2]:
+                    continue
+                
+                body = archive.extractfile(member).read()
+                if b'\0' in body[:8000]:
+                    continue  # Binary file
+                
+                heapq.heappush(best, (value_score, file_path, file_info, body.decode('utf-8', errors='replace')))
+                if len(best) > max_files:
+                    heapq.heappop(best)
+        
+        best.sort(key=lambda x: (-x[0], x[1]))
+        return [(file_path, file_info, content) for _, file_path, file_info, content in best]
+    except Exception as e:
+        logger.error(f"Error reading tarball of {repo_name}: {str(e)}")
+        return None
+
 def collect_valuable_files(session, repo_name, repo_info, max_files=75, test_mode=False, max_file_size=1024*1024, recursive_depth=3):
     """
     Collect valuable files from a GitHub repository
@@ -2217,6 +2296,14 @@ def collect_valuable_files(session, repo_name, repo_info, max_files=75, test_mod
     - Well-documented Python files
     - Jupyter notebooks with explanations and code
     
+    The repository is listed with one recursive Git Trees call and every
+    file is scored locally from its path and size (get_file_value_score).
+    The best candidates are downloaded in parallel from
+    raw.githubusercontent.com, which does not count against the API rate
+    limit, and ranked on their content with calculate_file_value_score.
+    When GitHub truncates the listing of a large repository, a repository
+    of at most TARBALL_MAX_KB is read from one streamed tarball instead.
+    
     Args:
         session: GitHub API session
         repo_name: Repository name (owner/repo)
@@ -2224,7 +2311,7 @@ def collect_valuable_files(session, repo_name, repo_info, max_files=75, test_mod
         max_files: Maximum number of files to collect
         test_mode: If True, print extra information for testing
         max_file_size: Maximum file size in bytes to collect (default: 1MB)
-        recursive_depth: Maximum depth for recursive directory exploration
+        recursive_depth: Unused, the tree listing covers the whole repository (kept for compatibility)
         
     Returns:
         List of dictionaries with file information
@@ -2232,292 +2319,82 @@ def collect_valuable_files(session, repo_name, repo_info, max_files=75, test_mod
     if not repo_name or not session:
         return []
     
-    valuable_files = []
-    visited_directories = set()
-    
-    # Priority directories to scan first (in order of importance)
-    priority_paths = [
-        "docs", "doc", "documentation", 
-        "examples", "tutorials", "guides", "cookbook",
-        "samples", "demo", "howto",
-        "notebooks", "jupyter", 
-        "."  # Root directory (for README and important root files)
-    ]
+    repo_info = repo_info or {}
+    ref = repo_info.get('default_branch') or "HEAD"
     
-    # Store paths and their scores for prioritization
-    candidate_files = []
+    contents, truncated = get_repo_tree(session, repo_name, ref)
+    if contents is None:
+        return []
     
-    # Number of files rejected due to size concerns
-    rejected_count = 0
+    # Collect more candidates than needed so the content score can pick the best
+    pool_size = max_files * 2
+    repo_size_kb = repo_info.get('size')
     
-    # First pass: scan priority directories
-    for path in priority_paths:
-        if test_mode:
-            logger.info(f"Scanning priority directory: {path}")
+    if truncated and repo_size_kb is not None and repo_size_kb <= TARBALL_MAX_KB:
+        logger.info(f"File tree of {repo_name} is truncated, reading its tarball")
+        fetched = collect_files_from_tarball(session, repo_name, ref, pool_size, max_file_size, test_mode)
+        if fetched is None:
+            return []
+    else:
+        if truncated:
+            logger.warning(f"File tree of {repo_name} is truncated, ranking only the files GitHub returned")
         
-        try:
-            # Check if directory exists by requesting content
-            if path == ".":
-                contents = get_repo_contents(session, repo_name, "")
-            else:
-                contents = get_repo_contents(session, repo_name, path)
-                
-            if contents is None:
+        # Store paths and their scores for prioritization
+        candidate_files = []
+        for item in contents:
+            if item['type'] != 'file':
                 continue
-                
-            visited_directories.add(path)
-            
-            # Process files in this directory
-            for item in contents:
-                if item['type'] == 'dir':
-                    continue  # Skip directories in first pass
-                
-                # Check if this is a valuable file type
-                file_path = item['path']
-                file_ext = os.path.splitext(file_path)[1].lower()
-                
-                # Large files are skipped
-                if item['size'] > max_file_size:
-                    # For implementation files, still consider them if they contain valuable patterns
-                    file_type = get_file_type(file_path)
-                    high_value_patterns = ['/model/', '/engine/', '/core/', '/runtime/', '/optimizer/', '/kernel/']
-                    is_critical_file = any(pattern in file_path.lower() for pattern in high_value_patterns)
-                    
-                    # Don't immediately reject critical implementation files
-                    if (file_type in ['python', 'cpp', 'cuda', 'header'] and is_critical_file and 
-                            item['size'] < max_file_size * 2):  # Allow up to 2x the max size for important files
-                        if test_mode:
-                            logger.info(f"Including large important file: {file_path} ({item['size']} bytes)")
-                    else:
-                        if test_mode:
-                            logger.info(f"Skipping large file: {file_path} ({item['size']} bytes)")
-                        rejected_count += 1
-                        continue
-                
-                # Skip files in SKIP_DIRECTORIES directories
-                if any(skip_dir in file_path.lower() for skip_dir in SKIP_DIRECTORIES):
-                    if test_mode:
-                        logger.info(f"Skipping file in ignored directory: {file_path}")
-                    continue
-                
-                # Skip files with extensions to ignore
-                if file_ext.lstrip('.') in SKIP_EXTENSIONS:
-                    if test_mode:
-                        logger.info(f"Skipping file with ignored extension: {file_path}")
-                    continue
-                
-                # Apply additional filters for specific file types
-                if file_ext.lstrip('.') in ['md', 'rst', 'txt']:
-                    # Only README or explicitly valuable text files
-                    if not ('readme' in file_path.lower() or 
-                            'tutorial' in file_path.lower() or
-                            'guide' in file_path.lower() or
-                            'example' in file_path.lower() or
-                            'documentation' in file_path.lower()):
-                        # Further check if file has a potentially valuable name
-                        if not any(term in file_path.lower() for term in [
-                            'overview', 'howto', 'getting_started', 'setup', 'install',
-                            'introduction', 'usage', 'quickstart', 'contributing', 'changelog'
-                        ]):
-                            continue
-                
-                try:
-                    # Calculate a value score for this file
-                    file_info = item
-                    value_score = get_file_value_score(file_info)
-                    
-                    if test_mode:
-                        logger.info(f"File: {file_path}, Value Score: {value_score}")
-                    
-                    if value_score >= 5:  # Lower threshold from 40 to 5 for first pass
-                        candidate_files.append((file_path, value_score, file_info))
-                        
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {str(e)}")
-                    
-        except Exception as e:
-            logger.warning(f"Error getting contents of {path} in {repo_name}: {str(e)}")
-    
-    # Second pass: discover other valuable directories by scanning the root recursively
-    try:
-        dirs_to_visit = []
-        root_contents = get_repo_contents(session, repo_name, "")
-        
-        if root_contents:
-            for item in root_contents:
-                if item['type'] == 'dir':
-                    dir_path = item['path']
-                    # Skip already visited directories and known low-value dirs
-                    if (dir_path in visited_directories or 
-                        any(skip_dir in dir_path.lower() for skip_dir in SKIP_DIRECTORIES)):
-                        continue
-                    dirs_to_visit.append(dir_path)
-    
-        # Visit directories in breadth-first manner to find valuable files
-        while dirs_to_visit and len(candidate_files) < max_files * 2:  # Collect more than needed for better selection
-            current_dir = dirs_to_visit.pop(0)
-            if current_dir in visited_directories:
+            value_score = get_candidate_file_score(item, max_file_size, test_mode)
+            if value_score:
+                candidate_files.append((item['path'], value_score, item))
+        
+        # Sort by value score (descending) and download the best candidates
+        candidate_files.sort(key=lambda x: x[1], reverse=True)
+        candidate_files = candidate_files[:pool_size]
+        if test_mode:
+            logger.info(f"Selected {len(candidate_files)} of {len(contents)} listed entries in {repo_name}")
+        
+        with ThreadPoolExecutor(max_workers=FILE_FETCH_WORKERS) as executor:
+            contents_fetched = list(executor.map(
+                lambda candidate: collect_file_content(session, repo_name, candidate[0], candidate[2], ref),
+                candidate_files
+            ))
+        
+        fetched = []
+        for (file_path, _, file_info), content in zip(candidate_files, contents_fetched):
+            if not content:
+                logger.warning(f"Failed to collect content for {file_path} - content returned None")
                 continue
-                
-            visited_directories.add(current_dir)
-            
-            try:
-                contents = get_repo_contents(session, repo_name, current_dir)
-                if not contents:
-                    continue
-                    
-                # First, add subdirectories to the visit queue
-                for item in contents:
-                    if item['type'] == 'dir':
-                        # Skip known low-value directories
-                        if any(skip_dir in item['path'].lower() for skip_dir in SKIP_DIRECTORIES):
-                            continue
-                        dirs_to_visit.append(item['path'])
-                    
-                    # Process files
-                    elif item['type'] == 'file':
-                        file_path = item['path']
-                        file_ext = os.path.splitext(file_path)[1].lower()
-                        
-                        # Large files are skipped
-                        if item['size'] > max_file_size:
-                            if should_include_large_file(file_path, item['size'], max_file_size, test_mode):
-                                # Continue processing this file
-                                pass
-                            else:
-                                if test_mode:
-                                    logger.info(f"Skipping large file: {file_path} ({item['size']} bytes)")
-                                rejected_count += 1
-                                continue
-                            
-                        # Skip files with extensions to ignore
-                        if file_ext.lstrip('.') in SKIP_EXTENSIONS:
-                            if test_mode:
-                                logger.info(f"Skipping file with ignored extension: {file_path}")
-                            continue
-                            
-                        # Calculate a value score for this file
-                        try:
-                            file_info = item
-                            value_score = get_file_value_score(file_info)
-                            
-                            if test_mode:
-                                logger.info(f"File: {file_path}, Value Score: {value_score}")
-                                
-                            if value_score >= 5:  # Lower threshold from 30 to 5 for secondary search
-                                candidate_files.append((file_path, value_score, file_info))
-                                
-                        except Exception as e:
-                            logger.error(f"Error processing {file_path}: {str(e)}")
-                    
-            except Exception as e:
-                logger.warning(f"Error getting contents of {current_dir} in {repo_name}: {str(e)}")
-                
-    except Exception as e:
-        logger.warning(f"Error during recursive directory search: {str(e)}")
-    
-    # If we still don't have enough files, try a more aggressive recursive approach
-    if len(candidate_files) < max_files * 0.5:  # If we have less than 50% of our target
-        logger.info(f"Not enough files found in standard directories. Attempting deeper recursive scan.")
-        try:
-            # Use our enhanced recursive directory structure function
-            recursive_contents = get_repo_directory_structure(
-                session, repo_name, "", 
-                recursive=True, 
-                max_depth=recursive_depth
-            )
-            
-            # Process files
-            for item in recursive_contents:
-                if len(candidate_files) >= max_files * 2:
-                    break
-                    
-                if item.get('type') != 'file':
-                    continue
-                    
-                file_path = item.get('path', '')
-                file_size = item.get('size', 0)
-                
-                # Skip files that are too large
-                if file_size > max_file_size:
-                    if should_include_large_file(file_path, file_size, max_file_size, test_mode):
-                        # Continue processing this file
-                        pass
-                    else:
-                        if test_mode:
-                            logger.info(f"Skipping large file: {file_path} ({file_size} bytes)")
-                        rejected_count += 1
-                        continue
-                
-                # Skip files in ignored directories
-                if any(skip_dir in file_path.lower() for skip_dir in SKIP_DIRECTORIES):
-                    continue
-                
-                # Skip files with ignored extensions
-                file_ext = os.path.splitext(file_path)[1].lower()
-                if file_ext.lstrip('.') in SKIP_EXTENSIONS:
-                    continue
-                
-                try:
-                    # Calculate a value score for this file
-                    value_score = get_file_value_score(item)
-                    
-                    if test_mode:
-                        logger.info(f"File (deep scan): {file_path}, Value Score: {value_score}")
-                        
-                    if value_score >= 1:  # Lower threshold from 10 to 1 for deep scan
-                        candidate_files.append((file_path, value_score, item))
-                        
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {str(e)}")
-        except Exception as e:
-            logger.warning(f"Error during deep recursive scan: {str(e)}")
+            fetched.append((file_path, file_info, content))
     
-    # Sort by value score (descending) and select the best files
-    candidate_files.sort(key=lambda x: x[1], reverse=True)
-    
-    # Take top files up to max_files
-    top_files = candidate_files[:max_files]
+    # Rank the downloaded files on their content and keep the best
+    scored_files = [
+        (calculate_file_value_score(file_path, content, repo_info), file_path, file_info, content)
+        for file_path, file_info, content in fetched
+    ]
+    scored_files.sort(key=lambda x: x[0], reverse=True)
     
-    # Collect content for top files
-    for file_path, value_score, file_info in top_files:
+    valuable_files = []
+    for value_score, file_path, file_info, content in scored_files[:max_files]:
+        # Process file content based on type
+        file_type = get_file_type(file_path)
+        
         try:
-            if test_mode:
-                logger.info(f"Attempting to collect content for: {file_path}")
-                
-            # Collect file content
-            content = collect_file_content(session, repo_name, file_path, file_info)
-            if not content:
-                logger.warning(f"Failed to collect content for {file_path} - content returned None")
-                continue
-                
-            # Process file content based on type
-            file_type = get_file_type(file_path)
-            
-            try:
-                processed_content = process_file_content(content, repo_name, file_path, file_type)
-            except Exception as e:
-                logger.error(f"Error processing content for {file_path}: {str(e)}")
-                # Continue with unprocessed content rather than skipping the file
-                processed_content = content
-            
-            # Add to valuable files
-            valuable_file = {
-                'path': file_path,
-                'type': file_type,
-                'value_score': value_score,
-                'content': content,
-                'processed_content': processed_content,
-                'size': file_info.get('size', 0)
-            }
-            
-            valuable_files.append(valuable_file)
-            
-            if test_mode:
-                logger.info(f"Added file to valuable files: {file_path}, Value Score: {value_score}")
-                
+            processed_content = process_file_content(content, repo_name, file_path, file_type)
         except Exception as e:
-            logger.error(f"Error collecting content for {file_path}: {str(e)}")
+            logger.error(f"Error processing content for {file_path}: {str(e)}")
+            # Continue with unprocessed content rather than skipping the file
+            processed_content = content
+        
+        # Add to valuable files
+        valuable_files.append({
+            'path': file_path,
+            'type': file_type,
+            'value_score': value_score,
+            'content': content,
+            'processed_content': processed_content,
+            'size': file_info.get('size', 0)
+        })
     
     if test_mode:
         if valuable_files:
@@ -2528,7 +2405,6 @@ def collect_valuable_files(session, repo_name, repo_info, max_files=75, test_mod
                 logger.info(f"  - ... and {len(valuable_files)-5} more files")
         else:
             logger.warning("No valuable files were collected. Check file content collection.")
-        logger.info(f"Rejected {rejected_count} files due to size")
     
     # Calculate repository quality score based on collected files
     quality_score = calculate_repo_quality_score(repo_info, valuable_files)
@@ -2798,6 +2674,7 @@ def collect_github_repos(github_token=None, max_repos=None, test_mode=False, sin
         os.environ['no_proxy'] = '*'
     
     session = requests.Session()
+    install_http_cache(session)
     if github_token:
         session.headers.update({'Authorization': f'token {github_token}'})
     
@@ -2913,6 +2790,7 @@ def collect_github_repos(github_token=None, max_repos=None, test_mode=False, sin
         # Close database connection
         if conn:
             conn.close()
+        log_http_cache_stats()
 
 def process_markdown(content, repo_name="", file_path=""):
     """